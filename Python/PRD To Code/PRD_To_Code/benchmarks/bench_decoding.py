@@ -0,0 +1,71 @@
+"""
+Benchmark de decodificación de imágenes por formato.
+Mide la lectura completa y reducida de fotos de 12 MP en JPEG, PNG, WebP y
+HEIC (si pillow-heif está instalado), y lo que cuesta preparar cada formato
+para enviarlo a las APIs de visión (tal cual o transcodificado).
+
+Uso:
+    python benchmarks/bench_decoding.py [repeticiones]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.image_io import bytes_para_subida, leer_imagen, leer_reducida, pillow_heif
+
+def crear_foto(directorio: Path) -> dict:
+    """Genera una foto sintética de 4032x3024 (iPhone) en cada formato."""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)
+    imagen = cv2.resize(base, (4032, 3024), interpolation=cv2.INTER_CUBIC)
+    imagen = cv2.add(imagen, rng.integers(0, 16, imagen.shape, dtype=np.uint8))
+
+    rutas = {
+        'JPEG': directorio / "foto.jpg",
+        'PNG': directorio / "foto.png",
+        'WEBP': directorio / "foto.webp"
+    }
+    cv2.imwrite(str(rutas['JPEG']), imagen, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    cv2.imwrite(str(rutas['PNG']), imagen)
+    cv2.imwrite(str(rutas['WEBP']), imagen, [cv2.IMWRITE_WEBP_QUALITY, 90])
+    if pillow_heif is not None:
+        rutas['HEIC'] = directorio / "foto.heic"
+        Image.fromarray(cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)).save(rutas['HEIC'], quality=90)
+    return {formato: str(ruta) for formato, ruta in rutas.items()}
+
+def medir(funcion, repeticiones: int) -> float:
+    """Milisegundos medios por llamada."""
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+def main():
+    """Ejecuta el benchmark."""
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = crear_foto(Path(directorio))
+
+        print(f"🖼️  Decodificación de una foto de 4032x3024 (media de {repeticiones} lecturas)")
+        print(f"  {'formato':>8} {'MB':>6} {'completa':>10} {'a 1080p':>10} {'subida':>10}")
+        for formato, ruta in rutas.items():
+            megas = Path(ruta).stat().st_size / 1e6
+            completa = medir(lambda: leer_imagen(ruta), repeticiones)
+            reducida = medir(lambda: leer_reducida(ruta, 1440, 1080), repeticiones)
+            subida = medir(lambda: bytes_para_subida(ruta), repeticiones)
+            print(f"  {formato:>8} {megas:>6.1f} {completa:>8.1f}ms {reducida:>8.1f}ms {subida:>8.1f}ms")
+        if pillow_heif is None:
+            print("  HEIC: no disponible (pip install pillow-heif)")
+
+if __name__ == "__main__":
+    main()
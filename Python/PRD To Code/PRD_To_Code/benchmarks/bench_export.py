@@ -0,0 +1,59 @@
+"""
+Benchmark de la exportación de recetas.
+Compara la memoria pico y el tiempo de construir el informe completo en memoria
+con la exportación en streaming a un destino con buffer.
+
+Uso:
+    python benchmarks/bench_export.py [num_recetas]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_model_loading import crear_datos_receta
+from utils.export import StreamExporter
+
+def generar_recetas(num_recetas: int):
+    """Genera recetas de una en una, como al recorrer el log de resultados."""
+    for i in range(num_recetas):
+        yield crear_datos_receta(i)
+
+def exportar_en_memoria(num_recetas: int, formato: str) -> None:
+    """Construye el informe completo y lo escribe de una vez."""
+    generador = StreamExporter.iter_recetas_markdown if formato == 'markdown' else StreamExporter.iter_recetas_json
+    contenido = ''.join(generador(list(generar_recetas(num_recetas))))
+    with open(os.devnull, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+
+def exportar_en_streaming(num_recetas: int, formato: str) -> None:
+    """Escribe el informe por fragmentos a medida que se generan las recetas."""
+    StreamExporter.exportar_recetas(generar_recetas(num_recetas), os.devnull, formato)
+
+def medir(funcion, *args):
+    """Devuelve el tiempo y la memoria pico (MB) de una ejecución."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    funcion(*args)
+    tiempo = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tiempo, pico / 1024 / 1024
+
+def main():
+    """Ejecuta el benchmark."""
+    num_recetas = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print(f"📤 Exportación de {num_recetas} recetas")
+    print(f"  {'formato':<10} {'modo':<11} {'tiempo s':>9} {'pico MB':>9}")
+    for formato in ('markdown', 'json'):
+        for modo, funcion in (('memoria', exportar_en_memoria), ('streaming', exportar_en_streaming)):
+            tiempo, pico = medir(funcion, num_recetas, formato)
+            print(f"  {formato:<10} {modo:<11} {tiempo:>9.2f} {pico:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark de memoria del historial de detecciones de ingredientes.
+Compara la memoria residente de N listas ListaIngredientes con la del
+HistorialIngredientes por columnas.
+
+Uso:
+    python benchmarks/bench_ingredient_store.py [num_detecciones]
+"""
+import random
+import sys
+import tracemalloc
+import warnings
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+warnings.filterwarnings("ignore")
+
+from models.ingredient import Ingrediente, ListaIngredientes, EstadoIngrediente, UnidadMedida
+from models.ingredient_store import HistorialIngredientes
+
+NOMBRES = [
+    "tomate", "cebolla", "ajo", "pimiento", "zanahoria", "patata", "pollo", "huevo", "queso",
+    "leche", "arroz", "pasta", "lechuga", "pepino", "limón", "manzana", "plátano", "espinaca"
+]
+
+def crear_detecciones(num_detecciones: int):
+    """Genera detecciones con el vocabulario reducido típico."""
+    aleatorio = random.Random(42)
+    for _ in range(num_detecciones):
+        yield ListaIngredientes(
+            ingredientes=[
+                Ingrediente(
+                    nombre=aleatorio.choice(NOMBRES),
+                    cantidad=float(aleatorio.randint(1, 500)),
+                    unidad=aleatorio.choice(list(UnidadMedida)),
+                    estado=aleatorio.choice(list(EstadoIngrediente)),
+                    confianza=round(aleatorio.uniform(0.5, 1.0), 3),
+                    categoria=aleatorio.choice(["vegetal", "proteina", "lacteo", "fruta"]),
+                    alergenos=["lactosa"] if aleatorio.random() < 0.1 else []
+                )
+                for _ in range(aleatorio.randint(3, 10))
+            ],
+            calidad_imagen="buena"
+        )
+
+def medir_memoria(constructor) -> int:
+    """Mide la memoria que queda reservada tras construir un objeto."""
+    tracemalloc.start()
+    objeto = constructor()
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objeto
+    return memoria
+
+def main():
+    """Ejecuta el benchmark."""
+    num_detecciones = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    listas = medir_memoria(lambda: list(crear_detecciones(num_detecciones)))
+    historial = medir_memoria(lambda: HistorialIngredientes.desde_listas(crear_detecciones(num_detecciones)))
+
+    print(f"📊 Memoria de {num_detecciones} detecciones")
+    print(f"  ListaIngredientes:     {listas / 1024 / 1024:>8.2f} MB")
+    print(f"  HistorialIngredientes: {historial / 1024 / 1024:>8.2f} MB")
+    print(f"  Reducción: {listas / historial:.1f}x")
+
+if __name__ == "__main__":
+    main()
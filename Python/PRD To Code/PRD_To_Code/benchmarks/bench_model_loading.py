@@ -0,0 +1,100 @@
+"""
+Benchmark de construcción de modelos desde datos JSON.
+Compara la construcción campo a campo de LLMClient con la validación en una
+sola pasada de Receta.from_dict / ListaIngredientes.from_dict.
+
+Uso:
+    python benchmarks/bench_model_loading.py [num_objetos]
+"""
+import sys
+import timeit
+import warnings
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+warnings.filterwarnings("ignore")
+
+from models.recipe import Receta
+from models.ingredient import Ingrediente, ListaIngredientes, EstadoIngrediente, UnidadMedida
+from services.llm_client import LLMClient
+
+def crear_datos_receta(recipe_id: int) -> dict:
+    """Crea los datos de una receta típica del LLM."""
+    return {
+        "id": recipe_id,
+        "nombre": f"Receta {recipe_id}",
+        "descripcion_corta": "Receta de prueba para el benchmark",
+        "tiempo_preparacion_min": 15,
+        "tiempo_coccion_min": 20,
+        "tiempo_total_min": 35,
+        "dificultad_estrellas": 2,
+        "porciones": 2,
+        "tipo_cocina": "mediterranea",
+        "ingredientes": [
+            {"nombre": f"ingrediente {i}", "cantidad": "100", "unidad": "g", "detectado": True, "esencial": True}
+            for i in range(8)
+        ],
+        "instrucciones": [
+            {"paso": i, "accion": f"Paso {i} de la receta", "tiempo_estimado": "5 min", "tip": "Consejo"}
+            for i in range(1, 7)
+        ],
+        "informacion_nutricional": {"calorias_por_porcion": 350, "proteinas_g": 25, "carbohidratos_g": 45, "grasas_g": 12},
+        "tags": ["rapido", "saludable"],
+        "nivel_dificultad": "principiante",
+        "consejos_chef": ["Consejo 1", "Consejo 2"],
+        "variaciones": ["Variación 1"]
+    }
+
+def crear_datos_ingredientes() -> dict:
+    """Crea los datos de una detección típica de ingredientes."""
+    return {
+        "ingredientes": [
+            {"nombre": f"ingrediente {i}", "cantidad": 2.0, "unidad": "unidad", "estado": "fresco",
+             "confianza": 0.9, "categoria": "vegetal"}
+            for i in range(10)
+        ],
+        "calidad_imagen": "buena"
+    }
+
+def construir_ingredientes_campo_a_campo(data: dict) -> ListaIngredientes:
+    """Construcción equivalente a ImageProcessor._parse_openai_response."""
+    ingredientes = [
+        Ingrediente(
+            nombre=ing['nombre'],
+            cantidad=ing.get('cantidad'),
+            unidad=UnidadMedida(ing['unidad']) if ing.get('unidad') else None,
+            estado=EstadoIngrediente(ing.get('estado', 'desconocido')),
+            confianza=ing.get('confianza', 0.0),
+            categoria=ing.get('categoria')
+        )
+        for ing in data['ingredientes']
+    ]
+    return ListaIngredientes(ingredientes=ingredientes, calidad_imagen=data.get('calidad_imagen'))
+
+def medir(nombre: str, funcion, num_objetos: int) -> float:
+    """Mide objetos por segundo (mejor de 5 repeticiones)."""
+    mejor = min(timeit.repeat(funcion, number=1, repeat=5))
+    objetos_seg = num_objetos / mejor
+    print(f"  {nombre:<28} {objetos_seg:>12,.0f} objetos/s")
+    return objetos_seg
+
+def main():
+    """Ejecuta el benchmark."""
+    num_objetos = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    recetas = [crear_datos_receta(i) for i in range(1, num_objetos + 1)]
+    detecciones = [crear_datos_ingredientes() for _ in range(num_objetos)]
+    cliente = LLMClient.__new__(LLMClient)
+
+    print(f"📊 Construcción de {num_objetos} recetas")
+    lento = medir("campo a campo", lambda: [cliente._create_recipe_from_data(r, r['id']) for r in recetas], num_objetos)
+    rapido = medir("Receta.from_dict", lambda: [Receta.from_dict(r) for r in recetas], num_objetos)
+    print(f"  Aceleración: {rapido / lento:.2f}x")
+
+    print(f"\n📊 Construcción de {num_objetos} listas de ingredientes")
+    lento = medir("campo a campo", lambda: [construir_ingredientes_campo_a_campo(d) for d in detecciones], num_objetos)
+    rapido = medir("ListaIngredientes.from_dict", lambda: [ListaIngredientes.from_dict(d) for d in detecciones], num_objetos)
+    print(f"  Aceleración: {rapido / lento:.2f}x")
+
+if __name__ == "__main__":
+    main()
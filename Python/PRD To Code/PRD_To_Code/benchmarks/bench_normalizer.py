@@ -0,0 +1,61 @@
+"""
+Benchmark de la normalización de nombres de ingredientes.
+Mide el rendimiento de la forma canónica con la memoización fría (nombres
+nuevos) y caliente (nombres repetidos, el caso habitual entre sesiones).
+
+Uso:
+    python benchmarks/bench_normalizer.py [num_nombres]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.ingredient_normalizer import IngredientNormalizer
+
+BASES = [
+    "Tomate", "tomates", "Cebolla morada", "ajo", "Champiñones", "pimientos rojos", "limón",
+    "Nueces", "pechuga de pollo", "carne de res", "Patatas", "jitomate cherry", "queso fresco",
+    "Aceite de oliva virgen extra", "zanahorias", "espinacas frescas", "huevos", "arroz blanco"
+]
+
+def crear_nombres(num_nombres: int, distintos: int) -> list:
+    """Crea nombres de ingredientes con un número dado de variantes distintas."""
+    rng = random.Random(42)
+    variantes = [f"{rng.choice(BASES)} {i}" if i >= len(BASES) else BASES[i] for i in range(distintos)]
+    return [rng.choice(variantes) for _ in range(num_nombres)]
+
+def medir(nombres: list, limpiar: bool) -> float:
+    """Devuelve nombres canonicalizados por segundo."""
+    if limpiar:
+        for funcion in (IngredientNormalizer.normalizar, IngredientNormalizer.palabras, IngredientNormalizer.forma_busqueda):
+            funcion.cache_clear()
+    inicio = time.perf_counter()
+    for nombre in nombres:
+        IngredientNormalizer.canonico(nombre)
+    return len(nombres) / (time.perf_counter() - inicio)
+
+def medir_lower(nombres: list) -> float:
+    """Tiempo de la normalización anterior (solo minúsculas)."""
+    inicio = time.perf_counter()
+    for nombre in nombres:
+        nombre.lower()
+    return time.perf_counter() - inicio
+
+def main():
+    """Ejecuta el benchmark."""
+    num_nombres = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    print(f"🔤 Canonicalización de {num_nombres} nombres de ingredientes")
+    print(f"  {'escenario':<32} {'nombres/s':>12}")
+    unicos = crear_nombres(num_nombres, num_nombres)
+    print(f"  {'todos distintos (caché fría)':<32} {medir(unicos, limpiar=True):>12,.0f}")
+    repetidos = crear_nombres(num_nombres, 500)
+    print(f"  {'500 distintos (caché caliente)':<32} {medir(repetidos, limpiar=False):>12,.0f}")
+    print(f"  {'comparación: str.lower()':<32} {len(repetidos) / medir_lower(repetidos):>12,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark del preprocesamiento de imágenes en paralelo.
+Mide en imágenes por segundo lo que ejecuta `main.py --preprocess-only`
+(decodificar, preprocesar y guardar como JPEG) según el número de procesos.
+
+Uso:
+    python benchmarks/bench_preprocessing.py [num_imagenes]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.preprocessing_pool import PreprocessingPool, nucleos_disponibles
+
+def crear_imagenes(directorio: Path, num_imagenes: int):
+    """Genera fotos sintéticas de 3840x2160 con manchas de color."""
+    rng = np.random.default_rng(0)
+    rutas = []
+    for i in range(num_imagenes):
+        base = rng.integers(0, 256, (27, 48, 3), dtype=np.uint8)
+        imagen = cv2.resize(base, (3840, 2160), interpolation=cv2.INTER_CUBIC)
+        imagen = cv2.add(imagen, rng.integers(0, 16, imagen.shape, dtype=np.uint8))
+        ruta = directorio / f"foto_{i:03d}.jpg"
+        cv2.imwrite(str(ruta), imagen, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        rutas.append(str(ruta))
+    return rutas
+
+def medir(rutas, salida: Path, procesos: int) -> float:
+    """Imágenes por segundo de preprocesar_a_disco con ese número de procesos."""
+    with PreprocessingPool(procesos=procesos, lote_minimo=1) as pool:
+        pool.preprocesar_a_disco(rutas[:procesos], str(salida / "calentamiento"))  # arrancar los procesos
+        inicio = time.perf_counter()
+        pool.preprocesar_a_disco(rutas, str(salida / f"procesos_{procesos}"))
+        return len(rutas) / (time.perf_counter() - inicio)
+
+def main():
+    """Ejecuta el benchmark."""
+    num_imagenes = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    nucleos = nucleos_disponibles()
+    niveles = sorted({1, 2, 4, 8, 16, nucleos} & set(range(1, nucleos + 1)))
+
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = crear_imagenes(Path(directorio), num_imagenes)
+
+        print(f"🖼️  Preprocesamiento a disco de {num_imagenes} imágenes 4K ({nucleos} núcleos disponibles)")
+        print(f"  {'procesos':>8} {'imágenes/s':>11}")
+        for procesos in niveles:
+            print(f"  {procesos:>8} {medir(rutas, Path(directorio), procesos):>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark de analítica sobre el corpus de recetas.
+Compara bucles Python sobre diccionarios con el RecipeFrame columnar en un
+informe típico: totales nutricionales, filtro por tiempo y medias por cocina.
+
+Uso:
+    python benchmarks/bench_recipe_frame.py [num_recetas]
+"""
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.recipe import TipoCocina, NivelDificultad
+from models.recipe_frame import RecipeFrame
+
+def crear_recetas(num_recetas: int):
+    """Genera recetas en formato diccionario."""
+    aleatorio = random.Random(42)
+    for recipe_id in range(1, num_recetas + 1):
+        preparacion, coccion = aleatorio.randint(5, 60), aleatorio.randint(0, 120)
+        yield {
+            "id": recipe_id,
+            "nombre": f"Receta {recipe_id % 500}",
+            "tiempo_preparacion_min": preparacion,
+            "tiempo_coccion_min": coccion,
+            "tiempo_total_min": preparacion + coccion,
+            "dificultad_estrellas": aleatorio.randint(1, 5),
+            "porciones": aleatorio.randint(1, 6),
+            "tipo_cocina": aleatorio.choice(list(TipoCocina)).value,
+            "nivel_dificultad": aleatorio.choice(list(NivelDificultad)).value,
+            "informacion_nutricional": {
+                "calorias_por_porcion": aleatorio.randint(100, 900),
+                "proteinas_g": aleatorio.uniform(0, 60),
+                "carbohidratos_g": aleatorio.uniform(0, 120),
+                "grasas_g": aleatorio.uniform(0, 50),
+                "fibra_g": aleatorio.uniform(0, 15) if aleatorio.random() < 0.7 else None
+            }
+        }
+
+def informe_python(recetas):
+    """Informe recorriendo diccionarios."""
+    totales = defaultdict(float)
+    for receta in recetas:
+        info_nut = receta['informacion_nutricional']
+        totales['calorias'] += info_nut.get('calorias_por_porcion') or 0
+        totales['proteinas'] += info_nut.get('proteinas_g') or 0
+        totales['carbohidratos'] += info_nut.get('carbohidratos_g') or 0
+        totales['grasas'] += info_nut.get('grasas_g') or 0
+        totales['fibra'] += info_nut.get('fibra_g') or 0
+
+    rapidas = [receta for receta in recetas if receta['tiempo_total_min'] <= 30]
+    suma, conteo = defaultdict(float), defaultdict(int)
+    for receta in rapidas:
+        suma[receta['tipo_cocina']] += receta['informacion_nutricional']['calorias_por_porcion']
+        conteo[receta['tipo_cocina']] += 1
+    return totales, {tipo: suma[tipo] / conteo[tipo] for tipo in suma}
+
+def informe_frame(frame: RecipeFrame):
+    """Informe con operaciones vectorizadas."""
+    totales = frame.totales_nutricionales()
+    medias = frame.filtrar_por_tiempo(30).agregar('calorias_por_porcion', 'media', por='tipo_cocina')
+    return totales, medias
+
+def medir(funcion, repeticiones: int = 5) -> float:
+    """Devuelve el mejor tiempo de varias repeticiones."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def main():
+    """Ejecuta el benchmark."""
+    num_recetas = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    recetas = list(crear_recetas(num_recetas))
+
+    construccion = medir(lambda: RecipeFrame.from_dicts(recetas), repeticiones=1)
+    frame = RecipeFrame.from_dicts(recetas)
+    python = medir(lambda: informe_python(recetas))
+    columnar = medir(lambda: informe_frame(frame))
+
+    print(f"📊 Informe sobre {num_recetas} recetas")
+    print(f"  Bucles Python:          {python * 1000:>8.1f} ms")
+    print(f"  RecipeFrame:            {columnar * 1000:>8.1f} ms")
+    print(f"  Construcción del frame: {construccion * 1000:>8.1f} ms (una vez por corpus)")
+    print(f"  Aceleración del informe: {python / columnar:.1f}x")
+
+if __name__ == "__main__":
+    main()
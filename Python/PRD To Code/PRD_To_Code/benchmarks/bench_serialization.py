@@ -0,0 +1,69 @@
+"""
+Benchmark de los formatos de almacenamiento de resultados.
+Compara tamaño y velocidad de codificación/decodificación del JSON legible
+actual con el JSON compacto y el formato binario de registros. Los formatos se
+miden por rondas alternas, para que la recolección de basura y el estado de la
+caché no favorezcan al que se mide primero.
+
+Uso:
+    python benchmarks/bench_serialization.py [num_sesiones]
+"""
+import gc
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_model_loading import crear_datos_receta
+from utils.serialization import ResultSerializer, FORMATOS
+
+def crear_sesion(session_id: int) -> dict:
+    """Crea el resultado de una sesión como lo guarda main.py."""
+    recetas = [crear_datos_receta(session_id * 10 + i) for i in range(5)]
+    return {
+        "success": True,
+        "metadata": {
+            "total_recetas": len(recetas),
+            "ingredientes_utilizados": ["tomate", "cebolla", "ajo", "pimiento"],
+            "tiempo_generacion": "2024-06-01T12:00:00",
+            "temporada": "verano",
+            "version": "1.0",
+            "metricas": {}
+        },
+        "recetas": recetas,
+        "total_recetas": len(recetas)
+    }
+
+def medir(funcion) -> float:
+    """Devuelve el tiempo de una ejecución partiendo de la memoria recién recolectada."""
+    gc.collect()
+    inicio = time.perf_counter()
+    funcion()
+    return time.perf_counter() - inicio
+
+def main():
+    """Ejecuta el benchmark."""
+    num_sesiones = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sesiones = [crear_sesion(i) for i in range(num_sesiones)]
+
+    codificadas = {formato: [ResultSerializer.dumps(sesion, formato) for sesion in sesiones] for formato in FORMATOS}
+    codificar = {formato: float('inf') for formato in FORMATOS}
+    decodificar = {formato: float('inf') for formato in FORMATOS}
+    for _ in range(3):
+        for formato in FORMATOS:
+            codificar[formato] = min(codificar[formato], medir(lambda: [ResultSerializer.dumps(sesion, formato) for sesion in sesiones]))
+            decodificar[formato] = min(decodificar[formato], medir(lambda: [ResultSerializer.loads(raw) for raw in codificadas[formato]]))
+
+    print(f"📊 Serialización de {num_sesiones} sesiones (5 recetas cada una)")
+    print(f"  {'formato':<14} {'tamaño MB':>10} {'codificar/s':>12} {'decodificar/s':>14}")
+    for formato in FORMATOS:
+        tamano = sum(len(raw) for raw in codificadas[formato]) / 1024 / 1024
+        print(
+            f"  {formato:<14} {tamano:>10.2f} {num_sesiones / codificar[formato]:>12,.0f} "
+            f"{num_sesiones / decodificar[formato]:>14,.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
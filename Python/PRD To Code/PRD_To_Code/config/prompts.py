@@ -1,93 +1,55 @@
 """
 Plantillas de prompts para la generación de recetas con LLM.
 Basado en las especificaciones del PRD v1.0
+
+Los prompts de recetas empiezan por un prefijo estático (rol, reglas y esquema)
+idéntico byte a byte en todas las llamadas, seguido de la solicitud concreta.
+Así el proveedor puede reutilizar su caché de prefijos entre sesiones.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from config.settings import settings
 
-class PromptTemplates:
-    """Plantillas de prompts para diferentes escenarios."""
-    
-    @staticmethod
-    def get_main_recipe_prompt(
-        ingredientes_detectados: List[Dict[str, Any]],
-        ingredientes_basicos: List[str],
-        restricciones_dieteticas: List[str],
-        tiempo_disponible: int,
-        nivel_experiencia: str,
-        num_personas: int = 2
-    ) -> str:
-        """
-        Genera el prompt principal para la generación de recetas.
-        
-        Args:
-            ingredientes_detectados: Lista de ingredientes identificados
-            ingredientes_basicos: Lista de ingredientes básicos disponibles
-            restricciones_dieteticas: Restricciones dietéticas del usuario
-            tiempo_disponible: Tiempo disponible en minutos
-            nivel_experiencia: Nivel culinario del usuario
-            num_personas: Número de personas para las que cocinar
-            
-        Returns:
-            Prompt formateado para el LLM
-        """
-        
-        # Formatear ingredientes detectados
-        ingredientes_formateados = []
-        for ingrediente in ingredientes_detectados:
-            confianza = ingrediente.get('confianza', 0)
-            if confianza >= settings.MIN_CONFIDENCE_THRESHOLD:
-                ingredientes_formateados.append(
-                    f"- {ingrediente['nombre']} (confianza: {confianza:.1%})"
-                )
-        
-        ingredientes_texto = "\n".join(ingredientes_formateados) if ingredientes_formateados else "No se detectaron ingredientes claros"
-        
-        # Formatear restricciones dietéticas
-        restricciones_texto = ", ".join(restricciones_dieteticas) if restricciones_dieteticas else "Ninguna"
-        
-        # Obtener temporada actual
-        temporada_actual = settings.get_temporada_actual()
-        
-        return f"""
+# Descripción compacta del esquema de respuesta (sustituye al esqueleto JSON completo)
+ESQUEMA_RECETAS_COMPACTO = """Responde únicamente en JSON válido con la estructura {"metadata": {...}, "recetas": [...]}.
+metadata: total_recetas, ingredientes_utilizados (lista), tiempo_generacion, temporada.
+Cada receta: id, nombre, descripcion_corta, tiempo_preparacion_min, tiempo_coccion_min,
+tiempo_total_min (= preparación + cocción), dificultad_estrellas (1-5), porciones,
+tipo_cocina (italiana|mexicana|asiatica|mediterranea|francesa|espanola|internacional|fusion|vegetariana|vegana),
+ingredientes [{nombre, cantidad, unidad, detectado, esencial}],
+instrucciones [{paso, accion, tiempo_estimado, tip}],
+informacion_nutricional {calorias_por_porcion, proteinas_g, carbohidratos_g, grasas_g},
+tags, nivel_dificultad (principiante|intermedio|avanzado|experto), consejos_chef, variaciones."""
+
+# Prefijo estático del prompt principal (sin datos de la sesión)
+PREFIJO_RECETAS = """
 Actúa como un chef profesional con especialización en cocina internacional y nutrición. 
 Tu misión es transformar ingredientes disponibles en recetas extraordinarias.
 
-=== ANÁLISIS DE INGREDIENTES ===
-Ingredientes principales detectados:
-{ingredientes_texto}
-
-Ingredientes básicos disponibles: {", ".join(ingredientes_basicos)}
-Restricciones dietéticas activas: {restricciones_texto}
-
-=== PERFIL DEL USUARIO ===
-Nivel culinario: {nivel_experiencia}
-Tiempo disponible: {tiempo_disponible} minutos
-Número de comensales: {num_personas}
-Temporada actual: {temporada_actual}
-
-=== INSTRUCCIONES ESPECÍFICAS ===
-1. Genera EXACTAMENTE 5 recetas únicas y deliciosas
+=== INSTRUCCIONES GENERALES ===
+1. Genera exactamente el número de recetas indicado en la solicitud, únicas y deliciosas
 2. Cada receta debe usar mínimo 3 de los ingredientes detectados
 3. Ordena por dificultad: principiante a intermedio
 4. Incluye al menos 1 receta que se complete en <20 minutos
 5. Balancea tipos de cocción: crudo, salteado, horneado, hervido
-6. Prioriza ingredientes de temporada: {temporada_actual}
-7. Adapta porciones para {num_personas} personas
+6. Prioriza ingredientes de la temporada indicada
+7. Adapta las porciones al número de comensales indicado
+8. Cumple todas las restricciones obligatorias de la solicitud
 
 === FORMATO DE RESPUESTA REQUERIDO ===
-Responde únicamente en JSON válido siguiendo esta estructura exacta:
+Responde únicamente en JSON válido siguiendo esta estructura exacta.
+Los valores del ejemplo son ilustrativos: usa el número de recetas, comensales
+y temporada de la solicitud.
 
-{{
-  "metadata": {{
-    "total_recetas": 5,
+{
+  "metadata": {
+    "total_recetas": 1,
     "ingredientes_utilizados": ["lista", "de", "ingredientes"],
     "tiempo_generacion": "timestamp",
-    "temporada": "{temporada_actual}"
-  }},
+    "temporada": "temporada indicada"
+  },
   "recetas": [
-    {{
+    {
       "id": 1,
       "nombre": "Título Atractivo de la Receta",
       "descripcion_corta": "Descripción en una línea que despierte apetito",
@@ -95,31 +57,31 @@ Responde únicamente en JSON válido siguiendo esta estructura exacta:
       "tiempo_coccion_min": 20,
       "tiempo_total_min": 35,
       "dificultad_estrellas": 2,
-      "porciones": {num_personas},
+      "porciones": 2,
       "tipo_cocina": "italiana",
       "ingredientes": [
-        {{
+        {
           "nombre": "Ingrediente 1",
           "cantidad": "200g",
           "unidad": "gramos",
           "detectado": true,
           "esencial": true
-        }}
+        }
       ],
       "instrucciones": [
-        {{
+        {
           "paso": 1,
           "accion": "Descripción detallada del primer paso",
           "tiempo_estimado": "5 min",
           "tip": "Consejo profesional opcional"
-        }}
+        }
       ],
-      "informacion_nutricional": {{
+      "informacion_nutricional": {
         "calorias_por_porcion": 350,
         "proteinas_g": 25,
         "carbohidratos_g": 45,
         "grasas_g": 12
-      }},
+      },
       "tags": ["rapido", "saludable", "familiar"],
       "nivel_dificultad": "principiante",
       "consejos_chef": [
@@ -130,9 +92,9 @@ Responde únicamente en JSON válido siguiendo esta estructura exacta:
         "Versión vegetariana: sustituir X por Y",
         "Versión picante: agregar Z"
       ]
-    }}
+    }
   ]
-}}
+}
 
 === VALIDACIONES OBLIGATORIAS ===
 - Verificar que todos los ingredientes principales estén disponibles
@@ -147,20 +109,23 @@ Responde únicamente en JSON válido siguiendo esta estructura exacta:
 - Incluye información sobre conservación de sobras
 - Adapta las porciones si hay ingredientes en cantidad limitada
 - Sugiere acompañamientos que complementen nutritivamente
-- Considera la temporada {temporada_actual} para ingredientes frescos
+- Considera la temporada indicada para ingredientes frescos
+"""
 
-Genera las recetas ahora manteniendo el más alto estándar culinario y nutricional.
+# Prefijo estático de la variante compacta y de las peticiones de relleno
+PREFIJO_RECETAS_COMPACTO = f"""
+Eres un chef profesional. Genera recetas con los ingredientes de la solicitud.
+
+REGLAS: genera exactamente el número de recetas pedido; mínimo 3 ingredientes detectados por
+receta; al menos 1 receta de menos de 20 minutos; variedad de técnicas de cocción; cantidades
+realistas para los comensales indicados; marca como opcionales los ingredientes que falten;
+cumple todas las restricciones obligatorias de la solicitud.
+
+{ESQUEMA_RECETAS_COMPACTO}
 """
 
-    @staticmethod
-    def get_ingredient_detection_prompt() -> str:
-        """
-        Prompt para el reconocimiento de ingredientes en imágenes.
-        
-        Returns:
-            Prompt para análisis de imágenes
-        """
-        return """
+# Prompt de reconocimiento de ingredientes en una imagen
+PROMPT_DETECCION_INGREDIENTES = """
 Analiza esta imagen y identifica todos los ingredientes alimentarios visibles.
 
 INSTRUCCIONES:
@@ -196,6 +161,206 @@ Si no puedes identificar ingredientes claros, responde:
 }
 """
 
+class PromptTemplates:
+    """Plantillas de prompts para diferentes escenarios."""
+    
+    @staticmethod
+    def get_recipe_prompt_prefix(compacto: Optional[bool] = None) -> str:
+        """
+        Obtiene el prefijo estático de los prompts de recetas.
+        
+        Args:
+            compacto: Prefijo de la variante compacta (por defecto settings.PROMPT_COMPACT_MODE)
+            
+        Returns:
+            Prefijo común a todas las llamadas
+        """
+        if compacto is None:
+            compacto = settings.PROMPT_COMPACT_MODE
+        return PREFIJO_RECETAS_COMPACTO if compacto else PREFIJO_RECETAS
+    
+    @staticmethod
+    def get_main_recipe_prompt(
+        ingredientes_detectados: List[Dict[str, Any]],
+        ingredientes_basicos: List[str],
+        restricciones_dieteticas: List[str],
+        tiempo_disponible: int,
+        nivel_experiencia: str,
+        num_personas: int = 2,
+        num_recetas: int = settings.DEFAULT_MAX_RECIPES,
+        restricciones_duras: Optional[Dict[str, Any]] = None,
+        preferencias_usuario: Optional[str] = None,
+        compacto: Optional[bool] = None
+    ) -> str:
+        """
+        Genera el prompt principal para la generación de recetas.
+        
+        Args:
+            ingredientes_detectados: Lista de ingredientes identificados
+            ingredientes_basicos: Lista de ingredientes básicos disponibles
+            restricciones_dieteticas: Restricciones dietéticas del usuario
+            tiempo_disponible: Tiempo disponible en minutos
+            nivel_experiencia: Nivel culinario del usuario
+            num_personas: Número de personas para las que cocinar
+            num_recetas: Número de recetas candidatas a generar
+            restricciones_duras: Filtros obligatorios del usuario (ver PerfilUsuario.obtener_restricciones_duras)
+            preferencias_usuario: Preferencias del usuario en formato texto
+            compacto: Usa la variante compacta, sin esqueleto JSON ni instrucciones
+                redundantes (por defecto settings.PROMPT_COMPACT_MODE)
+            
+        Returns:
+            Prompt formateado para el LLM (prefijo estático + solicitud)
+        """
+        
+        ingredientes_texto = PromptTemplates._format_detected_ingredients(ingredientes_detectados)
+        
+        # Formatear restricciones dietéticas
+        restricciones_texto = ", ".join(restricciones_dieteticas) if restricciones_dieteticas else "Ninguna"
+        
+        # Obtener temporada actual
+        temporada_actual = settings.get_temporada_actual()
+        
+        # Formatear filtros obligatorios y preferencias del usuario
+        restricciones_duras_texto = PromptTemplates._format_hard_constraints(restricciones_duras)
+        preferencias_texto = preferencias_usuario or "Sin preferencias específicas"
+        
+        return PromptTemplates.get_recipe_prompt_prefix(compacto) + f"""
+=== SOLICITUD ===
+Genera EXACTAMENTE {num_recetas} recetas (total_recetas: {num_recetas}).
+
+Ingredientes principales detectados:
+{ingredientes_texto}
+
+Ingredientes básicos disponibles: {", ".join(ingredientes_basicos)}
+Restricciones dietéticas activas: {restricciones_texto}
+
+=== PERFIL DEL USUARIO ===
+Nivel culinario: {nivel_experiencia}
+Tiempo disponible: {tiempo_disponible} minutos
+Número de comensales: {num_personas}
+Temporada actual: {temporada_actual}
+Preferencias: {preferencias_texto}
+
+=== RESTRICCIONES OBLIGATORIAS ===
+{restricciones_duras_texto}
+
+Genera las recetas ahora manteniendo el más alto estándar culinario y nutricional.
+"""
+
+    @staticmethod
+    def get_backfill_recipe_prompt(
+        ingredientes_detectados: List[Dict[str, Any]],
+        recetas_existentes: List[str],
+        restricciones_dieteticas: List[str],
+        tiempo_disponible: int,
+        nivel_experiencia: str,
+        num_personas: int = 2,
+        num_recetas: int = 1,
+        restricciones_duras: Optional[Dict[str, Any]] = None,
+        preferencias_usuario: Optional[str] = None
+    ) -> str:
+        """
+        Prompt breve para completar una sesión con recetas adicionales.
+        
+        Se usa cuando, tras el filtrado, quedan menos recetas de las pedidas.
+        Pide solo las recetas que faltan y excluye las ya generadas.
+        
+        Args:
+            ingredientes_detectados: Lista de ingredientes identificados
+            recetas_existentes: Nombres de recetas que no deben repetirse
+            restricciones_dieteticas: Restricciones dietéticas del usuario
+            tiempo_disponible: Tiempo disponible en minutos
+            nivel_experiencia: Nivel culinario del usuario
+            num_personas: Número de personas para las que cocinar
+            num_recetas: Número de recetas adicionales a generar
+            restricciones_duras: Filtros obligatorios del usuario (ver PerfilUsuario.obtener_restricciones_duras)
+            preferencias_usuario: Preferencias del usuario en formato texto
+            
+        Returns:
+            Prompt formateado para el LLM (prefijo compacto + solicitud)
+        """
+        ingredientes_texto = PromptTemplates._format_detected_ingredients(ingredientes_detectados)
+        restricciones_texto = ", ".join(restricciones_dieteticas) if restricciones_dieteticas else "Ninguna"
+        excluidas_texto = ", ".join(recetas_existentes) if recetas_existentes else "Ninguna"
+        temporada_actual = settings.get_temporada_actual()
+        if restricciones_duras:
+            restricciones_duras_texto = PromptTemplates._format_hard_constraints(restricciones_duras)
+        else:
+            restricciones_duras_texto = f"- Tiempo total máximo: {tiempo_disponible} minutos"
+        preferencias_texto = preferencias_usuario or "Sin preferencias específicas"
+        
+        return PromptTemplates.get_recipe_prompt_prefix(compacto=True) + f"""
+SOLICITUD: genera EXACTAMENTE {num_recetas} recetas adicionales con estos ingredientes:
+{ingredientes_texto}
+
+REQUISITOS OBLIGATORIOS:
+- Nivel culinario del usuario: {nivel_experiencia}
+- Restricciones dietéticas: {restricciones_texto}
+- Porciones: {num_personas}
+- No repitas estas recetas: {excluidas_texto}
+{restricciones_duras_texto}
+
+PREFERENCIAS: {preferencias_texto}
+TEMPORADA: {temporada_actual}
+"""
+
+    @staticmethod
+    def _format_detected_ingredients(ingredientes_detectados: List[Dict[str, Any]]) -> str:
+        """Formatea los ingredientes detectados con confianza suficiente para el prompt."""
+        ingredientes_formateados = []
+        for ingrediente in ingredientes_detectados:
+            confianza = ingrediente.get('confianza', 0)
+            if confianza >= settings.MIN_CONFIDENCE_THRESHOLD:
+                cantidad = ''
+                if ingrediente.get('cantidad') and ingrediente.get('unidad'):
+                    cantidad = f": {ingrediente['cantidad']:g} {ingrediente['unidad']}"
+                ingredientes_formateados.append(
+                    f"- {ingrediente['nombre']}{cantidad} (confianza: {confianza:.1%})"
+                )
+        
+        return "\n".join(ingredientes_formateados) if ingredientes_formateados else "No se detectaron ingredientes claros"
+
+    @staticmethod
+    def _format_hard_constraints(restricciones_duras: Optional[Dict[str, Any]]) -> str:
+        """Formatea los filtros obligatorios del usuario como reglas para el LLM."""
+        if not restricciones_duras:
+            return "- Ninguna adicional"
+        
+        reglas = [
+            f"- Tiempo total máximo por receta: {restricciones_duras['tiempo_maximo']} minutos",
+            f"- Nivel de dificultad máximo: {restricciones_duras['nivel_maximo']}"
+        ]
+        if restricciones_duras.get('alergenos'):
+            reglas.append(f"- Alérgenos prohibidos: {', '.join(restricciones_duras['alergenos'])}")
+        prohibidos = restricciones_duras.get('ingredientes_prohibidos', []) + restricciones_duras.get('ingredientes_evitados', [])
+        if prohibidos:
+            reglas.append(f"- Ingredientes prohibidos (tampoco como opcionales): {', '.join(prohibidos)}")
+        reglas.append("- Cualquier receta que incumpla una de estas reglas será descartada")
+        
+        return "\n".join(reglas)
+
+    @staticmethod
+    def get_ingredient_detection_prompt(num_recuadros: int = 0) -> str:
+        """
+        Prompt para el reconocimiento de ingredientes en imágenes.
+        
+        Args:
+            num_recuadros: Recuadros del mosaico enviado (0 si es la foto original)
+        
+        Returns:
+            Prompt para análisis de imágenes
+        """
+        if num_recuadros:
+            return PROMPT_DETECCION_INGREDIENTES + f"""
+IMAGEN EN MOSAICO:
+La imagen está formada por {num_recuadros} recuadros numerados de 0 a {num_recuadros - 1}
+de izquierda a derecha. El recuadro 0 es la foto completa; los demás son
+ampliaciones de zonas de la misma foto. No cuentes dos veces un mismo producto
+visto en varios recuadros. Añade a cada ingrediente el campo "region" con el
+número del recuadro en que mejor se ve.
+"""
+        return PROMPT_DETECCION_INGREDIENTES
+
     @staticmethod
     def get_quick_recipe_prompt(
         ingredientes_detectados: List[str],
@@ -22,8 +22,32 @@ class Settings:
     MAX_IMAGES_PER_SESSION: int = int(os.getenv("MAX_IMAGES_PER_SESSION", "10"))
     MAX_RESPONSE_TIME: int = int(os.getenv("MAX_RESPONSE_TIME", "30"))
     MIN_CONFIDENCE_THRESHOLD: float = float(os.getenv("MIN_CONFIDENCE_THRESHOLD", "0.7"))
+    FUSION_QUANTITY_MODE: str = os.getenv("FUSION_QUANTITY_MODE", "max")
     DEFAULT_MAX_RECIPES: int = int(os.getenv("DEFAULT_MAX_RECIPES", "5"))
-    
+
+    # Generación adaptativa de candidatas y relleno
+    ENABLE_BACKFILL: bool = os.getenv("ENABLE_BACKFILL", "true").lower() == "true"
+    MAX_CANDIDATE_RECIPES: int = int(os.getenv("MAX_CANDIDATE_RECIPES", "10"))
+    MAX_BACKFILL_RECIPES: int = int(os.getenv("MAX_BACKFILL_RECIPES", "4"))
+    DEFAULT_REJECTION_RATE: float = float(os.getenv("DEFAULT_REJECTION_RATE", "0.2"))
+    REJECTION_RATE_SMOOTHING: float = float(os.getenv("REJECTION_RATE_SMOOTHING", "0.3"))
+
+    # Presupuesto de tokens y compactación de prompts
+    PROMPT_COMPACT_MODE: bool = os.getenv("PROMPT_COMPACT_MODE", "false").lower() == "true"
+    MAX_COMPLETION_TOKENS: int = int(os.getenv("MAX_COMPLETION_TOKENS", "4000"))
+    TOKENS_PER_RECIPE: int = int(os.getenv("TOKENS_PER_RECIPE", "650"))
+    RESPONSE_TOKEN_OVERHEAD: int = int(os.getenv("RESPONSE_TOKEN_OVERHEAD", "150"))
+
+    # Modo JSON de la API (solo en modelos que lo admiten)
+    ENABLE_JSON_MODE: bool = os.getenv("ENABLE_JSON_MODE", "true").lower() == "true"
+
+    # Log de resultados de sesiones
+    RESULTS_LOG_DIR: str = os.getenv("RESULTS_LOG_DIR", "output/results_log")
+    RESULTS_LOG_SEGMENT_SIZE: int = int(os.getenv("RESULTS_LOG_SEGMENT_SIZE", str(64 * 1024 * 1024)))
+
+    # Exportación de informes
+    EXPORT_BUFFER_SIZE: int = int(os.getenv("EXPORT_BUFFER_SIZE", str(256 * 1024)))
+
     # Logging Configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE: str = os.getenv("LOG_FILE", "culinary_vision.log")
@@ -31,6 +55,64 @@ class Settings:
     # Cache Configuration
     ENABLE_CACHE: bool = os.getenv("ENABLE_CACHE", "true").lower() == "true"
     CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+    SEMANTIC_CACHE_DIM: int = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+    SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+    NORMALIZER_CACHE_SIZE: int = int(os.getenv("NORMALIZER_CACHE_SIZE", "16384"))
+    
+    # Detección de imágenes duplicadas (hash perceptual)
+    ENABLE_IMAGE_DEDUP: bool = os.getenv("ENABLE_IMAGE_DEDUP", "true").lower() == "true"
+    IMAGE_HASH_MAX_DISTANCE: int = int(os.getenv("IMAGE_HASH_MAX_DISTANCE", "6"))
+    IMAGE_HASH_CACHE_SIZE: int = int(os.getenv("IMAGE_HASH_CACHE_SIZE", "10000"))
+    
+    # Filtro local de calidad de imagen
+    ENABLE_QUALITY_GATE: bool = os.getenv("ENABLE_QUALITY_GATE", "true").lower() == "true"
+    QUALITY_GATE_MODE: str = os.getenv("QUALITY_GATE_MODE", "rechazar")
+    QUALITY_MIN_SHARPNESS: float = float(os.getenv("QUALITY_MIN_SHARPNESS", "50"))
+    QUALITY_MIN_BRIGHTNESS: float = float(os.getenv("QUALITY_MIN_BRIGHTNESS", "35"))
+    QUALITY_MAX_BRIGHTNESS: float = float(os.getenv("QUALITY_MAX_BRIGHTNESS", "225"))
+    QUALITY_MAX_CLIPPED: float = float(os.getenv("QUALITY_MAX_CLIPPED", "0.5"))
+    QUALITY_MIN_FOOD_SCORE: float = float(os.getenv("QUALITY_MIN_FOOD_SCORE", "0.05"))
+    QUALITY_FOOD_SCORE_MODE: str = os.getenv("QUALITY_FOOD_SCORE_MODE", "avisar")
+    
+    # Mosaico de regiones para fotos grandes (celdas del tamaño de tesela del modelo de visión)
+    ENABLE_REGION_MOSAIC: bool = os.getenv("ENABLE_REGION_MOSAIC", "true").lower() == "true"
+    MOSAIC_MIN_SIDE: int = int(os.getenv("MOSAIC_MIN_SIDE", "2000"))
+    MOSAIC_TILE_SIZE: int = int(os.getenv("MOSAIC_TILE_SIZE", "512"))
+    MOSAIC_MAX_TILES: int = int(os.getenv("MOSAIC_MAX_TILES", "4"))
+    REGION_MIN_AREA: float = float(os.getenv("REGION_MIN_AREA", "0.005"))
+    
+    # Pool de preprocesamiento de imágenes (0 = todos los núcleos disponibles)
+    PREPROCESS_WORKERS: int = int(os.getenv("PREPROCESS_WORKERS", "0"))
+    PREPROCESS_MIN_BATCH: int = int(os.getenv("PREPROCESS_MIN_BATCH", "4"))
+    
+    # Backends de detección: api, local, local_primero, respaldo_local o una lista de detectores
+    DETECTION_BACKEND: str = os.getenv("DETECTION_BACKEND", "api")
+    
+    # Modelo local de detección (ONNX u otro formato de OpenCV DNN, en CPU)
+    LOCAL_MODEL_PATH: str = os.getenv("LOCAL_MODEL_PATH", "")
+    LOCAL_MODEL_CONFIG: str = os.getenv("LOCAL_MODEL_CONFIG", "")
+    LOCAL_MODEL_LABELS: str = os.getenv("LOCAL_MODEL_LABELS", "")
+    LOCAL_MODEL_INPUT_SIZE: int = int(os.getenv("LOCAL_MODEL_INPUT_SIZE", "224"))
+    LOCAL_MODEL_NORMALIZATION: str = os.getenv("LOCAL_MODEL_NORMALIZATION", "imagenet")
+    LOCAL_MODEL_ACTIVATION: str = os.getenv("LOCAL_MODEL_ACTIVATION", "softmax")
+    LOCAL_MODEL_BATCH_SIZE: int = int(os.getenv("LOCAL_MODEL_BATCH_SIZE", "8"))
+    LOCAL_MIN_CONFIDENCE: float = float(os.getenv("LOCAL_MIN_CONFIDENCE", "0.5"))
+    LOCAL_MAX_INGREDIENTS: int = int(os.getenv("LOCAL_MAX_INGREDIENTS", "10"))
+    
+    # Lectura de imágenes: presupuesto por proceso de bytes en vuelo y bloque de base64
+    IMAGE_MEMORY_BUDGET: int = int(os.getenv("IMAGE_MEMORY_BUDGET_MB", "512")) * 1024 * 1024
+    BASE64_CHUNK_SIZE: int = int(os.getenv("BASE64_CHUNK_SIZE", str(3 * 1024 * 1024)))
+    
+    # Transcodificación para las APIs de visión de los formatos que no aceptan (HEIC): JPEG o WEBP
+    UPLOAD_TRANSCODE_FORMAT: str = os.getenv("UPLOAD_TRANSCODE_FORMAT", "JPEG")
+    UPLOAD_TRANSCODE_QUALITY: int = int(os.getenv("UPLOAD_TRANSCODE_QUALITY", "85"))
+    UPLOAD_MAX_SIDE: int = int(os.getenv("UPLOAD_MAX_SIDE", "2048"))
+    
+    # Trazas con tiempos por etapa: exportación ninguna, log (JSON) u otlp (OTLP/JSON en TRACE_OTLP_FILE)
+    ENABLE_TRACING: bool = os.getenv("ENABLE_TRACING", "true").lower() == "true"
+    TRACE_EXPORT: str = os.getenv("TRACE_EXPORT", "ninguna")
+    TRACE_OTLP_FILE: str = os.getenv("TRACE_OTLP_FILE", "traces.otlp.jsonl")
     
     # Development Configuration
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
@@ -57,6 +139,14 @@ class Settings:
         "num_personas": 2
     }
     
+    # Pesos de la puntuación de recetas (dificultad, tiempo, cobertura, temporada)
+    RANKING_WEIGHTS = {
+        "dificultad": float(os.getenv("RANKING_WEIGHT_DIFICULTAD", "1.0")),
+        "tiempo": float(os.getenv("RANKING_WEIGHT_TIEMPO", "0.75")),
+        "cobertura": float(os.getenv("RANKING_WEIGHT_COBERTURA", "0.5")),
+        "temporada": float(os.getenv("RANKING_WEIGHT_TEMPORADA", "0.25"))
+    }
+
     # Ingredientes básicos siempre disponibles
     INGREDIENTES_BASICOS = [
         "sal", "pimienta", "aceite de oliva", "agua", "azúcar", 
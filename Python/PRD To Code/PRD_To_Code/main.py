@@ -11,8 +11,11 @@ from pathlib import Path
 from config.settings import settings
 from models.user_profile import PerfilUsuario
 from services.recipe_generator import RecipeGenerator
+from services.preprocessing_pool import PreprocessingPool
 from utils.validators import Validators
 from utils.helpers import Helpers
+from utils.export import StreamExporter
+from utils.results_log import ResultsLog
 
 # Configurar logging
 logging.basicConfig(
@@ -37,6 +40,9 @@ class CulinaryVisionAI:
             # Inicializar generador de recetas
             self.recipe_generator = RecipeGenerator()
             
+            # El log de resultados se abre al guardar la primera sesión
+            self._results_log = None
+            
             logger.info("CulinaryVision AI inicializado correctamente")
             
         except Exception as e:
@@ -64,7 +70,7 @@ class CulinaryVisionAI:
         max_recipes: Optional[int] = None,
         use_openai_vision: bool = True,
         save_to_file: bool = False,
-        output_format: str = "json"
+        output_format: Optional[str] = "json"
     ) -> dict:
         """
         Genera recetas a partir de imágenes de ingredientes.
@@ -74,8 +80,9 @@ class CulinaryVisionAI:
             user_profile: Perfil del usuario (opcional)
             max_recipes: Número máximo de recetas a generar
             use_openai_vision: Si usar OpenAI Vision para detección
-            save_to_file: Si guardar resultados en archivo
-            output_format: Formato de salida (json, markdown)
+            save_to_file: Si guardar resultados en el log de resultados
+            output_format: Formato de exportación (json, json_compacto, binario, markdown);
+                None para guardar solo en el log
             
         Returns:
             Diccionario con resultados
@@ -127,10 +134,10 @@ class CulinaryVisionAI:
                 'metadata': recetas.metadata.dict(),
                 'recetas': [receta.to_dict() for receta in recetas.recetas],
                 'total_recetas': len(recetas.recetas),
-                'ingredientes_detectados': [ing.nombre for ing in recetas.metadata.ingredientes_utilizados]
+                'ingredientes_detectados': list(recetas.metadata.ingredientes_utilizados)
             }
             
-            # Guardar en archivo si se solicita
+            # Guardar en el log de resultados si se solicita
             if save_to_file:
                 self._save_results(result, output_format)
             
@@ -144,38 +151,81 @@ class CulinaryVisionAI:
                 'error': f"Error interno: {str(e)}"
             }
     
-    def _save_results(self, result: dict, output_format: str):
-        """Guarda los resultados en archivo."""
+    @property
+    def results_log(self) -> ResultsLog:
+        """Log de resultados de sesiones."""
+        if self._results_log is None:
+            self._results_log = ResultsLog()
+        return self._results_log
+    
+    def _save_results(self, result: dict, output_format: Optional[str] = None):
+        """Guarda los resultados en el log y, si se pide, los exporta a archivo."""
         try:
-            # Crear directorio de salida
-            output_dir = "output"
-            Helpers.create_output_directory(output_dir)
-            
-            # Generar nombre de archivo
             session_id = Helpers.generate_session_id()
+            result['session_id'] = session_id
+            self.results_log.append(session_id, result)
+            logger.info(f"Resultados de la sesión {session_id} guardados en {self.results_log.directorio}")
             
-            if output_format.lower() == "json":
-                filename = f"{output_dir}/recetas_{session_id}.json"
-                Helpers.save_recipes_to_file(result, filename)
-                logger.info(f"Resultados guardados en {filename}")
-            
-            elif output_format.lower() == "markdown":
-                # Crear archivo Markdown para cada receta
-                for i, receta in enumerate(result['recetas']):
-                    filename = f"{output_dir}/receta_{i+1}_{session_id}.md"
-                    markdown_content = Helpers.create_recipe_markdown(receta)
-                    
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        f.write(markdown_content)
-                    
-                    logger.info(f"Receta {i+1} guardada en {filename}")
-            
-            else:
-                logger.warning(f"Formato de salida no soportado: {output_format}")
+            if output_format:
+                self.export_results(session_id, output_format)
                 
         except Exception as e:
             logger.error(f"Error al guardar resultados: {e}")
     
+    def export_results(self, session_id: str, output_format: str = "json", output_dir: str = "output") -> List[str]:
+        """
+        Exporta a archivo los resultados de una sesión guardada en el log.
+        
+        Args:
+            session_id: Id de la sesión
+            output_format: Formato de salida (json, json_compacto, binario, markdown)
+            output_dir: Directorio de salida
+            
+        Returns:
+            Rutas de los archivos creados
+        """
+        result = self.results_log.get(session_id)
+        if result is None:
+            logger.warning(f"Sesión no encontrada en el log: {session_id}")
+            return []
+        
+        Helpers.create_output_directory(output_dir)
+        archivos = []
+        
+        if output_format.lower() in ("json", "json_compacto", "binario"):
+            extension = "bin" if output_format.lower() == "binario" else "json"
+            filename = f"{output_dir}/recetas_{session_id}.{extension}"
+            if Helpers.save_recipes_to_file(result, filename, output_format.lower()):
+                archivos.append(filename)
+        
+        elif output_format.lower() == "markdown":
+            # Un único archivo Markdown con todas las recetas, escrito en streaming
+            filename = f"{output_dir}/recetas_{session_id}.md"
+            StreamExporter.exportar_recetas(result['recetas'], filename, 'markdown')
+            archivos.append(filename)
+        
+        else:
+            logger.warning(f"Formato de salida no soportado: {output_format}")
+        
+        for filename in archivos:
+            logger.info(f"Resultados exportados a {filename}")
+        return archivos
+    
+    def export_log(self, destino: Optional[str] = None, output_format: str = "markdown") -> int:
+        """
+        Exporta todas las sesiones del log de resultados sin cargarlas a la vez.
+        
+        Args:
+            destino: Ruta del archivo de salida; None o '-' para stdout
+            output_format: Formato de salida (markdown, json)
+            
+        Returns:
+            Bytes escritos
+        """
+        bytes_escritos = StreamExporter.exportar_resultados(self.results_log.iter_results(), destino, output_format)
+        logger.info(f"Log de resultados exportado ({Helpers.format_file_size(bytes_escritos)})")
+        return bytes_escritos
+    
     def generate_quick_recipes(self, ingredientes_detectados: List[str], tiempo_maximo: int = 15) -> dict:
         """Genera recetas rápidas."""
         try:
@@ -276,14 +326,34 @@ def main():
     parser.add_argument(
         '--save',
         action='store_true',
-        help='Guardar resultados en archivo'
+        help='Guardar resultados en el log de resultados y exportarlos al directorio output'
+    )
+    
+    parser.add_argument(
+        '--no-export',
+        action='store_true',
+        help='Con --save, guardar solo en el log de resultados sin exportar a archivo'
     )
     
     parser.add_argument(
         '--format',
-        choices=['json', 'markdown'],
+        choices=['json', 'json_compacto', 'binario', 'markdown'],
         default='json',
-        help='Formato de salida (default: json)'
+        help='Formato de exportación (default: json)'
+    )
+    
+    parser.add_argument(
+        '--preprocess-only',
+        type=str,
+        metavar='DIR',
+        help='Solo preprocesar las imágenes en paralelo y guardarlas en DIR'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='Procesos de preprocesamiento (default: todos los núcleos)'
     )
     
     parser.add_argument(
@@ -299,6 +369,16 @@ def main():
         logging.getLogger().setLevel(logging.DEBUG)
     
     try:
+        # Preprocesamiento por lotes sin detección ni recetas
+        if args.preprocess_only:
+            with PreprocessingPool(procesos=args.workers) as pool:
+                rutas = pool.preprocesar_a_disco(args.images, args.preprocess_only)
+                estadisticas = pool.obtener_estadisticas()
+            correctas = sum(1 for ruta in rutas if ruta)
+            print(f"\n🖼️  {correctas}/{len(rutas)} imágenes preprocesadas en '{args.preprocess_only}'")
+            print(f"⚡ {estadisticas['imagenes_por_segundo']:.1f} imágenes/s con {estadisticas['procesos']} procesos")
+            sys.exit(0 if correctas == len(rutas) else 1)
+        
         # Inicializar aplicación
         app = CulinaryVisionAI()
         
@@ -320,7 +400,7 @@ def main():
             max_recipes=args.max_recipes,
             use_openai_vision=not args.use_google_vision,
             save_to_file=args.save,
-            output_format=args.format
+            output_format=None if args.no_export else args.format
         )
         
         # Mostrar resultados
@@ -336,7 +416,9 @@ def main():
                     print(f"  {i}. {summary}")
             
             if args.save:
-                print(f"\n💾 Resultados guardados en directorio 'output'")
+                print(f"\n💾 Sesión {result.get('session_id')} guardada en '{settings.RESULTS_LOG_DIR}'")
+            if args.save and not args.no_export:
+                print(f"📄 Resultados exportados al directorio 'output'")
         
         else:
             print(f"\n❌ Error: {result['error']}")
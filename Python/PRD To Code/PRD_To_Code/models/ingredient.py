@@ -1,7 +1,7 @@
 """
 Modelo de datos para ingredientes.
 """
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from pydantic import BaseModel, Field, validator
 from enum import Enum
 
@@ -83,6 +83,35 @@ class Ingrediente(BaseModel):
         """Crea un ingrediente desde un diccionario."""
         return cls(**data)
 
+class IngredienteFusionado(Ingrediente):
+    """Ingrediente combinado a partir de las detecciones de varias imágenes."""
+    
+    imagenes: List[int] = Field(default_factory=list, description="Índices de las imágenes en que se detectó")
+    detecciones: int = Field(1, ge=1, description="Número de detecciones combinadas")
+    regiones: List[Tuple[int, List[int]]] = Field(
+        default_factory=list, description="Imagen y caja (x, y, ancho, alto) de cada zona en que se vio"
+    )
+    
+    def to_dict(self) -> dict:
+        """Convierte el ingrediente a diccionario, incluyendo su procedencia."""
+        return {
+            **super().to_dict(),
+            "imagenes": self.imagenes,
+            "detecciones": self.detecciones,
+            "regiones": [[imagen, list(caja)] for imagen, caja in self.regiones]
+        }
+
+class RegionImagen(BaseModel):
+    """Zona de la imagen analizada por separado (recuadro de un mosaico)."""
+    
+    indice: int = Field(..., ge=0, description="Número del recuadro en el mosaico (0 = imagen completa)")
+    caja: List[int] = Field(..., description="Caja en píxeles de la imagen original: x, y, ancho, alto")
+    ingredientes: List[str] = Field(default_factory=list, description="Ingredientes detectados en la zona")
+    
+    def to_dict(self) -> dict:
+        """Convierte la región a diccionario."""
+        return {"indice": self.indice, "caja": self.caja, "ingredientes": self.ingredientes}
+
 class ListaIngredientes(BaseModel):
     """Lista de ingredientes con metadatos."""
     
@@ -90,11 +119,39 @@ class ListaIngredientes(BaseModel):
     total_ingredientes: int = Field(0, description="Total de ingredientes")
     calidad_imagen: Optional[str] = Field(None, description="Calidad de la imagen analizada")
     error: Optional[str] = Field(None, description="Mensaje de error si aplica")
+    regiones: List[RegionImagen] = Field(default_factory=list, description="Zonas de la imagen donde se vio cada ingrediente")
     
     def __init__(self, **data):
         super().__init__(**data)
         self.total_ingredientes = len(self.ingredientes)
     
+    @validator('ingredientes', pre=True)
+    def ingredientes_fusionados(cls, v):
+        # Los diccionarios con procedencia (ver IngredienteFusionado.to_dict) se reconstruyen fusionados
+        if isinstance(v, list):
+            return [
+                IngredienteFusionado(**ing) if isinstance(ing, dict) and 'imagenes' in ing else ing
+                for ing in v
+            ]
+        return v
+    
+    def to_dict(self) -> dict:
+        """Convierte la lista a diccionario."""
+        return {
+            "ingredientes": [ing.to_dict() for ing in self.ingredientes],
+            "total_ingredientes": self.total_ingredientes,
+            "calidad_imagen": self.calidad_imagen,
+            "error": self.error,
+            "regiones": [region.to_dict() for region in self.regiones]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ListaIngredientes':
+        """Crea una lista desde un diccionario, validando en una sola pasada."""
+        lista = cls.model_validate(data)
+        lista.total_ingredientes = len(lista.ingredientes)
+        return lista
+    
     def agregar_ingrediente(self, ingrediente: Ingrediente) -> None:
         """Agrega un ingrediente a la lista."""
         self.ingredientes.append(ingrediente)
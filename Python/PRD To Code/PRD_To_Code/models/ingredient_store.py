@@ -0,0 +1,265 @@
+"""
+Almacenamiento compacto del historial de detecciones de ingredientes.
+Guarda las listas de ingredientes por columnas: textos internados en un
+vocabulario compartido, enumerados como códigos y números en arrays tipados.
+Los ingredientes fusionados conservan su procedencia (imágenes, detecciones y
+zonas) y las listas, las zonas de la imagen donde se vio cada ingrediente.
+"""
+import math
+import sys
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .ingredient import Ingrediente, IngredienteFusionado, ListaIngredientes, EstadoIngrediente, RegionImagen, UnidadMedida
+
+# Códigos de los enumerados (-1 representa None)
+UNIDADES = list(UnidadMedida)
+ESTADOS = list(EstadoIngrediente)
+CODIGOS_UNIDAD = {unidad: codigo for codigo, unidad in enumerate(UNIDADES)}
+CODIGOS_ESTADO = {estado: codigo for codigo, estado in enumerate(ESTADOS)}
+
+# Bits de la columna de indicadores
+DETECTADO = 1
+ESENCIAL = 2
+
+SIN_VALOR = -1
+
+# Detecciones de un ingrediente que no viene de una fusión
+NO_FUSIONADO = 0
+
+# Enteros por zona: imagen (o número de recuadro) y caja x, y, ancho, alto
+CAMPOS_ZONA = 5
+
+class HistorialIngredientes:
+    """Historial de listas de ingredientes almacenado por columnas."""
+
+    def __init__(self):
+        """Inicializa un historial vacío."""
+        # Vocabulario compartido de textos
+        self._vocabulario: List[str] = []
+        self._codigos: Dict[str, int] = {}
+
+        # Columnas por ingrediente
+        self._nombres = array('i')
+        self._cantidades = array('d')
+        self._confianzas = array('d')
+        self._unidades = array('b')
+        self._estados = array('b')
+        self._indicadores = array('B')
+        self._categorias = array('i')
+        self._temporadas = array('i')
+        self._inicio_alergenos = array('I', [0])
+        self._alergenos = array('i')
+        self._detecciones = array('i')
+        self._inicio_imagenes = array('I', [0])
+        self._imagenes = array('i')
+        self._inicio_zonas = array('I', [0])
+        self._zonas = array('i')
+
+        # Columnas por lista
+        self._inicio_listas = array('I', [0])
+        self._calidades = array('i')
+        self._errores = array('i')
+        self._inicio_regiones = array('I', [0])
+
+        # Columnas por región de la imagen
+        self._regiones = array('i')
+        self._inicio_nombres_region = array('I', [0])
+        self._nombres_region = array('i')
+
+    @classmethod
+    def desde_listas(cls, listas: Iterable[ListaIngredientes]) -> 'HistorialIngredientes':
+        """
+        Crea un historial a partir de listas de ingredientes.
+
+        Args:
+            listas: Listas de ingredientes detectados
+
+        Returns:
+            Historial con todas las listas
+        """
+        historial = cls()
+        historial.extender(listas)
+        return historial
+
+    def __len__(self) -> int:
+        """Número de listas almacenadas."""
+        return len(self._inicio_listas) - 1
+
+    def __iter__(self) -> Iterator[ListaIngredientes]:
+        """Recorre las listas almacenadas."""
+        for indice in range(len(self)):
+            yield self.obtener(indice)
+
+    @property
+    def num_ingredientes(self) -> int:
+        """Número total de ingredientes almacenados."""
+        return len(self._nombres)
+
+    def agregar(self, lista: ListaIngredientes) -> int:
+        """
+        Agrega una lista de ingredientes al historial.
+
+        Args:
+            lista: Lista de ingredientes
+
+        Returns:
+            Índice de la lista en el historial
+        """
+        for ingrediente in lista.ingredientes:
+            self._nombres.append(self._internar(ingrediente.nombre))
+            self._cantidades.append(math.nan if ingrediente.cantidad is None else ingrediente.cantidad)
+            self._confianzas.append(ingrediente.confianza)
+            self._unidades.append(CODIGOS_UNIDAD[ingrediente.unidad] if ingrediente.unidad else SIN_VALOR)
+            self._estados.append(CODIGOS_ESTADO[ingrediente.estado])
+            self._indicadores.append(
+                (DETECTADO if ingrediente.detectado else 0) | (ESENCIAL if ingrediente.esencial else 0)
+            )
+            self._categorias.append(self._internar(ingrediente.categoria))
+            self._temporadas.append(self._internar(ingrediente.temporada))
+            self._alergenos.extend(self._internar(alergeno) for alergeno in ingrediente.alergenos)
+            self._inicio_alergenos.append(len(self._alergenos))
+            if isinstance(ingrediente, IngredienteFusionado):
+                self._detecciones.append(ingrediente.detecciones)
+                self._imagenes.extend(ingrediente.imagenes)
+                for imagen, caja in ingrediente.regiones:
+                    self._zonas.append(imagen)
+                    self._zonas.extend(caja)
+            else:
+                self._detecciones.append(NO_FUSIONADO)
+            self._inicio_imagenes.append(len(self._imagenes))
+            self._inicio_zonas.append(len(self._zonas))
+
+        self._inicio_listas.append(len(self._nombres))
+        self._calidades.append(self._internar(lista.calidad_imagen))
+        self._errores.append(self._internar(lista.error))
+        for region in lista.regiones:
+            self._regiones.append(region.indice)
+            self._regiones.extend(region.caja)
+            self._nombres_region.extend(self._internar(nombre) for nombre in region.ingredientes)
+            self._inicio_nombres_region.append(len(self._nombres_region))
+        self._inicio_regiones.append(len(self._inicio_nombres_region) - 1)
+        return len(self) - 1
+
+    def extender(self, listas: Iterable[ListaIngredientes]) -> None:
+        """Agrega varias listas de ingredientes al historial."""
+        for lista in listas:
+            self.agregar(lista)
+
+    def obtener(self, indice: int) -> ListaIngredientes:
+        """
+        Reconstruye una lista de ingredientes del historial.
+
+        Args:
+            indice: Índice de la lista
+
+        Returns:
+            Lista de ingredientes idéntica a la almacenada
+        """
+        if not 0 <= indice < len(self):
+            raise IndexError(f"Índice de historial fuera de rango: {indice}")
+
+        inicio, fin = self._inicio_listas[indice], self._inicio_listas[indice + 1]
+        ingredientes = [self._construir_ingrediente(fila) for fila in range(inicio, fin)]
+        regiones = [
+            self._construir_region(fila)
+            for fila in range(self._inicio_regiones[indice], self._inicio_regiones[indice + 1])
+        ]
+
+        # Los valores ya se validaron al crear la lista original
+        return ListaIngredientes.model_construct(
+            ingredientes=ingredientes,
+            total_ingredientes=len(ingredientes),
+            calidad_imagen=self._texto(self._calidades[indice]),
+            error=self._texto(self._errores[indice]),
+            regiones=regiones
+        )
+
+    def frecuencia_ingredientes(self) -> Dict[str, int]:
+        """Obtiene cuántas veces se ha detectado cada ingrediente."""
+        return {self._vocabulario[codigo]: total for codigo, total in Counter(self._nombres).most_common()}
+
+    def confianza_media(self, nombre: str) -> Optional[float]:
+        """
+        Obtiene la confianza media de las detecciones de un ingrediente.
+
+        Args:
+            nombre: Nombre del ingrediente
+
+        Returns:
+            Confianza media o None si nunca se ha detectado
+        """
+        codigo = self._codigos.get(nombre)
+        if codigo is None:
+            return None
+        confianzas = [c for n, c in zip(self._nombres, self._confianzas) if n == codigo]
+        return sum(confianzas) / len(confianzas) if confianzas else None
+
+    def memoria_bytes(self) -> int:
+        """Estima la memoria ocupada por las columnas y el vocabulario."""
+        columnas = (
+            self._nombres, self._cantidades, self._confianzas, self._unidades, self._estados,
+            self._indicadores, self._categorias, self._temporadas, self._inicio_alergenos,
+            self._alergenos, self._detecciones, self._inicio_imagenes, self._imagenes,
+            self._inicio_zonas, self._zonas, self._inicio_listas, self._calidades, self._errores,
+            self._inicio_regiones, self._regiones, self._inicio_nombres_region, self._nombres_region
+        )
+        vocabulario = sum(sys.getsizeof(texto) for texto in self._vocabulario)
+        return sum(columna.itemsize * len(columna) for columna in columnas) + vocabulario
+
+    def _construir_ingrediente(self, fila: int) -> Ingrediente:
+        """Reconstruye el ingrediente de una fila (IngredienteFusionado si viene de una fusión)."""
+        cantidad = self._cantidades[fila]
+        unidad = self._unidades[fila]
+        indicadores = self._indicadores[fila]
+        inicio, fin = self._inicio_alergenos[fila], self._inicio_alergenos[fila + 1]
+
+        campos = dict(
+            nombre=self._vocabulario[self._nombres[fila]],
+            cantidad=None if math.isnan(cantidad) else cantidad,
+            unidad=UNIDADES[unidad] if unidad != SIN_VALOR else None,
+            estado=ESTADOS[self._estados[fila]],
+            confianza=self._confianzas[fila],
+            detectado=bool(indicadores & DETECTADO),
+            esencial=bool(indicadores & ESENCIAL),
+            categoria=self._texto(self._categorias[fila]),
+            alergenos=[self._vocabulario[codigo] for codigo in self._alergenos[inicio:fin]],
+            temporada=self._texto(self._temporadas[fila])
+        )
+        detecciones = self._detecciones[fila]
+        if detecciones == NO_FUSIONADO:
+            return Ingrediente.model_construct(**campos)
+        inicio, fin = self._inicio_imagenes[fila], self._inicio_imagenes[fila + 1]
+        zonas = self._zonas[self._inicio_zonas[fila]:self._inicio_zonas[fila + 1]].tolist()
+        return IngredienteFusionado.model_construct(
+            **campos,
+            imagenes=self._imagenes[inicio:fin].tolist(),
+            detecciones=detecciones,
+            regiones=[(zonas[i], zonas[i + 1:i + CAMPOS_ZONA]) for i in range(0, len(zonas), CAMPOS_ZONA)]
+        )
+
+    def _construir_region(self, fila: int) -> RegionImagen:
+        """Reconstruye la región de la imagen de una fila."""
+        campos = self._regiones[fila * CAMPOS_ZONA:(fila + 1) * CAMPOS_ZONA].tolist()
+        inicio, fin = self._inicio_nombres_region[fila], self._inicio_nombres_region[fila + 1]
+        return RegionImagen.model_construct(
+            indice=campos[0],
+            caja=campos[1:],
+            ingredientes=[self._vocabulario[codigo] for codigo in self._nombres_region[inicio:fin]]
+        )
+
+    def _internar(self, texto: Optional[str]) -> int:
+        """Obtiene el código de un texto, añadiéndolo al vocabulario si es nuevo."""
+        if texto is None:
+            return SIN_VALOR
+        codigo = self._codigos.get(texto)
+        if codigo is None:
+            codigo = len(self._vocabulario)
+            self._vocabulario.append(sys.intern(texto))
+            self._codigos[texto] = codigo
+        return codigo
+
+    def _texto(self, codigo: int) -> Optional[str]:
+        """Obtiene el texto de un código del vocabulario."""
+        return None if codigo == SIN_VALOR else self._vocabulario[codigo]
@@ -6,6 +6,7 @@ from pydantic import BaseModel, Field, validator
 from enum import Enum
 from datetime import datetime
 from .ingredient import Ingrediente
+from utils.ingredient_normalizer import IngredientNormalizer
 
 class NivelDificultad(str, Enum):
     """Niveles de dificultad de las recetas."""
@@ -120,7 +121,7 @@ class Receta(BaseModel):
         """Verifica si la receta es vegetariana."""
         ingredientes_carne = ['pollo', 'carne', 'cerdo', 'res', 'ternera', 'cordero', 'pavo']
         for ingrediente in self.ingredientes:
-            if any(carne in ingrediente.nombre.lower() for carne in ingredientes_carne):
+            if any(IngredientNormalizer.contiene_texto(ingrediente.nombre, carne) for carne in ingredientes_carne):
                 return False
         return True
     
@@ -128,7 +129,7 @@ class Receta(BaseModel):
         """Verifica si la receta es vegana."""
         ingredientes_animales = ['huevo', 'leche', 'queso', 'mantequilla', 'crema', 'yogur']
         for ingrediente in self.ingredientes:
-            if any(animal in ingrediente.nombre.lower() for animal in ingredientes_animales):
+            if any(IngredientNormalizer.contiene_texto(ingrediente.nombre, animal) for animal in ingredientes_animales):
                 return False
         return True
     
@@ -136,7 +137,7 @@ class Receta(BaseModel):
         """Verifica si la receta contiene alérgenos específicos."""
         for ingrediente in self.ingredientes:
             for alergeno in alergenos:
-                if alergeno.lower() in ingrediente.nombre.lower():
+                if IngredientNormalizer.contiene_texto(ingrediente.nombre, alergeno):
                     return True
         return False
     
@@ -148,6 +149,16 @@ class Receta(BaseModel):
         """Obtiene solo los ingredientes esenciales."""
         return [ing for ing in self.ingredientes if ing.esencial]
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Receta':
+        """
+        Crea una receta desde un diccionario con el formato de to_dict.
+        
+        Valida todos los campos y modelos anidados en una sola pasada, sin
+        construir cada submodelo por separado.
+        """
+        return cls.model_validate(data)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convierte la receta a diccionario."""
         return {
@@ -180,6 +191,7 @@ class MetadataRecetas(BaseModel):
     tiempo_generacion: str = Field(..., description="Timestamp de generación")
     temporada: str = Field(..., description="Temporada actual")
     version: str = Field("1.0", description="Versión del sistema")
+    metricas: Dict[str, Any] = Field(default_factory=dict, description="Métricas de la generación")
     
     @validator('tiempo_generacion')
     def tiempo_generacion_valido(cls, v):
@@ -194,6 +206,7 @@ class ColeccionRecetas(BaseModel):
     
     metadata: MetadataRecetas = Field(..., description="Metadatos de la generación")
     recetas: List[Receta] = Field(..., description="Lista de recetas")
+    error: Optional[str] = Field(None, description="Mensaje de error si aplica")
     
     def __init__(self, **data):
         super().__init__(**data)
@@ -230,6 +243,13 @@ class ColeccionRecetas(BaseModel):
         """Ordena las recetas por tiempo total (más rápido primero)."""
         return sorted(self.recetas, key=lambda x: x.tiempo_total_min)
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ColeccionRecetas':
+        """Crea una colección desde un diccionario con el formato de to_dict."""
+        coleccion = cls.model_validate(data)
+        coleccion.metadata.total_recetas = len(coleccion.recetas)
+        return coleccion
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convierte la colección a diccionario."""
         return {
@@ -0,0 +1,249 @@
+"""
+Corpus de recetas en formato columnar.
+Guarda los campos numéricos de muchas recetas en arrays de NumPy y los textos
+codificados con diccionario, para filtrar y agregar sin recorrer objetos Python.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .recipe import Receta
+
+# Columnas enteras (siempre presentes en una receta)
+COLUMNAS_ENTERAS = {
+    'id': np.int32,
+    'tiempo_preparacion_min': np.int32,
+    'tiempo_coccion_min': np.int32,
+    'tiempo_total_min': np.int32,
+    'dificultad_estrellas': np.int8,
+    'porciones': np.int16
+}
+
+# Columnas de información nutricional (NaN cuando falta el dato)
+COLUMNAS_NUTRICIONALES = (
+    'calorias_por_porcion', 'proteinas_g', 'carbohidratos_g', 'grasas_g',
+    'fibra_g', 'sodio_mg', 'azucares_g'
+)
+
+# Columnas de texto codificadas con diccionario
+COLUMNAS_CATEGORICAS = ('nombre', 'tipo_cocina', 'nivel_dificultad')
+
+# Totales que devuelve totales_nutricionales (mismas claves que Helpers)
+TOTALES_NUTRICIONALES = {
+    'calorias': 'calorias_por_porcion',
+    'proteinas': 'proteinas_g',
+    'carbohidratos': 'carbohidratos_g',
+    'grasas': 'grasas_g',
+    'fibra': 'fibra_g'
+}
+
+OPERACIONES = ('suma', 'media', 'min', 'max', 'conteo')
+
+class RecipeFrame:
+    """Conjunto de recetas almacenado por columnas."""
+
+    def __init__(self, columnas: Dict[str, np.ndarray], categorias: Dict[str, List[str]]):
+        """
+        Inicializa el frame a partir de columnas ya construidas.
+
+        Args:
+            columnas: Arrays por columna; las categóricas contienen códigos
+            categorias: Valores de cada columna categórica, indexados por código
+        """
+        self._columnas = columnas
+        self._categorias = categorias
+        self._indices_categorias = {
+            columna: {valor: codigo for codigo, valor in enumerate(valores)}
+            for columna, valores in categorias.items()
+        }
+
+    @classmethod
+    def from_recetas(cls, recetas: Iterable[Receta]) -> 'RecipeFrame':
+        """
+        Crea un frame desde objetos Receta.
+
+        Args:
+            recetas: Recetas a incluir
+
+        Returns:
+            Frame con una fila por receta
+        """
+        return cls.from_dicts(receta.to_dict() for receta in recetas)
+
+    @classmethod
+    def from_dicts(cls, recetas: Iterable[Dict[str, Any]]) -> 'RecipeFrame':
+        """
+        Crea un frame desde recetas en formato diccionario (Receta.to_dict).
+
+        Args:
+            recetas: Diccionarios de recetas
+
+        Returns:
+            Frame con una fila por receta
+        """
+        valores: Dict[str, List[Any]] = {
+            columna: [] for columna in (*COLUMNAS_ENTERAS, *COLUMNAS_NUTRICIONALES, *COLUMNAS_CATEGORICAS)
+        }
+        categorias: Dict[str, Dict[str, int]] = {columna: {} for columna in COLUMNAS_CATEGORICAS}
+
+        for receta in recetas:
+            for columna in COLUMNAS_ENTERAS:
+                valores[columna].append(receta.get(columna) or 0)
+
+            info_nut = receta.get('informacion_nutricional') or {}
+            for columna in COLUMNAS_NUTRICIONALES:
+                valor = info_nut.get(columna)
+                valores[columna].append(np.nan if valor is None else valor)
+
+            for columna in COLUMNAS_CATEGORICAS:
+                codigos = categorias[columna]
+                texto = receta.get(columna) or ''
+                valores[columna].append(codigos.setdefault(texto, len(codigos)))
+
+        columnas = {columna: np.array(valores[columna], dtype=tipo) for columna, tipo in COLUMNAS_ENTERAS.items()}
+        columnas.update(
+            {columna: np.array(valores[columna], dtype=np.float64) for columna in COLUMNAS_NUTRICIONALES}
+        )
+        columnas.update(
+            {columna: np.array(valores[columna], dtype=np.int32) for columna in COLUMNAS_CATEGORICAS}
+        )
+        return cls(columnas, {columna: list(codigos) for columna, codigos in categorias.items()})
+
+    def __len__(self) -> int:
+        """Número de recetas del frame."""
+        return len(self._columnas['id'])
+
+    @property
+    def columnas(self) -> List[str]:
+        """Nombres de las columnas disponibles."""
+        return list(self._columnas)
+
+    def columna(self, nombre: str) -> np.ndarray:
+        """
+        Obtiene los valores de una columna.
+
+        Args:
+            nombre: Nombre de la columna
+
+        Returns:
+            Array con los valores (los textos decodificados para columnas categóricas)
+        """
+        if nombre in self._categorias:
+            return np.array(self._categorias[nombre], dtype=object)[self._columnas[nombre]]
+        return self._columnas[nombre]
+
+    def es_igual(self, columna: str, valor: Any) -> np.ndarray:
+        """
+        Crea una máscara de las filas cuya columna vale `valor`.
+
+        En columnas categóricas compara códigos enteros, sin comparar textos.
+        """
+        if columna in self._categorias:
+            valor = getattr(valor, 'value', valor)
+            codigo = self._indices_categorias[columna].get(valor)
+            if codigo is None:
+                return np.zeros(len(self), dtype=bool)
+            return self._columnas[columna] == codigo
+        return self._columnas[columna] == valor
+
+    def filtrar(self, mascara: np.ndarray) -> 'RecipeFrame':
+        """
+        Obtiene un nuevo frame con las filas seleccionadas.
+
+        Args:
+            mascara: Máscara booleana o índices de las filas
+
+        Returns:
+            Frame filtrado (comparte el vocabulario de categorías)
+        """
+        return RecipeFrame(
+            {columna: valores[mascara] for columna, valores in self._columnas.items()},
+            self._categorias
+        )
+
+    def filtrar_por_tiempo(self, tiempo_maximo: int) -> 'RecipeFrame':
+        """Obtiene las recetas que se preparan en el tiempo indicado."""
+        return self.filtrar(self._columnas['tiempo_total_min'] <= tiempo_maximo)
+
+    def filtrar_por_tipo_cocina(self, tipo_cocina: Any) -> 'RecipeFrame':
+        """Obtiene las recetas de un tipo de cocina."""
+        return self.filtrar(self.es_igual('tipo_cocina', tipo_cocina))
+
+    def filtrar_por_dificultad(self, nivel_dificultad: Any) -> 'RecipeFrame':
+        """Obtiene las recetas de un nivel de dificultad."""
+        return self.filtrar(self.es_igual('nivel_dificultad', nivel_dificultad))
+
+    def agregar(
+        self,
+        columna: str,
+        operacion: str = 'media',
+        por: Optional[str] = None
+    ) -> Union[float, Dict[str, float]]:
+        """
+        Agrega una columna numérica, opcionalmente agrupando por una categórica.
+
+        Los valores NaN (datos nutricionales ausentes) se ignoran.
+
+        Args:
+            columna: Columna numérica a agregar
+            operacion: 'suma', 'media', 'min', 'max' o 'conteo'
+            por: Columna categórica por la que agrupar (opcional)
+
+        Returns:
+            Valor agregado, o diccionario categoría -> valor si se agrupa
+        """
+        if operacion not in OPERACIONES:
+            raise ValueError(f"Operación no soportada: {operacion}")
+
+        valores = self._columnas[columna].astype(np.float64)
+        validos = ~np.isnan(valores)
+
+        if por is None:
+            return self._agregar_array(valores[validos], operacion)
+
+        codigos = self._columnas[por][validos]
+        valores = valores[validos]
+        num_grupos = len(self._categorias[por])
+        conteos = np.bincount(codigos, minlength=num_grupos)
+
+        if operacion == 'conteo':
+            resultado = conteos.astype(np.float64)
+        elif operacion in ('suma', 'media'):
+            resultado = np.bincount(codigos, weights=valores, minlength=num_grupos)
+            if operacion == 'media':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    resultado = resultado / conteos
+        else:
+            resultado = np.full(num_grupos, np.inf if operacion == 'min' else -np.inf)
+            (np.minimum if operacion == 'min' else np.maximum).at(resultado, codigos, valores)
+
+        return {
+            categoria: float(resultado[codigo])
+            for codigo, categoria in enumerate(self._categorias[por])
+            if conteos[codigo]
+        }
+
+    def totales_nutricionales(self) -> Dict[str, float]:
+        """
+        Calcula los totales nutricionales por porción de todas las recetas.
+
+        Returns:
+            Diccionario con calorias, proteinas, carbohidratos, grasas y fibra
+        """
+        return {
+            total: float(np.nansum(self._columnas[columna]))
+            for total, columna in TOTALES_NUTRICIONALES.items()
+        }
+
+    @staticmethod
+    def _agregar_array(valores: np.ndarray, operacion: str) -> float:
+        """Aplica una operación de agregación a un array sin NaN."""
+        if operacion == 'conteo':
+            return float(len(valores))
+        if operacion == 'suma':
+            return float(valores.sum())
+        if not len(valores):
+            return float('nan')
+        if operacion == 'media':
+            return float(valores.mean())
+        return float(valores.min() if operacion == 'min' else valores.max())
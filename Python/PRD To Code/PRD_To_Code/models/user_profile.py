@@ -5,6 +5,17 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field, validator
 from enum import Enum
 
+from utils.ingredient_normalizer import IngredientNormalizer
+
+# Palabras clave de ingredientes incompatibles con cada restricción dietética
+INGREDIENTES_CARNE = ['pollo', 'carne', 'cerdo', 'res', 'ternera', 'cordero', 'pavo']
+INGREDIENTES_ANIMALES = ['huevo', 'leche', 'queso', 'mantequilla', 'crema', 'yogur', 'pollo', 'carne', 'pescado']
+INGREDIENTES_GLUTEN = ['trigo', 'cebada', 'centeno', 'avena', 'harina', 'pan', 'pasta']
+INGREDIENTES_LACTOSA = ['leche', 'queso', 'mantequilla', 'crema', 'yogur']
+
+# Niveles culinarios de menor a mayor experiencia
+ORDEN_NIVELES = ['principiante', 'intermedio', 'avanzado', 'experto']
+
 class NivelCulinario(str, Enum):
     """Niveles de experiencia culinaria."""
     PRINCIPIANTE = "principiante"
@@ -130,39 +141,59 @@ class PerfilUsuario(BaseModel):
     
     def puede_consumir_ingrediente(self, ingrediente: str) -> bool:
         """Verifica si el usuario puede consumir un ingrediente específico."""
-        ingrediente_lower = ingrediente.lower()
+        contiene = IngredientNormalizer.contiene_texto
         
         # Verificar restricciones dietéticas
-        if self.es_vegano():
-            ingredientes_animales = ['huevo', 'leche', 'queso', 'mantequilla', 'crema', 'yogur', 'pollo', 'carne', 'pescado']
-            if any(animal in ingrediente_lower for animal in ingredientes_animales):
+        if any(contiene(ingrediente, prohibido) for prohibido in self.obtener_ingredientes_prohibidos()):
+            return False
+        
+        # Verificar alérgenos
+        for alergeno in self.alergenos:
+            if contiene(ingrediente, alergeno.value):
                 return False
         
+        # Verificar ingredientes evitados
+        canonico = IngredientNormalizer.canonico(ingrediente)
+        if canonico in [IngredientNormalizer.canonico(ing) for ing in self.ingredientes_evitados]:
+            return False
+        
+        return True
+    
+    def obtener_ingredientes_prohibidos(self) -> List[str]:
+        """Obtiene las palabras clave de ingredientes excluidos por las restricciones dietéticas."""
+        prohibidos = set()
+        
+        if self.es_vegano():
+            prohibidos.update(INGREDIENTES_ANIMALES)
+        
         if self.es_vegetariano():
-            ingredientes_carne = ['pollo', 'carne', 'cerdo', 'res', 'ternera', 'cordero', 'pavo']
-            if any(carne in ingrediente_lower for carne in ingredientes_carne):
-                return False
+            prohibidos.update(INGREDIENTES_CARNE)
         
         if self.tiene_restriccion_gluten():
-            ingredientes_gluten = ['trigo', 'cebada', 'centeno', 'avena', 'harina', 'pan', 'pasta']
-            if any(gluten in ingrediente_lower for gluten in ingredientes_gluten):
-                return False
+            prohibidos.update(INGREDIENTES_GLUTEN)
         
         if self.tiene_restriccion_lactosa():
-            ingredientes_lactosa = ['leche', 'queso', 'mantequilla', 'crema', 'yogur']
-            if any(lactosa in ingrediente_lower for lactosa in ingredientes_lactosa):
-                return False
+            prohibidos.update(INGREDIENTES_LACTOSA)
         
-        # Verificar alérgenos
-        for alergeno in self.alergenos:
-            if alergeno.value in ingrediente_lower:
-                return False
+        return sorted(prohibidos)
+    
+    def obtener_restricciones_duras(self) -> Dict[str, Any]:
+        """
+        Obtiene los filtros obligatorios que toda receta debe cumplir.
         
-        # Verificar ingredientes evitados
-        if ingrediente_lower in [ing.lower() for ing in self.ingredientes_evitados]:
-            return False
+        Se usan tanto para construir el prompt como para el filtrado posterior,
+        de modo que ambos apliquen exactamente las mismas reglas.
+        """
+        nivel_usuario = ORDEN_NIVELES.index(self.nivel_culinario.value)
         
-        return True
+        return {
+            "tiempo_maximo": self.tiempo_disponible,
+            "nivel_maximo": ORDEN_NIVELES[min(nivel_usuario + 1, len(ORDEN_NIVELES) - 1)],
+            "restricciones": [r.value for r in self.restricciones_dieteticas],
+            "alergenos": [a.value for a in self.alergenos],
+            "ingredientes_prohibidos": self.obtener_ingredientes_prohibidos(),
+            "ingredientes_evitados": sorted({i.strip().lower() for i in self.ingredientes_evitados if i.strip()})
+        }
     
     def obtener_preferencias_texto(self) -> str:
         """Obtiene las preferencias en formato texto para el prompt."""
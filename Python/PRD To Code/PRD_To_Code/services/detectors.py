@@ -0,0 +1,75 @@
+"""
+Interfaz común de los backends de detección de ingredientes.
+Cada backend (OpenAI, Google Vision, modelo local...) implementa la misma
+interfaz, de modo que ImageProcessor los encadena como primera pasada o como
+respaldo según settings.DETECTION_BACKEND.
+"""
+from abc import ABC, abstractmethod
+from typing import List
+
+from models.ingredient import ListaIngredientes
+
+# Cadenas de backends predefinidas. 'api' es el primer servicio remoto disponible
+BACKENDS_DETECCION = {
+    'api': ('api',),
+    'local': ('local',),
+    'local_primero': ('local', 'api'),
+    'respaldo_local': ('api', 'local')
+}
+
+class DetectorIngredientes(ABC):
+    """Backend de detección de ingredientes en imágenes."""
+
+    # Nombre con el que se registra el detector
+    nombre = ''
+
+    # Si detectar_lote procesa varias imágenes a la vez (y conviene agruparlas)
+    por_lotes = False
+
+    @abstractmethod
+    def disponible(self) -> bool:
+        """Indica si el detector puede usarse (cliente configurado, modelo presente...)."""
+
+    @abstractmethod
+    def detectar(self, image_path: str) -> ListaIngredientes:
+        """
+        Detecta los ingredientes de una imagen ya validada.
+
+        Args:
+            image_path: Ruta de la imagen
+
+        Returns:
+            Lista de ingredientes detectados (con error si falla)
+        """
+
+    def detectar_lote(self, image_paths: List[str]) -> List[ListaIngredientes]:
+        """Detecta los ingredientes de varias imágenes, por defecto de una en una."""
+        return [self.detectar(image_path) for image_path in image_paths]
+
+class DetectorOpenAI(DetectorIngredientes):
+    """Detección con la API de visión de OpenAI."""
+
+    nombre = 'openai'
+
+    def __init__(self, procesador):
+        self.procesador = procesador
+
+    def disponible(self) -> bool:
+        return self.procesador.openai_client is not None
+
+    def detectar(self, image_path: str) -> ListaIngredientes:
+        return self.procesador.detect_ingredients_openai(image_path)
+
+class DetectorGoogleVision(DetectorIngredientes):
+    """Detección con Google Cloud Vision."""
+
+    nombre = 'google'
+
+    def __init__(self, procesador):
+        self.procesador = procesador
+
+    def disponible(self) -> bool:
+        return self.procesador.vision_client is not None
+
+    def detectar(self, image_path: str) -> ListaIngredientes:
+        return self.procesador.detect_ingredients_google_vision(image_path)
@@ -0,0 +1,159 @@
+"""
+Planificador adaptativo del número de recetas candidatas.
+Aprende la tasa de rechazo del filtrado por perfil de usuario para pedir al LLM
+suficientes candidatas desde el principio y dimensionar las peticiones de relleno.
+Las candidatas que no caben en una respuesta se piden en completados adicionales
+(ver LLMClient.generate_recipes); el relleno se limita a una sola respuesta.
+"""
+import logging
+import math
+import threading
+from typing import Dict, Any, Optional
+
+from config.settings import settings
+from models.user_profile import PerfilUsuario
+from services.token_budget import TokenBudget
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+class GenerationPlanner:
+    """Calcula cuántas recetas pedir al LLM según el historial de rechazos."""
+
+    def __init__(self, token_budget: Optional[TokenBudget] = None):
+        """
+        Inicializa el planificador.
+
+        Args:
+            token_budget: Contador de tokens que fija cuántas recetas de relleno
+                caben en una respuesta (por defecto uno nuevo con la configuración actual)
+        """
+        self.token_budget = token_budget or TokenBudget()
+        self._tasas_rechazo: Dict[str, float] = {}
+        self._evaluadas_totales = 0
+        self._aceptadas_totales = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave_perfil(user_profile: PerfilUsuario) -> str:
+        """
+        Obtiene la clave que agrupa perfiles con los mismos filtros obligatorios.
+
+        Args:
+            user_profile: Perfil del usuario
+
+        Returns:
+            Clave del perfil
+        """
+        restricciones = ",".join(sorted(r.value for r in user_profile.restricciones_dieteticas))
+        alergenos = ",".join(sorted(a.value for a in user_profile.alergenos))
+        evitados = ",".join(sorted(i.lower() for i in user_profile.ingredientes_evitados))
+        return (
+            f"{user_profile.nivel_culinario.value}|{user_profile.tiempo_disponible}|"
+            f"{restricciones}|{alergenos}|{evitados}"
+        )
+
+    def obtener_tasa_rechazo(self, user_profile: PerfilUsuario) -> float:
+        """
+        Obtiene la tasa de rechazo estimada para un perfil.
+
+        Args:
+            user_profile: Perfil del usuario
+
+        Returns:
+            Fracción estimada de recetas descartadas por el filtrado
+        """
+        with self._lock:
+            return self._tasas_rechazo.get(
+                self.clave_perfil(user_profile), settings.DEFAULT_REJECTION_RATE
+            )
+
+    def calcular_num_candidatos(self, user_profile: PerfilUsuario, max_recipes: int) -> int:
+        """
+        Calcula cuántas recetas candidatas pedir en la generación principal.
+
+        Args:
+            user_profile: Perfil del usuario
+            max_recipes: Número de recetas que se quieren entregar
+
+        Returns:
+            Número de recetas a pedir al LLM (puede superar las que caben en una
+            respuesta: el cliente las reparte en varios completados)
+        """
+        return self._dimensionar(user_profile, max_recipes, settings.MAX_CANDIDATE_RECIPES)
+
+    def calcular_num_relleno(self, user_profile: PerfilUsuario, faltantes: int) -> int:
+        """
+        Calcula cuántas recetas pedir en una petición de relleno.
+
+        Args:
+            user_profile: Perfil del usuario
+            faltantes: Recetas que faltan para llegar al máximo
+
+        Returns:
+            Número de recetas a pedir al LLM, sin superar las que caben en una respuesta
+        """
+        return self._dimensionar(
+            user_profile,
+            faltantes,
+            settings.MAX_BACKFILL_RECIPES,
+            tope=self.token_budget.max_recetas_por_respuesta()
+        )
+
+    def registrar_resultado(self, user_profile: PerfilUsuario, evaluadas: int, aceptadas: int) -> None:
+        """
+        Actualiza la tasa de rechazo de un perfil con el resultado de una sesión.
+
+        Args:
+            user_profile: Perfil del usuario
+            evaluadas: Recetas candidatas evaluadas por el filtrado
+            aceptadas: Recetas que superaron el filtrado
+        """
+        if evaluadas <= 0:
+            return
+
+        tasa_sesion = 1.0 - aceptadas / evaluadas
+        clave = self.clave_perfil(user_profile)
+        alpha = settings.REJECTION_RATE_SMOOTHING
+
+        with self._lock:
+            self._evaluadas_totales += evaluadas
+            self._aceptadas_totales += aceptadas
+            anterior = self._tasas_rechazo.get(clave, settings.DEFAULT_REJECTION_RATE)
+            self._tasas_rechazo[clave] = alpha * tasa_sesion + (1.0 - alpha) * anterior
+            nueva = self._tasas_rechazo[clave]
+
+        logger.debug(f"Tasa de rechazo del perfil actualizada a {nueva:.1%}")
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Obtiene la tasa de rechazo global y las aprendidas por perfil."""
+        with self._lock:
+            evaluadas = self._evaluadas_totales
+            return {
+                'evaluadas': evaluadas,
+                'aceptadas': self._aceptadas_totales,
+                'tasa_rechazo_global': 1.0 - self._aceptadas_totales / evaluadas if evaluadas else 0.0,
+                'perfiles': len(self._tasas_rechazo),
+                'tasas_rechazo': dict(self._tasas_rechazo)
+            }
+
+    def _dimensionar(
+        self,
+        user_profile: PerfilUsuario,
+        objetivo: int,
+        maximo: int,
+        tope: Optional[int] = None
+    ) -> int:
+        """
+        Calcula las recetas a pedir para obtener `objetivo` tras el filtrado.
+
+        Nunca pide menos que el objetivo ni más candidatas de sobra que `maximo`.
+        Con `tope` el resultado no lo supera aunque el objetivo sea mayor.
+        """
+        if objetivo <= 0:
+            return 0
+
+        tasa_aceptacion = max(1.0 - self.obtener_tasa_rechazo(user_profile), 0.1)
+        solicitadas = math.ceil(objetivo / tasa_aceptacion)
+        num_recetas = max(objetivo, min(solicitadas, maximo))
+        return num_recetas if tope is None else min(num_recetas, tope)
@@ -0,0 +1,202 @@
+"""
+Detección de imágenes casi duplicadas mediante hashing perceptual.
+Calcula un dHash de 64 bits sobre la imagen reducida en escala de grises y
+busca hashes cercanos (distancia de Hamming) en un BK-tree, para no enviar a la
+API de visión fotos repetidas dentro de una sesión ni entre sesiones.
+"""
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from utils.image_io import leer_reducida
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Lado del hash: dHash de LADO_HASH x LADO_HASH bits
+LADO_HASH = 8
+
+# Lado menor mínimo de la imagen decodificada para el hash (los JPEG se leen
+# ya reducidos hasta este tamaño)
+LADO_LECTURA_HASH = 64
+
+def dhash(imagen: np.ndarray) -> int:
+    """
+    Calcula el dHash de una imagen.
+
+    Cada bit indica si un píxel es más claro que su vecino de la derecha en la
+    imagen reducida a (LADO_HASH + 1) x LADO_HASH, por lo que el hash resiste
+    cambios de escala, compresión y pequeños ajustes de brillo.
+
+    Args:
+        imagen: Imagen BGR o en escala de grises
+
+    Returns:
+        Hash de LADO_HASH * LADO_HASH bits
+    """
+    if imagen.ndim == 3:
+        imagen = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+    reducida = cv2.resize(imagen, (LADO_HASH + 1, LADO_HASH), interpolation=cv2.INTER_AREA)
+    bits = reducida[:, 1:] > reducida[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def dhash_archivo(image_path: str) -> Optional[int]:
+    """Calcula el dHash de un archivo de imagen (None si no se puede leer)."""
+    imagen = leer_reducida(image_path, 0, LADO_LECTURA_HASH, gris=True)
+    if imagen is None:
+        return None
+    return dhash(imagen)
+
+def distancia_hamming(a: int, b: int) -> int:
+    """Número de bits distintos entre dos hashes (int.bit_count requiere Python 3.10)."""
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """Árbol BK para buscar hashes a una distancia de Hamming máxima."""
+
+    def __init__(self):
+        # Cada nodo: [hash, valor, {distancia: nodo hijo}]
+        self._raiz: Optional[list] = None
+        self._tamano = 0
+
+    def __len__(self) -> int:
+        return self._tamano
+
+    def agregar(self, hash_imagen: int, valor: Any) -> None:
+        """Añade un hash con su valor asociado."""
+        self._tamano += 1
+        if self._raiz is None:
+            self._raiz = [hash_imagen, valor, {}]
+            return
+
+        nodo = self._raiz
+        while True:
+            distancia = distancia_hamming(hash_imagen, nodo[0])
+            hijo = nodo[2].get(distancia)
+            if hijo is None:
+                nodo[2][distancia] = [hash_imagen, valor, {}]
+                return
+            nodo = hijo
+
+    def buscar(self, hash_imagen: int, distancia_maxima: int) -> Optional[Tuple[int, Any]]:
+        """
+        Busca el hash más cercano dentro de la distancia indicada.
+
+        Solo visita los hijos cuya distancia al nodo está en
+        [d - distancia_maxima, d + distancia_maxima] (desigualdad triangular).
+
+        Returns:
+            Tupla (distancia, valor) del más cercano, o None
+        """
+        if self._raiz is None:
+            return None
+
+        mejor: Optional[Tuple[int, Any]] = None
+        pendientes = [self._raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            distancia = distancia_hamming(hash_imagen, nodo[0])
+            if distancia <= distancia_maxima and (mejor is None or distancia < mejor[0]):
+                mejor = (distancia, nodo[1])
+                if distancia == 0:
+                    break
+            for arista, hijo in nodo[2].items():
+                if distancia - distancia_maxima <= arista <= distancia + distancia_maxima:
+                    pendientes.append(hijo)
+        return mejor
+
+class ImageHashIndex:
+    """Índice de detecciones por hash perceptual compartido entre sesiones."""
+
+    def __init__(self, distancia_maxima: Optional[int] = None, max_entradas: Optional[int] = None):
+        """
+        Inicializa el índice.
+
+        Args:
+            distancia_maxima: Bits distintos máximos para considerar dos imágenes
+                duplicadas (por defecto settings.IMAGE_HASH_MAX_DISTANCE)
+            max_entradas: Detecciones guardadas como máximo; al superarlo se
+                descartan las más antiguas (por defecto settings.IMAGE_HASH_CACHE_SIZE)
+        """
+        self.distancia_maxima = settings.IMAGE_HASH_MAX_DISTANCE if distancia_maxima is None else distancia_maxima
+        self.max_entradas = max_entradas or settings.IMAGE_HASH_CACHE_SIZE
+
+        self._arboles: Dict[str, BKTree] = {}
+        self._entradas: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._estadisticas = {'imagenes': 0, 'duplicadas_sesion': 0, 'aciertos_cache': 0}
+
+    def buscar(self, hash_imagen: int, espacio: str = '') -> Optional[Any]:
+        """
+        Busca una detección guardada para una imagen casi idéntica.
+
+        Args:
+            hash_imagen: dHash de la imagen
+            espacio: Espacio de claves (p. ej. el servicio de detección usado)
+
+        Returns:
+            Valor guardado o None
+        """
+        with self._lock:
+            arbol = self._arboles.get(espacio)
+            encontrado = arbol.buscar(hash_imagen, self.distancia_maxima) if arbol else None
+            if encontrado is None:
+                return None
+            self._estadisticas['aciertos_cache'] += 1
+            return encontrado[1]
+
+    def agregar(self, hash_imagen: int, valor: Any, espacio: str = '') -> None:
+        """Guarda la detección de una imagen."""
+        with self._lock:
+            entradas = self._entradas.setdefault(espacio, deque())
+            entradas.append((hash_imagen, valor))
+            if len(entradas) > self.max_entradas:
+                # Los BK-tree no admiten borrados: se reconstruye sin las más antiguas
+                while len(entradas) > self.max_entradas // 2:
+                    entradas.popleft()
+                arbol = BKTree()
+                for hash_entrada, valor_entrada in entradas:
+                    arbol.agregar(hash_entrada, valor_entrada)
+                self._arboles[espacio] = arbol
+            else:
+                self._arboles.setdefault(espacio, BKTree()).agregar(hash_imagen, valor)
+
+    def agrupar_duplicadas(self, hashes: List[Optional[int]]) -> List[int]:
+        """
+        Agrupa las imágenes casi duplicadas de una sesión.
+
+        Args:
+            hashes: Hash de cada imagen (None si no se pudo calcular)
+
+        Returns:
+            Para cada imagen, el índice de la primera imagen de su grupo
+        """
+        arbol = BKTree()
+        representantes = []
+        for indice, hash_imagen in enumerate(hashes):
+            encontrado = arbol.buscar(hash_imagen, self.distancia_maxima) if hash_imagen is not None else None
+            if encontrado is None:
+                representantes.append(indice)
+                if hash_imagen is not None:
+                    arbol.agregar(hash_imagen, indice)
+            else:
+                representantes.append(encontrado[1])
+
+        duplicadas = sum(1 for indice, representante in enumerate(representantes) if indice != representante)
+        with self._lock:
+            self._estadisticas['imagenes'] += len(hashes)
+            self._estadisticas['duplicadas_sesion'] += duplicadas
+        return representantes
+
+    def obtener_estadisticas(self) -> Dict[str, int]:
+        """Obtiene imágenes procesadas, duplicadas, aciertos de caché y llamadas evitadas."""
+        with self._lock:
+            estadisticas = dict(self._estadisticas)
+            estadisticas['entradas'] = sum(len(entradas) for entradas in self._entradas.values())
+        estadisticas['llamadas_evitadas'] = estadisticas['duplicadas_sesion'] + estadisticas['aciertos_cache']
+        return estadisticas
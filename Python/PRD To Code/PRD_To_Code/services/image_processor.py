@@ -4,11 +4,10 @@ Servicio de procesamiento de imágenes para reconocimiento de ingredientes.
 import os
 import base64
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import cv2
 import numpy as np
-from PIL import Image
 import requests
 try:
     from openai import OpenAI
@@ -23,11 +22,36 @@ except ImportError:
 
 from config.settings import settings
 from models.ingredient import Ingrediente, ListaIngredientes, EstadoIngrediente, UnidadMedida
+from services.response_parser import ResponseParser, crear_completado
+from services.ingredient_fusion import IngredientFusion
+from services.image_hashing import ImageHashIndex, dhash_archivo
+from services.image_quality import ImageQualityGate
+from services.detectors import BACKENDS_DETECCION, DetectorGoogleVision, DetectorIngredientes, DetectorOpenAI
+from services.local_detector import LocalDetector
+from services.region_proposals import RegionProposer
+from services.preprocessing_pool import leer_para_preprocesar, preprocesar_imagen
+from utils.image_io import (
+    bytes_para_subida, codificar_para_subida, detectar_formato, formato_decodificable, formatos_soportados,
+    leer_cabecera, leer_imagen, obtener_estadisticas_subida, presupuesto_imagenes
+)
+from utils.ingredient_normalizer import IngredientNormalizer
+from utils.tracing import tracer
 
 # Configurar logging
 logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
+# Palabras canónicas de cada categoría, en orden de prioridad
+CATEGORIAS_INGREDIENTES = (
+    ('vegetal', {'tomate', 'cebolla', 'ajo', 'zanahoria', 'papa', 'lechuga', 'espinaca'}),
+    ('fruta', {'manzana', 'naranja', 'platano', 'fresa', 'uva'}),
+    ('proteina', {'pollo', 'carne', 'cerdo', 'res', 'ternera'}),
+    ('pescado', {'pescado', 'salmon', 'camaron', 'atun'}),
+    ('lacteo', {'leche', 'queso', 'yogur', 'mantequilla'}),
+    ('carbohidrato', {'arroz', 'pasta', 'pan', 'harina'}),
+    ('proteina', {'huevo'})
+)
+
 class ImageProcessor:
     """Procesador de imágenes para reconocimiento de ingredientes."""
     
@@ -35,6 +59,16 @@ class ImageProcessor:
         """Inicializa el procesador de imágenes."""
         self.openai_client = None
         self.vision_client = None
+        self.response_parser = ResponseParser()
+        self.ingredient_fusion = IngredientFusion()
+        self.hash_index = ImageHashIndex() if settings.ENABLE_IMAGE_DEDUP else None
+        self.quality_gate = ImageQualityGate() if settings.ENABLE_QUALITY_GATE else None
+        self.region_proposer = RegionProposer() if settings.ENABLE_REGION_MOSAIC else None
+        self.detection_backend = settings.DETECTION_BACKEND
+        self.detectores: Dict[str, DetectorIngredientes] = {}
+        self.registrar_detector(DetectorOpenAI(self))
+        self.registrar_detector(DetectorGoogleVision(self))
+        self.registrar_detector(LocalDetector(categorizar=self._categorize_ingredient))
         self._initialize_clients()
     
     def _initialize_clients(self):
@@ -55,6 +89,15 @@ class ImageProcessor:
             except Exception as e:
                 logger.error(f"Error al inicializar cliente Google Cloud Vision: {e}")
     
+    def registrar_detector(self, detector: DetectorIngredientes) -> None:
+        """
+        Registra un backend de detección (sustituye al que tenga el mismo nombre).
+        
+        Args:
+            detector: Detector a registrar; se usa si su nombre aparece en DETECTION_BACKEND
+        """
+        self.detectores[detector.nombre] = detector
+    
     def validate_image(self, image_path: str) -> bool:
         """
         Valida que la imagen cumpla con los requisitos.
@@ -71,10 +114,13 @@ class ImageProcessor:
                 logger.error(f"Archivo no encontrado: {image_path}")
                 return False
             
-            # Verificar extensión
-            file_extension = Path(image_path).suffix.lower()
-            if file_extension not in settings.SUPPORTED_IMAGE_FORMATS:
-                logger.error(f"Formato de imagen no soportado: {file_extension}")
+            # Verificar formato por el contenido, no por la extensión
+            formato = detectar_formato(image_path)
+            if formato not in formatos_soportados():
+                logger.error(f"Formato de imagen no soportado: {formato or Path(image_path).suffix.lower()}")
+                return False
+            if not formato_decodificable(formato):
+                logger.error(f"Para leer imágenes {formato} hay que instalar pillow-heif: {image_path}")
                 return False
             
             # Verificar tamaño del archivo
@@ -83,15 +129,18 @@ class ImageProcessor:
                 logger.error(f"Archivo demasiado grande: {file_size} bytes")
                 return False
             
-            # Verificar resolución
-            with Image.open(image_path) as img:
-                width, height = img.size
-                if width < settings.MIN_IMAGE_RESOLUTION[0] or height < settings.MIN_IMAGE_RESOLUTION[1]:
-                    logger.error(f"Resolución demasiado baja: {width}x{height}")
-                    return False
-                if width > settings.MAX_IMAGE_RESOLUTION[0] or height > settings.MAX_IMAGE_RESOLUTION[1]:
-                    logger.error(f"Resolución demasiado alta: {width}x{height}")
-                    return False
+            # Verificar resolución (solo se lee la cabecera)
+            cabecera = leer_cabecera(image_path)
+            if cabecera is None:
+                logger.error(f"No se pudo leer la cabecera de la imagen: {image_path}")
+                return False
+            width, height = cabecera.ancho, cabecera.alto
+            if width < settings.MIN_IMAGE_RESOLUTION[0] or height < settings.MIN_IMAGE_RESOLUTION[1]:
+                logger.error(f"Resolución demasiado baja: {width}x{height}")
+                return False
+            if width > settings.MAX_IMAGE_RESOLUTION[0] or height > settings.MAX_IMAGE_RESOLUTION[1]:
+                logger.error(f"Resolución demasiado alta: {width}x{height}")
+                return False
             
             return True
             
@@ -101,7 +150,7 @@ class ImageProcessor:
     
     def preprocess_image(self, image_path: str) -> Optional[np.ndarray]:
         """
-        Preprocesa la imagen para mejorar el reconocimiento.
+        Preprocesa la imagen para mejorar el reconocimiento (ver preprocesar_imagen).
         
         Args:
             image_path: Ruta de la imagen
@@ -110,36 +159,13 @@ class ImageProcessor:
             Imagen preprocesada como array numpy
         """
         try:
-            # Cargar imagen
-            image = cv2.imread(image_path)
+            # Cargar imagen (reducida si es un JPEG mucho mayor que el resultado)
+            image = leer_para_preprocesar(image_path)
             if image is None:
                 logger.error(f"No se pudo cargar la imagen: {image_path}")
                 return None
             
-            # Convertir a RGB
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Ajustar contraste y brillo
-            lab = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2LAB)
-            l, a, b = cv2.split(lab)
-            
-            # Aplicar CLAHE (Contrast Limited Adaptive Histogram Equalization)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            l = clahe.apply(l)
-            
-            # Reconstruir imagen
-            lab = cv2.merge([l, a, b])
-            processed_image = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
-            
-            # Redimensionar si es muy grande
-            height, width = processed_image.shape[:2]
-            if width > 1920 or height > 1080:
-                scale = min(1920/width, 1080/height)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                processed_image = cv2.resize(processed_image, (new_width, new_height))
-            
-            return processed_image
+            return preprocesar_imagen(image)
             
         except Exception as e:
             logger.error(f"Error al preprocesar imagen {image_path}: {e}")
@@ -147,7 +173,8 @@ class ImageProcessor:
     
     def encode_image_to_base64(self, image_path: str) -> Optional[str]:
         """
-        Codifica una imagen a base64.
+        Codifica una imagen a base64 tal como se sube a las APIs de visión
+        (orientada y sin metadatos, ver encode_image_for_upload).
         
         Args:
             image_path: Ruta de la imagen
@@ -155,13 +182,63 @@ class ImageProcessor:
         Returns:
             Imagen codificada en base64
         """
+        subida = self.encode_image_for_upload(image_path)
+        return subida[0] if subida else None
+    
+    def encode_image_for_upload(self, image_path: str) -> Optional[Tuple[str, str]]:
+        """
+        Codifica una imagen a base64 en un formato que acepten las APIs de visión.
+        
+        La orientación EXIF se aplica una sola vez y se quitan los metadatos
+        (EXIF, miniaturas, XMP, ICC): los JPEG, PNG y WebP sin girar se envían
+        sin recomprimir, y los girados y las fotos HEIC se transcodifican (ver
+        settings.UPLOAD_TRANSCODE_FORMAT).
+        
+        Args:
+            image_path: Ruta de la imagen
+            
+        Returns:
+            Tupla (imagen en base64, tipo MIME), o None si no se pudo codificar
+        """
         try:
-            with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8')
+            return codificar_para_subida(image_path)
         except Exception as e:
             logger.error(f"Error al codificar imagen {image_path}: {e}")
             return None
     
+    def encode_region_mosaic(self, image_path: str) -> Optional[Tuple[str, List[Tuple[int, int, int, int]]]]:
+        """
+        Codifica a base64 el mosaico de regiones de una foto grande.
+        
+        Args:
+            image_path: Ruta de la imagen
+            
+        Returns:
+            Tupla (mosaico JPEG en base64, caja de cada recuadro), o None si la
+            foto no necesita mosaico
+        """
+        if self.region_proposer is None:
+            return None
+        
+        try:
+            cabecera = leer_cabecera(image_path)
+            if cabecera is None or max(cabecera.ancho, cabecera.alto) < self.region_proposer.lado_minimo_imagen:
+                return None
+            
+            image = leer_imagen(image_path)
+            preparado = self.region_proposer.preparar(image) if image is not None else None
+            if preparado is None:
+                return None
+            
+            mosaico, cajas = preparado
+            codificado, buffer = cv2.imencode('.jpg', mosaico, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            if not codificado:
+                return None
+            return base64.b64encode(buffer.tobytes()).decode('utf-8'), cajas
+        except Exception as e:
+            logger.warning(f"No se pudo componer el mosaico de {image_path}: {e}")
+            return None
+    
     def detect_ingredients_openai(self, image_path: str) -> ListaIngredientes:
         """
         Detecta ingredientes usando OpenAI Vision API.
@@ -177,39 +254,50 @@ class ImageProcessor:
             return ListaIngredientes(error="Cliente OpenAI no disponible")
         
         try:
-            # Codificar imagen
-            base64_image = self.encode_image_to_base64(image_path)
+            # Codificar imagen (las fotos grandes se envían como mosaico de regiones)
+            cajas = None
+            tipo_mime = "image/jpeg"
+            with tracer.span('codificacion') as span:
+                mosaico = self.encode_region_mosaic(image_path)
+                if mosaico is not None:
+                    base64_image, cajas = mosaico
+                else:
+                    base64_image, tipo_mime = self.encode_image_for_upload(image_path) or (None, tipo_mime)
+                span.establecer(mosaico=cajas is not None, bytes_base64=len(base64_image or ''))
             if not base64_image:
                 return ListaIngredientes(error="No se pudo codificar la imagen")
             
             # Prompt para detección
             from config.prompts import PromptTemplates
-            prompt = PromptTemplates.get_ingredient_detection_prompt()
+            prompt = PromptTemplates.get_ingredient_detection_prompt(len(cajas) if cajas else 0)
             
             # Llamada a la API
-            response = self.openai_client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+            with tracer.span('vision_api', servicio='openai', modelo=settings.OPENAI_MODEL):
+                response = crear_completado(
+                    self.openai_client.chat.completions.create,
+                    settings.OPENAI_MODEL,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:{tipo_mime};base64,{base64_image}"
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.1
-            )
+                            ]
+                        }
+                    ],
+                    max_tokens=1000,
+                    temperature=0.1
+                )
             
             # Procesar respuesta
             content = response.choices[0].message.content
-            return self._parse_openai_response(content)
+            with tracer.span('parseo_vision'):
+                return self._parse_openai_response(content, cajas)
             
         except Exception as e:
             logger.error(f"Error en detección OpenAI: {e}")
@@ -231,15 +319,18 @@ class ImageProcessor:
         
         try:
             # Leer imagen
-            with open(image_path, 'rb') as image_file:
-                content = image_file.read()
+            with tracer.span('codificacion'):
+                content = bytes_para_subida(image_path)
+            if content is None:
+                return ListaIngredientes(error="No se pudo leer la imagen")
             
             # Crear objeto de imagen
             image = vision.Image(content=content)
             
             # Realizar detección de objetos y etiquetas
-            object_response = self.vision_client.object_localization(image=image)
-            label_response = self.vision_client.label_detection(image=image)
+            with tracer.span('vision_api', servicio='google'):
+                object_response = self.vision_client.object_localization(image=image)
+                label_response = self.vision_client.label_detection(image=image)
             
             # Procesar resultados
             ingredientes = []
@@ -344,41 +435,32 @@ class ImageProcessor:
     
     def _categorize_ingredient(self, nombre: str) -> str:
         """Categoriza un ingrediente por tipo."""
-        nombre_lower = nombre.lower()
-        
-        if any(word in nombre_lower for word in ['tomate', 'cebolla', 'ajo', 'zanahoria', 'papa', 'lechuga', 'espinaca']):
-            return 'vegetal'
-        elif any(word in nombre_lower for word in ['manzana', 'naranja', 'plátano', 'fresa', 'uva']):
-            return 'fruta'
-        elif any(word in nombre_lower for word in ['pollo', 'carne', 'cerdo', 'res', 'ternera']):
-            return 'proteina'
-        elif any(word in nombre_lower for word in ['pescado', 'salmón', 'camarón', 'atún']):
-            return 'pescado'
-        elif any(word in nombre_lower for word in ['leche', 'queso', 'yogur', 'mantequilla']):
-            return 'lacteo'
-        elif any(word in nombre_lower for word in ['arroz', 'pasta', 'pan', 'harina']):
-            return 'carbohidrato'
-        elif any(word in nombre_lower for word in ['huevo']):
-            return 'proteina'
-        else:
-            return 'otros'
+        palabras = set(IngredientNormalizer.palabras(nombre))
+        
+        for categoria, claves in CATEGORIAS_INGREDIENTES:
+            if not palabras.isdisjoint(claves):
+                return categoria
+        return 'otros'
     
-    def _parse_openai_response(self, response_text: str) -> ListaIngredientes:
-        """Parsea la respuesta de OpenAI para extraer ingredientes."""
+    def _parse_openai_response(
+        self,
+        response_text: str,
+        cajas: Optional[List[Tuple[int, int, int, int]]] = None
+    ) -> ListaIngredientes:
+        """
+        Parsea la respuesta de OpenAI para extraer ingredientes.
+        
+        Args:
+            response_text: Texto de la respuesta
+            cajas: Caja de cada recuadro si se envió un mosaico de regiones
+        """
         try:
-            import json
-            
-            # Intentar extraer JSON de la respuesta
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
+            # Extraer JSON de la respuesta (recuperando los ingredientes completos si está truncada)
+            data, _ = self.response_parser.parse(response_text, clave_lista='ingredientes')
+            if data is None:
                 logger.error("No se encontró JSON válido en la respuesta")
                 return ListaIngredientes(error="Respuesta no válida")
             
-            json_str = response_text[start_idx:end_idx]
-            data = json.loads(json_str)
-            
             # Procesar ingredientes
             ingredientes = []
             for ing_data in data.get('ingredientes', []):
@@ -400,20 +482,110 @@ class ImageProcessor:
             return ListaIngredientes(
                 ingredientes=ingredientes,
                 calidad_imagen=data.get('calidad_imagen'),
-                error=data.get('error')
+                error=data.get('error'),
+                regiones=RegionProposer.asignar_regiones(cajas, data.get('ingredientes', [])) if cajas else []
             )
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Error al parsear JSON: {e}")
-            return ListaIngredientes(error="Error al parsear respuesta")
         except Exception as e:
             logger.error(f"Error al procesar respuesta: {e}")
             return ListaIngredientes(error=f"Error al procesar respuesta: {str(e)}")
     
+    def _cadena_detectores(self, use_openai: bool = True) -> List[DetectorIngredientes]:
+        """
+        Obtiene los detectores disponibles en el orden en que se prueban.
+        
+        DETECTION_BACKEND es una de las cadenas de BACKENDS_DETECCION o una lista
+        de nombres de detectores separados por comas. 'api' equivale al primer
+        servicio remoto disponible (OpenAI si use_openai, si no Google Vision).
+        """
+        nombres = BACKENDS_DETECCION.get(self.detection_backend) or [
+            nombre.strip() for nombre in self.detection_backend.split(',') if nombre.strip()
+        ]
+        
+        cadena = []
+        for nombre in nombres:
+            if nombre == 'api':
+                remotos = ['openai', 'google'] if use_openai else ['google']
+                disponibles = [self.detectores[n] for n in remotos if n in self.detectores and self.detectores[n].disponible()]
+                cadena.extend(disponibles[:1])
+            elif nombre in self.detectores and self.detectores[nombre].disponible():
+                cadena.append(self.detectores[nombre])
+            elif nombre not in self.detectores:
+                logger.warning(f"Detector desconocido en DETECTION_BACKEND: {nombre}")
+        return cadena
+    
+    def _comprobar_imagen(self, image_path: str) -> Optional[ListaIngredientes]:
+        """
+        Valida y filtra por calidad una imagen antes de detectar.
+        
+        La validación ya comprueba que se puede decodificar (formato por el
+        contenido y cabecera). La imagen no se preprocesa: los detectores leen
+        el archivo original, y el preprocesamiento completo (CLAHE y
+        redimensionado en el pool de procesos) solo se usa con --preprocess-only.
+        
+        Args:
+            image_path: Ruta de la imagen
+        
+        Returns:
+            Resultado con el error si la imagen se descarta, o None si es apta
+        """
+        # Validar imagen
+        with tracer.span('validacion'):
+            valida = self.validate_image(image_path)
+        if not valida:
+            return ListaIngredientes(error="Imagen no válida")
+        
+        # Filtrar localmente imágenes borrosas, mal expuestas o sin comida aparente
+        if self.quality_gate is not None:
+            with tracer.span('calidad'):
+                calidad = self.quality_gate.evaluar_archivo(image_path)
+            if calidad is not None and calidad['motivos']:
+                motivos = ', '.join(calidad['motivos'])
+                if not calidad['aceptada']:
+                    logger.warning(f"Imagen descartada antes de la API ({motivos}): {image_path}")
+                    return ListaIngredientes(error=f"Imagen descartada por calidad: {motivos}", calidad_imagen="baja")
+                logger.warning(f"Imagen de calidad dudosa ({motivos}): {image_path}")
+        
+        return None
+    
+    def _detectar_en_cadena(
+        self,
+        image_path: str,
+        cadena: List[DetectorIngredientes],
+        resultado: Optional[ListaIngredientes] = None
+    ) -> ListaIngredientes:
+        """
+        Prueba los detectores en orden hasta que uno encuentre ingredientes.
+        
+        Args:
+            image_path: Ruta de la imagen ya comprobada
+            cadena: Detectores pendientes de probar
+            resultado: Resultado de un detector anterior (p. ej. de un lote local)
+            
+        Returns:
+            Primer resultado con ingredientes, o el del último detector probado
+        """
+        for detector in cadena:
+            if resultado is not None and resultado.ingredientes and not resultado.error:
+                break
+            if resultado is not None:
+                logger.info(f"Sin ingredientes para {image_path}; se prueba el detector {detector.nombre}")
+            with tracer.span('deteccion', detector=detector.nombre) as span:
+                resultado = detector.detectar(image_path)
+                span.establecer(ingredientes=len(resultado.ingredientes))
+        
+        if resultado is None:
+            return ListaIngredientes(error="No hay servicios de detección disponibles")
+        return resultado
+    
     def detect_ingredients(self, image_path: str, use_openai: bool = True) -> ListaIngredientes:
         """
         Detecta ingredientes en una imagen usando el método especificado.
         
+        Los detectores se encadenan según DETECTION_BACKEND: el modelo local
+        puede actuar como primera pasada ('local_primero'), como respaldo de
+        las APIs ('respaldo_local') o en exclusiva ('local').
+        
         Args:
             image_path: Ruta de la imagen
             use_openai: Si usar OpenAI (True) o Google Vision (False)
@@ -421,27 +593,48 @@ class ImageProcessor:
         Returns:
             Lista de ingredientes detectados
         """
-        # Validar imagen
-        if not self.validate_image(image_path):
-            return ListaIngredientes(error="Imagen no válida")
+        error = self._comprobar_imagen(image_path)
+        if error is not None:
+            return error
         
-        # Preprocesar imagen
-        processed_image = self.preprocess_image(image_path)
-        if processed_image is None:
-            return ListaIngredientes(error="Error al preprocesar imagen")
-        
-        # Detectar ingredientes
-        if use_openai and self.openai_client:
-            return self.detect_ingredients_openai(image_path)
-        elif self.vision_client:
-            return self.detect_ingredients_google_vision(image_path)
-        else:
-            return ListaIngredientes(error="No hay servicios de detección disponibles")
+        return self._detectar_en_cadena(image_path, self._cadena_detectores(use_openai))
+    
+    def _detectar_pendientes(self, image_paths: List[str], use_openai: bool = True) -> List[ListaIngredientes]:
+        """
+        Detecta ingredientes en las imágenes que no tienen resultado previo.
+        
+        Si el primer detector de la cadena trabaja por lotes (modelo local), las
+        imágenes aptas se infieren juntas y solo las que quedan sin
+        ingredientes pasan a los detectores siguientes.
+        """
+        cadena = self._cadena_detectores(use_openai)
+        por_lotes = bool(cadena) and cadena[0].por_lotes
+        if len(image_paths) < 2 or not por_lotes:
+            results = []
+            for image_path in image_paths:
+                logger.info(f"Procesando imagen: {image_path}")
+                results.append(self.detect_ingredients(image_path, use_openai))
+            return results
+        
+        results = [self._comprobar_imagen(image_path) for image_path in image_paths]
+        aptas = [indice for indice, result in enumerate(results) if result is None]
+        
+        logger.info(f"Detección {cadena[0].nombre} por lotes de {len(aptas)} imágenes")
+        with tracer.span('deteccion', detector=cadena[0].nombre, imagenes=len(aptas)):
+            lote = cadena[0].detectar_lote([image_paths[indice] for indice in aptas])
+        for indice, result in zip(aptas, lote):
+            results[indice] = self._detectar_en_cadena(image_paths[indice], cadena[1:], result)
+        return results
     
     def detect_ingredients_batch(self, image_paths: List[str], use_openai: bool = True) -> List[ListaIngredientes]:
         """
         Detecta ingredientes en múltiples imágenes.
         
+        Las imágenes casi duplicadas de la sesión comparten el resultado de la
+        primera (el mismo objeto, que la fusión cuenta una sola vez) y las ya
+        analizadas en sesiones anteriores reutilizan su detección, sin llamar a la API.
+        Con el modelo local como primer detector, el resto se infiere por lotes.
+        
         Args:
             image_paths: Lista de rutas de imágenes
             use_openai: Si usar OpenAI (True) o Google Vision (False)
@@ -449,40 +642,77 @@ class ImageProcessor:
         Returns:
             Lista de resultados de detección
         """
-        results = []
+        if self.hash_index is None:
+            return self._detectar_pendientes(image_paths, use_openai)
+        
+        espacio = '+'.join(detector.nombre for detector in self._cadena_detectores(use_openai))
+        with tracer.span('deduplicacion', imagenes=len(image_paths)):
+            hashes = [dhash_archivo(image_path) if os.path.exists(image_path) else None for image_path in image_paths]
+            representantes = self.hash_index.agrupar_duplicadas(hashes)
         
-        for image_path in image_paths:
-            logger.info(f"Procesando imagen: {image_path}")
-            result = self.detect_ingredients(image_path, use_openai)
-            results.append(result)
+        results: List[Optional[ListaIngredientes]] = [None] * len(image_paths)
+        pendientes = []
+        for indice, image_path in enumerate(image_paths):
+            representante = representantes[indice]
+            if representante != indice:
+                logger.info(f"Imagen {image_path} duplicada de {image_paths[representante]}; se omite la detección")
+                continue
+            
+            hash_imagen = hashes[indice]
+            cacheado = self.hash_index.buscar(hash_imagen, espacio) if hash_imagen is not None else None
+            if cacheado is not None:
+                logger.info(f"Detección de {image_path} recuperada de sesiones anteriores")
+                results[indice] = cacheado.model_copy(deep=True)
+            else:
+                pendientes.append(indice)
+        
+        detectados = self._detectar_pendientes([image_paths[indice] for indice in pendientes], use_openai)
+        for indice, result in zip(pendientes, detectados):
+            hash_imagen = hashes[indice]
+            if hash_imagen is not None and not result.error and result.ingredientes:
+                self.hash_index.agregar(hash_imagen, result.model_copy(deep=True), espacio)
+            results[indice] = result
         
+        for indice, representante in enumerate(representantes):
+            if representante != indice:
+                results[indice] = results[representante]
+        
+        estadisticas = self.hash_index.obtener_estadisticas()
+        logger.info(f"Llamadas a la API de visión evitadas por duplicados: {estadisticas['llamadas_evitadas']}")
         return results
     
+    def get_quality_stats(self) -> Dict[str, float]:
+        """Obtiene las imágenes evaluadas y descartadas por el filtro de calidad."""
+        return self.quality_gate.obtener_estadisticas() if self.quality_gate is not None else {}
+    
+    def get_local_detector_stats(self) -> Dict[str, float]:
+        """Obtiene las imágenes y lotes procesados por el modelo local."""
+        detector = self.detectores.get('local')
+        return detector.obtener_estadisticas() if isinstance(detector, LocalDetector) else {}
+    
+    def get_dedup_stats(self) -> Dict[str, int]:
+        """Obtiene las imágenes duplicadas detectadas y las llamadas a la API evitadas."""
+        return self.hash_index.obtener_estadisticas() if self.hash_index is not None else {}
+    
+    def get_upload_stats(self) -> Dict[str, int]:
+        """Obtiene las imágenes preparadas para subir, las transcodificadas y los bytes ahorrados al quitar metadatos."""
+        return obtener_estadisticas_subida()
+    
+    def get_memory_stats(self) -> Dict[str, float]:
+        """Obtiene los bytes de imágenes en vuelo, el pico y las esperas por presupuesto de memoria."""
+        return presupuesto_imagenes.obtener_estadisticas()
+    
     def merge_ingredient_lists(self, ingredient_lists: List[ListaIngredientes]) -> ListaIngredientes:
         """
         Combina múltiples listas de ingredientes en una sola.
         
+        Las confianzas se combinan entre imágenes y se conservan las cantidades
+        y la procedencia de cada ingrediente (ver IngredientFusion).
+        
         Args:
-            ingredient_lists: Lista de ListaIngredientes
+            ingredient_lists: Lista de ListaIngredientes, una por imagen
             
         Returns:
             Lista combinada de ingredientes
         """
-        all_ingredients = []
-        
-        for lista in ingredient_lists:
-            if lista.ingredientes:
-                all_ingredients.extend(lista.ingredientes)
-        
-        # Eliminar duplicados basándose en nombre
-        unique_ingredients = {}
-        for ingrediente in all_ingredients:
-            nombre = ingrediente.nombre.lower()
-            if nombre not in unique_ingredients:
-                unique_ingredients[nombre] = ingrediente
-            else:
-                # Si ya existe, usar el de mayor confianza
-                if ingrediente.confianza > unique_ingredients[nombre].confianza:
-                    unique_ingredients[nombre] = ingrediente
-        
-        return ListaIngredientes(ingredientes=list(unique_ingredients.values()))
+        return self.ingredient_fusion.fusionar(ingredient_lists)
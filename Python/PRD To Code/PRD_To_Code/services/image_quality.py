@@ -0,0 +1,186 @@
+"""
+Filtro local de calidad de imagen previo a la detección de ingredientes.
+Con OpenCV y NumPy sobre la imagen reducida mide nitidez (varianza del
+laplaciano), exposición (histograma de luminancia) y color (saturación), y
+descarta o avisa de las fotos borrosas, oscuras o con poca probabilidad de
+contener comida antes de llamar a la API de visión.
+
+La puntuación de comida solo avisa por defecto: los alimentos pálidos (arroz,
+huevos, leche, harina, coliflor, tofu) o el interior blanco de una nevera
+tienen poca saturación y no deben descartarse sin llegar a la API.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from utils.image_io import leer_reducida
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Lado mayor de la imagen sobre la que se calculan las métricas (del orden de
+# la resolución a la que las APIs de visión analizan la foto)
+LADO_ANALISIS = 512
+
+MODOS_FILTRO = ('rechazar', 'avisar')
+
+# Saturación y brillo mínimos (escala 0-255 de OpenCV) de un píxel "con color"
+SATURACION_COLOR = 60
+BRILLO_COLOR = 40
+
+class ImageQualityGate:
+    """Evalúa si una imagen merece enviarse a la API de visión."""
+
+    def __init__(
+        self,
+        modo: Optional[str] = None,
+        nitidez_minima: Optional[float] = None,
+        brillo_minimo: Optional[float] = None,
+        brillo_maximo: Optional[float] = None,
+        recorte_maximo: Optional[float] = None,
+        puntuacion_comida_minima: Optional[float] = None,
+        modo_comida: Optional[str] = None
+    ):
+        """
+        Inicializa el filtro (los umbrales por defecto vienen de settings).
+
+        Args:
+            modo: 'rechazar' descarta las imágenes que no pasan; 'avisar' solo lo registra
+            nitidez_minima: Varianza mínima del laplaciano
+            brillo_minimo: Luminancia media mínima (0-255)
+            brillo_maximo: Luminancia media máxima (0-255)
+            recorte_maximo: Fracción máxima de píxeles negros o quemados
+            puntuacion_comida_minima: Fracción mínima de píxeles con color
+            modo_comida: 'rechazar' o 'avisar' para las imágenes sin comida aparente
+                (por defecto settings.QUALITY_FOOD_SCORE_MODE); con modo 'avisar'
+                nunca se descartan
+        """
+        self.modo = modo or settings.QUALITY_GATE_MODE
+        self.modo_comida = modo_comida or settings.QUALITY_FOOD_SCORE_MODE
+        for valor in (self.modo, self.modo_comida):
+            if valor not in MODOS_FILTRO:
+                raise ValueError(f"Modo de filtro de calidad no soportado: {valor}")
+        self.nitidez_minima = settings.QUALITY_MIN_SHARPNESS if nitidez_minima is None else nitidez_minima
+        self.brillo_minimo = settings.QUALITY_MIN_BRIGHTNESS if brillo_minimo is None else brillo_minimo
+        self.brillo_maximo = settings.QUALITY_MAX_BRIGHTNESS if brillo_maximo is None else brillo_maximo
+        self.recorte_maximo = settings.QUALITY_MAX_CLIPPED if recorte_maximo is None else recorte_maximo
+        self.puntuacion_comida_minima = (
+            settings.QUALITY_MIN_FOOD_SCORE if puntuacion_comida_minima is None else puntuacion_comida_minima
+        )
+
+        self._lock = threading.Lock()
+        self._estadisticas = {'evaluadas': 0, 'rechazadas': 0, 'avisos': 0, 'tiempo_total_ms': 0.0}
+
+    @staticmethod
+    def reducir(imagen: np.ndarray) -> np.ndarray:
+        """
+        Reduce la imagen para que su lado mayor no supere LADO_ANALISIS.
+
+        Tras una lectura reducida la escala suele ser mayor que 1/2, donde la
+        interpolación lineal es mucho más rápida que INTER_AREA y casi igual de fiel.
+        """
+        alto, ancho = imagen.shape[:2]
+        escala = LADO_ANALISIS / max(alto, ancho)
+        if escala >= 1.0:
+            return imagen
+        interpolacion = cv2.INTER_LINEAR if escala > 0.5 else cv2.INTER_AREA
+        return cv2.resize(imagen, (max(1, round(ancho * escala)), max(1, round(alto * escala))), interpolation=interpolacion)
+
+    @staticmethod
+    def calcular_metricas(imagen: np.ndarray) -> Dict[str, float]:
+        """
+        Calcula las métricas de calidad de una imagen BGR ya reducida.
+
+        Returns:
+            nitidez, brillo, fracciones subexpuesta y sobreexpuesta, saturación
+            media y puntuación de comida (fracción de píxeles con color)
+        """
+        gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+        _, desviacion = cv2.meanStdDev(cv2.Laplacian(gris, cv2.CV_16S))
+        nitidez = float(desviacion[0, 0]) ** 2
+
+        histograma = cv2.calcHist([gris], [0], None, [256], [0, 256]).ravel()
+        total = histograma.sum()
+        brillo = float(np.dot(histograma, np.arange(256)) / total)
+
+        hsv = cv2.cvtColor(imagen, cv2.COLOR_BGR2HSV)
+        con_color = cv2.inRange(hsv, (0, SATURACION_COLOR + 1, BRILLO_COLOR + 1), (180, 255, 255))
+
+        return {
+            'nitidez': round(nitidez, 2),
+            'brillo': round(brillo, 2),
+            'subexpuesta': round(float(histograma[:16].sum() / total), 4),
+            'sobreexpuesta': round(float(histograma[240:].sum() / total), 4),
+            'saturacion': round(cv2.mean(hsv)[1], 2),
+            'puntuacion_comida': round(cv2.countNonZero(con_color) / total, 4)
+        }
+
+    def evaluar(self, imagen: np.ndarray) -> Dict[str, Any]:
+        """
+        Evalúa una imagen BGR.
+
+        Args:
+            imagen: Imagen BGR (de cualquier tamaño)
+
+        Returns:
+            Diccionario con 'aceptada', 'motivos', 'metricas' y 'tiempo_ms'
+        """
+        inicio = time.perf_counter()
+        metricas = self.calcular_metricas(self.reducir(imagen))
+        motivos = self._motivos(metricas)
+        aceptada = self.modo == 'avisar' or not [
+            motivo for motivo in motivos if motivo != 'sin_comida_aparente' or self.modo_comida == 'rechazar'
+        ]
+        tiempo_ms = (time.perf_counter() - inicio) * 1000
+
+        with self._lock:
+            self._estadisticas['evaluadas'] += 1
+            self._estadisticas['tiempo_total_ms'] += tiempo_ms
+            if motivos:
+                self._estadisticas['rechazadas' if not aceptada else 'avisos'] += 1
+
+        return {'aceptada': aceptada, 'motivos': motivos, 'metricas': metricas, 'tiempo_ms': round(tiempo_ms, 3)}
+
+    def evaluar_archivo(self, image_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Evalúa un archivo de imagen, decodificándolo ya reducido (ver image_io.leer_reducida).
+
+        Returns:
+            Resultado de evaluar, o None si la imagen no se puede leer
+        """
+        imagen = leer_reducida(image_path, LADO_ANALISIS)
+        if imagen is None:
+            return None
+        return self.evaluar(imagen)
+
+    def obtener_estadisticas(self) -> Dict[str, float]:
+        """Obtiene imágenes evaluadas, rechazadas, avisos y tiempo medio por imagen."""
+        with self._lock:
+            estadisticas = dict(self._estadisticas)
+        evaluadas = estadisticas.pop('evaluadas')
+        tiempo_total = estadisticas.pop('tiempo_total_ms')
+        return {
+            'evaluadas': evaluadas,
+            **estadisticas,
+            'tiempo_medio_ms': tiempo_total / evaluadas if evaluadas else 0.0
+        }
+
+    def _motivos(self, metricas: Dict[str, float]) -> List[str]:
+        """Obtiene los motivos por los que una imagen no supera el filtro."""
+        motivos = []
+        if metricas['nitidez'] < self.nitidez_minima:
+            motivos.append('borrosa')
+        if metricas['brillo'] < self.brillo_minimo:
+            motivos.append('oscura')
+        elif metricas['brillo'] > self.brillo_maximo:
+            motivos.append('sobreexpuesta')
+        if max(metricas['subexpuesta'], metricas['sobreexpuesta']) > self.recorte_maximo:
+            motivos.append('exposicion_recortada')
+        if metricas['puntuacion_comida'] < self.puntuacion_comida_minima:
+            motivos.append('sin_comida_aparente')
+        return motivos
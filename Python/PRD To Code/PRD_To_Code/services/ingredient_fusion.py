@@ -0,0 +1,213 @@
+"""
+Fusión de los ingredientes detectados en varias imágenes.
+Combina las confianzas con un OR ruidoso (cada imagen es una evidencia
+independiente), concilia las cantidades por unidad de medida y conserva en qué
+imágenes (y en qué zonas de cada una) apareció cada ingrediente. Recorre cada
+detección una sola vez.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.settings import settings
+from models.ingredient import Ingrediente, IngredienteFusionado, ListaIngredientes, UnidadMedida
+from utils.ingredient_normalizer import IngredientNormalizer
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Unidades convertibles: unidad -> (unidad base, factor)
+CONVERSIONES = {
+    UnidadMedida.KILOGRAMOS: (UnidadMedida.GRAMOS, 1000.0),
+    UnidadMedida.GRAMOS: (UnidadMedida.GRAMOS, 1.0),
+    UnidadMedida.LITROS: (UnidadMedida.MILILITROS, 1000.0),
+    UnidadMedida.MILILITROS: (UnidadMedida.MILILITROS, 1.0)
+}
+
+# Unidad mayor a la que se vuelve cuando la cantidad base la alcanza
+UNIDAD_MAYOR = {
+    UnidadMedida.GRAMOS: UnidadMedida.KILOGRAMOS,
+    UnidadMedida.MILILITROS: UnidadMedida.LITROS
+}
+
+MODOS_CANTIDAD = ('max', 'suma')
+
+class _Acumulador:
+    """Evidencia acumulada de un ingrediente a lo largo de las imágenes."""
+
+    __slots__ = (
+        'mejor', 'prob_ausente', 'imagen_actual', 'max_imagen', 'imagenes', 'regiones', 'detecciones',
+        'cantidades', 'cantidades_imagen', 'pesos_unidad', 'unidades_originales',
+        'alergenos', 'esencial', 'detectado'
+    )
+
+    def __init__(self, ingrediente: Ingrediente):
+        self.mejor = ingrediente
+        self.prob_ausente = 1.0
+        self.imagen_actual: Optional[int] = None
+        self.max_imagen = 0.0
+        self.imagenes: List[int] = []
+        self.regiones: List[Tuple[int, List[int]]] = []
+        self.detecciones = 0
+        self.cantidades: Dict[UnidadMedida, float] = {}
+        self.cantidades_imagen: Dict[UnidadMedida, float] = {}
+        self.pesos_unidad: Dict[UnidadMedida, float] = {}
+        self.unidades_originales: Dict[UnidadMedida, set] = {}
+        self.alergenos: Dict[str, None] = {}
+        self.esencial = False
+        self.detectado = False
+
+class IngredientFusion:
+    """Motor de fusión de detecciones de ingredientes entre imágenes."""
+
+    def __init__(self, modo_cantidades: Optional[str] = None):
+        """
+        Inicializa el motor.
+
+        Args:
+            modo_cantidades: 'max' si las fotos pueden mostrar los mismos
+                productos (se concilian tomando el máximo entre imágenes) o
+                'suma' si cada foto muestra productos distintos
+                (por defecto settings.FUSION_QUANTITY_MODE)
+        """
+        self.modo_cantidades = modo_cantidades or settings.FUSION_QUANTITY_MODE
+        if self.modo_cantidades not in MODOS_CANTIDAD:
+            raise ValueError(f"Modo de cantidades no soportado: {self.modo_cantidades}")
+
+    def fusionar(self, listas: List[ListaIngredientes]) -> ListaIngredientes:
+        """
+        Fusiona las listas de ingredientes de varias imágenes.
+
+        Las detecciones del mismo ingrediente (por nombre canónico) en una misma
+        imagen cuentan como una sola evidencia con la confianza máxima; entre
+        imágenes la confianza es 1 - Π(1 - c). Dentro de una imagen las
+        cantidades se suman, y entre imágenes se concilian según modo_cantidades.
+        Una misma lista repetida (imágenes duplicadas) se cuenta una sola vez.
+        Las zonas de ListaIngredientes.regiones pasan a cada ingrediente como
+        pares (imagen, caja).
+
+        Args:
+            listas: Listas de ingredientes, una por imagen y en orden
+
+        Returns:
+            Lista de IngredienteFusionado en orden de primera aparición
+        """
+        acumuladores: Dict[str, _Acumulador] = {}
+        vistas = set()
+
+        for indice_imagen, lista in enumerate(listas):
+            if id(lista) in vistas:
+                continue
+            vistas.add(id(lista))
+            cajas = self._cajas_por_ingrediente(lista)
+            for ingrediente in lista.ingredientes:
+                clave = IngredientNormalizer.canonico(ingrediente.nombre)
+                acumulador = acumuladores.get(clave)
+                if acumulador is None:
+                    acumulador = acumuladores[clave] = _Acumulador(ingrediente)
+                self._acumular(acumulador, ingrediente, indice_imagen, cajas.get(clave, ()))
+
+        fusionados = [self._construir(acumulador) for acumulador in acumuladores.values()]
+        logger.debug(
+            f"Fusionadas {sum(a.detecciones for a in acumuladores.values())} detecciones "
+            f"de {len(listas)} imágenes en {len(fusionados)} ingredientes"
+        )
+        return ListaIngredientes(ingredientes=fusionados)
+
+    @staticmethod
+    def _cajas_por_ingrediente(lista: ListaIngredientes) -> Dict[str, List[List[int]]]:
+        """Agrupa las cajas de las zonas de una imagen por nombre canónico de ingrediente."""
+        cajas: Dict[str, List[List[int]]] = {}
+        for region in lista.regiones:
+            for nombre in region.ingredientes:
+                del_ingrediente = cajas.setdefault(IngredientNormalizer.canonico(nombre), [])
+                if region.caja not in del_ingrediente:
+                    del_ingrediente.append(region.caja)
+        return cajas
+
+    def _acumular(
+        self,
+        acumulador: _Acumulador,
+        ingrediente: Ingrediente,
+        indice_imagen: int,
+        cajas: Iterable[List[int]] = ()
+    ) -> None:
+        """Añade una detección (y las zonas de su imagen donde se vio) a la evidencia de su ingrediente."""
+        if acumulador.imagen_actual != indice_imagen:
+            self._cerrar_imagen(acumulador)
+            acumulador.imagen_actual = indice_imagen
+            acumulador.imagenes.append(indice_imagen)
+            acumulador.regiones.extend((indice_imagen, caja) for caja in cajas)
+
+        acumulador.detecciones += 1
+        acumulador.max_imagen = max(acumulador.max_imagen, ingrediente.confianza)
+        if ingrediente.confianza > acumulador.mejor.confianza:
+            acumulador.mejor = ingrediente
+        acumulador.esencial = acumulador.esencial or ingrediente.esencial
+        acumulador.detectado = acumulador.detectado or ingrediente.detectado
+        for alergeno in ingrediente.alergenos:
+            acumulador.alergenos[alergeno] = None
+
+        if ingrediente.cantidad is not None and ingrediente.unidad is not None:
+            base, factor = CONVERSIONES.get(ingrediente.unidad, (ingrediente.unidad, 1.0))
+            acumulador.cantidades_imagen[base] = acumulador.cantidades_imagen.get(base, 0.0) + ingrediente.cantidad * factor
+            acumulador.pesos_unidad[base] = acumulador.pesos_unidad.get(base, 0.0) + ingrediente.confianza
+            acumulador.unidades_originales.setdefault(base, set()).add(ingrediente.unidad)
+
+    def _cerrar_imagen(self, acumulador: _Acumulador) -> None:
+        """Incorpora la evidencia de la imagen en curso al total del ingrediente."""
+        if acumulador.imagen_actual is None:
+            return
+        acumulador.prob_ausente *= 1.0 - acumulador.max_imagen
+        acumulador.max_imagen = 0.0
+
+        for unidad, cantidad in acumulador.cantidades_imagen.items():
+            previa = acumulador.cantidades.get(unidad, 0.0)
+            acumulador.cantidades[unidad] = previa + cantidad if self.modo_cantidades == 'suma' else max(previa, cantidad)
+        acumulador.cantidades_imagen = {}
+
+    def _construir(self, acumulador: _Acumulador) -> IngredienteFusionado:
+        """Crea el ingrediente fusionado a partir de su evidencia acumulada."""
+        self._cerrar_imagen(acumulador)
+        cantidad, unidad = self._conciliar_cantidad(acumulador)
+        mejor = acumulador.mejor
+
+        return IngredienteFusionado(
+            nombre=mejor.nombre,
+            cantidad=cantidad,
+            unidad=unidad,
+            estado=mejor.estado,
+            confianza=round(1.0 - acumulador.prob_ausente, 4),
+            detectado=acumulador.detectado,
+            esencial=acumulador.esencial,
+            categoria=mejor.categoria,
+            alergenos=list(acumulador.alergenos),
+            temporada=mejor.temporada,
+            imagenes=acumulador.imagenes,
+            detecciones=acumulador.detecciones,
+            regiones=acumulador.regiones
+        )
+
+    @staticmethod
+    def _conciliar_cantidad(acumulador: _Acumulador) -> Tuple[Optional[float], Optional[UnidadMedida]]:
+        """
+        Elige la cantidad final: la de la unidad con más evidencia.
+
+        Las cantidades en unidades no convertibles entre sí (p. ej. gramos y
+        piezas) no se mezclan.
+        """
+        if not acumulador.cantidades:
+            return None, None
+
+        base = max(acumulador.cantidades, key=lambda unidad: acumulador.pesos_unidad[unidad])
+        cantidad = acumulador.cantidades[base]
+        originales = acumulador.unidades_originales[base]
+
+        if len(originales) == 1:
+            unidad = next(iter(originales))
+            _, factor = CONVERSIONES.get(unidad, (unidad, 1.0))
+            return round(cantidad / factor, 3), unidad
+
+        mayor = UNIDAD_MAYOR.get(base)
+        if mayor is not None and cantidad >= 1000.0:
+            return round(cantidad / 1000.0, 3), mayor
+        return round(cantidad, 3), base
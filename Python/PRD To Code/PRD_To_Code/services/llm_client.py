@@ -1,7 +1,6 @@
 """
 Cliente para la API de LLM (OpenAI).
 """
-import json
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
@@ -20,10 +19,16 @@ except ImportError:
 from config.settings import settings
 from models.recipe import ColeccionRecetas, Receta, MetadataRecetas
 from models.ingredient import ListaIngredientes
+from services.token_budget import TokenBudget
+from services.response_parser import ResponseParser, crear_completado
+from services.semantic_cache import SemanticCache
+from utils.tracing import tracer
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "Eres un chef experto y nutricionista con 15 años de experiencia internacional. Tu especialidad es crear recetas deliciosas y saludables optimizando ingredientes disponibles."
+
 class LLMClient:
     """Cliente para interactuar con la API de OpenAI."""
     
@@ -34,6 +39,9 @@ class LLMClient:
         
         self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.OPENAI_MODEL
+        self.token_budget = TokenBudget(self.model)
+        self.response_parser = ResponseParser()
+        self.cache = SemanticCache() if settings.ENABLE_CACHE else None
         logger.info(f"Cliente LLM inicializado con modelo: {self.model}")
     
     def generate_recipes(
@@ -43,7 +51,10 @@ class LLMClient:
         restricciones_dieteticas: List[str],
         tiempo_disponible: int,
         nivel_experiencia: str,
-        num_personas: int = 2
+        num_personas: int = 2,
+        num_recetas: int = settings.DEFAULT_MAX_RECIPES,
+        restricciones_duras: Optional[Dict[str, Any]] = None,
+        preferencias_usuario: Optional[str] = None
     ) -> ColeccionRecetas:
         """
         Genera recetas usando el LLM.
@@ -55,32 +66,163 @@ class LLMClient:
             tiempo_disponible: Tiempo disponible en minutos
             nivel_experiencia: Nivel culinario del usuario
             num_personas: Número de personas para las que cocinar
+            num_recetas: Número de recetas candidatas a pedir al LLM. Las que no
+                caben en una respuesta se piden en completados adicionales que
+                excluyen las ya generadas
+            restricciones_duras: Filtros obligatorios del usuario a incluir en el prompt
+            preferencias_usuario: Preferencias del usuario en formato texto
             
         Returns:
             Colección de recetas generadas
         """
         try:
-            # Generar prompt
-            from config.prompts import PromptTemplates
-            prompt = PromptTemplates.get_main_recipe_prompt(
-                ingredientes_detectados=ingredientes_detectados.ingredientes,
-                ingredientes_basicos=ingredientes_basicos,
-                restricciones_dieteticas=restricciones_dieteticas,
+            # Buscar en caché un conjunto de ingredientes similar con el mismo contexto
+            nombres = ingredientes_detectados.obtener_nombres()
+            contexto = SemanticCache.clave_contexto(
+                ingredientes_basicos=sorted(ingredientes_basicos),
+                restricciones_dieteticas=sorted(restricciones_dieteticas),
                 tiempo_disponible=tiempo_disponible,
                 nivel_experiencia=nivel_experiencia,
-                num_personas=num_personas
+                num_personas=num_personas,
+                num_recetas=num_recetas,
+                restricciones_duras=restricciones_duras,
+                preferencias_usuario=preferencias_usuario
             )
+            if self.cache is not None:
+                with tracer.span('cache_semantica') as span:
+                    encontrado = self.cache.get(nombres, contexto, basicos=ingredientes_basicos)
+                    span.establecer(acierto=encontrado is not None)
+                if encontrado is not None:
+                    recetas, similitud = encontrado
+                    logger.info(f"Recetas obtenidas de caché (similitud {similitud:.2f})")
+                    # Los metadatos de la petición son los de esta sesión, no los de la que se guardó
+                    recetas = recetas.model_copy(deep=True)
+                    recetas.metadata.ingredientes_utilizados = nombres
+                    recetas.metadata.tiempo_generacion = datetime.now().isoformat()
+                    recetas.metadata.metricas = {'cache': {'acierto': True, 'similitud': round(similitud, 4)}}
+                    return recetas
+            
+            # Primera tanda con el prompt principal; el resto, en completados adicionales
+            por_respuesta = self.token_budget.max_recetas_por_respuesta()
+            primera_tanda = min(num_recetas, por_respuesta)
+
+            # Generar prompt
+            from config.prompts import PromptTemplates
+            with tracer.span('construccion_prompt'):
+                prompt = PromptTemplates.get_main_recipe_prompt(
+                    ingredientes_detectados=[ing.to_dict() for ing in ingredientes_detectados.ingredientes],
+                    ingredientes_basicos=ingredientes_basicos,
+                    restricciones_dieteticas=restricciones_dieteticas,
+                    tiempo_disponible=tiempo_disponible,
+                    nivel_experiencia=nivel_experiencia,
+                    num_personas=num_personas,
+                    num_recetas=primera_tanda,
+                    restricciones_duras=restricciones_duras,
+                    preferencias_usuario=preferencias_usuario
+                )
             
             # Llamar a la API
-            response = self._call_openai_api(prompt)
+            response = self._call_openai_api(
+                prompt,
+                plantilla='principal',
+                max_tokens=self.token_budget.max_tokens_para_recetas(primera_tanda)
+            )
             
             # Procesar respuesta
-            return self._parse_recipe_response(response, ingredientes_detectados)
+            with tracer.span('parseo_recetas') as span:
+                recetas = self._parse_recipe_response(response, ingredientes_detectados)
+                span.establecer(recetas=len(recetas.recetas), modo=recetas.metadata.metricas.get('parseo', ''))
+
+            # Candidatas que no caben en una respuesta
+            completados = 1
+            while not recetas.error and primera_tanda <= len(recetas.recetas) < num_recetas:
+                tanda = min(num_recetas - len(recetas.recetas), por_respuesta)
+                adicionales = self.generate_backfill_recipes(
+                    ingredientes_detectados=ingredientes_detectados,
+                    recetas_existentes=[receta.nombre for receta in recetas.recetas],
+                    restricciones_dieteticas=restricciones_dieteticas,
+                    tiempo_disponible=tiempo_disponible,
+                    nivel_experiencia=nivel_experiencia,
+                    num_personas=num_personas,
+                    num_recetas=tanda,
+                    restricciones_duras=restricciones_duras,
+                    preferencias_usuario=preferencias_usuario
+                )
+                completados += 1
+                if adicionales.error or not adicionales.recetas:
+                    break
+                # Renumerar para evitar IDs repetidos entre completados
+                for receta in adicionales.recetas:
+                    receta.id = len(recetas.recetas) + 1
+                    recetas.recetas.append(receta)
+                if len(adicionales.recetas) < tanda:
+                    break
+            if completados > 1:
+                recetas.metadata.total_recetas = len(recetas.recetas)
+                recetas.metadata.metricas['completados'] = completados
+
+            if self.cache is not None and not recetas.error and recetas.recetas:
+                self.cache.put(nombres, recetas.model_copy(deep=True), contexto)
+            return recetas
             
         except Exception as e:
             logger.error(f"Error al generar recetas: {e}")
             return self._create_error_response(str(e))
     
+    def generate_backfill_recipes(
+        self,
+        ingredientes_detectados: ListaIngredientes,
+        recetas_existentes: List[str],
+        restricciones_dieteticas: List[str],
+        tiempo_disponible: int,
+        nivel_experiencia: str,
+        num_personas: int = 2,
+        num_recetas: int = 1,
+        restricciones_duras: Optional[Dict[str, Any]] = None,
+        preferencias_usuario: Optional[str] = None
+    ) -> ColeccionRecetas:
+        """
+        Genera recetas adicionales para completar una sesión.
+        
+        Args:
+            ingredientes_detectados: Lista de ingredientes detectados
+            recetas_existentes: Nombres de recetas ya generadas que no deben repetirse
+            restricciones_dieteticas: Restricciones dietéticas del usuario
+            tiempo_disponible: Tiempo disponible en minutos
+            nivel_experiencia: Nivel culinario del usuario
+            num_personas: Número de personas para las que cocinar
+            num_recetas: Número de recetas adicionales a pedir
+            restricciones_duras: Filtros obligatorios del usuario a incluir en el prompt
+            preferencias_usuario: Preferencias del usuario en formato texto
+            
+        Returns:
+            Colección con las recetas adicionales
+        """
+        try:
+            from config.prompts import PromptTemplates
+            prompt = PromptTemplates.get_backfill_recipe_prompt(
+                ingredientes_detectados=[ing.to_dict() for ing in ingredientes_detectados.ingredientes],
+                recetas_existentes=recetas_existentes,
+                restricciones_dieteticas=restricciones_dieteticas,
+                tiempo_disponible=tiempo_disponible,
+                nivel_experiencia=nivel_experiencia,
+                num_personas=num_personas,
+                num_recetas=num_recetas,
+                restricciones_duras=restricciones_duras,
+                preferencias_usuario=preferencias_usuario
+            )
+            
+            response = self._call_openai_api(
+                prompt,
+                plantilla='relleno',
+                max_tokens=self.token_budget.max_tokens_para_recetas(num_recetas)
+            )
+            return self._parse_recipe_response(response, ingredientes_detectados)
+            
+        except Exception as e:
+            logger.error(f"Error al generar recetas adicionales: {e}")
+            return self._create_error_response(str(e))
+    
     def generate_quick_recipes(
         self,
         ingredientes_detectados: List[str],
@@ -103,7 +245,11 @@ class LLMClient:
                 tiempo_maximo=tiempo_maximo
             )
             
-            response = self._call_openai_api(prompt)
+            response = self._call_openai_api(
+                prompt,
+                plantilla='rapidas',
+                max_tokens=self.token_budget.max_tokens_para_recetas(3)
+            )
             return self._parse_quick_recipe_response(response)
             
         except Exception as e:
@@ -132,7 +278,11 @@ class LLMClient:
                 nivel_experiencia=nivel_experiencia
             )
             
-            response = self._call_openai_api(prompt)
+            response = self._call_openai_api(
+                prompt,
+                plantilla='gourmet',
+                max_tokens=self.token_budget.max_tokens_para_recetas(3)
+            )
             return self._parse_gourmet_recipe_response(response)
             
         except Exception as e:
@@ -161,49 +311,83 @@ class LLMClient:
                 restricciones=restricciones
             )
             
-            response = self._call_openai_api(prompt)
+            response = self._call_openai_api(
+                prompt,
+                plantilla='saludables',
+                max_tokens=self.token_budget.max_tokens_para_recetas(3)
+            )
             return self._parse_healthy_recipe_response(response)
             
         except Exception as e:
             logger.error(f"Error al generar recetas saludables: {e}")
             return {"error": str(e)}
     
-    def _call_openai_api(self, prompt: str) -> str:
+    def _call_openai_api(
+        self,
+        prompt: str,
+        plantilla: str = 'principal',
+        max_tokens: Optional[int] = None
+    ) -> str:
         """
         Realiza la llamada a la API de OpenAI.
         
         Args:
             prompt: Prompt a enviar
+            plantilla: Nombre de la plantilla usada, para la contabilidad de tokens
+            max_tokens: Límite de tokens de la respuesta (por defecto settings.MAX_COMPLETION_TOKENS)
             
         Returns:
             Respuesta de la API
         """
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un chef experto y nutricionista con 15 años de experiencia internacional. Tu especialidad es crear recetas deliciosas y saludables optimizando ingredientes disponibles."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=4000,
-                temperature=0.7,
-                top_p=0.9,
-                frequency_penalty=0.1,
-                presence_penalty=0.1
-            )
+            messages = [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+            with tracer.span('llamada_llm', modelo=self.model, plantilla=plantilla) as span:
+                response = crear_completado(
+                    self.client.chat.completions.create,
+                    self.model,
+                    messages=messages,
+                    max_tokens=max_tokens or settings.MAX_COMPLETION_TOKENS,
+                    temperature=0.7,
+                    top_p=0.9,
+                    frequency_penalty=0.1,
+                    presence_penalty=0.1
+                )
+                uso = getattr(response, 'usage', None)
+                if uso is not None:
+                    span.establecer(
+                        tokens_prompt=getattr(uso, 'prompt_tokens', 0),
+                        tokens_respuesta=getattr(uso, 'completion_tokens', 0)
+                    )
             
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            self.token_budget.registrar_uso(plantilla, messages, content, getattr(response, 'usage', None))
+            return content
             
         except Exception as e:
             logger.error(f"Error en llamada a OpenAI API: {e}")
             raise
     
+    def get_token_stats(self) -> Dict[str, Dict[str, float]]:
+        """Obtiene el consumo de tokens acumulado por plantilla de prompt."""
+        return self.token_budget.obtener_estadisticas()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Obtiene la tasa de aciertos de la caché semántica."""
+        return self.cache.obtener_estadisticas() if self.cache is not None else {}
+    
+    def get_parse_stats(self) -> Dict[str, Any]:
+        """Obtiene las métricas de parseo y recuperación de respuestas."""
+        return self.response_parser.obtener_estadisticas()
+    
     def _parse_recipe_response(self, response_text: str, ingredientes_detectados: ListaIngredientes) -> ColeccionRecetas:
         """
         Parsea la respuesta del LLM para extraer recetas.
@@ -216,27 +400,35 @@ class LLMClient:
             Colección de recetas
         """
         try:
-            # Extraer JSON de la respuesta
-            json_data = self._extract_json_from_response(response_text)
+            # Extraer JSON de la respuesta (recuperando las recetas completas si está truncada)
+            json_data, modo_parseo = self.response_parser.parse(response_text, clave_lista='recetas')
             if not json_data:
                 return self._create_error_response("No se pudo extraer JSON de la respuesta")
             
             # Validar estructura básica
-            if 'recetas' not in json_data or 'metadata' not in json_data:
+            if not isinstance(json_data['recetas'], list):
                 return self._create_error_response("Estructura de respuesta inválida")
             
             # Procesar metadata
-            metadata = self._create_metadata(json_data['metadata'], ingredientes_detectados)
+            metadata = self._create_metadata(json_data.get('metadata') or {}, ingredientes_detectados)
+            metadata.metricas['parseo'] = modo_parseo
             
-            # Procesar recetas
+            # Procesar recetas: validación directa en una pasada y, si el LLM se
+            # desvía del esquema, construcción tolerante campo a campo
             recetas = []
+            tolerantes = 0
             for i, receta_data in enumerate(json_data['recetas']):
                 try:
-                    receta = self._create_recipe_from_data(receta_data, i + 1)
-                    recetas.append(receta)
-                except Exception as e:
-                    logger.warning(f"Error al procesar receta {i + 1}: {e}")
-                    continue
+                    receta = Receta.from_dict({**receta_data, 'id': i + 1})
+                except Exception:
+                    try:
+                        receta = self._create_recipe_from_data(receta_data, i + 1)
+                        tolerantes += 1
+                    except Exception as e:
+                        logger.warning(f"Error al procesar receta {i + 1}: {e}")
+                        continue
+                recetas.append(receta)
+            metadata.metricas['construccion_tolerante'] = tolerantes
             
             if not recetas:
                 return self._create_error_response("No se pudieron procesar recetas válidas")
@@ -250,7 +442,7 @@ class LLMClient:
     def _parse_quick_recipe_response(self, response_text: str) -> Dict[str, Any]:
         """Parsea respuesta de recetas rápidas."""
         try:
-            json_data = self._extract_json_from_response(response_text)
+            json_data = self._extract_json_from_response(response_text, 'recetas_rapidas')
             return json_data if json_data else {"error": "No se pudo extraer JSON"}
         except Exception as e:
             return {"error": str(e)}
@@ -258,7 +450,7 @@ class LLMClient:
     def _parse_gourmet_recipe_response(self, response_text: str) -> Dict[str, Any]:
         """Parsea respuesta de recetas gourmet."""
         try:
-            json_data = self._extract_json_from_response(response_text)
+            json_data = self._extract_json_from_response(response_text, 'recetas_gourmet')
             return json_data if json_data else {"error": "No se pudo extraer JSON"}
         except Exception as e:
             return {"error": str(e)}
@@ -266,39 +458,24 @@ class LLMClient:
     def _parse_healthy_recipe_response(self, response_text: str) -> Dict[str, Any]:
         """Parsea respuesta de recetas saludables."""
         try:
-            json_data = self._extract_json_from_response(response_text)
+            json_data = self._extract_json_from_response(response_text, 'recetas_saludables')
             return json_data if json_data else {"error": "No se pudo extraer JSON"}
         except Exception as e:
             return {"error": str(e)}
     
-    def _extract_json_from_response(self, response_text: str) -> Optional[Dict[str, Any]]:
+    def _extract_json_from_response(self, response_text: str, clave_lista: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Extrae JSON de la respuesta del LLM.
         
         Args:
             response_text: Respuesta del LLM
+            clave_lista: Lista principal a recuperar si la respuesta está truncada
             
         Returns:
             Datos JSON extraídos
         """
-        try:
-            # Buscar JSON en la respuesta
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
-                logger.error("No se encontró JSON en la respuesta")
-                return None
-            
-            json_str = response_text[start_idx:end_idx]
-            return json.loads(json_str)
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Error al parsear JSON: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error al extraer JSON: {e}")
-            return None
+        json_data, _ = self.response_parser.parse(response_text, clave_lista)
+        return json_data
     
     def _create_metadata(self, metadata_data: Dict[str, Any], ingredientes_detectados: ListaIngredientes) -> MetadataRecetas:
         """Crea objeto MetadataRecetas desde datos."""
@@ -0,0 +1,319 @@
+"""
+Detección local de ingredientes con un modelo ejecutado en CPU.
+Carga un modelo de clasificación o detección de alimentos (ONNX, o cualquier
+formato que lea OpenCV DNN) una sola vez por proceso, agrupa las imágenes de la
+sesión en lotes para la inferencia y traduce las etiquetas del modelo a
+objetos Ingrediente, sin red ni coste por llamada.
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from models.ingredient import Ingrediente, ListaIngredientes
+from services.detectors import DetectorIngredientes
+from utils.image_io import leer_reducida
+from utils.ingredient_normalizer import IngredientNormalizer
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Media y desviación (RGB, escala 0-1) de cada normalización de entrada
+NORMALIZACIONES = {
+    'imagenet': ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225)),
+    'unitaria': ((0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+}
+
+ACTIVACIONES = ('softmax', 'sigmoid', 'ninguna')
+
+# Etiquetas en inglés de los modelos de alimentos habituales -> ingrediente
+ETIQUETAS_INGREDIENTES = {
+    'apple': 'manzana',
+    'avocado': 'aguacate',
+    'bacon': 'tocino',
+    'banana': 'plátano',
+    'beef': 'carne de res',
+    'bell pepper': 'pimiento',
+    'bread': 'pan',
+    'broccoli': 'brócoli',
+    'butter': 'mantequilla',
+    'cabbage': 'repollo',
+    'carrot': 'zanahoria',
+    'cauliflower': 'coliflor',
+    'cheese': 'queso',
+    'chicken': 'pollo',
+    'corn': 'maíz',
+    'cucumber': 'pepino',
+    'egg': 'huevo',
+    'eggplant': 'berenjena',
+    'fish': 'pescado',
+    'garlic': 'ajo',
+    'grape': 'uva',
+    'ham': 'jamón',
+    'lemon': 'limón',
+    'lettuce': 'lechuga',
+    'milk': 'leche',
+    'mushroom': 'champiñón',
+    'onion': 'cebolla',
+    'orange': 'naranja',
+    'pasta': 'pasta',
+    'pepper': 'pimiento',
+    'pork': 'cerdo',
+    'potato': 'papa',
+    'rice': 'arroz',
+    'salmon': 'salmón',
+    'sausage': 'salchicha',
+    'shrimp': 'camarón',
+    'spinach': 'espinaca',
+    'strawberry': 'fresa',
+    'tomato': 'tomate',
+    'tuna': 'atún',
+    'yogurt': 'yogur',
+    'zucchini': 'calabacín'
+}
+
+# Clases que no corresponden a ningún ingrediente
+ETIQUETAS_IGNORADAS = {'background', '__background__', 'other', 'no_food', 'not_food'}
+
+# Modelos cargados en este proceso: (modelo, configuración) -> (red, lock de inferencia)
+_modelos: Dict[Tuple[str, str], Tuple[cv2.dnn.Net, threading.Lock]] = {}
+_lock_modelos = threading.Lock()
+
+def cargar_modelo(ruta_modelo: str, ruta_config: str = '') -> Tuple[cv2.dnn.Net, threading.Lock]:
+    """
+    Obtiene el modelo cargado en este proceso, leyéndolo solo la primera vez.
+
+    Las redes de OpenCV no admiten inferencias concurrentes, por lo que cada
+    modelo se comparte junto con el lock que serializa sus forward.
+
+    Args:
+        ruta_modelo: Archivo del modelo (.onnx, .weights, .caffemodel, .pb...)
+        ruta_config: Archivo de configuración para los formatos que lo requieren
+
+    Returns:
+        Tupla (red, lock)
+    """
+    clave = (ruta_modelo, ruta_config)
+    with _lock_modelos:
+        cargado = _modelos.get(clave)
+        if cargado is None:
+            inicio = time.perf_counter()
+            red = cv2.dnn.readNet(ruta_modelo, ruta_config)
+            red.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            red.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            cargado = _modelos[clave] = (red, threading.Lock())
+            logger.info(f"Modelo local {ruta_modelo} cargado en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        return cargado
+
+def cargar_etiquetas(ruta: str) -> List[Optional[str]]:
+    """
+    Lee las etiquetas del modelo y las traduce a nombres de ingredientes.
+
+    Una etiqueta por línea, en el orden de las clases del modelo. Cada línea
+    puede indicar el ingrediente explícitamente ("tomato;tomate"); si no, se
+    traduce con ETIQUETAS_INGREDIENTES o se usa la propia etiqueta.
+
+    Returns:
+        Nombre de ingrediente de cada clase (None para las clases ignoradas)
+    """
+    nombres = []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            etiqueta, _, nombre = linea.strip().partition(';')
+            etiqueta = etiqueta.strip().lower().replace('_', ' ')
+            if not etiqueta or etiqueta.replace(' ', '_') in ETIQUETAS_IGNORADAS:
+                nombres.append(None)
+            else:
+                nombres.append(nombre.strip() or ETIQUETAS_INGREDIENTES.get(etiqueta, etiqueta))
+    return nombres
+
+class LocalDetector(DetectorIngredientes):
+    """Detector de ingredientes con un modelo local en CPU (OpenCV DNN)."""
+
+    nombre = 'local'
+    por_lotes = True
+
+    def __init__(
+        self,
+        ruta_modelo: Optional[str] = None,
+        ruta_etiquetas: Optional[str] = None,
+        ruta_config: Optional[str] = None,
+        tamano_entrada: Optional[int] = None,
+        normalizacion: Optional[str] = None,
+        activacion: Optional[str] = None,
+        tamano_lote: Optional[int] = None,
+        confianza_minima: Optional[float] = None,
+        max_ingredientes: Optional[int] = None,
+        categorizar: Optional[Callable[[str], str]] = None
+    ):
+        """
+        Inicializa el detector (los valores por defecto vienen de settings).
+
+        El modelo no se carga hasta la primera detección.
+
+        Args:
+            ruta_modelo: Archivo del modelo
+            ruta_etiquetas: Archivo de etiquetas (ver cargar_etiquetas)
+            ruta_config: Configuración del modelo (Darknet, Caffe...), si la necesita
+            tamano_entrada: Lado de la imagen cuadrada de entrada
+            normalizacion: 'imagenet' o 'unitaria' (solo escala a 0-1)
+            activacion: Función aplicada a la salida de un clasificador
+                ('softmax', 'sigmoid' para multietiqueta o 'ninguna')
+            tamano_lote: Imágenes por inferencia
+            confianza_minima: Confianza mínima de una clase para reportarla
+            max_ingredientes: Ingredientes reportados como máximo por imagen
+            categorizar: Función que asigna la categoría a un nombre de ingrediente
+        """
+        self.ruta_modelo = settings.LOCAL_MODEL_PATH if ruta_modelo is None else ruta_modelo
+        self.ruta_etiquetas = settings.LOCAL_MODEL_LABELS if ruta_etiquetas is None else ruta_etiquetas
+        self.ruta_config = settings.LOCAL_MODEL_CONFIG if ruta_config is None else ruta_config
+        self.tamano_entrada = tamano_entrada or settings.LOCAL_MODEL_INPUT_SIZE
+        self.normalizacion = normalizacion or settings.LOCAL_MODEL_NORMALIZATION
+        self.activacion = activacion or settings.LOCAL_MODEL_ACTIVATION
+        self.tamano_lote = tamano_lote or settings.LOCAL_MODEL_BATCH_SIZE
+        self.confianza_minima = settings.LOCAL_MIN_CONFIDENCE if confianza_minima is None else confianza_minima
+        self.max_ingredientes = max_ingredientes or settings.LOCAL_MAX_INGREDIENTS
+        self.categorizar = categorizar
+
+        if self.normalizacion not in NORMALIZACIONES:
+            raise ValueError(f"Normalización no soportada: {self.normalizacion}")
+        if self.activacion not in ACTIVACIONES:
+            raise ValueError(f"Activación no soportada: {self.activacion}")
+
+        media, desviacion = NORMALIZACIONES[self.normalizacion]
+        self._media = tuple(m * 255 for m in media)
+        self._desviacion = np.array(desviacion, dtype=np.float32).reshape(1, 3, 1, 1)
+        self._etiquetas: Optional[List[Optional[str]]] = None
+        self._lock = threading.Lock()
+        self._estadisticas = {'imagenes': 0, 'lotes': 0, 'tiempo_inferencia_ms': 0.0}
+
+    def disponible(self) -> bool:
+        """Indica si el modelo y sus etiquetas están presentes en disco."""
+        return bool(self.ruta_modelo and self.ruta_etiquetas) and \
+            Path(self.ruta_modelo).is_file() and Path(self.ruta_etiquetas).is_file()
+
+    def detectar(self, image_path: str) -> ListaIngredientes:
+        """Detecta los ingredientes de una imagen."""
+        return self.detectar_lote([image_path])[0]
+
+    def detectar_lote(self, image_paths: List[str]) -> List[ListaIngredientes]:
+        """
+        Detecta los ingredientes de varias imágenes con inferencias por lotes.
+
+        Args:
+            image_paths: Rutas de las imágenes
+
+        Returns:
+            Lista de ingredientes detectados de cada imagen, en el mismo orden
+        """
+        if not self.disponible():
+            return [ListaIngredientes(error="Modelo local no disponible") for _ in image_paths]
+
+        try:
+            etiquetas = self._obtener_etiquetas()
+            red, lock_red = cargar_modelo(self.ruta_modelo, self.ruta_config)
+        except Exception as e:
+            logger.error(f"Error al cargar el modelo local: {e}")
+            return [ListaIngredientes(error=f"Error al cargar el modelo local: {str(e)}") for _ in image_paths]
+
+        resultados: List[Optional[ListaIngredientes]] = [None] * len(image_paths)
+        imagenes = []
+        for indice, image_path in enumerate(image_paths):
+            imagen = leer_reducida(image_path, self.tamano_entrada)
+            if imagen is None:
+                resultados[indice] = ListaIngredientes(error="No se pudo leer la imagen")
+            else:
+                imagenes.append((indice, imagen))
+
+        for inicio in range(0, len(imagenes), self.tamano_lote):
+            lote = imagenes[inicio:inicio + self.tamano_lote]
+            try:
+                puntuaciones = self._inferir(red, lock_red, [imagen for _, imagen in lote])
+            except Exception as e:
+                logger.error(f"Error en detección local: {e}")
+                for indice, _ in lote:
+                    resultados[indice] = ListaIngredientes(error=f"Error en detección local: {str(e)}")
+                continue
+            for (indice, _), fila in zip(lote, puntuaciones):
+                resultados[indice] = self._crear_lista(fila, etiquetas)
+
+        return resultados
+
+    def obtener_estadisticas(self) -> Dict[str, float]:
+        """Obtiene imágenes procesadas, lotes y tiempo medio de inferencia por imagen."""
+        with self._lock:
+            estadisticas = dict(self._estadisticas)
+        tiempo_total = estadisticas.pop('tiempo_inferencia_ms')
+        estadisticas['tiempo_medio_ms'] = tiempo_total / estadisticas['imagenes'] if estadisticas['imagenes'] else 0.0
+        return estadisticas
+
+    def _obtener_etiquetas(self) -> List[Optional[str]]:
+        """Lee las etiquetas la primera vez que se necesitan."""
+        if self._etiquetas is None:
+            self._etiquetas = cargar_etiquetas(self.ruta_etiquetas)
+        return self._etiquetas
+
+    def _inferir(self, red: cv2.dnn.Net, lock_red: threading.Lock, imagenes: List[np.ndarray]) -> np.ndarray:
+        """
+        Ejecuta una inferencia sobre un lote de imágenes BGR.
+
+        Returns:
+            Matriz (imágenes, clases) de puntuaciones en [0, 1]
+        """
+        lado = self.tamano_entrada
+        blob = cv2.dnn.blobFromImages(imagenes, 1 / 255, (lado, lado), self._media, swapRB=True, crop=False)
+        blob /= self._desviacion
+
+        inicio = time.perf_counter()
+        with lock_red:
+            red.setInput(blob)
+            salida = red.forward()
+        tiempo_ms = (time.perf_counter() - inicio) * 1000
+
+        with self._lock:
+            self._estadisticas['imagenes'] += len(imagenes)
+            self._estadisticas['lotes'] += 1
+            self._estadisticas['tiempo_inferencia_ms'] += tiempo_ms
+
+        if salida.ndim == 3:
+            # Detector tipo YOLO: (lote, 4 + clases, anclas); nos quedamos con la
+            # mejor puntuación de cada clase en toda la imagen
+            return salida[:, 4:, :].max(axis=2)
+
+        puntuaciones = salida.reshape(len(imagenes), -1)
+        if self.activacion == 'softmax':
+            exponenciales = np.exp(puntuaciones - puntuaciones.max(axis=1, keepdims=True))
+            return exponenciales / exponenciales.sum(axis=1, keepdims=True)
+        if self.activacion == 'sigmoid':
+            return 1 / (1 + np.exp(-puntuaciones))
+        return puntuaciones
+
+    def _crear_lista(self, puntuaciones: np.ndarray, etiquetas: List[Optional[str]]) -> ListaIngredientes:
+        """
+        Convierte las puntuaciones de una imagen en su lista de ingredientes.
+
+        Las clases que corresponden al mismo ingrediente (mismo nombre canónico,
+        p. ej. "Tomate" y "tomates") se cuentan una vez, con la mejor puntuación.
+        """
+        ingredientes = {}
+        for clase in np.argsort(puntuaciones)[::-1]:
+            confianza = float(puntuaciones[clase])
+            if confianza < self.confianza_minima or len(ingredientes) >= self.max_ingredientes:
+                break
+            nombre = etiquetas[clase] if clase < len(etiquetas) else None
+            clave = IngredientNormalizer.canonico(nombre) if nombre is not None else None
+            if clave is None or clave in ingredientes:
+                continue
+            ingrediente = Ingrediente(
+                nombre=nombre,
+                confianza=min(confianza, 1.0),
+                detectado=True,
+                categoria=self.categorizar(nombre) if self.categorizar else None
+            )
+            ingredientes[clave] = ingrediente
+        return ListaIngredientes(ingredientes=list(ingredientes.values()))
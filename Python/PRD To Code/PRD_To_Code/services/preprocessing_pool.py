@@ -0,0 +1,206 @@
+"""
+Preprocesamiento de imágenes en paralelo con un pool de procesos.
+Cada proceso decodifica, preprocesa (CLAHE, conversión de color y
+redimensionado) y codifica sus imágenes en disco, de modo que solo viajan
+rutas entre procesos. Es el camino de `main.py --preprocess-only`.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from utils.image_io import leer_cabecera, leer_imagen, leer_reducida
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Resolución máxima de una imagen preprocesada (ancho, alto)
+RESOLUCION_PREPROCESADA = (1920, 1080)
+
+def tamano_preprocesado(ancho: int, alto: int) -> Tuple[int, int]:
+    """Obtiene el (ancho, alto) de una imagen tras preprocess_image."""
+    ancho_max, alto_max = RESOLUCION_PREPROCESADA
+    if ancho > ancho_max or alto > alto_max:
+        escala = min(ancho_max / ancho, alto_max / alto)
+        return int(ancho * escala), int(alto * escala)
+    return ancho, alto
+
+def preprocesar_imagen(image: np.ndarray) -> np.ndarray:
+    """
+    Preprocesa una imagen para mejorar el reconocimiento.
+
+    Args:
+        image: Imagen BGR decodificada
+
+    Returns:
+        Imagen RGB con el contraste ecualizado y como máximo RESOLUCION_PREPROCESADA
+    """
+    # Convertir a RGB
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    # Ajustar contraste y brillo
+    lab = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2LAB)
+    l, a, b = cv2.split(lab)
+
+    # Aplicar CLAHE (Contrast Limited Adaptive Histogram Equalization)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    l = clahe.apply(l)
+
+    # Reconstruir imagen
+    lab = cv2.merge([l, a, b])
+    processed_image = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
+
+    # Redimensionar si es muy grande
+    height, width = processed_image.shape[:2]
+    new_width, new_height = tamano_preprocesado(width, height)
+    if (new_width, new_height) != (width, height):
+        processed_image = cv2.resize(processed_image, (new_width, new_height))
+
+    return processed_image
+
+def leer_para_preprocesar(image_path: str) -> Optional[np.ndarray]:
+    """
+    Lee una imagen para preprocesar_imagen.
+
+    Los JPEG se decodifican ya reducidos siempre que sigan cubriendo la
+    resolución preprocesada, así que el redimensionado final parte de una
+    imagen varias veces menor.
+
+    Returns:
+        Imagen BGR, o None si no se puede leer
+    """
+    cabecera = leer_cabecera(image_path)
+    if cabecera is None:
+        return leer_imagen(image_path)
+    ancho, alto = tamano_preprocesado(cabecera.ancho, cabecera.alto)
+    return leer_reducida(image_path, max(ancho, alto), min(ancho, alto))
+
+def _inicializar_worker() -> None:
+    """Evita que OpenCV abra sus propios hilos en cada proceso del pool."""
+    cv2.setNumThreads(1)
+
+def _preprocesar_a_archivo(image_path: str, ruta_salida: str, calidad: int) -> Optional[str]:
+    """Preprocesa una imagen y la guarda como JPEG (None si falla)."""
+    imagen = leer_para_preprocesar(image_path)
+    if imagen is None:
+        return None
+    resultado = cv2.cvtColor(preprocesar_imagen(imagen), cv2.COLOR_RGB2BGR)
+    if not cv2.imwrite(ruta_salida, resultado, [cv2.IMWRITE_JPEG_QUALITY, calidad]):
+        return None
+    return ruta_salida
+
+def nucleos_disponibles() -> int:
+    """Núcleos de CPU que puede usar este proceso."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+class PreprocessingPool:
+    """Pool de procesos de preprocesamiento de imágenes."""
+
+    def __init__(self, procesos: Optional[int] = None, lote_minimo: Optional[int] = None):
+        """
+        Inicializa el pool (los procesos se arrancan en el primer lote grande).
+
+        Args:
+            procesos: Procesos del pool; 0 o None usa settings.PREPROCESS_WORKERS
+                y, si también es 0, todos los núcleos disponibles
+            lote_minimo: Imágenes a partir de las cuales compensa usar el pool
+                (por defecto settings.PREPROCESS_MIN_BATCH)
+        """
+        self.procesos = procesos or settings.PREPROCESS_WORKERS or nucleos_disponibles()
+        self.lote_minimo = lote_minimo or settings.PREPROCESS_MIN_BATCH
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._estadisticas = {'imagenes': 0, 'lotes_paralelos': 0, 'segundos': 0.0}
+
+    def __enter__(self) -> 'PreprocessingPool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.cerrar()
+
+    def usa_procesos(self, num_imagenes: int) -> bool:
+        """Indica si un lote de ese tamaño se repartiría entre procesos."""
+        return self.procesos > 1 and num_imagenes >= self.lote_minimo
+
+    def preprocesar_a_disco(self, image_paths: List[str], directorio: str, calidad: int = 90) -> List[Optional[str]]:
+        """
+        Preprocesa un lote de imágenes y las guarda como JPEG.
+
+        La codificación también se hace en los procesos del pool.
+
+        Args:
+            image_paths: Rutas de las imágenes
+            directorio: Directorio de salida
+            calidad: Calidad JPEG
+
+        Returns:
+            Ruta de cada imagen guardada (None si falló)
+        """
+        inicio = time.perf_counter()
+        Path(directorio).mkdir(parents=True, exist_ok=True)
+        argumentos = [
+            (image_path, str(Path(directorio) / f"{indice:04d}_{Path(image_path).stem}.jpg"), calidad)
+            for indice, image_path in enumerate(image_paths)
+        ]
+        paralelo = self.usa_procesos(len(image_paths))
+        rutas = self._ejecutar(_preprocesar_a_archivo, argumentos, paralelo)
+        self._registrar(len(image_paths), paralelo, time.perf_counter() - inicio)
+        return rutas
+
+    def cerrar(self) -> None:
+        """Detiene los procesos del pool."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def obtener_estadisticas(self) -> Dict[str, float]:
+        """Obtiene procesos, imágenes preprocesadas y rendimiento en imágenes por segundo."""
+        with self._lock:
+            estadisticas = dict(self._estadisticas)
+        segundos = estadisticas['segundos']
+        return {
+            'procesos': self.procesos,
+            **estadisticas,
+            'imagenes_por_segundo': estadisticas['imagenes'] / segundos if segundos else 0.0
+        }
+
+    def _ejecutar(self, funcion, argumentos: List[tuple], paralelo: bool) -> list:
+        """Ejecuta la función sobre cada tupla de argumentos, en el pool o en este proceso."""
+        if not paralelo:
+            return [funcion(*args) for args in argumentos]
+        executor = self._obtener_executor()
+        bloque = max(1, len(argumentos) // (self.procesos * 4))
+        return list(executor.map(funcion, *zip(*argumentos), chunksize=bloque))
+
+    def _obtener_executor(self) -> ProcessPoolExecutor:
+        """Arranca el pool la primera vez que se necesita."""
+        with self._lock:
+            if self._executor is None:
+                # 'spawn' evita heredar hilos y locks del proceso principal
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.procesos,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_inicializar_worker
+                )
+                logger.info(f"Pool de preprocesamiento con {self.procesos} procesos")
+            return self._executor
+
+    def _registrar(self, imagenes: int, paralelo: bool, segundos: float) -> None:
+        """Acumula las estadísticas de un lote."""
+        with self._lock:
+            self._estadisticas['imagenes'] += imagenes
+            self._estadisticas['lotes_paralelos'] += int(paralelo)
+            self._estadisticas['segundos'] += segundos
@@ -2,6 +2,7 @@
 Servicio principal de generación de recetas.
 Orquesta todo el proceso desde detección de ingredientes hasta generación de recetas.
 """
+import itertools
 import logging
 import time
 from typing import List, Optional, Dict, Any
@@ -13,6 +14,10 @@ from models.recipe import ColeccionRecetas
 from models.user_profile import PerfilUsuario
 from services.image_processor import ImageProcessor
 from services.llm_client import LLMClient
+from services.recipe_ranker import RecipeRanker, NIVELES_DIFICULTAD
+from services.generation_planner import GenerationPlanner
+from utils.ingredient_normalizer import IngredientNormalizer
+from utils.tracing import tracer
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -24,6 +29,8 @@ class RecipeGenerator:
         """Inicializa el generador de recetas."""
         self.image_processor = ImageProcessor()
         self.llm_client = LLMClient()
+        self.recipe_ranker = RecipeRanker()
+        self.generation_planner = GenerationPlanner(self.llm_client.token_budget)
         logger.info("RecipeGenerator inicializado correctamente")
     
     def generate_recipes_from_images(
@@ -43,9 +50,29 @@ class RecipeGenerator:
             use_openai_vision: Si usar OpenAI Vision para detección
             
         Returns:
-            Colección de recetas generadas
+            Colección de recetas generadas (con los tiempos por etapa en
+            metadata.metricas['tiempos'] si el trazado está activo)
         """
-        start_time = time.time()
+        with tracer.traza('generar_recetas', imagenes=len(image_paths), vision='openai' if use_openai_vision else 'google') as traza:
+            recetas = self._generar_recetas(image_paths, user_profile, max_recipes, use_openai_vision)
+            traza.establecer(recetas=len(recetas.recetas))
+            if recetas.error:
+                traza.establecer(error=recetas.error)
+        
+        tiempos = traza.resumen()
+        if tiempos:
+            recetas.metadata.metricas['tiempos'] = tiempos
+        return recetas
+    
+    def _generar_recetas(
+        self,
+        image_paths: List[str],
+        user_profile: Optional[PerfilUsuario],
+        max_recipes: Optional[int],
+        use_openai_vision: bool
+    ) -> ColeccionRecetas:
+        """Genera recetas a partir de imágenes (ver generate_recipes_from_images)."""
+        start_time = time.perf_counter()
         
         try:
             # Validar entrada
@@ -68,9 +95,11 @@ class RecipeGenerator:
             logger.info(f"Iniciando generación de recetas para {len(image_paths)} imágenes")
             
             # Paso 1: Detectar ingredientes en todas las imágenes
-            ingredientes_detectados = self._detect_ingredients_from_images(
-                image_paths, use_openai_vision
-            )
+            with tracer.span('deteccion_ingredientes') as span:
+                ingredientes_detectados = self._detect_ingredients_from_images(
+                    image_paths, use_openai_vision
+                )
+                span.establecer(ingredientes=len(ingredientes_detectados.ingredientes))
             
             if ingredientes_detectados.error:
                 return self._create_error_response(ingredientes_detectados.error)
@@ -80,23 +109,42 @@ class RecipeGenerator:
             
             logger.info(f"Detectados {len(ingredientes_detectados.ingredientes)} ingredientes")
             
-            # Paso 2: Generar recetas usando LLM
-            recetas = self._generate_recipes_with_llm(
-                ingredientes_detectados, user_profile, max_recipes
-            )
+            # Paso 2: Generar recetas candidatas usando LLM
+            num_candidatas = self.generation_planner.calcular_num_candidatos(user_profile, max_recipes)
+            with tracer.span('generacion_llm', candidatas=num_candidatas):
+                recetas = self._generate_recipes_with_llm(
+                    ingredientes_detectados, user_profile, num_candidatas
+                )
             
             # Paso 3: Validar y procesar resultados
             if recetas.error:
                 return recetas
             
-            # Paso 4: Filtrar recetas según preferencias del usuario
-            recetas_filtradas = self._filter_recipes_by_user_preferences(recetas, user_profile)
-            
-            # Paso 5: Ordenar recetas
-            recetas_ordenadas = self._sort_recipes(recetas_filtradas, user_profile)
+            # Paso 4: Filtrar y ordenar recetas según preferencias del usuario
+            estadisticas = {'evaluadas': 0, 'aceptadas': 0, 'motivos': {}}
+            with tracer.span('filtrado_y_orden') as span:
+                recetas_ordenadas = self._rank_recipes(
+                    recetas, user_profile, ingredientes_detectados, max_recipes, estadisticas
+                )
+                span.establecer(evaluadas=estadisticas['evaluadas'], aceptadas=estadisticas['aceptadas'])
+            
+            # Paso 5: Completar con una petición de relleno si faltan recetas
+            if settings.ENABLE_BACKFILL and len(recetas_ordenadas.recetas) < max_recipes:
+                with tracer.span('relleno', faltan=max_recipes - len(recetas_ordenadas.recetas)):
+                    recetas_ordenadas = self._backfill_recipes(
+                        recetas_ordenadas, recetas, ingredientes_detectados,
+                        user_profile, max_recipes, estadisticas
+                    )
+            
+            self.generation_planner.registrar_resultado(
+                user_profile, estadisticas['evaluadas'], estadisticas['aceptadas']
+            )
+            recetas_ordenadas.metadata.metricas['filtrado'] = self._build_filter_metrics(
+                estadisticas, num_candidatas
+            )
             
             # Calcular tiempo total
-            total_time = time.time() - start_time
+            total_time = time.perf_counter() - start_time
             logger.info(f"Generación completada en {total_time:.2f} segundos")
             
             # Actualizar metadata con tiempo de generación
@@ -129,13 +177,12 @@ class RecipeGenerator:
                 image_paths, use_openai_vision
             )
             
-            # Combinar resultados
-            combined_ingredients = self.image_processor.merge_ingredient_lists(results)
-            
-            # Filtrar por confianza mínima
-            filtered_ingredients = combined_ingredients.obtener_por_confianza(
-                settings.MIN_CONFIDENCE_THRESHOLD
-            )
+            # Combinar resultados y filtrar por confianza mínima
+            with tracer.span('fusion', imagenes=len(results)):
+                combined_ingredients = self.image_processor.merge_ingredient_lists(results)
+                filtered_ingredients = combined_ingredients.obtener_por_confianza(
+                    settings.MIN_CONFIDENCE_THRESHOLD
+                )
             
             return ListaIngredientes(ingredientes=filtered_ingredients)
             
@@ -147,7 +194,7 @@ class RecipeGenerator:
         self,
         ingredientes_detectados: ListaIngredientes,
         user_profile: PerfilUsuario,
-        max_recipes: int
+        num_recetas: int
     ) -> ColeccionRecetas:
         """
         Genera recetas usando el LLM.
@@ -155,7 +202,7 @@ class RecipeGenerator:
         Args:
             ingredientes_detectados: Lista de ingredientes detectados
             user_profile: Perfil del usuario
-            max_recipes: Número máximo de recetas
+            num_recetas: Número de recetas candidatas a pedir
             
         Returns:
             Colección de recetas generadas
@@ -174,166 +221,175 @@ class RecipeGenerator:
                 restricciones_dieteticas=restricciones_dieteticas,
                 tiempo_disponible=user_profile.tiempo_disponible,
                 nivel_experiencia=user_profile.nivel_culinario.value,
-                num_personas=user_profile.num_personas
+                num_personas=user_profile.num_personas,
+                num_recetas=num_recetas,
+                restricciones_duras=user_profile.obtener_restricciones_duras(),
+                preferencias_usuario=user_profile.obtener_preferencias_texto()
             )
             
-            # Limitar número de recetas si es necesario
-            if len(recetas.recetas) > max_recipes:
-                recetas.recetas = recetas.recetas[:max_recipes]
-                recetas.metadata.total_recetas = len(recetas.recetas)
-            
             return recetas
             
         except Exception as e:
             logger.error(f"Error en generación con LLM: {e}")
             return self._create_error_response(f"Error en generación: {str(e)}")
     
-    def _filter_recipes_by_user_preferences(
+    def _rank_recipes(
         self,
         recetas: ColeccionRecetas,
-        user_profile: PerfilUsuario
+        user_profile: PerfilUsuario,
+        ingredientes_detectados: ListaIngredientes,
+        max_recipes: int,
+        estadisticas: Optional[Dict[str, Any]] = None,
+        recetas_aceptadas: Optional[List['Receta']] = None
     ) -> ColeccionRecetas:
         """
-        Filtra recetas según las preferencias del usuario.
+        Filtra y ordena las recetas según las preferencias del usuario.
+        
+        El filtrado y la selección de las mejores recetas se hacen en una sola
+        pasada con RecipeRanker, sin colecciones intermedias.
         
         Args:
-            recetas: Colección de recetas
+            recetas: Colección de recetas candidatas
             user_profile: Perfil del usuario
+            ingredientes_detectados: Ingredientes detectados en las imágenes
+            max_recipes: Número máximo de recetas a devolver
+            estadisticas: Contadores 'evaluadas', 'aceptadas' y 'motivos' a actualizar (opcional)
+            recetas_aceptadas: Recetas ya filtradas que compiten sin volver a filtrarse
             
         Returns:
-            Colección filtrada de recetas
+            Colección con las mejores recetas, de mayor a menor puntuación
         """
         try:
-            filtered_recipes = []
-            
-            for receta in recetas.recetas:
-                # Verificar restricciones dietéticas
-                if not self._recipe_matches_dietary_restrictions(receta, user_profile):
-                    continue
-                
-                # Verificar alérgenos
-                if self._recipe_contains_allergens(receta, user_profile):
-                    continue
-                
-                # Verificar tiempo disponible
-                if receta.tiempo_total_min > user_profile.tiempo_disponible:
-                    continue
-                
-                # Verificar nivel de dificultad
-                if not self._recipe_matches_skill_level(receta, user_profile):
-                    continue
-                
-                filtered_recipes.append(receta)
-            
-            # Crear nueva colección con recetas filtradas
-            filtered_collection = ColeccionRecetas(
-                metadata=recetas.metadata,
-                recetas=filtered_recipes
+            previas = recetas_aceptadas or []
+            ids_previas = {id(receta) for receta in previas}
+            restricciones = user_profile.obtener_restricciones_duras()
+            
+            def filtro(receta: 'Receta') -> bool:
+                if id(receta) in ids_previas:
+                    return True
+                motivo = self._recipe_rejection_reason(receta, restricciones)
+                if estadisticas is not None:
+                    estadisticas['evaluadas'] += 1
+                    if motivo is None:
+                        estadisticas['aceptadas'] += 1
+                    else:
+                        motivos = estadisticas.setdefault('motivos', {})
+                        motivos[motivo] = motivos.get(motivo, 0) + 1
+                return motivo is None
+            
+            contexto = self.recipe_ranker.crear_contexto(
+                user_profile, ingredientes_detectados, recetas.metadata.temporada
+            )
+            seleccionadas = self.recipe_ranker.seleccionar_mejores(
+                itertools.chain(previas, recetas.recetas),
+                max_recipes,
+                contexto,
+                filtro=filtro
             )
             
-            logger.info(f"Filtradas {len(filtered_recipes)} recetas de {len(recetas.recetas)}")
-            return filtered_collection
+            logger.info(f"Seleccionadas {len(seleccionadas)} recetas de {len(previas) + len(recetas.recetas)}")
+            return ColeccionRecetas(metadata=recetas.metadata, recetas=seleccionadas)
             
         except Exception as e:
-            logger.error(f"Error al filtrar recetas: {e}")
-            return recetas  # Retornar recetas sin filtrar en caso de error
+            logger.error(f"Error al ordenar recetas: {e}")
+            return recetas  # Retornar recetas sin ordenar en caso de error
     
-    def _sort_recipes(
+    def _backfill_recipes(
         self,
-        recetas: ColeccionRecetas,
-        user_profile: PerfilUsuario
+        recetas_ordenadas: ColeccionRecetas,
+        recetas_generadas: ColeccionRecetas,
+        ingredientes_detectados: ListaIngredientes,
+        user_profile: PerfilUsuario,
+        max_recipes: int,
+        estadisticas: Dict[str, Any]
     ) -> ColeccionRecetas:
         """
-        Ordena las recetas según las preferencias del usuario.
+        Pide al LLM solo las recetas que faltan tras el filtrado.
         
         Args:
-            recetas: Colección de recetas
+            recetas_ordenadas: Recetas que ya superaron el filtrado
+            recetas_generadas: Todas las recetas generadas (para no repetirlas)
+            ingredientes_detectados: Ingredientes detectados en las imágenes
             user_profile: Perfil del usuario
+            max_recipes: Número máximo de recetas a devolver
+            estadisticas: Contadores 'evaluadas', 'aceptadas' y 'motivos' a actualizar
             
         Returns:
-            Colección ordenada de recetas
+            Colección completada, o la original si el relleno falla
         """
-        try:
-            # Ordenar por dificultad primero (más fácil primero)
-            recetas_ordenadas = recetas.ordenar_por_dificultad()
-            
-            # Si el usuario prefiere recetas rápidas, priorizar por tiempo
-            if user_profile.tiempo_disponible <= 30:
-                recetas_ordenadas = recetas.ordenar_por_tiempo()
-            
-            # Crear nueva colección con recetas ordenadas
-            sorted_collection = ColeccionRecetas(
-                metadata=recetas.metadata,
-                recetas=recetas_ordenadas
-            )
-            
-            return sorted_collection
-            
-        except Exception as e:
-            logger.error(f"Error al ordenar recetas: {e}")
-            return recetas  # Retornar recetas sin ordenar en caso de error
-    
-    def _recipe_matches_dietary_restrictions(
-        self,
-        receta: 'Receta',
-        user_profile: PerfilUsuario
-    ) -> bool:
-        """Verifica si una receta cumple con las restricciones dietéticas."""
-        # Verificar vegetarianismo
-        if user_profile.es_vegetariano() and not receta.es_vegetariana():
-            return False
-        
-        # Verificar veganismo
-        if user_profile.es_vegano() and not receta.es_vegana():
-            return False
-        
-        # Verificar restricción de gluten
-        if user_profile.tiene_restriccion_gluten():
-            ingredientes_gluten = ['trigo', 'cebada', 'centeno', 'avena', 'harina', 'pan', 'pasta']
-            for ingrediente in receta.ingredientes:
-                if any(gluten in ingrediente.nombre.lower() for gluten in ingredientes_gluten):
-                    return False
-        
-        # Verificar restricción de lactosa
-        if user_profile.tiene_restriccion_lactosa():
-            ingredientes_lactosa = ['leche', 'queso', 'mantequilla', 'crema', 'yogur']
-            for ingrediente in receta.ingredientes:
-                if any(lactosa in ingrediente.nombre.lower() for lactosa in ingredientes_lactosa):
-                    return False
-        
-        return True
-    
-    def _recipe_contains_allergens(
-        self,
-        receta: 'Receta',
-        user_profile: PerfilUsuario
-    ) -> bool:
-        """Verifica si una receta contiene alérgenos del usuario."""
-        for alergeno in user_profile.alergenos:
-            for ingrediente in receta.ingredientes:
-                if alergeno.value in ingrediente.nombre.lower():
-                    return True
-        return False
+        faltantes = max_recipes - len(recetas_ordenadas.recetas)
+        num_recetas = self.generation_planner.calcular_num_relleno(user_profile, faltantes)
+        logger.info(f"Faltan {faltantes} recetas tras el filtrado; solicitando {num_recetas} adicionales")
+        
+        adicionales = self.llm_client.generate_backfill_recipes(
+            ingredientes_detectados=ingredientes_detectados,
+            recetas_existentes=[receta.nombre for receta in recetas_generadas.recetas],
+            restricciones_dieteticas=[r.value for r in user_profile.restricciones_dieteticas],
+            tiempo_disponible=user_profile.tiempo_disponible,
+            nivel_experiencia=user_profile.nivel_culinario.value,
+            num_personas=user_profile.num_personas,
+            num_recetas=num_recetas,
+            restricciones_duras=user_profile.obtener_restricciones_duras(),
+            preferencias_usuario=user_profile.obtener_preferencias_texto()
+        )
+        
+        if adicionales.error:
+            logger.warning(f"No se pudo completar la sesión con recetas adicionales: {adicionales.error}")
+            return recetas_ordenadas
+        
+        completadas = self._rank_recipes(
+            adicionales, user_profile, ingredientes_detectados, max_recipes,
+            estadisticas, recetas_aceptadas=recetas_ordenadas.recetas
+        )
+        
+        # Renumerar para evitar IDs repetidos entre ambas generaciones
+        for recipe_id, receta in enumerate(completadas.recetas, 1):
+            receta.id = recipe_id
+        
+        return ColeccionRecetas(metadata=recetas_ordenadas.metadata, recetas=completadas.recetas)
     
-    def _recipe_matches_skill_level(
+    def _recipe_rejection_reason(
         self,
         receta: 'Receta',
-        user_profile: PerfilUsuario
-    ) -> bool:
-        """Verifica si una receta coincide con el nivel de habilidad del usuario."""
-        # Mapeo de niveles de dificultad
-        difficulty_mapping = {
-            'principiante': 1,
-            'intermedio': 2,
-            'avanzado': 3,
-            'experto': 4
-        }
+        restricciones: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Obtiene el motivo por el que una receta incumple los filtros obligatorios.
+        
+        Args:
+            receta: Receta a verificar
+            restricciones: Filtros obtenidos con PerfilUsuario.obtener_restricciones_duras
+            
+        Returns:
+            Motivo del rechazo, o None si la receta es válida
+        """
+        nombres = [ingrediente.nombre for ingrediente in receta.ingredientes]
+        contiene = IngredientNormalizer.contiene_texto
         
-        user_level = difficulty_mapping.get(user_profile.nivel_culinario.value, 2)
-        recipe_level = difficulty_mapping.get(receta.nivel_dificultad.value, 2)
+        # Verificar restricciones dietéticas
+        prohibidos = restricciones['ingredientes_prohibidos']
+        if any(contiene(nombre, prohibido) for nombre in nombres for prohibido in prohibidos):
+            return 'restriccion_dietetica'
         
-        # Permitir recetas hasta un nivel más avanzado que el usuario
-        return recipe_level <= user_level + 1
+        # Verificar alérgenos
+        if any(contiene(nombre, alergeno) for nombre in nombres for alergeno in restricciones['alergenos']):
+            return 'alergenos'
+        
+        # Verificar ingredientes evitados
+        evitados = restricciones['ingredientes_evitados']
+        if any(contiene(nombre, evitado) for nombre in nombres for evitado in evitados):
+            return 'ingredientes_evitados'
+        
+        # Verificar tiempo disponible
+        if receta.tiempo_total_min > restricciones['tiempo_maximo']:
+            return 'tiempo'
+        
+        # Verificar nivel de dificultad (se permite un nivel por encima del usuario)
+        recipe_level = NIVELES_DIFICULTAD.get(receta.nivel_dificultad.value, 2)
+        if recipe_level > NIVELES_DIFICULTAD[restricciones['nivel_maximo']]:
+            return 'dificultad'
+        
+        return None
     
     def generate_quick_recipes(
         self,
@@ -407,6 +463,23 @@ class RecipeGenerator:
             logger.error(f"Error al generar recetas saludables: {e}")
             return {"error": str(e)}
     
+    def _build_filter_metrics(self, estadisticas: Dict[str, Any], num_candidatas: int) -> Dict[str, Any]:
+        """Resume las estadísticas del filtrado posterior a la generación."""
+        evaluadas = estadisticas['evaluadas']
+        tasa_rechazo = 1.0 - estadisticas['aceptadas'] / evaluadas if evaluadas else 0.0
+        logger.info(
+            f"Tasa de rechazo tras el filtrado: {tasa_rechazo:.1%} "
+            f"({evaluadas - estadisticas['aceptadas']} de {evaluadas}) {estadisticas['motivos']}"
+        )
+        
+        return {
+            'candidatas_solicitadas': num_candidatas,
+            'evaluadas': evaluadas,
+            'aceptadas': estadisticas['aceptadas'],
+            'tasa_rechazo': round(tasa_rechazo, 4),
+            'motivos': dict(estadisticas['motivos'])
+        }
+    
     def _create_error_response(self, error_message: str) -> ColeccionRecetas:
         """Crea una respuesta de error."""
         from models.recipe import MetadataRecetas
@@ -0,0 +1,162 @@
+"""
+Etapa de ranking de recetas.
+Puntúa cada receta candidata con una función multi-criterio configurable y
+selecciona las mejores en una sola pasada usando un heap de tamaño fijo.
+"""
+import heapq
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import settings
+from models.ingredient import ListaIngredientes
+from models.recipe import Receta
+from models.user_profile import PerfilUsuario
+from utils.ingredient_normalizer import IngredientNormalizer
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Orden numérico de los niveles de dificultad
+NIVELES_DIFICULTAD = {
+    'principiante': 1,
+    'intermedio': 2,
+    'avanzado': 3,
+    'experto': 4
+}
+
+class RecipeRanker:
+    """Selecciona las mejores recetas según una puntuación multi-criterio."""
+
+    def __init__(self, pesos: Optional[Dict[str, float]] = None):
+        """
+        Inicializa el ranker.
+
+        Args:
+            pesos: Peso de cada criterio (dificultad, tiempo, cobertura, temporada).
+                   Los criterios ausentes usan el valor de settings.RANKING_WEIGHTS.
+        """
+        self.pesos = dict(settings.RANKING_WEIGHTS)
+        if pesos:
+            self.pesos.update(pesos)
+
+    def crear_contexto(
+        self,
+        user_profile: PerfilUsuario,
+        ingredientes_detectados: Optional[ListaIngredientes] = None,
+        temporada: Optional[str] = None
+    ) -> Dict[str, object]:
+        """
+        Precalcula los datos del usuario que se usan al puntuar cada receta.
+
+        Args:
+            user_profile: Perfil del usuario
+            ingredientes_detectados: Ingredientes detectados en las imágenes
+            temporada: Temporada actual (por defecto la de settings)
+
+        Returns:
+            Contexto reutilizable para todas las recetas de la sesión
+        """
+        temporada = (temporada or settings.get_temporada_actual()).lower()
+        nombres_detectados = set()
+        nombres_temporada = set()
+        if ingredientes_detectados:
+            for ingrediente in ingredientes_detectados.ingredientes:
+                nombre = IngredientNormalizer.canonico(ingrediente.nombre)
+                nombres_detectados.add(nombre)
+                if ingrediente.temporada and ingrediente.temporada.lower() == temporada:
+                    nombres_temporada.add(nombre)
+
+        return {
+            'nivel_usuario': NIVELES_DIFICULTAD.get(user_profile.nivel_culinario.value, 2),
+            'tiempo_disponible': max(user_profile.tiempo_disponible, 1),
+            'detectados': nombres_detectados,
+            'de_temporada': nombres_temporada,
+            'temporada': temporada
+        }
+
+    def puntuar(self, receta: Receta, contexto: Dict[str, object]) -> float:
+        """
+        Calcula la puntuación de una receta (mayor es mejor).
+
+        Args:
+            receta: Receta a puntuar
+            contexto: Contexto creado con crear_contexto
+
+        Returns:
+            Puntuación ponderada de la receta
+        """
+        puntuacion = 0.0
+
+        # Ajuste de dificultad: 1.0 cuando coincide con el nivel del usuario
+        peso = self.pesos.get('dificultad', 0.0)
+        if peso:
+            nivel_receta = NIVELES_DIFICULTAD.get(receta.nivel_dificultad.value, 2)
+            distancia = abs(nivel_receta - contexto['nivel_usuario'])
+            puntuacion += peso * (1.0 - distancia / 3.0)
+
+        # Ajuste de tiempo: cuanto más holgura respecto al tiempo disponible, mejor
+        peso = self.pesos.get('tiempo', 0.0)
+        if peso:
+            proporcion = receta.tiempo_total_min / contexto['tiempo_disponible']
+            puntuacion += peso * (1.0 - min(proporcion, 1.0))
+
+        # Cobertura de ingredientes detectados y de temporada
+        peso_cobertura = self.pesos.get('cobertura', 0.0)
+        peso_temporada = self.pesos.get('temporada', 0.0)
+        if (peso_cobertura or peso_temporada) and receta.ingredientes:
+            detectados = contexto['detectados']
+            de_temporada = contexto['de_temporada']
+            cubiertos = 0
+            usa_temporada = False
+            for ingrediente in receta.ingredientes:
+                nombre = IngredientNormalizer.canonico(ingrediente.nombre)
+                if nombre in detectados or any(IngredientNormalizer.contiene(nombre, d) for d in detectados):
+                    cubiertos += 1
+                if not usa_temporada and de_temporada and any(IngredientNormalizer.contiene(nombre, t) for t in de_temporada):
+                    usa_temporada = True
+            puntuacion += peso_cobertura * cubiertos / len(receta.ingredientes)
+
+            if peso_temporada and (usa_temporada or contexto['temporada'] in (t.lower() for t in receta.tags)):
+                puntuacion += peso_temporada
+
+        return puntuacion
+
+    def seleccionar_mejores(
+        self,
+        recetas: Iterable[Receta],
+        limite: int,
+        contexto: Dict[str, object],
+        filtro: Optional[Callable[[Receta], bool]] = None
+    ) -> List[Receta]:
+        """
+        Selecciona las `limite` recetas con mayor puntuación en una sola pasada.
+
+        Mantiene un heap mínimo de tamaño `limite`, por lo que no construye
+        colecciones intermedias ni ordena todas las candidatas. Ante empates
+        conserva el orden original de las recetas.
+
+        Args:
+            recetas: Recetas candidatas (cualquier iterable, incluso un generador)
+            limite: Número máximo de recetas a devolver
+            contexto: Contexto creado con crear_contexto
+            filtro: Predicado opcional; las recetas que no lo cumplan se descartan
+
+        Returns:
+            Recetas seleccionadas, de mayor a menor puntuación
+        """
+        if limite <= 0:
+            return []
+
+        heap: List[Tuple[float, int, Receta]] = []
+        for orden, receta in enumerate(recetas):
+            if filtro is not None and not filtro(receta):
+                continue
+
+            entrada = (self.puntuar(receta, contexto), -orden, receta)
+            if len(heap) < limite:
+                heapq.heappush(heap, entrada)
+            elif entrada[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entrada)
+
+        heap.sort(key=lambda entrada: entrada[:2], reverse=True)
+        return [receta for _, _, receta in heap]
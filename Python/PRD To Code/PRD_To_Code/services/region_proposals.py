@@ -0,0 +1,281 @@
+"""
+Propuesta de regiones y mosaico para fotos grandes de neveras y despensas.
+Localiza las zonas con productos mediante saliencia de residuo espectral y
+contornos de OpenCV, recorta esas zonas a resolución completa y las compone en
+un mosaico de celdas del tamaño de tesela del modelo de visión, junto con una
+vista general de la foto. Así los productos pequeños de una foto 4K llegan
+legibles al modelo con menos teselas que la imagen completa.
+"""
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config.settings import settings
+from models.ingredient import RegionImagen
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Lado del mapa de saliencia (el residuo espectral funciona a baja resolución)
+LADO_SALIENCIA = 128
+
+# Lado mayor de la imagen reducida sobre la que se buscan los contornos
+LADO_PROPUESTAS = 512
+
+# Fracción máxima del área de la foto que puede ocupar una región (las mayores
+# ya las cubre la vista general)
+AREA_MAXIMA_REGION = 0.6
+
+# Margen añadido alrededor de cada región, como fracción de su lado mayor
+MARGEN_REGION = 0.1
+
+# Caja en píxeles de la imagen original: (x, y, ancho, alto)
+Caja = Tuple[int, int, int, int]
+
+def _residuo_espectral(canal: np.ndarray) -> np.ndarray:
+    """Saliencia por residuo espectral de un canal (Hou y Zhang, 2007)."""
+    espectro = cv2.dft(canal, flags=cv2.DFT_COMPLEX_OUTPUT)
+    magnitud, fase = cv2.cartToPolar(espectro[:, :, 0], espectro[:, :, 1])
+    log_amplitud = np.log(magnitud + 1e-6)
+    residuo = log_amplitud - cv2.blur(log_amplitud, (3, 3))
+
+    real, imaginaria = cv2.polarToCart(np.exp(residuo), fase)
+    inversa = cv2.idft(cv2.merge([real, imaginaria]), flags=cv2.DFT_SCALE)
+    return cv2.magnitude(inversa[:, :, 0], inversa[:, :, 1]) ** 2
+
+def mapa_saliencia(imagen: np.ndarray) -> np.ndarray:
+    """
+    Calcula el mapa de saliencia por residuo espectral.
+
+    Se suma la saliencia de los tres canales Lab para que un producto que solo
+    contrasta en color con la balda (naranja sobre madera) también destaque.
+
+    Args:
+        imagen: Imagen BGR
+
+    Returns:
+        Mapa float32 en [0, 1] de LADO_SALIENCIA x LADO_SALIENCIA
+    """
+    reducida = cv2.resize(imagen, (LADO_SALIENCIA, LADO_SALIENCIA), interpolation=cv2.INTER_AREA)
+    lab = cv2.cvtColor(reducida, cv2.COLOR_BGR2LAB).astype(np.float32) if reducida.ndim == 3 else reducida[:, :, None].astype(np.float32)
+    saliencia = sum(_residuo_espectral(np.ascontiguousarray(lab[:, :, c])) for c in range(lab.shape[2]))
+    saliencia = cv2.GaussianBlur(saliencia, (0, 0), 1.5)
+    return cv2.normalize(saliencia, None, 0.0, 1.0, cv2.NORM_MINMAX)
+
+def redimensionar(imagen: np.ndarray, tamano: Tuple[int, int]) -> np.ndarray:
+    """
+    Redimensiona una imagen a (ancho, alto).
+
+    Las reducciones fuertes se hacen primero por un factor entero con
+    INTER_AREA, mucho más rápido que con un factor fraccionario, y se terminan
+    con interpolación lineal.
+    """
+    alto, ancho = imagen.shape[:2]
+    factor = min(ancho // max(1, tamano[0]), alto // max(1, tamano[1]))
+    if factor >= 2:
+        imagen = reducir_por_factor(imagen, factor)
+    return cv2.resize(imagen, tamano, interpolation=cv2.INTER_LINEAR)
+
+def reducir_por_factor(imagen: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Reduce una imagen promediando bloques de factor x factor píxeles.
+
+    Se descartan los últimos píxeles que no completan un bloque para que la
+    escala sea exactamente entera (camino rápido de INTER_AREA).
+    """
+    alto, ancho = imagen.shape[:2]
+    alto_r, ancho_r = max(1, alto // factor), max(1, ancho // factor)
+    recortada = imagen[:alto_r * factor, :ancho_r * factor]
+    return cv2.resize(recortada, (ancho_r, alto_r), interpolation=cv2.INTER_AREA)
+
+def fusionar_cajas(cajas: List[Caja]) -> List[Caja]:
+    """Une las cajas que se solapan hasta que ninguna se solapa con otra."""
+    cajas = list(cajas)
+    fusionada = True
+    while fusionada:
+        fusionada = False
+        for i in range(len(cajas)):
+            for j in range(i + 1, len(cajas)):
+                x1, y1, w1, h1 = cajas[i]
+                x2, y2, w2, h2 = cajas[j]
+                if x1 < x2 + w2 and x2 < x1 + w1 and y1 < y2 + h2 and y2 < y1 + h1:
+                    x, y = min(x1, x2), min(y1, y2)
+                    cajas[i] = (x, y, max(x1 + w1, x2 + w2) - x, max(y1 + h1, y2 + h2) - y)
+                    del cajas[j]
+                    fusionada = True
+                    break
+            if fusionada:
+                break
+    return cajas
+
+class RegionProposer:
+    """Propone regiones con productos y compone el mosaico para la API de visión."""
+
+    def __init__(
+        self,
+        lado_tesela: Optional[int] = None,
+        max_teselas: Optional[int] = None,
+        area_minima: Optional[float] = None,
+        lado_minimo_imagen: Optional[int] = None
+    ):
+        """
+        Inicializa el proponedor (los valores por defecto vienen de settings).
+
+        Args:
+            lado_tesela: Lado de cada celda del mosaico; debe coincidir con la
+                tesela del modelo de visión para que cada recorte ocupe una
+            max_teselas: Celdas del mosaico (una fila), incluida la vista general
+            area_minima: Fracción mínima del área de la foto de una región
+            lado_minimo_imagen: Lado mayor a partir del cual se usa el mosaico
+        """
+        self.lado_tesela = lado_tesela or settings.MOSAIC_TILE_SIZE
+        self.max_teselas = max_teselas or settings.MOSAIC_MAX_TILES
+        self.area_minima = settings.REGION_MIN_AREA if area_minima is None else area_minima
+        self.lado_minimo_imagen = lado_minimo_imagen or settings.MOSAIC_MIN_SIDE
+        if self.max_teselas < 2:
+            raise ValueError("El mosaico necesita al menos 2 teselas (vista general y una región)")
+
+    def proponer(self, imagen: np.ndarray, max_regiones: Optional[int] = None) -> List[Caja]:
+        """
+        Propone las regiones con productos de una imagen.
+
+        Umbraliza el mapa de saliencia, une las zonas cercanas con un cierre
+        morfológico y toma la caja de cada contorno. Las cajas se amplían con
+        un margen y hasta media tesela, se fusionan si se solapan y se ordenan
+        por saliencia acumulada.
+
+        Args:
+            imagen: Imagen BGR a resolución completa
+            max_regiones: Regiones devueltas como máximo (por defecto max_teselas - 1)
+
+        Returns:
+            Cajas (x, y, ancho, alto) en píxeles de la imagen original
+        """
+        max_regiones = max_regiones or self.max_teselas - 1
+        alto, ancho = imagen.shape[:2]
+        factor = max(1, math.ceil(max(alto, ancho) / LADO_PROPUESTAS))
+        reducida = reducir_por_factor(imagen, factor)
+        alto_r, ancho_r = reducida.shape[:2]
+
+        saliencia = cv2.resize(mapa_saliencia(reducida), (ancho_r, alto_r), interpolation=cv2.INTER_LINEAR)
+        mascara = (saliencia > max(float(saliencia.mean()) * 2.0, 0.15)).astype(np.uint8) * 255
+        nucleo = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (max(3, ancho_r // 40) | 1,) * 2)
+        mascara = cv2.morphologyEx(mascara, cv2.MORPH_CLOSE, nucleo)
+        contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        area_total = alto * ancho
+        lado_minimo = self.lado_tesela // 2
+        cajas = []
+        for contorno in contornos:
+            x, y, w, h = (v * factor for v in cv2.boundingRect(contorno))
+            if w * h < self.area_minima * area_total:
+                continue
+            margen = int(max(w, h) * MARGEN_REGION)
+            w_final, h_final = max(w + 2 * margen, lado_minimo), max(h + 2 * margen, lado_minimo)
+            x = min(max(0, x + w // 2 - w_final // 2), max(0, ancho - w_final))
+            y = min(max(0, y + h // 2 - h_final // 2), max(0, alto - h_final))
+            cajas.append((x, y, min(w_final, ancho - x), min(h_final, alto - y)))
+
+        cajas = [caja for caja in fusionar_cajas(cajas) if caja[2] * caja[3] <= AREA_MAXIMA_REGION * area_total]
+        cajas.sort(key=lambda caja: self._saliencia_caja(saliencia, caja, factor), reverse=True)
+        return cajas[:max_regiones]
+
+    def componer_mosaico(self, imagen: np.ndarray, cajas: List[Caja]) -> np.ndarray:
+        """
+        Compone una fila de celdas cuadradas: la vista general y un recorte por región.
+
+        Cada celda lleva su número en la esquina superior izquierda para que el
+        modelo pueda indicar en qué recuadro vio cada ingrediente.
+
+        Args:
+            imagen: Imagen BGR a resolución completa
+            cajas: Regiones a recortar
+
+        Returns:
+            Mosaico BGR de lado_tesela x (lado_tesela * (1 + len(cajas)))
+        """
+        lado = self.lado_tesela
+        alto, ancho = imagen.shape[:2]
+        celdas = [(0, 0, ancho, alto)] + list(cajas)
+        mosaico = np.zeros((lado, lado * len(celdas), 3), dtype=np.uint8)
+
+        for indice, (x, y, w, h) in enumerate(celdas):
+            recorte = imagen[y:y + h, x:x + w]
+            escala = lado / max(w, h)
+            w_celda, h_celda = max(1, round(w * escala)), max(1, round(h * escala))
+            x0 = indice * lado + (lado - w_celda) // 2
+            y0 = (lado - h_celda) // 2
+            mosaico[y0:y0 + h_celda, x0:x0 + w_celda] = redimensionar(recorte, (w_celda, h_celda))
+
+            cv2.rectangle(mosaico, (indice * lado, 0), (indice * lado + 44, 40), (0, 0, 0), -1)
+            cv2.putText(mosaico, str(indice), (indice * lado + 8, 32), cv2.FONT_HERSHEY_SIMPLEX, 1.1, (255, 255, 255), 2)
+        return mosaico
+
+    def preparar(self, imagen: np.ndarray) -> Optional[Tuple[np.ndarray, List[Caja]]]:
+        """
+        Prepara el mosaico de una foto grande.
+
+        Returns:
+            Tupla (mosaico, cajas de cada celda, empezando por la foto completa),
+            o None si la foto es pequeña o no se encuentran regiones
+        """
+        alto, ancho = imagen.shape[:2]
+        if max(alto, ancho) < self.lado_minimo_imagen:
+            return None
+        cajas = self.proponer(imagen)
+        if not cajas:
+            return None
+        logger.info(f"Mosaico de {len(cajas)} regiones para una imagen de {ancho}x{alto}")
+        return self.componer_mosaico(imagen, cajas), [(0, 0, ancho, alto)] + cajas
+
+    @staticmethod
+    def asignar_regiones(cajas: List[Caja], detecciones: List[Dict[str, Any]]) -> List[RegionImagen]:
+        """
+        Traduce los números de recuadro de la respuesta a regiones de la foto.
+
+        Args:
+            cajas: Caja de cada celda del mosaico (la 0 es la foto completa)
+            detecciones: Ingredientes de la respuesta, con su campo 'region'
+
+        Returns:
+            Regiones con los ingredientes vistos en cada una (los que no indican
+            un recuadro válido se asignan a la foto completa)
+        """
+        nombres: Dict[int, List[str]] = {}
+        for deteccion in detecciones:
+            try:
+                region = int(deteccion.get('region', 0))
+            except (TypeError, ValueError):
+                region = 0
+            if not 0 <= region < len(cajas):
+                region = 0
+            nombre = str(deteccion.get('nombre', '')).strip().lower()
+            if nombre:
+                nombres.setdefault(region, []).append(nombre)
+
+        return [
+            RegionImagen(indice=indice, caja=list(cajas[indice]), ingredientes=nombres[indice])
+            for indice in sorted(nombres)
+        ]
+
+    @staticmethod
+    def _saliencia_caja(saliencia: np.ndarray, caja: Caja, factor: int) -> float:
+        """Saliencia acumulada de una caja en el mapa reducido."""
+        x, y, w, h = (v // factor for v in caja)
+        return float(saliencia[y:y + max(1, h), x:x + max(1, w)].sum())
+
+    @staticmethod
+    def teselas_estimadas(ancho: int, alto: int, lado_tesela: int = 512) -> int:
+        """
+        Estima las teselas que cobra un modelo de visión en alta resolución.
+
+        La imagen se ajusta a 2048 x 2048, su lado menor a 768 y se divide en
+        teselas de lado_tesela (criterio de los modelos de visión de OpenAI).
+        """
+        escala = min(1.0, 2048 / max(ancho, alto))
+        ancho, alto = ancho * escala, alto * escala
+        escala = min(1.0, 768 / min(ancho, alto))
+        return math.ceil(ancho * escala / lado_tesela) * math.ceil(alto * escala / lado_tesela)
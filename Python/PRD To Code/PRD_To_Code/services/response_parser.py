@@ -0,0 +1,214 @@
+"""
+Parseo tolerante de las respuestas JSON del LLM.
+Intenta primero un parseo estricto (modo JSON del proveedor), después extrae el
+objeto JSON del texto y, si la respuesta está truncada, recupera los objetos
+completos de la lista principal en lugar de descartar toda la respuesta.
+"""
+import json
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from openai import BadRequestError
+except ImportError:
+    # Fallback para versiones anteriores de openai: se comprueba el código HTTP
+    BadRequestError = Exception
+
+from config.settings import settings
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Modelos que aceptan response_format={"type": "json_object"}: prefijos de
+# nombre y nombres exactos (los alias cortos también cubren versiones antiguas)
+PREFIJOS_MODO_JSON = (
+    "gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-3.5-turbo-1106", "gpt-3.5-turbo-0125"
+)
+MODELOS_MODO_JSON = ("gpt-3.5-turbo",)
+
+# Modelos de la lista cuyo modo JSON ha rechazado la API en este proceso
+_modelos_rechazados = set()
+_lock_modelos = threading.Lock()
+
+# Modos de parseo, del más al menos fiable
+MODOS_PARSEO = ("estricto", "extraido", "recuperado", "fallido")
+
+# Posiciones de '{' que se prueban antes de dar el texto por truncado
+MAX_INTENTOS_EXTRACCION = 8
+
+def soporta_modo_json(model: str) -> bool:
+    """
+    Indica si un modelo admite el modo JSON de la API.
+
+    Args:
+        model: Nombre del modelo
+
+    Returns:
+        True si se puede pedir response_format json_object
+    """
+    if not settings.ENABLE_JSON_MODE or model in _modelos_rechazados:
+        return False
+    return model in MODELOS_MODO_JSON or model.startswith(PREFIJOS_MODO_JSON)
+
+def crear_completado(crear: Callable[..., Any], model: str, **opciones) -> Any:
+    """
+    Pide un completado a la API, en modo JSON si el modelo lo admite.
+
+    Si la API rechaza response_format (error 400 que lo menciona), repite la
+    petición una vez sin él y no lo vuelve a pedir para ese modelo.
+
+    Args:
+        crear: Función de la API (client.chat.completions.create)
+        model: Nombre del modelo
+        **opciones: Resto de parámetros de la petición
+
+    Returns:
+        Respuesta de la API
+    """
+    if not soporta_modo_json(model):
+        return crear(model=model, **opciones)
+    try:
+        return crear(model=model, response_format={"type": "json_object"}, **opciones)
+    except BadRequestError as e:
+        status = getattr(e, 'status_code', None) or getattr(e, 'http_status', None)
+        if status != 400 or 'response_format' not in str(e):
+            raise
+        logger.warning(f"El modelo {model} no admite el modo JSON; se repite la petición sin él")
+        with _lock_modelos:
+            _modelos_rechazados.add(model)
+        return crear(model=model, **opciones)
+
+class ResponseParser:
+    """Extrae JSON de las respuestas del LLM y registra cómo se obtuvo."""
+
+    def __init__(self):
+        """Inicializa el parser y sus contadores."""
+        self._decoder = json.JSONDecoder()
+        self._modos = {modo: 0 for modo in MODOS_PARSEO}
+        self._objetos_recuperados = 0
+        self._lock = threading.Lock()
+
+    def parse(self, texto: Optional[str], clave_lista: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Parsea una respuesta del LLM.
+
+        Args:
+            texto: Respuesta del LLM
+            clave_lista: Clave de la lista principal ('recetas', 'ingredientes'...).
+                Si se indica, el objeto extraído debe contenerla y, si la respuesta
+                está truncada, se recuperan sus elementos completos.
+
+        Returns:
+            Tupla (datos, modo) con modo 'estricto', 'extraido', 'recuperado' o 'fallido'
+        """
+        datos, modo = self._parse(texto or "", clave_lista)
+
+        with self._lock:
+            self._modos[modo] += 1
+            if modo == "recuperado":
+                self._objetos_recuperados += len(datos[clave_lista])
+
+        if modo == "recuperado":
+            logger.warning(f"Respuesta truncada: recuperados {len(datos[clave_lista])} elementos de '{clave_lista}'")
+        elif modo == "fallido":
+            logger.error("No se pudo extraer JSON de la respuesta")
+        return datos, modo
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Obtiene cuántas respuestas se parsearon de cada modo y cuántos objetos se recuperaron."""
+        with self._lock:
+            total = sum(self._modos.values())
+            return {
+                'respuestas': total,
+                'modos': dict(self._modos),
+                'objetos_recuperados': self._objetos_recuperados,
+                'tasa_recuperacion': self._modos['recuperado'] / total if total else 0.0,
+                'tasa_fallo': self._modos['fallido'] / total if total else 0.0
+            }
+
+    def _parse(self, texto: str, clave_lista: Optional[str]) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Aplica las estrategias de parseo en orden."""
+        try:
+            datos = json.loads(texto)
+            if self._es_valido(datos, clave_lista):
+                return datos, "estricto"
+        except json.JSONDecodeError:
+            pass
+
+        datos = self._extraer_objeto(texto, clave_lista)
+        if datos is not None:
+            return datos, "extraido"
+
+        if clave_lista:
+            datos = self._recuperar_lista(texto, clave_lista)
+            if datos is not None:
+                return datos, "recuperado"
+
+        return None, "fallido"
+
+    def _extraer_objeto(self, texto: str, clave_lista: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Decodifica el primer objeto JSON válido del texto, ignorando el texto que lo rodea."""
+        inicio = texto.find('{')
+        intentos = 0
+        while inicio != -1 and intentos < MAX_INTENTOS_EXTRACCION:
+            intentos += 1
+            try:
+                datos, _ = self._decoder.raw_decode(texto, inicio)
+                if self._es_valido(datos, clave_lista):
+                    return datos
+            except json.JSONDecodeError:
+                pass
+            inicio = texto.find('{', inicio + 1)
+        return None
+
+    def _recuperar_lista(self, texto: str, clave_lista: str) -> Optional[Dict[str, Any]]:
+        """Recupera los elementos completos de la lista `clave_lista` de un JSON truncado."""
+        coincidencia = re.search(rf'"{re.escape(clave_lista)}"\s*:\s*\[', texto)
+        if not coincidencia:
+            return None
+
+        elementos = []
+        posicion = coincidencia.end()
+        while True:
+            posicion = self._saltar_separadores(texto, posicion)
+            if posicion >= len(texto) or texto[posicion] == ']':
+                break
+            try:
+                elemento, posicion = self._decoder.raw_decode(texto, posicion)
+            except json.JSONDecodeError:
+                break
+            if isinstance(elemento, dict):
+                elementos.append(elemento)
+
+        if not elementos:
+            return None
+
+        datos = self._recuperar_campos_previos(texto[:coincidencia.start()])
+        datos[clave_lista] = elementos
+        return datos
+
+    def _recuperar_campos_previos(self, texto: str) -> Dict[str, Any]:
+        """Recupera los campos de nivel superior completos anteriores a la lista (p. ej. 'metadata')."""
+        datos: Dict[str, Any] = {}
+        for coincidencia in re.finditer(r'"(\w+)"\s*:\s*', texto):
+            try:
+                valor, _ = self._decoder.raw_decode(texto, coincidencia.end())
+            except json.JSONDecodeError:
+                continue
+            if isinstance(valor, dict):
+                datos.setdefault(coincidencia.group(1), valor)
+        return datos
+
+    @staticmethod
+    def _saltar_separadores(texto: str, posicion: int) -> int:
+        """Avanza sobre espacios y comas entre elementos de una lista."""
+        while posicion < len(texto) and texto[posicion] in ' \t\r\n,':
+            posicion += 1
+        return posicion
+
+    @staticmethod
+    def _es_valido(datos: Any, clave_lista: Optional[str]) -> bool:
+        """Comprueba que el JSON decodificado es un objeto con la lista esperada."""
+        return isinstance(datos, dict) and (clave_lista is None or clave_lista in datos)
@@ -0,0 +1,244 @@
+"""
+Caché semántica de recetas generadas.
+Representa cada conjunto de ingredientes como un vector de n-gramas de
+caracteres con hashing (sin modelos externos ni GPU) y reutiliza el resultado
+de una consulta anterior cuando la similitud coseno supera un umbral y todos
+los ingredientes de esa consulta están disponibles en la nueva.
+"""
+import json
+import logging
+import threading
+import time
+import zlib
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from utils.ingredient_normalizer import IngredientNormalizer
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Longitudes de los n-gramas de caracteres
+TAMANOS_NGRAMA = (3, 4)
+
+CAPACIDAD_INICIAL = 64
+
+class _Particion:
+    """Índice vectorial de las entradas que comparten el mismo contexto."""
+
+    def __init__(self, dimension: int):
+        self.vectores = np.zeros((CAPACIDAD_INICIAL, dimension), dtype=np.float32)
+        self.valores: List[Any] = []
+        self.conjuntos: List[FrozenSet[str]] = []
+        self.instantes: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+    def agregar(self, vector: np.ndarray, valor: Any, conjunto: FrozenSet[str], instante: float) -> None:
+        """Añade una entrada, duplicando la capacidad de la matriz si hace falta."""
+        n = len(self.valores)
+        if n == len(self.vectores):
+            self.vectores = np.concatenate([self.vectores, np.zeros_like(self.vectores)])
+        self.vectores[n] = vector
+        self.valores.append(valor)
+        self.conjuntos.append(conjunto)
+        self.instantes.append(instante)
+
+    def buscar(self, vector: np.ndarray, umbral: float, disponibles: FrozenSet[str]) -> Optional[Tuple[int, float]]:
+        """
+        Devuelve la entrada más similar que supere el umbral y cuyos
+        ingredientes estén todos disponibles, junto con su similitud coseno.
+        """
+        similitudes = self.vectores[:len(self.valores)] @ vector
+        for indice in np.argsort(-similitudes):
+            similitud = float(similitudes[indice])
+            if similitud < umbral:
+                break
+            if self.conjuntos[indice] <= disponibles:
+                return int(indice), similitud
+        return None
+
+    def eliminar(self, indices: Iterable[int]) -> None:
+        """Elimina entradas conservando el orden de inserción."""
+        eliminar = set(indices)
+        conservar = [i for i in range(len(self.valores)) if i not in eliminar]
+        n = len(conservar)
+        self.vectores[:n] = self.vectores[conservar]
+        self.vectores[n:] = 0
+        self.valores = [self.valores[i] for i in conservar]
+        self.conjuntos = [self.conjuntos[i] for i in conservar]
+        self.instantes = [self.instantes[i] for i in conservar]
+
+class SemanticCache:
+    """Caché por similitud de conjuntos de ingredientes."""
+
+    def __init__(
+        self,
+        umbral: Optional[float] = None,
+        ttl: Optional[int] = None,
+        dimension: Optional[int] = None,
+        max_entradas: Optional[int] = None
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            umbral: Similitud coseno mínima para considerar un acierto. Subirlo
+                prioriza la precisión; bajarlo, la tasa de aciertos
+                (por defecto settings.SEMANTIC_CACHE_THRESHOLD)
+            ttl: Segundos de validez de cada entrada (por defecto settings.CACHE_TTL)
+            dimension: Dimensión de los vectores (por defecto settings.SEMANTIC_CACHE_DIM)
+            max_entradas: Entradas máximas por contexto; se descartan las más
+                antiguas (por defecto settings.SEMANTIC_CACHE_MAX_ENTRIES)
+        """
+        self.umbral = settings.SEMANTIC_CACHE_THRESHOLD if umbral is None else umbral
+        self.ttl = settings.CACHE_TTL if ttl is None else ttl
+        self.dimension = dimension or settings.SEMANTIC_CACHE_DIM
+        self.max_entradas = max_entradas or settings.SEMANTIC_CACHE_MAX_ENTRIES
+
+        self._particiones: Dict[str, _Particion] = {}
+        self._lock = threading.Lock()
+        self._consultas = 0
+        self._aciertos = 0
+        self._similitudes_aciertos: List[float] = []
+
+    def __len__(self) -> int:
+        """Número total de entradas almacenadas."""
+        return sum(len(particion) for particion in self._particiones.values())
+
+    def vectorizar(self, ingredientes: Iterable[str]) -> np.ndarray:
+        """
+        Calcula el vector normalizado de un conjunto de ingredientes.
+
+        Los nombres se canonicalizan antes ("tomates" y "tomate" son el mismo
+        ingrediente) y cada uno aporta un vector unitario de n-gramas de sus
+        palabras, de modo que todos pesan igual independientemente de su longitud.
+
+        Args:
+            ingredientes: Nombres de los ingredientes
+
+        Returns:
+            Vector unitario de dimensión self.dimension
+        """
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for nombre in IngredientNormalizer.canonicos(ingredientes):
+            parcial = np.zeros(self.dimension, dtype=np.float32)
+            for palabra in nombre.split():
+                texto = f" {palabra} "
+                for n in TAMANOS_NGRAMA:
+                    for i in range(len(texto) - n + 1):
+                        parcial[zlib.crc32(texto[i:i + n].encode('utf-8')) % self.dimension] += 1.0
+            norma = np.linalg.norm(parcial)
+            if norma:
+                vector += parcial / norma
+
+        norma = np.linalg.norm(vector)
+        return vector / norma if norma else vector
+
+    @staticmethod
+    def clave_contexto(**contexto: Any) -> str:
+        """
+        Construye la clave exacta de los parámetros que no admiten aproximación.
+
+        Restricciones dietéticas, tiempo, nivel o número de recetas deben
+        coincidir exactamente: solo los ingredientes se comparan por similitud.
+        """
+        return json.dumps(contexto, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(
+        self,
+        ingredientes: Iterable[str],
+        contexto: str = '',
+        basicos: Iterable[str] = ()
+    ) -> Optional[Tuple[Any, float]]:
+        """
+        Busca un resultado para un conjunto de ingredientes similar.
+
+        La similitud es simétrica, así que un conjunto guardado con un
+        ingrediente más ({tomate, cebolla, ajo, pollo}) supera el umbral frente
+        a la consulta sin él. Solo se acepta una entrada si todos sus
+        ingredientes están en la consulta o entre los básicos.
+
+        Args:
+            ingredientes: Nombres de los ingredientes
+            contexto: Clave exacta del resto de parámetros (ver clave_contexto)
+            basicos: Ingredientes básicos que se dan por disponibles
+
+        Returns:
+            Tupla (valor, similitud) o None si no hay acierto
+        """
+        ingredientes = list(ingredientes)
+        vector = self.vectorizar(ingredientes)
+        disponibles = frozenset(IngredientNormalizer.canonicos(ingredientes + list(basicos)))
+        with self._lock:
+            self._consultas += 1
+            particion = self._particiones.get(contexto)
+            if not particion:
+                return None
+
+            self._purgar_expiradas(particion, time.time())
+            if not len(particion):
+                return None
+
+            encontrado = particion.buscar(vector, self.umbral, disponibles)
+            if encontrado is None:
+                return None
+
+            indice, similitud = encontrado
+            self._aciertos += 1
+            self._similitudes_aciertos.append(similitud)
+            return particion.valores[indice], similitud
+
+    def put(self, ingredientes: Iterable[str], valor: Any, contexto: str = '') -> None:
+        """
+        Guarda un resultado.
+
+        Args:
+            ingredientes: Nombres de los ingredientes
+            valor: Resultado a guardar
+            contexto: Clave exacta del resto de parámetros (ver clave_contexto)
+        """
+        ingredientes = list(ingredientes)
+        vector = self.vectorizar(ingredientes)
+        conjunto = frozenset(IngredientNormalizer.canonicos(ingredientes))
+        with self._lock:
+            particion = self._particiones.setdefault(contexto, _Particion(self.dimension))
+            ahora = time.time()
+            self._purgar_expiradas(particion, ahora)
+            if len(particion) >= self.max_entradas:
+                particion.eliminar(range(len(particion) - self.max_entradas + 1))
+            particion.agregar(vector, valor, conjunto, ahora)
+
+    def clear(self) -> None:
+        """Vacía la caché y reinicia las estadísticas."""
+        with self._lock:
+            self._particiones.clear()
+            self._consultas = 0
+            self._aciertos = 0
+            self._similitudes_aciertos = []
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """Obtiene consultas, aciertos, tasa de aciertos y similitud media de los aciertos."""
+        with self._lock:
+            return {
+                'consultas': self._consultas,
+                'aciertos': self._aciertos,
+                'fallos': self._consultas - self._aciertos,
+                'tasa_aciertos': self._aciertos / self._consultas if self._consultas else 0.0,
+                'similitud_media': float(np.mean(self._similitudes_aciertos)) if self._similitudes_aciertos else 0.0,
+                'entradas': sum(len(particion) for particion in self._particiones.values()),
+                'umbral': self.umbral
+            }
+
+    def _purgar_expiradas(self, particion: _Particion, ahora: float) -> None:
+        """Elimina las entradas con más antigüedad que el TTL (son las primeras)."""
+        expiradas = 0
+        for instante in particion.instantes:
+            if ahora - instante <= self.ttl:
+                break
+            expiradas += 1
+        if expiradas:
+            particion.eliminar(range(expiradas))
@@ -0,0 +1,186 @@
+"""
+Contabilidad de tokens para las llamadas al LLM.
+Cuenta tokens con un tokenizador local, registra el consumo por plantilla de
+prompt y dimensiona max_tokens según el número de recetas pedidas.
+"""
+import logging
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from config.settings import settings
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tokens extra que añade el formato de chat por mensaje y por respuesta
+TOKENS_POR_MENSAJE = 4
+TOKENS_INICIO_RESPUESTA = 3
+
+class TokenBudget:
+    """Cuenta tokens y registra el consumo de cada plantilla de prompt."""
+
+    def __init__(self, model: Optional[str] = None):
+        """
+        Inicializa el contador de tokens.
+
+        Args:
+            model: Modelo cuyo tokenizador se usará (por defecto settings.OPENAI_MODEL)
+        """
+        self.model = model or settings.OPENAI_MODEL
+        self._encoding = None
+        self._encoding_cargado = False
+        self._uso: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def exacto(self) -> bool:
+        """Indica si se dispone del tokenizador real o de una estimación."""
+        return self._obtener_encoding() is not None
+
+    def contar(self, texto: str) -> int:
+        """
+        Cuenta los tokens de un texto.
+
+        Args:
+            texto: Texto a contar
+
+        Returns:
+            Número de tokens (estimado si no hay tokenizador local)
+        """
+        if not texto:
+            return 0
+
+        encoding = self._obtener_encoding()
+        if encoding is not None:
+            return len(encoding.encode(texto))
+
+        # Estimación para español: ~3.6 caracteres por token
+        return math.ceil(len(texto) / 3.6)
+
+    def contar_mensajes(self, mensajes: List[Dict[str, str]]) -> int:
+        """
+        Cuenta los tokens de entrada de una conversación de chat.
+
+        Args:
+            mensajes: Mensajes con claves 'role' y 'content'
+
+        Returns:
+            Número de tokens de entrada
+        """
+        total = TOKENS_INICIO_RESPUESTA
+        for mensaje in mensajes:
+            contenido = mensaje.get('content')
+            total += TOKENS_POR_MENSAJE + (self.contar(contenido) if isinstance(contenido, str) else 0)
+        return total
+
+    def max_recetas_por_respuesta(self) -> int:
+        """Obtiene cuántas recetas caben en una respuesta con settings.MAX_COMPLETION_TOKENS."""
+        disponibles = settings.MAX_COMPLETION_TOKENS - settings.RESPONSE_TOKEN_OVERHEAD
+        return max(1, disponibles // settings.TOKENS_PER_RECIPE)
+
+    def max_tokens_para_recetas(self, num_recetas: int) -> int:
+        """
+        Dimensiona max_tokens para una respuesta con `num_recetas` recetas.
+
+        Args:
+            num_recetas: Número de recetas pedidas
+
+        Returns:
+            Límite de tokens de la respuesta
+        """
+        necesarios = settings.RESPONSE_TOKEN_OVERHEAD + num_recetas * settings.TOKENS_PER_RECIPE
+        return min(necesarios, settings.MAX_COMPLETION_TOKENS)
+
+    def registrar_uso(
+        self,
+        plantilla: str,
+        mensajes: List[Dict[str, str]],
+        respuesta: Optional[str],
+        usage: Any = None
+    ) -> Dict[str, int]:
+        """
+        Registra los tokens consumidos por una llamada.
+
+        Usa los contadores que devuelve la API cuando están disponibles y, si no,
+        los calcula con el tokenizador local. Los tokens de entrada servidos desde
+        la caché de prefijos del proveedor solo se conocen por la API.
+
+        Args:
+            plantilla: Nombre de la plantilla de prompt usada
+            mensajes: Mensajes enviados
+            respuesta: Texto de la respuesta
+            usage: Objeto `usage` de la respuesta de la API (opcional)
+
+        Returns:
+            Tokens de entrada, de salida y cacheados de la llamada
+        """
+        prompt_tokens = getattr(usage, 'prompt_tokens', None)
+        completion_tokens = getattr(usage, 'completion_tokens', None)
+        cached_tokens = getattr(getattr(usage, 'prompt_tokens_details', None), 'cached_tokens', None) or 0
+        if prompt_tokens is None:
+            prompt_tokens = self.contar_mensajes(mensajes)
+        if completion_tokens is None:
+            completion_tokens = self.contar(respuesta or "")
+
+        with self._lock:
+            uso = self._uso.setdefault(plantilla, {
+                'llamadas': 0,
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'cached_tokens': 0
+            })
+            uso['llamadas'] += 1
+            uso['prompt_tokens'] += prompt_tokens
+            uso['completion_tokens'] += completion_tokens
+            uso['cached_tokens'] += cached_tokens
+
+        logger.debug(
+            f"Tokens [{plantilla}]: entrada={prompt_tokens} (cacheados={cached_tokens}), salida={completion_tokens}"
+        )
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cached_tokens': cached_tokens
+        }
+
+    def obtener_estadisticas(self) -> Dict[str, Dict[str, float]]:
+        """Obtiene el consumo acumulado y medio de tokens y la tasa de caché por plantilla."""
+        with self._lock:
+            estadisticas = {}
+            for plantilla, uso in self._uso.items():
+                llamadas = uso['llamadas']
+                estadisticas[plantilla] = dict(uso)
+                estadisticas[plantilla]['prompt_tokens_medio'] = uso['prompt_tokens'] / llamadas
+                estadisticas[plantilla]['completion_tokens_medio'] = uso['completion_tokens'] / llamadas
+                estadisticas[plantilla]['tasa_cache'] = (
+                    uso['cached_tokens'] / uso['prompt_tokens'] if uso['prompt_tokens'] else 0.0
+                )
+            return estadisticas
+
+    def _obtener_encoding(self):
+        """Carga el tokenizador local una sola vez."""
+        if not self._encoding_cargado:
+            self._encoding_cargado = True
+            if tiktoken is not None:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = self._cargar_encoding_base()
+                except Exception as e:
+                    logger.warning(f"No se pudo cargar el tokenizador local, se usará una estimación: {e}")
+        return self._encoding
+
+    @staticmethod
+    def _cargar_encoding_base():
+        """Carga el tokenizador por defecto para modelos que tiktoken no conoce."""
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el tokenizador local, se usará una estimación: {e}")
+            return None
@@ -0,0 +1,204 @@
+"""
+Pruebas del almacenamiento compacto y columnar de datos.
+"""
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.ingredient import Ingrediente, ListaIngredientes, EstadoIngrediente, UnidadMedida
+
+def test_historial_ingredientes_sin_perdidas():
+    """Prueba que el historial compacto reconstruye las listas exactamente."""
+    from models.ingredient_store import HistorialIngredientes
+
+    listas = [
+        ListaIngredientes(
+            ingredientes=[
+                Ingrediente(nombre="Tomate", cantidad=2.5, unidad=UnidadMedida.KILOGRAMOS,
+                            estado=EstadoIngrediente.MADURO, confianza=0.93, categoria="vegetal",
+                            temporada="verano"),
+                Ingrediente(nombre="queso", confianza=0.61, esencial=False, detectado=False,
+                            alergenos=["lactosa", "leche"])
+            ],
+            calidad_imagen="buena"
+        ),
+        ListaIngredientes(error="Imagen no válida"),
+        ListaIngredientes(ingredientes=[Ingrediente(nombre="tomate", confianza=0.8)])
+    ]
+
+    historial = HistorialIngredientes.desde_listas(listas)
+
+    assert len(historial) == 3
+    assert historial.num_ingredientes == 3
+    for original, reconstruida in zip(listas, historial):
+        assert reconstruida.model_dump() == original.model_dump()
+        assert [i.to_dict() for i in reconstruida.ingredientes] == [i.to_dict() for i in original.ingredientes]
+    assert historial.frecuencia_ingredientes() == {"tomate": 2, "queso": 1}
+    assert abs(historial.confianza_media("tomate") - (0.93 + 0.8) / 2) < 1e-9
+    assert historial.confianza_media("pollo") is None
+
+    # Los ingredientes fusionados conservan su procedencia
+    from models.ingredient import IngredienteFusionado
+    from services.ingredient_fusion import IngredientFusion
+
+    fusionada = IngredientFusion(modo_cantidades='max').fusionar(listas)
+    historial.agregar(fusionada)
+    reconstruida = historial.obtener(3)
+    assert all(isinstance(ingrediente, IngredienteFusionado) for ingrediente in reconstruida.ingredientes)
+    assert [i.to_dict() for i in reconstruida.ingredientes] == [i.to_dict() for i in fusionada.ingredientes]
+    assert reconstruida.ingredientes[0].imagenes == [0, 2] and reconstruida.ingredientes[0].detecciones == 2
+    assert type(historial.obtener(2).ingredientes[0]) is Ingrediente
+
+def test_recipe_frame_filtros_y_agregaciones():
+    """Prueba los filtros, agregaciones y totales del frame columnar."""
+    import math
+    from models.recipe import (
+        Receta, Instruccion, InformacionNutricional, IngredienteReceta, NivelDificultad, TipoCocina
+    )
+    from models.recipe_frame import RecipeFrame
+    from utils.helpers import Helpers
+
+    def crear(recipe_id, tiempo, tipo, calorias, fibra=None):
+        return Receta(
+            id=recipe_id, nombre=f"Receta {recipe_id}", descripcion_corta="Prueba",
+            tiempo_preparacion_min=tiempo, tiempo_coccion_min=0, tiempo_total_min=tiempo,
+            dificultad_estrellas=2, porciones=2, tipo_cocina=tipo,
+            ingredientes=[IngredienteReceta(nombre="tomate", cantidad="1", unidad="unidad")],
+            instrucciones=[Instruccion(paso=1, accion="Cortar")],
+            informacion_nutricional=InformacionNutricional(calorias_por_porcion=calorias, fibra_g=fibra),
+            nivel_dificultad=NivelDificultad.PRINCIPIANTE
+        )
+
+    recetas = [
+        crear(1, 15, TipoCocina.ITALIANA, 400, fibra=3.0),
+        crear(2, 45, TipoCocina.ITALIANA, 600),
+        crear(3, 20, TipoCocina.MEXICANA, 300, fibra=5.0),
+        crear(4, 10, TipoCocina.MEXICANA, 500)
+    ]
+    frame = RecipeFrame.from_recetas(recetas)
+
+    rapidas = frame.filtrar_por_tiempo(20)
+    assert list(rapidas.columna('id')) == [1, 3, 4]
+    assert list(frame.filtrar_por_tipo_cocina(TipoCocina.MEXICANA).columna('nombre')) == ["Receta 3", "Receta 4"]
+    assert len(frame.filtrar_por_tipo_cocina("vegana")) == 0
+
+    assert rapidas.agregar('calorias_por_porcion', 'media', por='tipo_cocina') == {'italiana': 400.0, 'mexicana': 400.0}
+    assert frame.agregar('calorias_por_porcion', 'max', por='tipo_cocina') == {'italiana': 600.0, 'mexicana': 500.0}
+    assert frame.agregar('fibra_g', 'conteo') == 2
+    assert math.isnan(frame.filtrar_por_tiempo(5).agregar('tiempo_total_min', 'media'))
+
+    totales = Helpers.calculate_nutritional_totals([receta.to_dict() for receta in recetas])
+    assert totales['calorias'] == 1800 and totales['fibra'] == 8.0 and totales['proteinas'] == 0
+
+def test_serializacion_binaria_y_json(tmp_path):
+    """Prueba que todos los formatos conservan los datos y se detectan al cargar."""
+    from models.ingredient import IngredienteFusionado
+    from models.recipe import ColeccionRecetas
+    from services.ingredient_fusion import IngredientFusion
+    from utils.helpers import Helpers
+    from utils.serialization import ResultSerializer, FORMATOS
+    from tests.test_recipe_generation import crear_coleccion, crear_receta
+
+    coleccion = crear_coleccion([crear_receta(1, ingredientes=["tomate", "jamón ibérico"]), crear_receta(2)])
+    lista = ListaIngredientes(
+        ingredientes=[Ingrediente(nombre="tomate", cantidad=2.0, unidad=UnidadMedida.UNIDADES, confianza=0.9)],
+        calidad_imagen="buena"
+    )
+
+    fusionada = IngredientFusion().fusionar([
+        ListaIngredientes(ingredientes=[Ingrediente(nombre="tomate", confianza=0.9)]),
+        ListaIngredientes(ingredientes=[Ingrediente(nombre="tomates", confianza=0.8)])
+    ])
+
+    for formato in FORMATOS:
+        assert ResultSerializer.loads_coleccion(ResultSerializer.dumps_coleccion(coleccion, formato)) == coleccion
+        assert ResultSerializer.loads_ingredientes(ResultSerializer.dumps_ingredientes(lista, formato)) == lista
+        recuperada = ResultSerializer.loads_ingredientes(ResultSerializer.dumps_ingredientes(fusionada, formato))
+        assert recuperada == fusionada and isinstance(recuperada.ingredientes[0], IngredienteFusionado)
+
+        archivo = tmp_path / f"recetas_{formato}"
+        assert Helpers.save_recipes_to_file(coleccion.to_dict(), str(archivo), formato)
+        assert ColeccionRecetas.from_dict(Helpers.load_recipes_from_file(str(archivo))) == coleccion
+
+    binario = ResultSerializer.dumps_coleccion(coleccion)
+    legible = ResultSerializer.dumps_coleccion(coleccion, 'json')
+    assert ResultSerializer.es_binario(binario) and len(binario) < len(legible) / 3
+
+def test_log_de_resultados_segmentado(tmp_path):
+    """Prueba escritura, lectura, borrado, rotación, recuperación y compactación del log."""
+    from utils.results_log import ResultsLog
+
+    directorio = str(tmp_path / "log")
+    resultado = lambda n: {'success': True, 'recetas': [{'id': i, 'nombre': f"receta {n}-{i}"} for i in range(20)]}
+
+    log = ResultsLog(directorio, tamano_segmento=512)
+    for n in range(10):
+        log.append(f"s{n}", resultado(n))
+    log.append("s3", {'success': False, 'error': "reescrita"})
+    assert log.delete("s5") and not log.delete("s5")
+
+    assert log.get("s3") == {'success': False, 'error': "reescrita"}
+    assert log.get("s5") is None and "s5" not in log
+    assert log.get("s7") == resultado(7)
+    assert log.estadisticas()['segmentos'] > 1
+    assert [s for s, _ in log.iter_results()] == ["s0", "s1", "s2", "s4", "s6", "s7", "s8", "s9", "s3"]
+    log.close()
+
+    # Simular un corte: la última entrada del índice no llegó a escribirse
+    indice = sorted((tmp_path / "log").glob("*.idx"))[-1]
+    lineas = indice.read_text(encoding='utf-8').splitlines(keepends=True)
+    indice.write_text(''.join(lineas[:-1]), encoding='utf-8')
+
+    with ResultsLog(directorio, tamano_segmento=512) as reabierto:
+        assert len(reabierto) == 9
+        assert reabierto.get("s3") == {'success': False, 'error': "reescrita"}
+        assert reabierto.get("s5") is None
+
+        antes = reabierto.estadisticas()
+        compactado = reabierto.compact()
+        assert compactado['bytes_despues'] < compactado['bytes_antes'] == antes['bytes']
+        assert reabierto.get("s9") == resultado(9) and len(reabierto) == 9
+
+    with ResultsLog(directorio) as tras_compactar:
+        assert tras_compactar.session_ids() == ["s0", "s1", "s2", "s4", "s6", "s7", "s8", "s9", "s3"]
+
+    # Un archivo ajeno en el directorio no impide abrir el log
+    (tmp_path / "log" / "notas.log").write_text("no es un segmento", encoding='utf-8')
+    with ResultsLog(directorio) as con_ajenos:
+        assert len(con_ajenos) == 9
+
+def test_exportacion_en_streaming(tmp_path):
+    """Prueba la exportación por fragmentos a archivo, texto y binario."""
+    import io
+    import json
+    from utils.export import BufferedSink, StreamExporter
+    from utils.helpers import Helpers
+    from utils.results_log import ResultsLog
+    from tests.test_recipe_generation import crear_receta
+
+    recetas = [crear_receta(i).to_dict() for i in range(1, 4)]
+    markdown = Helpers.create_recipe_markdown(recetas[0])
+    assert markdown.startswith(f"# {recetas[0]['nombre']}\n\n") and "## Ingredientes\n\n• " in markdown
+    assert "".join(StreamExporter.iter_recetas_markdown(recetas)).count("\n---\n\n") == 2
+
+    # Las escrituras se agrupan en bloques del tamaño del buffer
+    destino = io.BytesIO()
+    with BufferedSink(destino, tamano_buffer=1024) as sink:
+        sink.writelines(StreamExporter.iter_recetas_json(recetas))
+    assert json.loads(destino.getvalue()) == recetas
+    assert 1 < sink.escrituras < sink.bytes_escritos / 1024 + 2
+
+    archivo = tmp_path / "recetas.md"
+    assert StreamExporter.exportar_recetas(iter(recetas), str(archivo)) == archivo.stat().st_size
+
+    with ResultsLog(str(tmp_path / "log")) as log:
+        for n in range(3):
+            log.append(f"s{n}", {'recetas': recetas, 'ingredientes_detectados': ["tomate"]})
+        texto = io.StringIO()
+        StreamExporter.exportar_resultados(log.iter_results(), texto, 'json')
+        assert [s['session_id'] for s in json.loads(texto.getvalue())] == ["s0", "s1", "s2"]
+        texto = io.StringIO()
+        StreamExporter.exportar_resultados(log.iter_results(), texto, 'markdown')
+        assert texto.getvalue().count("# Sesión ") == 3
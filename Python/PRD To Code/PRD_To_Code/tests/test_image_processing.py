@@ -0,0 +1,504 @@
+"""
+Pruebas del procesamiento de imágenes previo a la detección de ingredientes.
+"""
+import base64
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import pytest
+import numpy as np
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.ingredient import Ingrediente, ListaIngredientes
+
+def crear_imagen(ruta, semilla, tamano=(480, 640)):
+    """Crea una imagen sintética con manchas de color y la guarda en disco."""
+    rng = np.random.default_rng(semilla)
+    imagen = cv2.resize(rng.integers(0, 256, (12, 16, 3), dtype=np.uint8), tamano[::-1], interpolation=cv2.INTER_CUBIC)
+    cv2.imwrite(str(ruta), imagen)
+    return imagen
+
+def crear_procesador(**atributos):
+    """Crea un ImageProcessor sin clientes de API."""
+    from services.detectors import DetectorGoogleVision, DetectorOpenAI
+    from services.image_processor import ImageProcessor
+
+    procesador = ImageProcessor.__new__(ImageProcessor)
+    procesador.openai_client = object()
+    procesador.vision_client = None
+    procesador.detection_backend = 'api'
+    procesador.detectores = {}
+    procesador.registrar_detector(DetectorOpenAI(procesador))
+    procesador.registrar_detector(DetectorGoogleVision(procesador))
+    for nombre, valor in atributos.items():
+        setattr(procesador, nombre, valor)
+    return procesador
+
+def test_duplicados_por_hash_perceptual(tmp_path):
+    """Prueba que las fotos casi iguales no se envían de nuevo a la API."""
+    from services.image_hashing import BKTree, ImageHashIndex, dhash, dhash_archivo, distancia_hamming
+    from services.ingredient_fusion import IngredientFusion
+
+    original = crear_imagen(tmp_path / "estante.png", 1)
+    reducida = cv2.resize(original, (320, 240), interpolation=cv2.INTER_AREA)
+    cv2.imwrite(str(tmp_path / "estante_bis.jpg"), cv2.convertScaleAbs(reducida, alpha=1.05, beta=4), [cv2.IMWRITE_JPEG_QUALITY, 70])
+    crear_imagen(tmp_path / "nevera.png", 2)
+
+    hashes = [dhash_archivo(str(tmp_path / n)) for n in ("estante.png", "estante_bis.jpg", "nevera.png")]
+    assert distancia_hamming(hashes[0], hashes[1]) <= 6 < distancia_hamming(hashes[0], hashes[2])
+    assert dhash(original) == hashes[0]
+
+    arbol = BKTree()
+    for valor in range(200):
+        arbol.agregar(valor * 0x9E3779B97F4A7C15 % (1 << 64), valor)
+    assert arbol.buscar(17 * 0x9E3779B97F4A7C15 % (1 << 64) ^ 0b101, 3) == (2, 17)
+
+    llamadas = []
+    def detectar(image_path, use_openai=True):
+        llamadas.append(Path(image_path).name)
+        return ListaIngredientes(ingredientes=[Ingrediente(nombre=Path(image_path).stem, confianza=0.6)])
+
+    procesador = crear_procesador(hash_index=ImageHashIndex(distancia_maxima=6), ingredient_fusion=IngredientFusion())
+    procesador.detect_ingredients = detectar
+    rutas = [str(tmp_path / n) for n in ("estante.png", "estante_bis.jpg", "nevera.png")]
+
+    resultados = procesador.detect_ingredients_batch(rutas)
+    assert llamadas == ["estante.png", "nevera.png"]
+    assert resultados[1] is resultados[0]
+    assert procesador.merge_ingredient_lists(resultados).ingredientes[0].confianza == 0.6
+
+    # Una sesión posterior con las mismas fotos no llama a la API
+    procesador.detect_ingredients_batch(list(reversed(rutas)))
+    assert len(llamadas) == 2
+    assert procesador.get_dedup_stats() == {
+        'imagenes': 6, 'duplicadas_sesion': 2, 'aciertos_cache': 2, 'entradas': 2, 'llamadas_evitadas': 4
+    }
+
+def test_filtro_de_calidad_local(tmp_path):
+    """Prueba que las fotos borrosas, oscuras o sin color no llegan a la API."""
+    from services.image_quality import ImageQualityGate
+
+    rng = np.random.default_rng(3)
+    nitida = crear_imagen(tmp_path / "base.png", 3)
+    for _ in range(80):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        centro = (int(rng.integers(0, 640)), int(rng.integers(0, 480)))
+        cv2.circle(nitida, centro, int(rng.integers(5, 40)), color, -1)
+
+    casos = {
+        "nitida.png": (nitida, []),
+        "borrosa.png": (cv2.GaussianBlur(nitida, (0, 0), 8), ['borrosa']),
+        "oscura.png": ((nitida * 0.1).astype(np.uint8), ['borrosa', 'oscura', 'exposicion_recortada', 'sin_comida_aparente']),
+        "gris.png": (cv2.cvtColor(cv2.cvtColor(nitida, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR), ['sin_comida_aparente'])
+    }
+    filtro = ImageQualityGate(modo='rechazar', modo_comida='rechazar')
+    for nombre, (imagen, motivos) in casos.items():
+        cv2.imwrite(str(tmp_path / nombre), imagen)
+        resultado = filtro.evaluar_archivo(str(tmp_path / nombre))
+        assert resultado['motivos'] == motivos, nombre
+        assert resultado['aceptada'] == (not motivos)
+
+    assert filtro.obtener_estadisticas()['rechazadas'] == 3
+    assert ImageQualityGate(modo='avisar').evaluar(casos["gris.png"][0])['aceptada']
+
+    # Los alimentos pálidos (arroz y huevos sobre un plato blanco) solo generan un aviso por defecto
+    palida = np.full((480, 640, 3), (190, 198, 205), dtype=np.uint8)
+    for _ in range(60):
+        centro = (int(rng.integers(0, 640)), int(rng.integers(0, 480)))
+        tono = tuple(int(c) for c in rng.integers(160, 240, 3))
+        cv2.ellipse(palida, centro, (int(rng.integers(6, 30)), int(rng.integers(4, 18))), int(rng.integers(0, 180)), 0, 360, tono, -1)
+        cv2.ellipse(palida, centro, (int(rng.integers(6, 30)), int(rng.integers(4, 18))), 0, 0, 360, (120, 140, 150), 1)
+    evaluacion = ImageQualityGate(modo='rechazar').evaluar(palida)
+    assert evaluacion['motivos'] == ['sin_comida_aparente'] and evaluacion['aceptada']
+    assert not ImageQualityGate(modo='rechazar', modo_comida='rechazar').evaluar(palida)['aceptada']
+
+    # El filtro actúa antes de preprocesar la imagen y de llamar a la API
+    procesador = crear_procesador(quality_gate=filtro)
+    procesador.validate_image = lambda image_path: True
+    procesador.preprocess_image = lambda image_path: pytest.fail("No debe preprocesarse una imagen descartada")
+    resultado = procesador.detect_ingredients(str(tmp_path / "borrosa.png"))
+    assert resultado.error == "Imagen descartada por calidad: borrosa" and resultado.calidad_imagen == "baja"
+
+def crear_modelo_local(directorio):
+    """
+    Crea un clasificador Darknet de 3 clases que OpenCV DNN ejecuta en CPU.
+
+    Cada clase puntúa la intensidad media de un canal RGB, de modo que una
+    foto roja se clasifica como la primera clase.
+    """
+    (directorio / "modelo.cfg").write_text(
+        "[net]\nbatch=1\nwidth=8\nheight=8\nchannels=3\n\n"
+        "[convolutional]\nfilters=3\nsize=8\nstride=8\npad=0\nactivation=linear\n\n[softmax]\n"
+    )
+    pesos = np.zeros((3, 3, 8, 8), dtype=np.float32)
+    for clase in range(3):
+        pesos[clase, clase] = 10 / 64
+    with open(directorio / "modelo.weights", "wb") as f:
+        f.write(np.array([0, 2, 0], dtype=np.int32).tobytes() + np.zeros(1, dtype=np.int64).tobytes())
+        f.write(np.zeros(3, dtype=np.float32).tobytes() + pesos.tobytes())
+    (directorio / "etiquetas.txt").write_text("tomato\nlettuce;lechuga romana\nbackground\n")
+
+def test_detector_local_offline(tmp_path):
+    """Prueba la detección local por lotes y su uso como primera pasada."""
+    from services.detectors import DetectorIngredientes
+    from services.local_detector import LocalDetector, cargar_modelo
+
+    # Un detector sin todos los métodos de la interfaz falla al crearse, no al usarse
+    class DetectorIncompleto(DetectorIngredientes):
+        def disponible(self):
+            return True
+    with pytest.raises(TypeError):
+        DetectorIncompleto()
+
+    crear_modelo_local(tmp_path)
+    colores = {"tomates.png": (0, 0, 230), "lechugas.png": (0, 230, 0), "vacia.png": (230, 0, 0)}
+    rutas = []
+    for nombre, color in colores.items():
+        cv2.imwrite(str(tmp_path / nombre), np.full((480, 640, 3), color, dtype=np.uint8))
+        rutas.append(str(tmp_path / nombre))
+
+    local = LocalDetector(
+        ruta_modelo=str(tmp_path / "modelo.weights"), ruta_etiquetas=str(tmp_path / "etiquetas.txt"),
+        ruta_config=str(tmp_path / "modelo.cfg"), tamano_entrada=8, normalizacion='unitaria',
+        activacion='ninguna', tamano_lote=2, confianza_minima=0.5,
+        categorizar=lambda nombre: 'vegetal'
+    )
+    assert local.disponible()
+    resultados = local.detectar_lote(rutas)
+    assert [[i.nombre for i in r.ingredientes] for r in resultados] == [["tomate"], ["lechuga romana"], []]
+    assert resultados[0].ingredientes[0].confianza > 0.9 and resultados[0].ingredientes[0].categoria == 'vegetal'
+    assert local.obtener_estadisticas()['lotes'] == 2
+    assert cargar_modelo(local.ruta_modelo, local.ruta_config) is cargar_modelo(local.ruta_modelo, local.ruta_config)
+
+    # Las clases del mismo ingrediente (mayúsculas, plurales) se cuentan una vez con la mejor puntuación
+    lista = local._crear_lista(np.array([0.7, 0.9, 0.8, 0.6]), ["Tomate", "tomate", "Tomates ", "Lechuga"])
+    assert [(i.nombre, i.confianza) for i in lista.ingredientes] == [("tomate", 0.9), ("lechuga", 0.6)]
+
+    # Primera pasada local por lotes: solo la imagen sin ingredientes llega a la API
+    llamadas = []
+    procesador = crear_procesador(quality_gate=None, hash_index=None, detection_backend='local_primero')
+    procesador.registrar_detector(local)
+    procesador.validate_image = lambda image_path: True
+    procesador.detect_ingredients_openai = lambda image_path: llamadas.append(image_path) or ListaIngredientes(
+        ingredientes=[Ingrediente(nombre="queso", confianza=0.8)]
+    )
+    resultados = procesador.detect_ingredients_batch(rutas)
+    assert [r.ingredientes[0].nombre for r in resultados] == ["tomate", "lechuga romana", "queso"]
+    assert llamadas == [rutas[2]] and local.obtener_estadisticas()['lotes'] == 4
+
+    # Sin red ni clientes de API, el modelo local sirve como respaldo completo
+    procesador.openai_client = None
+    procesador.detection_backend = 'respaldo_local'
+    assert procesador.detect_ingredients(rutas[0]).ingredientes[0].nombre == "tomate"
+    procesador.detection_backend = 'api'
+    assert procesador.detect_ingredients(rutas[0]).error == "No hay servicios de detección disponibles"
+
+def test_mosaico_de_regiones_para_fotos_grandes(tmp_path):
+    """Prueba que los productos pequeños de una foto 4K se recortan en un mosaico."""
+    from services.region_proposals import RegionProposer
+    from services.response_parser import ResponseParser
+
+    rng = np.random.default_rng(5)
+    despensa = cv2.add(np.full((3000, 4000, 3), (170, 180, 190), dtype=np.uint8), rng.integers(0, 12, (3000, 4000, 3), dtype=np.uint8))
+    productos = [(600, 500, (0, 0, 220)), (3200, 700, (0, 200, 0)), (1800, 2300, (0, 160, 230))]
+    for x, y, color in productos:
+        cv2.circle(despensa, (x, y), 120, color, -1)
+    cv2.imwrite(str(tmp_path / "despensa.jpg"), despensa)
+
+    proponedor = RegionProposer(lado_tesela=512, max_teselas=4, area_minima=0.005, lado_minimo_imagen=2000)
+    cajas = proponedor.proponer(despensa)
+    assert len(cajas) == 3
+    for x, y, _ in productos:
+        assert any(cx <= x < cx + w and cy <= y < cy + h for cx, cy, w, h in cajas)
+    assert all(w * h < 0.05 * 4000 * 3000 for _, _, w, h in cajas)
+
+    # Cada recorte ocupa una tesela: el mosaico no cuesta más que la foto entera
+    mosaico, celdas = proponedor.preparar(despensa)
+    assert mosaico.shape == (512, 2048, 3) and celdas[0] == (0, 0, 4000, 3000)
+    assert RegionProposer.teselas_estimadas(2048, 512) <= RegionProposer.teselas_estimadas(4000, 3000)
+    assert proponedor.preparar(cv2.resize(despensa, (1000, 750))) is None
+
+    # Las detecciones del mosaico se asignan a las zonas de la foto original
+    respuesta = {"ingredientes": [
+        {"nombre": "Tomate", "confianza": 0.9, "region": 1},
+        {"nombre": "pepino", "confianza": 0.8, "region": 2},
+        {"nombre": "naranja", "confianza": 0.7, "region": "9"}
+    ]}
+    peticiones = []
+    def crear(**kwargs):
+        peticiones.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(respuesta)))])
+
+    procesador = crear_procesador(region_proposer=proponedor, response_parser=ResponseParser())
+    procesador.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=crear)))
+    resultado = procesador.detect_ingredients_openai(str(tmp_path / "despensa.jpg"))
+
+    texto, imagen = peticiones[0]["messages"][0]["content"]
+    assert "4 recuadros" in texto["text"]
+    enviado = cv2.imdecode(np.frombuffer(base64.b64decode(imagen["image_url"]["url"].split(",", 1)[1]), np.uint8), cv2.IMREAD_COLOR)
+    assert enviado.shape == (512, 2048, 3)
+    assert resultado.obtener_nombres() == ["tomate", "pepino", "naranja"]
+    assert [(r.indice, r.caja, r.ingredientes) for r in resultado.regiones] == [
+        (0, [0, 0, 4000, 3000], ["naranja"]), (1, list(celdas[1]), ["tomate"]), (2, list(celdas[2]), ["pepino"])
+    ]
+
+    # Las zonas llegan a los ingredientes fusionados y el historial las conserva
+    from models.ingredient_store import HistorialIngredientes
+    from services.ingredient_fusion import IngredientFusion
+
+    procesador.ingredient_fusion = IngredientFusion()
+    otra_foto = ListaIngredientes(ingredientes=[Ingrediente(nombre="tomates", confianza=0.5)])
+    fusionada = procesador.merge_ingredient_lists([otra_foto, resultado])
+    tomate, pepino, naranja = [fusionada.ingredientes[i] for i in (0, 1, 2)]
+    assert tomate.imagenes == [0, 1] and tomate.regiones == [(1, list(celdas[1]))]
+    assert pepino.regiones == [(1, list(celdas[2]))] and naranja.regiones == [(1, [0, 0, 4000, 3000])]
+    assert tomate.to_dict()["regiones"] == [[1, list(celdas[1])]]
+
+    historial = HistorialIngredientes.desde_listas([resultado, fusionada])
+    assert historial.obtener(0).model_dump() == resultado.model_dump()
+    assert [i.to_dict() for i in historial.obtener(1).ingredientes] == [i.to_dict() for i in fusionada.ingredientes]
+
+def test_pool_de_preprocesamiento_a_disco(tmp_path):
+    """Prueba que el pool guarda lo mismo que el preprocesamiento secuencial."""
+    from services.preprocessing_pool import PreprocessingPool, leer_para_preprocesar, preprocesar_imagen
+
+    rutas = [str(tmp_path / "grande.jpg"), str(tmp_path / "mediana.png"), str(tmp_path / "rota.jpg")]
+    crear_imagen(rutas[0], 7, tamano=(1800, 2400))
+    crear_imagen(rutas[1], 8)
+    Path(rutas[2]).write_bytes(b"no es una imagen")
+
+    with PreprocessingPool(procesos=2, lote_minimo=2) as pool:
+        assert pool.usa_procesos(3) and not pool.usa_procesos(1)
+        paralelas = pool.preprocesar_a_disco(rutas, str(tmp_path / "paralelo"))
+        assert paralelas[2] is None
+        assert cv2.imread(paralelas[0]).shape == (1080, 1440, 3) and cv2.imread(paralelas[1]).shape == (480, 640, 3)
+
+        secuenciales = pool.preprocesar_a_disco(rutas[:1], str(tmp_path / "secuencial"))
+        assert np.array_equal(cv2.imread(paralelas[0]), cv2.imread(secuenciales[0]))
+        esperada = cv2.cvtColor(preprocesar_imagen(leer_para_preprocesar(rutas[0])), cv2.COLOR_RGB2BGR)
+        assert np.abs(cv2.imread(paralelas[0]).astype(int) - esperada).mean() < 3
+        assert pool.obtener_estadisticas()['lotes_paralelos'] == 1
+
+    # La detección no preprocesa (los detectores leen el original) y las
+    # imágenes que no se pueden decodificar no llegan a la API
+    llamadas = []
+    procesador = crear_procesador(quality_gate=None, hash_index=None)
+    procesador.preprocess_image = lambda image_path: pytest.fail("La detección no debe preprocesar")
+    procesador.detect_ingredients_openai = lambda image_path: llamadas.append(image_path) or ListaIngredientes(
+        ingredientes=[Ingrediente(nombre="pan", confianza=0.9)]
+    )
+    resultados = procesador.detect_ingredients_batch(rutas)
+    assert llamadas == rutas[:2]
+    assert resultados[2].error == "Imagen no válida"
+
+def test_lectura_mapeada_y_presupuesto_de_memoria(tmp_path):
+    """Prueba la lectura desde mmap, el base64 por bloques y el presupuesto de memoria."""
+    import threading
+    from utils.image_io import MemoryBudget, codificar_base64, iter_base64, leer_bytes, leer_imagen
+
+    ruta = str(tmp_path / "foto.jpg")
+    crear_imagen(ruta, 9)
+    assert np.array_equal(leer_imagen(ruta), cv2.imread(ruta))
+    assert np.array_equal(leer_imagen(ruta, cv2.IMREAD_REDUCED_GRAYSCALE_4), cv2.imread(ruta, cv2.IMREAD_REDUCED_GRAYSCALE_4))
+    (tmp_path / "vacia.jpg").write_bytes(b"")
+    assert leer_imagen(str(tmp_path / "vacia.jpg")) is None and leer_imagen(str(tmp_path / "no_existe.jpg")) is None
+
+    contenido = Path(ruta).read_bytes()
+    assert leer_bytes(ruta) == contenido
+    assert codificar_base64(ruta) == base64.b64encode(contenido).decode('ascii')
+    assert b"".join(iter_base64(ruta, tamano_bloque=1000)) == base64.b64encode(contenido)
+
+    # Una reserva espera hasta que las que hay en vuelo dejan sitio
+    presupuesto = MemoryBudget(limite=100)
+    dentro, liberar = threading.Event(), threading.Event()
+
+    def ocupar():
+        with presupuesto.reservar(80):
+            dentro.set()
+            liberar.wait()
+
+    hilo = threading.Thread(target=ocupar)
+    hilo.start()
+    dentro.wait()
+    concedida = []
+
+    def esperar():
+        with presupuesto.reservar(50):
+            concedida.append(presupuesto.en_vuelo)
+
+    segundo = threading.Thread(target=esperar)
+    segundo.start()
+    segundo.join(0.2)
+    assert not concedida
+    liberar.set()
+    hilo.join()
+    segundo.join()
+    assert concedida == [50] and presupuesto.en_vuelo == 0
+
+    # Una reserva mayor que el límite se concede si no hay otras en vuelo
+    with MemoryBudget(limite=10).reservar(50):
+        pass
+    assert presupuesto.obtener_estadisticas()['esperas'] == 1
+
+def test_cabecera_y_lectura_reducida_de_jpeg(tmp_path):
+    """Prueba que los metadatos salen de la cabecera y los JPEG se decodifican ya reducidos."""
+    from services.preprocessing_pool import leer_para_preprocesar
+    from utils.helpers import Helpers
+    from utils.image_io import factor_reduccion, leer_cabecera, leer_reducida
+
+    ruta = str(tmp_path / "foto.jpg")
+    crear_imagen(ruta, 10, tamano=(1200, 1600))
+    crear_imagen(tmp_path / "foto.png", 10, tamano=(1200, 1600))
+
+    cabecera = leer_cabecera(ruta)
+    assert (cabecera.ancho, cabecera.alto, cabecera.formato) == (1600, 1200, "JPEG")
+    assert leer_cabecera(ruta) is cabecera
+    info = Helpers.get_image_info(ruta)
+    assert (info['width'], info['height'], info['format'], info['aspect_ratio']) == (1600, 1200, "JPEG", 1.33)
+    assert crear_procesador().validate_image(ruta)
+
+    assert factor_reduccion(1600, 1200, 400, 300) == 4 and factor_reduccion(1200, 1600, 400, 301) == 2
+    assert factor_reduccion(640, 480, 640) == 1
+    assert leer_reducida(ruta, 400, 300).shape == (300, 400, 3)
+    assert leer_reducida(ruta, 100, gris=True).shape == (150, 200)
+    assert leer_reducida(str(tmp_path / "foto.png"), 400, 300).shape == (1200, 1600, 3)
+
+    # La lectura para preprocesar no baja de la resolución preprocesada
+    assert leer_para_preprocesar(ruta).shape == (1200, 1600, 3)
+    crear_imagen(ruta, 11, tamano=(2400, 3200))
+    assert leer_cabecera(ruta).ancho == 3200
+    assert leer_para_preprocesar(ruta).shape == (1200, 1600, 3)
+
+def test_formato_por_contenido_y_transcodificacion(tmp_path):
+    """Prueba la detección del formato por los bytes iniciales y la preparación para subir."""
+    from utils.image_io import detectar_formato, formato_decodificable, leer_imagen, pillow_heif, transcodificar
+    from utils.validators import Validators
+
+    original = crear_imagen(tmp_path / "foto.png", 12)
+    cv2.imwrite(str(tmp_path / "foto.webp"), original, [cv2.IMWRITE_WEBP_QUALITY, 101])
+    Path(tmp_path / "jpeg_con_otra_extension.png").write_bytes(cv2.imencode(".jpg", original)[1].tobytes())
+    (tmp_path / "iphone.heic").write_bytes(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00mif1heic" + bytes(64))
+    (tmp_path / "texto.jpg").write_text("no es una imagen")
+
+    formatos = [detectar_formato(str(tmp_path / n)) for n in ("foto.png", "foto.webp", "jpeg_con_otra_extension.png", "iphone.heic", "texto.jpg")]
+    assert formatos == ["PNG", "WEBP", "JPEG", "HEIC", None]
+    assert np.array_equal(leer_imagen(str(tmp_path / "foto.webp")), original)
+
+    procesador = crear_procesador()
+    assert procesador.validate_image(str(tmp_path / "jpeg_con_otra_extension.png"))
+    assert not procesador.validate_image(str(tmp_path / "texto.jpg"))
+    assert Validators.validate_image_file(str(tmp_path / "jpeg_con_otra_extension.png"))['warnings']
+    assert procesador.encode_image_for_upload(str(tmp_path / "foto.webp"))[1] == "image/webp"
+    if pillow_heif is None:
+        assert not formato_decodificable("HEIC") and not procesador.validate_image(str(tmp_path / "iphone.heic"))
+        assert "pillow-heif" in Validators.validate_image_file(str(tmp_path / "iphone.heic"))['errors'][0]
+
+    # Transcodificación a un formato compacto limitando el lado mayor
+    datos = transcodificar(str(tmp_path / "foto.png"), formato="WEBP", calidad=80, lado_maximo=320)
+    assert datos[:4] == b"RIFF" and cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_COLOR).shape == (240, 320, 3)
+    assert transcodificar(str(tmp_path / "foto.png"), formato="JPEG")[:3] == b"\xff\xd8\xff"
+
+def test_orientacion_exif_y_subida_sin_metadatos(tmp_path):
+    """Prueba que las fotos se suben orientadas y sin metadatos."""
+    from PIL import Image, ImageOps
+    from utils.image_io import _base64_por_bloques, bytes_para_subida, leer_imagen, obtener_estadisticas_subida
+    from utils.image_metadata import fragmentos_sin_metadatos, orientacion_exif
+
+    original = crear_imagen(tmp_path / "base.png", 13, tamano=(240, 320))
+    foto = Image.fromarray(cv2.cvtColor(original, cv2.COLOR_BGR2RGB))
+    miniatura = foto.resize((80, 60))
+    miniatura.save(tmp_path / "miniatura.jpg")
+
+    # El decodificador aplica la orientación EXIF (1-8) igual que PIL en todos los formatos
+    for orientacion in range(1, 9):
+        exif = Image.Exif()
+        exif[0x0112] = orientacion
+        for nombre, opciones in (("foto.jpg", {"quality": 95}), ("foto.png", {}), ("foto.webp", {"lossless": True, "method": 0})):
+            ruta = tmp_path / f"{orientacion}_{nombre}"
+            foto.save(ruta, exif=exif.tobytes(), **opciones)
+            formato = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP"}[nombre.split(".")[1]]
+            assert orientacion_exif(ruta.read_bytes(), formato) == orientacion
+            with Image.open(ruta) as img:
+                esperada = cv2.cvtColor(np.asarray(ImageOps.exif_transpose(img).convert("RGB")), cv2.COLOR_RGB2BGR)
+            leida = leer_imagen(str(ruta))
+            assert leida.shape == esperada.shape
+            if formato != "JPEG":
+                assert np.array_equal(leida, esperada)
+
+    # Una foto derecha se sube sin EXIF ni comentarios y con los mismos píxeles
+    exif = Image.Exif()
+    exif[0x010F] = "Fabricante"
+    ruta = tmp_path / "derecha.jpg"
+    foto.save(ruta, quality=95, exif=exif.tobytes() + (tmp_path / "miniatura.jpg").read_bytes(), comment=b"x" * 5000)
+    contenido = ruta.read_bytes()
+    limpio = b"".join(fragmentos_sin_metadatos(contenido, "JPEG"))
+    assert len(limpio) < len(contenido) - 5000 and b"Exif" not in limpio and b"Fabricante" not in limpio
+    assert np.array_equal(cv2.imdecode(np.frombuffer(limpio, np.uint8), cv2.IMREAD_COLOR), cv2.imread(str(ruta)))
+
+    antes = obtener_estadisticas_subida()
+    procesador = crear_procesador()
+    codificada, tipo_mime = procesador.encode_image_for_upload(str(ruta))
+    assert tipo_mime == "image/jpeg" and base64.b64decode(codificada) == limpio == bytes_para_subida(str(ruta))
+    despues = obtener_estadisticas_subida()
+    assert despues['bytes_ahorrados'] - antes['bytes_ahorrados'] == 2 * (len(contenido) - len(limpio))
+
+    # Una foto girada se transcodifica ya orientada; un WebP conserva un RIFF válido sin EXIF
+    girada = base64.b64decode(procesador.encode_image_to_base64(str(tmp_path / "6_foto.jpg")))
+    assert orientacion_exif(girada, "JPEG") == 1 and cv2.imdecode(np.frombuffer(girada, np.uint8), cv2.IMREAD_COLOR).shape == (320, 240, 3)
+    webp = b"".join(fragmentos_sin_metadatos((tmp_path / "1_foto.webp").read_bytes(), "WEBP"))
+    assert int.from_bytes(webp[4:8], "little") == len(webp) - 8 and b"EXIF" not in webp
+    assert np.array_equal(cv2.imdecode(np.frombuffer(webp, np.uint8), cv2.IMREAD_COLOR), original)
+    assert obtener_estadisticas_subida()['transcodificadas'] == despues['transcodificadas'] + 1
+
+    # El base64 por bloques no depende de cómo se parten los fragmentos
+    datos = bytes(range(256)) * 3
+    partes = [memoryview(datos)[:5], datos[5:6], memoryview(datos)[6:500], datos[500:]]
+    assert b"".join(_base64_por_bloques(partes, tamano_bloque=7)) == base64.b64encode(datos)
+
+def test_subidas_transcodificadas_concurrentes_con_presupuesto(tmp_path, monkeypatch):
+    """Prueba que las subidas que transcodifican no se bloquean esperando a su propia reserva."""
+    import threading
+    from PIL import Image
+    from utils import image_io
+    from utils.image_io import MemoryBudget, bytes_para_subida, codificar_para_subida, pillow_heif
+
+    rng = np.random.default_rng(5)
+    foto = Image.fromarray(rng.integers(0, 256, (1200, 1600, 3), dtype=np.uint8))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    girada = tmp_path / "girada.jpg"
+    foto.save(girada, quality=95, exif=exif.tobytes())
+    heic = tmp_path / "iphone.heic"
+    if pillow_heif is not None:
+        pillow_heif.from_pillow(foto).save(str(heic))
+    else:
+        heic.write_bytes(b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00mif1heic" + bytes(64))
+
+    resultados = []
+
+    def subir(ruta):
+        resultados.append((bytes_para_subida(ruta), codificar_para_subida(ruta)))
+
+    def subir_en_hilos(rutas, limite):
+        presupuesto = MemoryBudget(limite=limite)
+        monkeypatch.setattr(image_io, "presupuesto_imagenes", presupuesto)
+        hilos = [threading.Thread(target=subir, args=(str(ruta),), daemon=True) for ruta in rutas]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join(timeout=60)
+        assert not any(hilo.is_alive() for hilo in hilos) and presupuesto.en_vuelo == 0
+
+    # Un presupuesto menor que una sola subida no bloquea a un hilo solo
+    subir_en_hilos([girada], 1024 * 1024)
+    assert cv2.imdecode(np.frombuffer(resultados[0][0], np.uint8), cv2.IMREAD_COLOR).shape == (1600, 1200, 3)
+
+    # Varios hilos subiendo fotos giradas y HEIC terminan y liberan todo el presupuesto
+    subir_en_hilos([girada, heic] * 5, 8 * 1024 * 1024)
+    assert len(resultados) == 11
+    assert sum(1 for datos, codificada in resultados if datos is not None and codificada[1] == "image/jpeg") >= 5
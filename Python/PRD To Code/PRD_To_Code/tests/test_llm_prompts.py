@@ -0,0 +1,225 @@
+"""
+Pruebas de las plantillas de prompts, la contabilidad de tokens y el parseo de respuestas.
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.prompts import PromptTemplates
+from config.settings import settings
+from services.token_budget import TokenBudget
+
+def crear_prompt_principal(**kwargs):
+    """Genera el prompt principal con datos de prueba."""
+    return PromptTemplates.get_main_recipe_prompt(
+        ingredientes_detectados=[{'nombre': 'tomate', 'confianza': 0.9}, {'nombre': 'queso', 'confianza': 0.8}],
+        ingredientes_basicos=["sal", "aceite de oliva"],
+        restricciones_dieteticas=[],
+        tiempo_disponible=30,
+        nivel_experiencia="intermedio",
+        **kwargs
+    )
+
+def test_prompt_compacto_reduce_tokens():
+    """Prueba que la variante compacta conserva los datos con menos tokens."""
+    budget = TokenBudget()
+    completo = crear_prompt_principal(compacto=False)
+    compacto = crear_prompt_principal(compacto=True)
+
+    assert "tomate" in compacto
+    assert "EXACTAMENTE 5 recetas" in compacto
+    assert "VALIDACIONES OBLIGATORIAS" not in compacto
+    assert budget.contar(compacto) < budget.contar(completo) * 0.7
+
+def test_max_tokens_segun_recetas():
+    """Prueba que max_tokens crece con las recetas pedidas sin superar el máximo."""
+    budget = TokenBudget()
+
+    assert budget.max_tokens_para_recetas(1) < budget.max_tokens_para_recetas(3)
+    assert budget.max_tokens_para_recetas(100) == settings.MAX_COMPLETION_TOKENS
+    assert budget.max_tokens_para_recetas(budget.max_recetas_por_respuesta()) <= settings.MAX_COMPLETION_TOKENS
+
+def test_registro_de_uso_por_plantilla():
+    """Prueba que el uso se toma de la API y, si falta, se calcula localmente."""
+    budget = TokenBudget()
+    mensajes = [{'role': 'user', 'content': 'Genera una receta'}]
+
+    budget.registrar_uso('principal', mensajes, '{}', SimpleNamespace(prompt_tokens=120, completion_tokens=800))
+    budget.registrar_uso('principal', mensajes, '{}', SimpleNamespace(prompt_tokens=80, completion_tokens=400))
+    uso = budget.registrar_uso('relleno', mensajes, '{"recetas": []}')
+
+    estadisticas = budget.obtener_estadisticas()
+    assert estadisticas['principal']['llamadas'] == 2
+    assert estadisticas['principal']['prompt_tokens_medio'] == 100
+    assert estadisticas['principal']['completion_tokens'] == 1200
+    assert uso['prompt_tokens'] > 0 and uso['completion_tokens'] > 0
+
+def test_prefijo_estable_entre_llamadas():
+    """Prueba que el prefijo estático no cambia con los datos de la sesión."""
+    for compacto in (False, True):
+        prefijo = PromptTemplates.get_recipe_prompt_prefix(compacto)
+        primero = crear_prompt_principal(compacto=compacto)
+        segundo = PromptTemplates.get_main_recipe_prompt(
+            ingredientes_detectados=[{'nombre': 'pollo', 'confianza': 0.95}],
+            ingredientes_basicos=["sal"],
+            restricciones_dieteticas=["sin_gluten"],
+            tiempo_disponible=90,
+            nivel_experiencia="avanzado",
+            num_personas=6,
+            num_recetas=8,
+            preferencias_usuario="Cocina asiática",
+            compacto=compacto
+        )
+
+        assert primero.encode('utf-8').startswith(prefijo.encode('utf-8'))
+        assert segundo.encode('utf-8').startswith(prefijo.encode('utf-8'))
+        assert "tomate" not in prefijo and "pollo" not in prefijo
+
+    relleno = PromptTemplates.get_backfill_recipe_prompt(
+        ingredientes_detectados=[{'nombre': 'tomate', 'confianza': 0.9}],
+        recetas_existentes=["Ensalada"],
+        restricciones_dieteticas=[],
+        tiempo_disponible=30,
+        nivel_experiencia="intermedio"
+    )
+    assert relleno.startswith(PromptTemplates.get_recipe_prompt_prefix(compacto=True))
+
+def test_registro_de_tokens_cacheados():
+    """Prueba que se registran los tokens de entrada servidos desde la caché."""
+    budget = TokenBudget()
+    usage = SimpleNamespace(
+        prompt_tokens=2000,
+        completion_tokens=900,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1536)
+    )
+
+    uso = budget.registrar_uso('principal', [], '{}', usage)
+
+    assert uso['cached_tokens'] == 1536
+    assert budget.obtener_estadisticas()['principal']['tasa_cache'] == 1536 / 2000
+
+def test_parser_extrae_json_con_texto_alrededor():
+    """Prueba que el parser ignora el texto y las llaves sueltas fuera del JSON."""
+    from services.response_parser import ResponseParser
+
+    parser = ResponseParser()
+    datos, modo = parser.parse('{"recetas": []}', clave_lista='recetas')
+    assert modo == "estricto" and datos == {"recetas": []}
+
+    texto = 'Nota {importante}: aquí tienes el JSON\n```json\n{"recetas": [{"id": 1}]}\n```\nBuen provecho :}'
+    datos, modo = parser.parse(texto, clave_lista='recetas')
+    assert modo == "extraido"
+    assert datos["recetas"] == [{"id": 1}]
+
+def test_parser_recupera_recetas_de_respuesta_truncada():
+    """Prueba que se recuperan las recetas completas de una respuesta cortada."""
+    from services.response_parser import ResponseParser
+
+    parser = ResponseParser()
+    texto = (
+        '{"metadata": {"total_recetas": 3, "temporada": "verano"}, "recetas": ['
+        '{"id": 1, "nombre": "Ensalada", "tags": ["rapido"]}, '
+        '{"id": 2, "nombre": "Sopa {fria}"}, '
+        '{"id": 3, "nombre": "Tort'
+    )
+    datos, modo = parser.parse(texto, clave_lista='recetas')
+
+    assert modo == "recuperado"
+    assert [receta["id"] for receta in datos["recetas"]] == [1, 2]
+    assert datos["metadata"]["temporada"] == "verano"
+
+    _, modo = parser.parse("Lo siento, no puedo ayudarte", clave_lista='recetas')
+    assert modo == "fallido"
+
+    estadisticas = parser.obtener_estadisticas()
+    assert estadisticas['respuestas'] == 2
+    assert estadisticas['objetos_recuperados'] == 2
+    assert estadisticas['tasa_recuperacion'] == 0.5
+
+def test_candidatas_repartidas_en_varios_completados():
+    """Prueba que las candidatas que no caben en una respuesta se piden en completados adicionales."""
+    import json
+    from models.ingredient import Ingrediente, ListaIngredientes
+    from services.llm_client import LLMClient
+    from services.response_parser import ResponseParser
+    from tests.test_recipe_generation import crear_receta
+
+    cliente = LLMClient.__new__(LLMClient)
+    cliente.model = settings.OPENAI_MODEL
+    cliente.token_budget = TokenBudget(cliente.model)
+    cliente.response_parser = ResponseParser()
+    cliente.cache = None
+    llamadas = []
+
+    def llamar(prompt, plantilla, max_tokens):
+        pedidas = (max_tokens - settings.RESPONSE_TOKEN_OVERHEAD) // settings.TOKENS_PER_RECIPE
+        inicio = 1 + sum(n for _, n in llamadas)
+        llamadas.append((plantilla, pedidas))
+        return json.dumps({"recetas": [crear_receta(i).to_dict() for i in range(inicio, inicio + pedidas)]})
+
+    cliente._call_openai_api = llamar
+    ingredientes = ListaIngredientes(ingredientes=[Ingrediente(nombre="tomate", confianza=0.9)])
+    recetas = cliente.generate_recipes(ingredientes, ["sal"], [], 30, "intermedio", num_recetas=8)
+
+    assert llamadas == [('principal', 5), ('relleno', 3)]
+    assert [receta.id for receta in recetas.recetas] == list(range(1, 9))
+    assert recetas.metadata.total_recetas == 8 and recetas.metadata.metricas['completados'] == 2
+
+def test_cache_semantica_de_ingredientes():
+    """Prueba que conjuntos de ingredientes casi iguales reutilizan la respuesta del LLM."""
+    import json
+    from models.ingredient import Ingrediente, ListaIngredientes
+    from services.llm_client import LLMClient
+    from services.response_parser import ResponseParser
+    from services.semantic_cache import SemanticCache
+    from tests.test_recipe_generation import crear_receta
+
+    cache = SemanticCache(umbral=0.85, ttl=3600)
+    assert cache.get(["tomate"]) is None
+    cache.put(["tomate", "cebolla", "ajo"], "recetas", contexto="vegano")
+    assert cache.get(["Tomates", "cebolla morada", "ajo"], contexto="vegano")[0] == "recetas"
+    assert cache.get(["tomates", "cebolla morada", "ajo"], contexto="sin gluten") is None
+    assert cache.get(["pollo", "arroz", "ajo"], contexto="vegano") is None
+    assert cache.obtener_estadisticas()['aciertos'] == 1
+
+    cliente = LLMClient.__new__(LLMClient)
+    cliente.model = settings.OPENAI_MODEL
+    cliente.token_budget = TokenBudget(cliente.model)
+    cliente.response_parser = ResponseParser()
+    cliente.cache = SemanticCache(umbral=0.85, ttl=3600)
+    llamadas = []
+    respuesta = json.dumps({"recetas": [crear_receta(1).to_dict()]})
+    cliente._call_openai_api = lambda prompt, plantilla, max_tokens: llamadas.append(plantilla) or respuesta
+
+    def generar(nombres, restricciones):
+        ingredientes = ListaIngredientes(ingredientes=[Ingrediente(nombre=n, confianza=0.9) for n in nombres])
+        return cliente.generate_recipes(ingredientes, ["sal"], restricciones, 30, "intermedio", num_recetas=1)
+
+    primera = generar(["tomate", "cebolla", "ajo"], [])
+    segunda = generar(["tomates", "cebolla morada", "ajo"], [])
+    generar(["tomates", "cebolla morada", "ajo"], ["vegano"])
+
+    assert len(llamadas) == 2
+    assert segunda.recetas == primera.recetas and 'cache' in segunda.metadata.metricas
+    assert segunda.metadata.ingredientes_utilizados == ["tomates", "cebolla morada", "ajo"]
+    assert segunda.metadata.metricas == {'cache': {'acierto': True, 'similitud': segunda.metadata.metricas['cache']['similitud']}}
+    assert segunda.metadata.tiempo_generacion >= primera.metadata.tiempo_generacion and 'cache' not in primera.metadata.metricas
+    assert cliente.get_cache_stats()['tasa_aciertos'] == 1 / 3
+
+def test_cache_semantica_no_devuelve_ingredientes_ausentes():
+    """Prueba que una entrada con más ingredientes que la consulta no es un acierto."""
+    from services.semantic_cache import SemanticCache
+
+    cache = SemanticCache(umbral=0.85, ttl=3600)
+    cache.put(["tomate", "cebolla", "ajo", "pollo"], "con pollo")
+    assert cache.vectorizar(["tomate", "cebolla", "ajo", "pollo"]) @ cache.vectorizar(["tomate", "cebolla", "ajo"]) >= 0.85
+    assert cache.get(["tomate", "cebolla", "ajo"]) is None
+
+    # Los básicos que faltan en la consulta no impiden el acierto
+    cache.put(["tomate", "cebolla", "ajo", "sal"], "con sal")
+    assert cache.get(["tomates", "cebolla", "ajo"], basicos=["sal", "aceite"])[0] == "con sal"
+    # La consulta puede tener ingredientes de más
+    assert cache.get(["tomate", "cebolla", "ajo", "pollo", "perejil"])[0] == "con pollo"
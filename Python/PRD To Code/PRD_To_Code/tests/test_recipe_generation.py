@@ -0,0 +1,367 @@
+"""
+Pruebas de la generación, filtrado y ordenación de recetas.
+"""
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.recipe import (
+    Receta, Instruccion, InformacionNutricional, IngredienteReceta,
+    NivelDificultad, TipoCocina
+)
+
+def crear_receta(recipe_id, tiempo_total=20, nivel=NivelDificultad.PRINCIPIANTE, ingredientes=None, tags=None):
+    """Crea una receta mínima para las pruebas."""
+    nombres = ingredientes or ["tomate"]
+    return Receta(
+        id=recipe_id,
+        nombre=f"Receta {recipe_id}",
+        descripcion_corta="Receta de prueba",
+        tiempo_preparacion_min=tiempo_total,
+        tiempo_coccion_min=0,
+        tiempo_total_min=tiempo_total,
+        dificultad_estrellas=2,
+        porciones=2,
+        tipo_cocina=TipoCocina.MEDITERRANEA,
+        ingredientes=[
+            IngredienteReceta(nombre=nombre, cantidad="100", unidad="g") for nombre in nombres
+        ],
+        instrucciones=[Instruccion(paso=1, accion="Mezclar todo")],
+        informacion_nutricional=InformacionNutricional(calorias_por_porcion=300),
+        nivel_dificultad=nivel,
+        tags=tags or []
+    )
+
+def test_ranker_selecciona_mejores():
+    """Prueba que el ranker devuelve las mejores recetas respetando el límite."""
+    from models.user_profile import PerfilUsuario, NivelCulinario
+    from services.recipe_ranker import RecipeRanker
+
+    perfil = PerfilUsuario(nivel_culinario=NivelCulinario.PRINCIPIANTE, tiempo_disponible=60)
+    ranker = RecipeRanker(pesos={'dificultad': 0.0, 'tiempo': 1.0, 'cobertura': 0.0, 'temporada': 0.0})
+    contexto = ranker.crear_contexto(perfil, temporada="verano")
+
+    recetas = [crear_receta(i, tiempo_total=t) for i, t in enumerate([50, 10, 40, 20, 30], 1)]
+    mejores = ranker.seleccionar_mejores(iter(recetas), 3, contexto)
+
+    assert [receta.tiempo_total_min for receta in mejores] == [10, 20, 30]
+
+def test_ranker_aplica_filtro_y_empates():
+    """Prueba que el filtro descarta recetas y los empates conservan el orden original."""
+    from models.user_profile import PerfilUsuario
+    from services.recipe_ranker import RecipeRanker
+
+    perfil = PerfilUsuario.crear_perfil_default()
+    ranker = RecipeRanker(pesos={'dificultad': 0.0, 'tiempo': 0.0, 'cobertura': 0.0, 'temporada': 0.0})
+    contexto = ranker.crear_contexto(perfil, temporada="verano")
+
+    recetas = [crear_receta(i) for i in range(1, 6)]
+    mejores = ranker.seleccionar_mejores(recetas, 10, contexto, filtro=lambda r: r.id % 2 == 1)
+
+    assert [receta.id for receta in mejores] == [1, 3, 5]
+
+def crear_coleccion(recetas):
+    """Crea una colección de recetas para las pruebas."""
+    from models.recipe import ColeccionRecetas, MetadataRecetas
+
+    metadata = MetadataRecetas(
+        total_recetas=len(recetas),
+        ingredientes_utilizados=["tomate"],
+        tiempo_generacion="2024-01-01T00:00:00",
+        temporada="verano"
+    )
+    return ColeccionRecetas(metadata=metadata, recetas=recetas)
+
+def test_planner_aumenta_candidatas_con_rechazos():
+    """Prueba que el planificador pide más candidatas cuando el perfil rechaza muchas."""
+    from models.user_profile import PerfilUsuario
+    from services.generation_planner import GenerationPlanner
+    from services.token_budget import TokenBudget
+
+    planner = GenerationPlanner()
+    perfil = PerfilUsuario.crear_perfil_default()
+    inicial = planner.calcular_num_candidatos(perfil, 5)
+
+    for _ in range(5):
+        planner.registrar_resultado(perfil, evaluadas=10, aceptadas=3)
+
+    # Las candidatas pueden superar las que caben en una respuesta (5 con la
+    # configuración por defecto); el relleno, no
+    cabe = TokenBudget().max_recetas_por_respuesta()
+    assert cabe == 5
+    assert planner.calcular_num_candidatos(perfil, 5) > inicial
+    assert cabe < planner.calcular_num_candidatos(perfil, 5) <= 10
+    assert planner.calcular_num_relleno(perfil, 8) == cabe
+
+def test_generador_completa_con_relleno():
+    """Prueba que el generador pide solo las recetas que faltan tras el filtrado."""
+    from models.ingredient import Ingrediente, ListaIngredientes
+    from models.user_profile import PerfilUsuario
+    from services.generation_planner import GenerationPlanner
+    from services.recipe_generator import RecipeGenerator
+    from services.recipe_ranker import RecipeRanker
+
+    class LLMFalso:
+        def __init__(self):
+            self.peticiones_relleno = []
+
+        def generate_backfill_recipes(self, **kwargs):
+            self.peticiones_relleno.append(kwargs)
+            return crear_coleccion([crear_receta(i, tiempo_total=15) for i in range(1, kwargs['num_recetas'] + 1)])
+
+    generador = RecipeGenerator.__new__(RecipeGenerator)
+    generador.llm_client = LLMFalso()
+    generador.recipe_ranker = RecipeRanker()
+    generador.generation_planner = GenerationPlanner()
+
+    perfil = PerfilUsuario(tiempo_disponible=30)
+    ingredientes = ListaIngredientes(ingredientes=[Ingrediente(nombre="tomate", confianza=0.9)])
+    generadas = crear_coleccion([crear_receta(1, tiempo_total=20), crear_receta(2, tiempo_total=90)])
+
+    estadisticas = {'evaluadas': 0, 'aceptadas': 0}
+    ordenadas = generador._rank_recipes(generadas, perfil, ingredientes, 3, estadisticas)
+    assert len(ordenadas.recetas) == 1
+
+    completadas = generador._backfill_recipes(ordenadas, generadas, ingredientes, perfil, 3, estadisticas)
+
+    assert len(generador.llm_client.peticiones_relleno) == 1
+    assert generador.llm_client.peticiones_relleno[0]['num_recetas'] >= 2
+    assert len(completadas.recetas) == 3
+    assert [receta.id for receta in completadas.recetas] == [1, 2, 3]
+    assert estadisticas['aceptadas'] == 1 + generador.llm_client.peticiones_relleno[0]['num_recetas']
+
+def test_restricciones_duras_en_prompt_y_filtrado():
+    """Prueba que el prompt y el filtrado aplican los mismos filtros obligatorios."""
+    from config.prompts import PromptTemplates
+    from models.user_profile import PerfilUsuario, RestriccionDietetica
+    from services.recipe_generator import RecipeGenerator
+
+    perfil = PerfilUsuario(
+        tiempo_disponible=30,
+        restricciones_dieteticas=[RestriccionDietetica.VEGETARIANO],
+        ingredientes_evitados=["Cilantro"]
+    )
+    restricciones = perfil.obtener_restricciones_duras()
+
+    prompt = PromptTemplates.get_main_recipe_prompt(
+        ingredientes_detectados=[{'nombre': 'tomate', 'confianza': 0.9}],
+        ingredientes_basicos=["sal"],
+        restricciones_dieteticas=restricciones['restricciones'],
+        tiempo_disponible=30,
+        nivel_experiencia="intermedio",
+        restricciones_duras=restricciones
+    )
+    assert "pollo" in prompt
+    assert "cilantro" in prompt
+
+    generador = RecipeGenerator.__new__(RecipeGenerator)
+    assert generador._recipe_rejection_reason(crear_receta(1, ingredientes=["pollo asado"]), restricciones) == 'restriccion_dietetica'
+    assert generador._recipe_rejection_reason(crear_receta(2, ingredientes=["cilantro picado"]), restricciones) == 'ingredientes_evitados'
+    assert generador._recipe_rejection_reason(crear_receta(3, tiempo_total=45), restricciones) == 'tiempo'
+    assert generador._recipe_rejection_reason(crear_receta(4), restricciones) is None
+
+def test_construccion_directa_y_tolerante():
+    """Prueba que las recetas válidas se validan en una pasada y las desviadas se reconstruyen."""
+    import json
+    from models.ingredient import ListaIngredientes
+    from models.recipe import ColeccionRecetas, Receta
+    from services.llm_client import LLMClient
+    from services.response_parser import ResponseParser
+
+    receta = crear_receta(7, ingredientes=["tomate", "albahaca"])
+    assert Receta.from_dict(receta.to_dict()) == receta
+
+    coleccion = ColeccionRecetas.from_dict(crear_coleccion([receta, crear_receta(8)]).to_dict())
+    assert coleccion.metadata.total_recetas == 2
+
+    lista = ListaIngredientes.from_dict({'ingredientes': [{'nombre': ' Tomate ', 'confianza': 0.9}], 'total_ingredientes': 0})
+    assert lista.total_ingredientes == 1 and lista.ingredientes[0].nombre == "tomate"
+
+    desviada = dict(receta.to_dict(), tipo_cocina="peruana")
+    del desviada["descripcion_corta"]
+    respuesta = json.dumps({"metadata": {"temporada": "verano"}, "recetas": [receta.to_dict(), desviada]})
+    cliente = LLMClient.__new__(LLMClient)
+    cliente.response_parser = ResponseParser()
+
+    resultado = cliente._parse_recipe_response(respuesta, ListaIngredientes())
+
+    assert [r.id for r in resultado.recetas] == [1, 2]
+    assert resultado.recetas[1].tipo_cocina.value == "internacional"
+    assert resultado.metadata.metricas['construccion_tolerante'] == 1
+
+def test_modo_json_solo_en_modelos_compatibles():
+    """Prueba que el modo JSON se pide solo a modelos conocidos y se abandona si la API lo rechaza."""
+    import httpx
+    from openai import BadRequestError
+    from services.response_parser import crear_completado, soporta_modo_json
+
+    assert soporta_modo_json("gpt-4o-mini") and soporta_modo_json("gpt-4-turbo-2024-04-09") and soporta_modo_json("gpt-3.5-turbo")
+    assert not soporta_modo_json("gpt-4-vision-preview") and not soporta_modo_json("gpt-3.5-turbo-16k")
+    assert not soporta_modo_json("modelo-desconocido")
+
+    peticiones = []
+    def crear(**kwargs):
+        peticiones.append(kwargs)
+        if 'response_format' in kwargs:
+            respuesta = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+            raise BadRequestError("Invalid parameter: 'response_format' of type 'json_object'", response=respuesta, body=None)
+        return "ok"
+
+    assert crear_completado(crear, "gpt-4o-2099-01-01", messages=[]) == "ok"
+    assert [('response_format' in peticion) for peticion in peticiones] == [True, False]
+    assert not soporta_modo_json("gpt-4o-2099-01-01")
+    assert crear_completado(crear, "gpt-4o-2099-01-01", messages=[]) == "ok" and len(peticiones) == 3
+
+def test_normalizacion_de_ingredientes():
+    """Prueba la forma canónica de los nombres y su uso al combinar y filtrar."""
+    from models.ingredient import Ingrediente, ListaIngredientes
+    from models.user_profile import PerfilUsuario, Alergeno
+    from services.image_processor import ImageProcessor
+    from services.ingredient_fusion import IngredientFusion
+    from utils.ingredient_normalizer import IngredientNormalizer
+
+    canonico = IngredientNormalizer.canonico
+    assert canonico("Tomates") == canonico("tomate cherry") == canonico("Jitomate") == "tomate"
+    assert canonico("Champiñones") == "champiñon" and canonico("nueces") == "nuez"
+    assert canonico("Limones") == "limon" and canonico("Cebolla morada") == "cebolla"
+    assert IngredientNormalizer.contiene("carne de res", "res")
+    assert not IngredientNormalizer.contiene("cilantro fresco", "res")
+    assert IngredientNormalizer.contiene_texto("Empanada", "pan")
+
+    procesador = ImageProcessor.__new__(ImageProcessor)
+    procesador.ingredient_fusion = IngredientFusion()
+    combinada = procesador.merge_ingredient_lists([
+        ListaIngredientes(ingredientes=[Ingrediente(nombre="Tomate", confianza=0.7), Ingrediente(nombre="ajo", confianza=0.9)]),
+        ListaIngredientes(ingredientes=[Ingrediente(nombre="tomates", confianza=0.95), Ingrediente(nombre="tomate cherry", confianza=0.5)])
+    ])
+    assert sorted(i.nombre for i in combinada.ingredientes) == ["ajo", "tomates"]
+    assert procesador._categorize_ingredient("Plátanos") == "fruta"
+    assert procesador._categorize_ingredient("cilantro fresco") == "otros"
+
+    # Los alérgenos en plural se detectan en ingredientes en singular
+    perfil = PerfilUsuario(alergenos=[Alergeno.HUEVOS])
+    assert not perfil.puede_consumir_ingrediente("Huevo")
+    assert crear_receta(1, ingredientes=["huevo"]).tiene_alergenos(["huevos"])
+
+def test_fusion_de_ingredientes_entre_imagenes():
+    """Prueba la combinación de confianzas, cantidades y procedencia entre imágenes."""
+    from models.ingredient import Ingrediente, ListaIngredientes, UnidadMedida
+    from services.ingredient_fusion import IngredientFusion
+
+    listas = [
+        ListaIngredientes(ingredientes=[
+            Ingrediente(nombre="tomate", confianza=0.6, cantidad=500, unidad=UnidadMedida.GRAMOS),
+            Ingrediente(nombre="tomates cherry", confianza=0.5, cantidad=250, unidad=UnidadMedida.GRAMOS),
+            Ingrediente(nombre="ajo", confianza=0.4, cantidad=2, unidad=UnidadMedida.UNIDADES)
+        ]),
+        ListaIngredientes(error="Imagen no válida"),
+        ListaIngredientes(ingredientes=[
+            Ingrediente(nombre="Tomates", confianza=0.7, cantidad=0.5, unidad=UnidadMedida.KILOGRAMOS, alergenos=["ninguno"]),
+            Ingrediente(nombre="ajo", confianza=0.5)
+        ]),
+        ListaIngredientes(ingredientes=[Ingrediente(nombre="ajos", confianza=0.5, cantidad=3, unidad=UnidadMedida.UNIDADES)])
+    ]
+
+    fusion = IngredientFusion(modo_cantidades='max').fusionar(listas)
+    tomate, ajo = fusion.ingredientes
+
+    # Misma imagen: confianza máxima y cantidades sumadas; entre imágenes: OR ruidoso y máximo
+    assert tomate.nombre == "tomates" and tomate.imagenes == [0, 2] and tomate.detecciones == 3
+    assert abs(tomate.confianza - (1 - 0.4 * 0.3)) < 1e-4
+    assert (tomate.cantidad, tomate.unidad) == (750.0, UnidadMedida.GRAMOS)
+    assert tomate.alergenos == ["ninguno"]
+    assert ajo.imagenes == [0, 2, 3] and abs(ajo.confianza - (1 - 0.6 * 0.5 * 0.5)) < 1e-4
+    assert (ajo.cantidad, ajo.unidad) == (3.0, UnidadMedida.UNIDADES)
+
+    suma = IngredientFusion(modo_cantidades='suma').fusionar(listas)
+    assert (suma.ingredientes[0].cantidad, suma.ingredientes[0].unidad) == (1.25, UnidadMedida.KILOGRAMOS)
+    assert suma.ingredientes[1].cantidad == 5.0
+    assert suma.ingredientes[0].to_dict()['imagenes'] == [0, 2]
+
+def test_tiempos_por_etapa_en_metadatos(tmp_path):
+    """Prueba que la generación adjunta los tiempos por etapa y exporta la traza en formato OTLP."""
+    import json
+    from types import SimpleNamespace
+    from models.ingredient import Ingrediente, ListaIngredientes
+    from services.generation_planner import GenerationPlanner
+    from services.llm_client import LLMClient
+    from services.recipe_generator import RecipeGenerator
+    from services.recipe_ranker import RecipeRanker
+    from services.response_parser import ResponseParser
+    from services.token_budget import TokenBudget
+    from utils.tracing import Tracer, tracer
+
+    respuesta = json.dumps({"metadata": {"temporada": "verano"}, "recetas": [crear_receta(i).to_dict() for i in (1, 2, 3)]})
+
+    class CompletionsFalso:
+        def create(self, **kwargs):
+            mensaje = SimpleNamespace(content=respuesta)
+            return SimpleNamespace(choices=[SimpleNamespace(message=mensaje)], usage=SimpleNamespace(prompt_tokens=900, completion_tokens=700))
+
+    class ProcesadorFalso:
+        def detect_ingredients_batch(self, image_paths, use_openai):
+            resultados = []
+            for _ in image_paths:
+                with tracer.span('vision_api', servicio='openai'):
+                    resultados.append(ListaIngredientes(ingredientes=[Ingrediente(nombre="tomate", confianza=0.9)]))
+            return resultados
+
+        def merge_ingredient_lists(self, listas):
+            return listas[0]
+
+    cliente = LLMClient.__new__(LLMClient)
+    cliente.client = SimpleNamespace(chat=SimpleNamespace(completions=CompletionsFalso()))
+    cliente.model = "gpt-4o"
+    cliente.token_budget = TokenBudget("gpt-4o")
+    cliente.response_parser = ResponseParser()
+    cliente.cache = None
+
+    generador = RecipeGenerator.__new__(RecipeGenerator)
+    generador.image_processor = ProcesadorFalso()
+    generador.llm_client = cliente
+    generador.recipe_ranker = RecipeRanker()
+    generador.generation_planner = GenerationPlanner()
+
+    exportadas = []
+    tracer.exportadores.append(exportadas.append)
+    try:
+        recetas = generador.generate_recipes_from_images(["a.jpg", "b.jpg"], max_recipes=2)
+    finally:
+        tracer.exportadores.remove(exportadas.append)
+
+    tiempos = recetas.metadata.metricas['tiempos']
+    assert {'deteccion_ingredientes', 'vision_api', 'fusion', 'generacion_llm', 'construccion_prompt',
+            'llamada_llm', 'parseo_recetas', 'filtrado_y_orden'} <= set(tiempos['etapas'])
+    spans = {span['nombre']: span for span in tiempos['spans']}
+    assert spans['llamada_llm']['padre_id'] == spans['generacion_llm']['span_id']
+    assert spans['generacion_llm']['padre_id'] == spans['generar_recetas']['span_id']
+    assert spans['llamada_llm']['atributos'] == {'modelo': 'gpt-4o', 'plantilla': 'principal', 'tokens_prompt': 900, 'tokens_respuesta': 700}
+    assert sum(1 for span in tiempos['spans'] if span['nombre'] == 'vision_api') == 2
+    assert tiempos['total_ms'] >= tiempos['etapas']['deteccion_ingredientes'] + tiempos['etapas']['generacion_llm']
+    assert len(exportadas) == 1 and exportadas[0].traza_id == tiempos['traza_id']
+
+    # Exportación OTLP/JSON y trazado desactivado
+    ruta = tmp_path / "trazas.jsonl"
+    otlp = Tracer(habilitado=True, exportacion='otlp', ruta_otlp=str(ruta))
+    with otlp.traza('generar_recetas', imagenes=1):
+        with otlp.span('vision_api', servicio='google'):
+            pass
+        try:
+            with otlp.span('llamada_llm'):
+                raise TimeoutError("sin respuesta")
+        except TimeoutError:
+            pass
+    exportada = json.loads(ruta.read_text())['resourceSpans'][0]['scopeSpans'][0]['spans']
+    raiz, vision, llm = exportada
+    assert vision['parentSpanId'] == raiz['spanId'] and len(raiz['traceId']) == 32 and len(vision['spanId']) == 16
+    assert int(vision['endTimeUnixNano']) >= int(vision['startTimeUnixNano']) >= int(raiz['startTimeUnixNano'])
+    assert vision['attributes'] == [{'key': 'servicio', 'value': {'stringValue': 'google'}}]
+    assert llm['status'] == {'code': 2, 'message': 'TimeoutError: sin respuesta'} and raiz['status'] == {'code': 1}
+
+    desactivado = Tracer(habilitado=False)
+    assert desactivado.span('a') is desactivado.span('b') and tracer.span('fuera_de_traza') is desactivado.span('c')
+    with desactivado.traza('generar_recetas') as traza:
+        pass
+    assert traza.resumen() == {}
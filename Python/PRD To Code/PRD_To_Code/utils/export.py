@@ -0,0 +1,298 @@
+"""
+Exportación en streaming de recetas y resultados a Markdown o JSON.
+Los informes se generan por fragmentos y se escriben a un destino con buffer
+(archivo, stdout o cualquier objeto con write, como una respuesta HTTP), sin
+construir el documento completo en memoria.
+"""
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, TextIO, Tuple, Union
+
+from config.settings import settings
+from utils.helpers import Helpers
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+FORMATOS_EXPORTACION = ('markdown', 'json')
+
+SEPARADOR_RECETAS = "\n---\n\n"
+
+_codificador = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+class BufferedSink:
+    """Destino de escritura que agrupa los fragmentos en bloques grandes."""
+
+    def __init__(
+        self,
+        destino: Union[str, Path, BinaryIO, TextIO, None] = None,
+        tamano_buffer: Optional[int] = None
+    ):
+        """
+        Inicializa el destino.
+
+        Args:
+            destino: Ruta de archivo, '-' o None para stdout, o un objeto con
+                write (binario o de texto), p. ej. una respuesta HTTP
+            tamano_buffer: Bytes acumulados antes de escribir
+                (por defecto settings.EXPORT_BUFFER_SIZE)
+        """
+        self.tamano_buffer = tamano_buffer or settings.EXPORT_BUFFER_SIZE
+        self._propio = False
+
+        if destino is None or destino == '-':
+            destino = sys.stdout
+        elif isinstance(destino, (str, Path)):
+            destino = open(destino, 'wb')
+            self._propio = True
+
+        self._destino = destino
+        self._texto = isinstance(destino, io.TextIOBase)
+        self._fragmentos = []
+        self._pendiente = 0
+        self.bytes_escritos = 0
+        self.escrituras = 0
+
+    def __enter__(self) -> 'BufferedSink':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, texto: str) -> None:
+        """Añade un fragmento de texto al buffer, escribiendo si se llena."""
+        fragmento = texto.encode('utf-8')
+        self._fragmentos.append(fragmento)
+        self._pendiente += len(fragmento)
+        if self._pendiente >= self.tamano_buffer:
+            self.flush()
+
+    def writelines(self, fragmentos: Iterable[str]) -> None:
+        """Añade todos los fragmentos de un iterable."""
+        for texto in fragmentos:
+            self.write(texto)
+
+    def flush(self) -> None:
+        """Escribe en el destino el contenido acumulado."""
+        if not self._fragmentos:
+            return
+        bloque = b''.join(self._fragmentos)
+        self._destino.write(bloque.decode('utf-8') if self._texto else bloque)
+        self.bytes_escritos += len(bloque)
+        self.escrituras += 1
+        self._fragmentos = []
+        self._pendiente = 0
+
+    def close(self) -> None:
+        """Vacía el buffer y cierra el destino si lo abrió el propio sink."""
+        self.flush()
+        if self._propio:
+            self._destino.close()
+        elif hasattr(self._destino, 'flush'):
+            self._destino.flush()
+
+class StreamExporter:
+    """Generadores de informes y funciones para volcarlos a un destino."""
+
+    @staticmethod
+    def iter_lineas_ingredientes(ingredients: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """Genera las líneas de una lista de ingredientes."""
+        for ingredient in ingredients:
+            nombre = ingredient.get('nombre', '')
+            cantidad = ingredient.get('cantidad', '')
+            unidad = ingredient.get('unidad', '')
+
+            if cantidad and unidad:
+                yield f"• {cantidad} {unidad} de {nombre}"
+            else:
+                yield f"• {nombre}"
+
+    @staticmethod
+    def iter_lineas_instrucciones(instructions: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """Genera las líneas de una lista de instrucciones."""
+        for instruction in instructions:
+            paso = instruction.get('paso', 1)
+            accion = instruction.get('accion', '')
+            tiempo = instruction.get('tiempo_estimado', '')
+            tip = instruction.get('tip', '')
+
+            line = f"{paso}. {accion}"
+            if tiempo:
+                line += f" ({tiempo})"
+            yield line
+
+            if tip:
+                yield f"   💡 {tip}"
+
+    @staticmethod
+    def iter_receta_markdown(recipe: Dict[str, Any]) -> Iterator[str]:
+        """
+        Genera el Markdown de una receta por fragmentos.
+
+        Args:
+            recipe: Datos de la receta
+
+        Yields:
+            Fragmentos de texto Markdown
+        """
+        yield f"# {recipe.get('nombre', 'Receta')}\n\n"
+
+        # Información básica
+        yield f"**Tiempo total:** {Helpers.format_time(recipe.get('tiempo_total_min', 0))}\n"
+        yield f"**Dificultad:** {Helpers.format_difficulty(recipe.get('dificultad_estrellas', 3))}\n"
+        yield f"**Porciones:** {recipe.get('porciones', 2)}\n"
+        yield f"**Tipo de cocina:** {recipe.get('tipo_cocina', 'internacional')}\n\n"
+
+        # Descripción
+        if recipe.get('descripcion_corta'):
+            yield f"## Descripción\n\n{recipe['descripcion_corta']}\n\n"
+
+        # Ingredientes
+        yield "## Ingredientes\n\n"
+        yield from StreamExporter._unir_lineas(StreamExporter.iter_lineas_ingredientes(recipe.get('ingredientes', [])))
+        yield "\n\n"
+
+        # Instrucciones
+        yield "## Instrucciones\n\n"
+        yield from StreamExporter._unir_lineas(StreamExporter.iter_lineas_instrucciones(recipe.get('instrucciones', [])))
+        yield "\n\n"
+
+        # Información nutricional
+        info_nut = recipe.get('informacion_nutricional', {})
+        if info_nut:
+            yield "## Información Nutricional\n\n"
+            yield f"- **Calorías por porción:** {info_nut.get('calorias_por_porcion', 0)} kcal\n"
+            yield f"- **Proteínas:** {info_nut.get('proteinas_g', 0)}g\n"
+            yield f"- **Carbohidratos:** {info_nut.get('carbohidratos_g', 0)}g\n"
+            yield f"- **Grasas:** {info_nut.get('grasas_g', 0)}g\n"
+            if info_nut.get('fibra_g'):
+                yield f"- **Fibra:** {info_nut['fibra_g']}g\n"
+            yield "\n"
+
+        # Consejos del chef
+        consejos = recipe.get('consejos_chef', [])
+        if consejos:
+            yield "## Consejos del Chef\n\n"
+            for consejo in consejos:
+                yield f"- {consejo}\n"
+            yield "\n"
+
+        # Variaciones
+        variaciones = recipe.get('variaciones', [])
+        if variaciones:
+            yield "## Variaciones\n\n"
+            for variacion in variaciones:
+                yield f"- {variacion}\n"
+            yield "\n"
+
+    @staticmethod
+    def iter_recetas_markdown(recipes: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """Genera el Markdown de varias recetas separadas por una línea horizontal."""
+        for i, recipe in enumerate(recipes):
+            if i:
+                yield SEPARADOR_RECETAS
+            yield from StreamExporter.iter_receta_markdown(recipe)
+
+    @staticmethod
+    def iter_recetas_json(recipes: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """Genera un array JSON de recetas, codificando una receta cada vez."""
+        yield "["
+        for i, recipe in enumerate(recipes):
+            yield ",\n" if i else "\n"
+            yield _codificador.encode(recipe)
+        yield "\n]\n"
+
+    @staticmethod
+    def iter_resultados_markdown(resultados: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+        """Genera un informe Markdown con las recetas de cada sesión."""
+        for session_id, resultado in resultados:
+            yield f"# Sesión {session_id}\n\n"
+            ingredientes = resultado.get('ingredientes_detectados') or []
+            if ingredientes:
+                yield f"**Ingredientes detectados:** {', '.join(ingredientes)}\n\n"
+            for recipe in resultado.get('recetas', []):
+                yield SEPARADOR_RECETAS
+                yield from StreamExporter.iter_receta_markdown(recipe)
+            yield "\n"
+
+    @staticmethod
+    def iter_resultados_json(resultados: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[str]:
+        """Genera un array JSON con un objeto {session_id, resultado} por sesión."""
+        yield "["
+        for i, (session_id, resultado) in enumerate(resultados):
+            yield ",\n" if i else "\n"
+            yield _codificador.encode({'session_id': session_id, 'resultado': resultado})
+        yield "\n]\n"
+
+    @staticmethod
+    def exportar_recetas(
+        recipes: Iterable[Dict[str, Any]],
+        destino: Union[str, Path, BinaryIO, TextIO, None],
+        formato: str = 'markdown'
+    ) -> int:
+        """
+        Exporta recetas a un destino sin materializar el informe.
+
+        Args:
+            recipes: Recetas (puede ser un generador)
+            destino: Destino de BufferedSink
+            formato: 'markdown' o 'json'
+
+        Returns:
+            Bytes escritos
+        """
+        generador = {
+            'markdown': StreamExporter.iter_recetas_markdown,
+            'json': StreamExporter.iter_recetas_json
+        }[StreamExporter._validar_formato(formato)]
+        return StreamExporter._volcar(generador(recipes), destino)
+
+    @staticmethod
+    def exportar_resultados(
+        resultados: Iterable[Tuple[str, Dict[str, Any]]],
+        destino: Union[str, Path, BinaryIO, TextIO, None],
+        formato: str = 'markdown'
+    ) -> int:
+        """
+        Exporta resultados de sesiones (pares session_id, resultado) a un destino.
+
+        Args:
+            resultados: Pares (session_id, resultado), p. ej. ResultsLog.iter_results()
+            destino: Destino de BufferedSink
+            formato: 'markdown' o 'json'
+
+        Returns:
+            Bytes escritos
+        """
+        generador = {
+            'markdown': StreamExporter.iter_resultados_markdown,
+            'json': StreamExporter.iter_resultados_json
+        }[StreamExporter._validar_formato(formato)]
+        return StreamExporter._volcar(generador(resultados), destino)
+
+    @staticmethod
+    def _validar_formato(formato: str) -> str:
+        """Comprueba que el formato de exportación está soportado."""
+        formato = formato.lower()
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato de exportación no soportado: {formato}")
+        return formato
+
+    @staticmethod
+    def _volcar(fragmentos: Iterable[str], destino: Union[str, Path, BinaryIO, TextIO, None]) -> int:
+        """Escribe los fragmentos de un generador en un BufferedSink."""
+        with BufferedSink(destino) as sink:
+            sink.writelines(fragmentos)
+        logger.debug(f"Exportados {sink.bytes_escritos} bytes en {sink.escrituras} escrituras")
+        return sink.bytes_escritos
+
+    @staticmethod
+    def _unir_lineas(lineas: Iterable[str]) -> Iterator[str]:
+        """Intercala saltos de línea entre las líneas (sin salto final)."""
+        for i, linea in enumerate(lineas):
+            if i:
+                yield "\n"
+            yield linea
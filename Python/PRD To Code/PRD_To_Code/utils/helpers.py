@@ -2,7 +2,6 @@
 Funciones auxiliares para la aplicación.
 """
 import os
-import json
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -55,20 +54,22 @@ class Helpers:
         return difficulty_map.get(stars, "Intermedio")
     
     @staticmethod
-    def save_recipes_to_file(recipes: Dict[str, Any], filename: str) -> bool:
+    def save_recipes_to_file(recipes: Dict[str, Any], filename: str, formato: str = 'json') -> bool:
         """
-        Guarda recetas en un archivo JSON.
+        Guarda recetas en un archivo.
         
         Args:
             recipes: Diccionario con recetas
             filename: Nombre del archivo
+            formato: 'json' (legible), 'json_compacto' o 'binario'
             
         Returns:
             True si se guardó correctamente
         """
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(recipes, f, ensure_ascii=False, indent=2)
+            from utils.serialization import ResultSerializer
+            with open(filename, 'wb') as f:
+                f.write(ResultSerializer.dumps(recipes, formato))
             logger.info(f"Recetas guardadas en {filename}")
             return True
         except Exception as e:
@@ -78,7 +79,7 @@ class Helpers:
     @staticmethod
     def load_recipes_from_file(filename: str) -> Optional[Dict[str, Any]]:
         """
-        Carga recetas desde un archivo JSON.
+        Carga recetas desde un archivo JSON o binario (el formato se detecta).
         
         Args:
             filename: Nombre del archivo
@@ -87,8 +88,9 @@ class Helpers:
             Diccionario con recetas o None si hay error
         """
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                recipes = json.load(f)
+            from utils.serialization import ResultSerializer
+            with open(filename, 'rb') as f:
+                recipes = ResultSerializer.loads(f.read())
             logger.info(f"Recetas cargadas desde {filename}")
             return recipes
         except Exception as e:
@@ -166,18 +168,8 @@ class Helpers:
         Returns:
             Lista formateada
         """
-        formatted = []
-        for ingredient in ingredients:
-            nombre = ingredient.get('nombre', '')
-            cantidad = ingredient.get('cantidad', '')
-            unidad = ingredient.get('unidad', '')
-            
-            if cantidad and unidad:
-                formatted.append(f"• {cantidad} {unidad} de {nombre}")
-            else:
-                formatted.append(f"• {nombre}")
-        
-        return '\n'.join(formatted)
+        from utils.export import StreamExporter
+        return '\n'.join(StreamExporter.iter_lineas_ingredientes(ingredients))
     
     @staticmethod
     def format_instructions(instructions: List[Dict[str, Any]]) -> str:
@@ -190,22 +182,8 @@ class Helpers:
         Returns:
             Instrucciones formateadas
         """
-        formatted = []
-        for instruction in instructions:
-            paso = instruction.get('paso', 1)
-            accion = instruction.get('accion', '')
-            tiempo = instruction.get('tiempo_estimado', '')
-            tip = instruction.get('tip', '')
-            
-            line = f"{paso}. {accion}"
-            if tiempo:
-                line += f" ({tiempo})"
-            formatted.append(line)
-            
-            if tip:
-                formatted.append(f"   💡 {tip}")
-        
-        return '\n'.join(formatted)
+        from utils.export import StreamExporter
+        return '\n'.join(StreamExporter.iter_lineas_instrucciones(instructions))
     
     @staticmethod
     def calculate_nutritional_totals(recipes: List[Dict[str, Any]]) -> Dict[str, float]:
@@ -218,23 +196,8 @@ class Helpers:
         Returns:
             Diccionario con totales nutricionales
         """
-        totals = {
-            'calorias': 0,
-            'proteinas': 0,
-            'carbohidratos': 0,
-            'grasas': 0,
-            'fibra': 0
-        }
-        
-        for recipe in recipes:
-            info_nut = recipe.get('informacion_nutricional', {})
-            totals['calorias'] += info_nut.get('calorias_por_porcion', 0)
-            totals['proteinas'] += info_nut.get('proteinas_g', 0)
-            totals['carbohidratos'] += info_nut.get('carbohidratos_g', 0)
-            totals['grasas'] += info_nut.get('grasas_g', 0)
-            totals['fibra'] += info_nut.get('fibra_g', 0)
-        
-        return totals
+        from models.recipe_frame import RecipeFrame
+        return RecipeFrame.from_dicts(recipes).totales_nutricionales()
     
     @staticmethod
     def get_recipe_summary(recipe: Dict[str, Any]) -> str:
@@ -318,23 +281,23 @@ class Helpers:
             Diccionario con información de la imagen
         """
         try:
-            from PIL import Image
+            from utils.image_io import leer_cabecera
             
-            with Image.open(image_path) as img:
-                width, height = img.size
-                format_name = img.format
-                mode = img.mode
-                file_size = os.path.getsize(image_path)
-                
-                return {
-                    'width': width,
-                    'height': height,
-                    'format': format_name,
-                    'mode': mode,
-                    'file_size': file_size,
-                    'file_size_formatted': Helpers.format_file_size(file_size),
-                    'aspect_ratio': round(width / height, 2)
-                }
+            # Solo se lee la cabecera (compartida con la validación de la imagen)
+            cabecera = leer_cabecera(image_path)
+            if cabecera is None:
+                raise ValueError(f"No se pudo leer la cabecera de {image_path}")
+            file_size = os.path.getsize(image_path)
+            
+            return {
+                'width': cabecera.ancho,
+                'height': cabecera.alto,
+                'format': cabecera.formato,
+                'mode': cabecera.modo,
+                'file_size': file_size,
+                'file_size_formatted': Helpers.format_file_size(file_size),
+                'aspect_ratio': round(cabecera.ancho / cabecera.alto, 2)
+            }
         except Exception as e:
             logger.error(f"Error al obtener información de imagen: {e}")
             return {}
@@ -350,54 +313,5 @@ class Helpers:
         Returns:
             Contenido Markdown
         """
-        markdown = f"# {recipe.get('nombre', 'Receta')}\n\n"
-        
-        # Información básica
-        markdown += f"**Tiempo total:** {Helpers.format_time(recipe.get('tiempo_total_min', 0))}\n"
-        markdown += f"**Dificultad:** {Helpers.format_difficulty(recipe.get('dificultad_estrellas', 3))}\n"
-        markdown += f"**Porciones:** {recipe.get('porciones', 2)}\n"
-        markdown += f"**Tipo de cocina:** {recipe.get('tipo_cocina', 'internacional')}\n\n"
-        
-        # Descripción
-        if recipe.get('descripcion_corta'):
-            markdown += f"## Descripción\n\n{recipe['descripcion_corta']}\n\n"
-        
-        # Ingredientes
-        markdown += "## Ingredientes\n\n"
-        markdown += Helpers.format_ingredient_list(recipe.get('ingredientes', []))
-        markdown += "\n\n"
-        
-        # Instrucciones
-        markdown += "## Instrucciones\n\n"
-        markdown += Helpers.format_instructions(recipe.get('instrucciones', []))
-        markdown += "\n\n"
-        
-        # Información nutricional
-        info_nut = recipe.get('informacion_nutricional', {})
-        if info_nut:
-            markdown += "## Información Nutricional\n\n"
-            markdown += f"- **Calorías por porción:** {info_nut.get('calorias_por_porcion', 0)} kcal\n"
-            markdown += f"- **Proteínas:** {info_nut.get('proteinas_g', 0)}g\n"
-            markdown += f"- **Carbohidratos:** {info_nut.get('carbohidratos_g', 0)}g\n"
-            markdown += f"- **Grasas:** {info_nut.get('grasas_g', 0)}g\n"
-            if info_nut.get('fibra_g'):
-                markdown += f"- **Fibra:** {info_nut['fibra_g']}g\n"
-            markdown += "\n"
-        
-        # Consejos del chef
-        consejos = recipe.get('consejos_chef', [])
-        if consejos:
-            markdown += "## Consejos del Chef\n\n"
-            for consejo in consejos:
-                markdown += f"- {consejo}\n"
-            markdown += "\n"
-        
-        # Variaciones
-        variaciones = recipe.get('variaciones', [])
-        if variaciones:
-            markdown += "## Variaciones\n\n"
-            for variacion in variaciones:
-                markdown += f"- {variacion}\n"
-            markdown += "\n"
-        
-        return markdown
+        from utils.export import StreamExporter
+        return ''.join(StreamExporter.iter_receta_markdown(recipe))
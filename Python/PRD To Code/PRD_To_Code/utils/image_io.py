@@ -0,0 +1,597 @@
+"""
+Lectura de imágenes con memoria acotada.
+Los archivos se mapean en memoria (mmap) en lugar de leerse a un buffer:
+OpenCV decodifica directamente desde el mapeo y la codificación base64 se hace
+por bloques. Un presupuesto por proceso limita los bytes de imágenes en vuelo
+(archivo, imagen decodificada y base64) cuando hay varias sesiones a la vez.
+
+Los metadatos se obtienen solo de la cabecera (con caché por archivo) y los
+JPEG se decodifican ya reducidos a 1/2, 1/4 o 1/8 (escalado DCT de libjpeg)
+cuando el tamaño de destino lo permite.
+
+El formato se detecta por los bytes iniciales del archivo, no por la
+extensión. OpenCV decodifica JPEG, PNG y WebP; HEIC/HEIF (las fotos de iPhone)
+se decodifica con pillow-heif si está instalado, y para enviarlo a las APIs de
+visión se transcodifica a JPEG o WebP.
+
+Todas las lecturas aplican la orientación EXIF una sola vez, y lo que se sube a
+las APIs va sin metadatos (ver image_metadata): si la foto no está girada se
+quitan los segmentos de metadatos sin recomprimir; si lo está, se transcodifica
+ya orientada.
+"""
+import binascii
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+try:
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+except ImportError:
+    pillow_heif = None
+
+from config.settings import settings
+from utils.image_metadata import Fragmento, fragmentos_sin_metadatos, orientacion_exif
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Factor de reducción y canales de cada modo de lectura de OpenCV
+MODOS_LECTURA = {
+    cv2.IMREAD_COLOR: (1, 3),
+    cv2.IMREAD_GRAYSCALE: (1, 1),
+    cv2.IMREAD_REDUCED_COLOR_2: (2, 3),
+    cv2.IMREAD_REDUCED_COLOR_4: (4, 3),
+    cv2.IMREAD_REDUCED_COLOR_8: (8, 3),
+    cv2.IMREAD_REDUCED_GRAYSCALE_2: (2, 1),
+    cv2.IMREAD_REDUCED_GRAYSCALE_4: (4, 1),
+    cv2.IMREAD_REDUCED_GRAYSCALE_8: (8, 1)
+}
+
+# Modos de lectura reducida (color, gris) por factor de reducción, de mayor a menor
+LECTURA_REDUCIDA = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+)
+
+# Formatos que se decodifican más rápido a tamaño reducido (en los demás
+# OpenCV decodifica la imagen entera y la redimensiona)
+FORMATOS_ESCALABLES = ('JPEG', 'MPO')
+
+# Formato de cada extensión de archivo admitida en settings.SUPPORTED_IMAGE_FORMATS
+EXTENSIONES_FORMATO = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+    '.heic': 'HEIC',
+    '.heif': 'HEIC'
+}
+
+# Formatos que decodifica OpenCV
+FORMATOS_OPENCV = ('JPEG', 'PNG', 'WEBP')
+
+# Marcas de la caja ftyp de los archivos HEIF con imágenes HEVC
+MARCAS_HEIC = (b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1')
+
+# Tipo MIME de los formatos que aceptan las APIs de visión tal cual
+FORMATOS_SUBIDA = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp'
+}
+
+# Extensión de OpenCV y parámetro de calidad de cada formato de transcodificación
+CODIFICACION_SUBIDA = {
+    'JPEG': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'WEBP': ('.webp', cv2.IMWRITE_WEBP_QUALITY)
+}
+
+# Formatos cuya orientación EXIF no aplica OpenCV al decodificar
+FORMATOS_ORIENTACION_PROPIA = ('WEBP',)
+
+# Cabeceras de imagen que se conservan en caché
+MAX_CABECERAS = 256
+
+class CabeceraImagen(NamedTuple):
+    """Metadatos de una imagen leídos de su cabecera, sin decodificar los píxeles."""
+    ancho: int
+    alto: int
+    formato: Optional[str]
+    modo: str
+
+class MemoryBudget:
+    """Presupuesto de bytes de imágenes en vuelo compartido por los hilos de un proceso."""
+
+    def __init__(self, limite: Optional[int] = None):
+        """
+        Inicializa el presupuesto.
+
+        Args:
+            limite: Bytes en vuelo como máximo (por defecto settings.IMAGE_MEMORY_BUDGET)
+        """
+        self.limite = limite or settings.IMAGE_MEMORY_BUDGET
+        self._en_vuelo = 0
+        self._condicion = threading.Condition()
+        self._estadisticas = {'reservas': 0, 'esperas': 0, 'pico_bytes': 0, 'espera_total_s': 0.0}
+
+    @contextmanager
+    def reservar(self, num_bytes: int) -> Iterator[None]:
+        """
+        Reserva bytes durante el bloque, esperando a que haya presupuesto.
+
+        Una reserva mayor que el límite se concede cuando no hay ninguna otra
+        en vuelo, para no bloquearse indefinidamente.
+
+        Args:
+            num_bytes: Bytes que se van a ocupar
+        """
+        num_bytes = max(0, int(num_bytes))
+        with self._condicion:
+            inicio = time.perf_counter()
+            esperado = False
+            while self._en_vuelo and self._en_vuelo + num_bytes > self.limite:
+                esperado = True
+                self._condicion.wait()
+            self._en_vuelo += num_bytes
+            self._estadisticas['reservas'] += 1
+            self._estadisticas['pico_bytes'] = max(self._estadisticas['pico_bytes'], self._en_vuelo)
+            if esperado:
+                self._estadisticas['esperas'] += 1
+                self._estadisticas['espera_total_s'] += time.perf_counter() - inicio
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._en_vuelo -= num_bytes
+                self._condicion.notify_all()
+
+    @property
+    def en_vuelo(self) -> int:
+        """Bytes reservados en este momento."""
+        return self._en_vuelo
+
+    def obtener_estadisticas(self) -> Dict[str, float]:
+        """Obtiene límite, bytes en vuelo, pico, reservas y esperas."""
+        with self._condicion:
+            return {'limite': self.limite, 'en_vuelo': self._en_vuelo, **self._estadisticas}
+
+# Presupuesto compartido por todas las lecturas de este proceso
+presupuesto_imagenes = MemoryBudget()
+
+def detectar_formato(ruta: str) -> Optional[str]:
+    """
+    Detecta el formato de una imagen por sus bytes iniciales.
+
+    Returns:
+        'JPEG', 'PNG', 'WEBP', 'HEIC', 'AVIF', 'GIF', 'BMP' o 'TIFF', o None si
+        no se reconoce o no se puede leer
+    """
+    try:
+        with open(ruta, 'rb') as f:
+            inicio = f.read(64)
+    except OSError:
+        return None
+
+    if inicio.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if inicio.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if inicio[:4] == b'RIFF' and inicio[8:12] == b'WEBP':
+        return 'WEBP'
+    if inicio[4:8] == b'ftyp':
+        # Marca principal y marcas compatibles de la caja ftyp
+        fin = min(len(inicio), int.from_bytes(inicio[:4], 'big'))
+        marcas = {inicio[8:12]} | {inicio[i:i + 4] for i in range(16, fin - 3, 4)}
+        if marcas & set(MARCAS_HEIC) and inicio[8:12] not in (b'avif', b'avis'):
+            return 'HEIC'
+        if marcas & {b'avif', b'avis'}:
+            return 'AVIF'
+        return None
+    if inicio[:6] in (b'GIF87a', b'GIF89a'):
+        return 'GIF'
+    if inicio[:2] == b'BM':
+        return 'BMP'
+    if inicio[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'TIFF'
+    return None
+
+def formatos_soportados() -> Set[str]:
+    """Formatos correspondientes a las extensiones de settings.SUPPORTED_IMAGE_FORMATS."""
+    return {EXTENSIONES_FORMATO[ext] for ext in settings.SUPPORTED_IMAGE_FORMATS if ext in EXTENSIONES_FORMATO}
+
+def formato_decodificable(formato: Optional[str]) -> bool:
+    """Indica si hay un decodificador disponible para el formato."""
+    return formato in FORMATOS_OPENCV or (formato == 'HEIC' and pillow_heif is not None)
+
+_cabeceras: 'OrderedDict[Tuple[str, int, int], CabeceraImagen]' = OrderedDict()
+_lock_cabeceras = threading.Lock()
+
+def leer_cabecera(ruta: str) -> Optional[CabeceraImagen]:
+    """
+    Lee las dimensiones, el formato y el modo de una imagen sin decodificarla.
+
+    El resultado se guarda en caché por ruta, fecha de modificación y tamaño, de
+    modo que la validación, la información de la imagen y las lecturas
+    reducidas de un mismo archivo solo analizan la cabecera una vez.
+
+    Returns:
+        Cabecera de la imagen, o None si no se puede leer
+    """
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    clave = (os.path.abspath(ruta), estado.st_mtime_ns, estado.st_size)
+    with _lock_cabeceras:
+        cabecera = _cabeceras.get(clave)
+        if cabecera is not None:
+            _cabeceras.move_to_end(clave)
+            return cabecera
+    try:
+        with Image.open(ruta) as img:
+            cabecera = CabeceraImagen(img.size[0], img.size[1], img.format, img.mode)
+    except Exception:
+        return None
+    with _lock_cabeceras:
+        _cabeceras[clave] = cabecera
+        if len(_cabeceras) > MAX_CABECERAS:
+            _cabeceras.popitem(last=False)
+    return cabecera
+
+def factor_reduccion(ancho: int, alto: int, lado_mayor_minimo: int, lado_menor_minimo: int = 0) -> int:
+    """
+    Obtiene el mayor factor de reducción (8, 4 o 2) que mantiene los lados por
+    encima de los mínimos, o 1 si ninguno lo hace.
+
+    Se comparan el lado mayor y el menor para que no influya la orientación EXIF.
+    """
+    lado_mayor, lado_menor = max(ancho, alto), min(ancho, alto)
+    return next(
+        (factor for factor, _, _ in LECTURA_REDUCIDA
+         if lado_mayor // factor >= lado_mayor_minimo and lado_menor // factor >= lado_menor_minimo),
+        1
+    )
+
+@contextmanager
+def mapear_archivo(ruta: str) -> Iterator[memoryview]:
+    """
+    Mapea un archivo en memoria de solo lectura.
+
+    Las páginas las gestiona el sistema operativo (caché de disco), así que el
+    archivo no ocupa memoria del proceso aunque se lea varias veces.
+
+    Yields:
+        Vista de los bytes del archivo (vacía si el archivo está vacío)
+    """
+    with open(ruta, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield memoryview(b'')
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            vista = memoryview(mapa)
+            try:
+                yield vista
+            finally:
+                vista.release()
+
+def estimar_bytes_decodificados(ruta: str, flags: int = cv2.IMREAD_COLOR) -> int:
+    """Bytes de la imagen decodificada, según las dimensiones de la cabecera (0 si no se leen)."""
+    factor, canales = MODOS_LECTURA.get(flags, (1, 3))
+    cabecera = leer_cabecera(ruta)
+    if cabecera is None:
+        return 0
+    return -(-cabecera.ancho // factor) * -(-cabecera.alto // factor) * canales
+
+def leer_imagen(
+    ruta: str,
+    flags: int = cv2.IMREAD_COLOR,
+    presupuesto: Optional[MemoryBudget] = None,
+    reservar: bool = True
+) -> Optional[np.ndarray]:
+    """
+    Decodifica una imagen desde el archivo mapeado en memoria.
+
+    Args:
+        ruta: Ruta de la imagen
+        flags: Modo de lectura de OpenCV (IMREAD_COLOR, IMREAD_REDUCED_COLOR_4...)
+        presupuesto: Presupuesto de memoria (por defecto el del proceso)
+        reservar: Reservar la imagen decodificada en el presupuesto; False si
+            quien llama ya la tiene reservada (reservar dos veces en el mismo
+            hilo puede bloquearlo esperando a su propia reserva)
+
+    Returns:
+        Imagen decodificada, o None si no se puede leer
+    """
+    presupuesto = presupuesto or presupuesto_imagenes
+    try:
+        with presupuesto.reservar(estimar_bytes_decodificados(ruta, flags)) if reservar else nullcontext():
+            formato = detectar_formato(ruta)
+            if formato == 'HEIC':
+                return _decodificar_con_pil(ruta, flags)
+            with mapear_archivo(ruta) as datos:
+                if not len(datos):
+                    return None
+                if formato not in FORMATOS_ORIENTACION_PROPIA:
+                    return cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), flags)
+                imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+                if imagen is None or flags & cv2.IMREAD_IGNORE_ORIENTATION:
+                    return imagen
+                return aplicar_orientacion(imagen, orientacion_exif(datos, formato))
+    except (OSError, ValueError, cv2.error) as e:
+        logger.error(f"No se pudo leer la imagen {ruta}: {e}")
+        return None
+
+def aplicar_orientacion(imagen: np.ndarray, orientacion: int) -> np.ndarray:
+    """Gira o voltea una imagen según su orientación EXIF (1-8) para verla derecha."""
+    if orientacion == 2:
+        return cv2.flip(imagen, 1)
+    if orientacion == 3:
+        return cv2.rotate(imagen, cv2.ROTATE_180)
+    if orientacion == 4:
+        return cv2.flip(imagen, 0)
+    if orientacion == 5:
+        return cv2.transpose(imagen)
+    if orientacion == 6:
+        return cv2.rotate(imagen, cv2.ROTATE_90_CLOCKWISE)
+    if orientacion == 7:
+        return cv2.flip(cv2.transpose(imagen), -1)
+    if orientacion == 8:
+        return cv2.rotate(imagen, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return imagen
+
+def _decodificar_con_pil(ruta: str, flags: int) -> Optional[np.ndarray]:
+    """Decodifica con PIL (y sus plugins) una imagen que OpenCV no sabe leer, con el resultado de cv2.imdecode."""
+    if pillow_heif is None:
+        logger.error(f"Para leer imágenes HEIC hay que instalar pillow-heif: {ruta}")
+        return None
+    factor, canales = MODOS_LECTURA.get(flags, (1, 3))
+    with Image.open(ruta) as img:
+        img = ImageOps.exif_transpose(img)
+        if factor > 1:
+            img = img.reduce(factor)
+        imagen = np.asarray(img.convert('L' if canales == 1 else 'RGB'))
+    return imagen if canales == 1 else cv2.cvtColor(imagen, cv2.COLOR_RGB2BGR)
+
+def leer_reducida(
+    ruta: str,
+    lado_mayor_minimo: int,
+    lado_menor_minimo: int = 0,
+    gris: bool = False,
+    presupuesto: Optional[MemoryBudget] = None,
+    reservar: bool = True
+) -> Optional[np.ndarray]:
+    """
+    Decodifica una imagen lo más reducida posible sin bajar de un tamaño mínimo.
+
+    En los JPEG la reducción la hace libjpeg al decodificar (escalado DCT), con
+    lo que una foto de 12 MP se lee varias veces más rápido que entera; el
+    resto de formatos se decodifica a tamaño completo.
+
+    Args:
+        ruta: Ruta de la imagen
+        lado_mayor_minimo: Píxeles mínimos del lado mayor de la imagen leída
+        lado_menor_minimo: Píxeles mínimos del lado menor de la imagen leída
+        gris: Leer en escala de grises en lugar de BGR
+        presupuesto: Presupuesto de memoria (por defecto el del proceso)
+        reservar: Reservar la imagen decodificada en el presupuesto (ver leer_imagen)
+
+    Returns:
+        Imagen decodificada, o None si no se puede leer
+    """
+    return leer_imagen(ruta, _modo_reducido(ruta, lado_mayor_minimo, lado_menor_minimo, gris), presupuesto, reservar)
+
+def _modo_reducido(ruta: str, lado_mayor_minimo: int, lado_menor_minimo: int = 0, gris: bool = False) -> int:
+    """Modo de lectura de OpenCV con el que leer_reducida decodifica una imagen."""
+    cabecera = leer_cabecera(ruta)
+    factor = 1
+    if cabecera is not None and cabecera.formato in FORMATOS_ESCALABLES:
+        factor = factor_reduccion(cabecera.ancho, cabecera.alto, lado_mayor_minimo, lado_menor_minimo)
+    flags = cv2.IMREAD_GRAYSCALE if gris else cv2.IMREAD_COLOR
+    for factor_modo, modo_color, modo_gris in LECTURA_REDUCIDA:
+        if factor_modo == factor:
+            flags = modo_gris if gris else modo_color
+    return flags
+
+def leer_bytes(ruta: str, presupuesto: Optional[MemoryBudget] = None) -> bytes:
+    """
+    Lee el contenido de un archivo para un cliente que exige bytes.
+
+    La copia se contabiliza en el presupuesto mientras se crea; quien la
+    recibe es responsable de no retenerla más de lo necesario.
+    """
+    presupuesto = presupuesto or presupuesto_imagenes
+    with presupuesto.reservar(os.path.getsize(ruta)):
+        with mapear_archivo(ruta) as datos:
+            return bytes(datos)
+
+def transcodificar(
+    ruta: str,
+    formato: Optional[str] = None,
+    calidad: Optional[int] = None,
+    lado_maximo: Optional[int] = None,
+    reservar: bool = True
+) -> Optional[bytes]:
+    """
+    Transcodifica una imagen a un formato compacto que aceptan las APIs de visión.
+
+    Args:
+        ruta: Ruta de la imagen
+        formato: 'JPEG' o 'WEBP' (por defecto settings.UPLOAD_TRANSCODE_FORMAT)
+        calidad: Calidad 1-100 (por defecto settings.UPLOAD_TRANSCODE_QUALITY)
+        lado_maximo: Lado mayor máximo (por defecto settings.UPLOAD_MAX_SIDE)
+        reservar: Reservar la imagen decodificada en el presupuesto (ver leer_imagen)
+
+    Returns:
+        Bytes de la imagen codificada, o None si no se puede leer o codificar
+    """
+    formato = (formato or settings.UPLOAD_TRANSCODE_FORMAT).upper()
+    extension, parametro = CODIFICACION_SUBIDA[formato]
+    lado_maximo = lado_maximo or settings.UPLOAD_MAX_SIDE
+
+    imagen = leer_reducida(ruta, lado_maximo, reservar=reservar)
+    if imagen is None:
+        return None
+    alto, ancho = imagen.shape[:2]
+    if max(ancho, alto) > lado_maximo:
+        escala = lado_maximo / max(ancho, alto)
+        imagen = cv2.resize(imagen, (round(ancho * escala), round(alto * escala)), interpolation=cv2.INTER_AREA)
+    codificado, buffer = cv2.imencode(extension, imagen, [parametro, calidad or settings.UPLOAD_TRANSCODE_QUALITY])
+    return buffer.tobytes() if codificado else None
+
+_estadisticas_subida = {'imagenes': 0, 'transcodificadas': 0, 'bytes_originales': 0, 'bytes_enviados': 0}
+_lock_subida = threading.Lock()
+
+def _preparar_subida(
+    ruta: str,
+    consumir: Callable[[List[Fragmento]], Any],
+    bytes_resultado: int,
+    presupuesto: Optional[MemoryBudget] = None
+) -> Optional[Tuple[Any, str]]:
+    """
+    Obtiene el flujo de bytes mínimo de una imagen para las APIs de visión.
+
+    Los JPEG, PNG y WebP sin girar se envían sin sus segmentos de metadatos y
+    sin recomprimir; los girados según su EXIF y los demás formatos (HEIC) se
+    transcodifican ya orientados.
+
+    Cada camino hace una sola reserva en el presupuesto que cubre todo lo que
+    ocupa (en la transcodificación, también la imagen decodificada), sin
+    reservas anidadas que podrían esperar a la del propio hilo.
+
+    Args:
+        ruta: Ruta de la imagen
+        consumir: Función que recibe los fragmentos del flujo y devuelve el
+            resultado (se llama con el archivo mapeado, sin copiarlo)
+        bytes_resultado: Bytes que ocupa lo que crea consumir
+        presupuesto: Presupuesto de memoria (por defecto el del proceso)
+
+    Returns:
+        Tupla (resultado de consumir, tipo MIME), o None si no se puede leer
+    """
+    presupuesto = presupuesto or presupuesto_imagenes
+    formato = detectar_formato(ruta)
+    if formato in FORMATOS_SUBIDA:
+        with presupuesto.reservar(bytes_resultado), mapear_archivo(ruta) as datos:
+            if orientacion_exif(datos, formato) == 1:
+                fragmentos = fragmentos_sin_metadatos(datos, formato)
+                try:
+                    enviados = sum(len(fragmento) for fragmento in fragmentos)
+                    resultado = consumir(fragmentos)
+                finally:
+                    # Las vistas deben liberarse antes de cerrar el mapeo
+                    for fragmento in fragmentos:
+                        if isinstance(fragmento, memoryview):
+                            fragmento.release()
+                _registrar_subida(len(datos), enviados, transcodificada=False)
+                return resultado, FORMATOS_SUBIDA[formato]
+
+    decodificada = estimar_bytes_decodificados(ruta, _modo_reducido(ruta, settings.UPLOAD_MAX_SIDE))
+    with presupuesto.reservar(decodificada + bytes_resultado):
+        datos = transcodificar(ruta, reservar=False)
+        if datos is None:
+            return None
+        _registrar_subida(os.path.getsize(ruta), len(datos), transcodificada=True)
+        return consumir([datos]), FORMATOS_SUBIDA[settings.UPLOAD_TRANSCODE_FORMAT.upper()]
+
+def _registrar_subida(bytes_originales: int, bytes_enviados: int, transcodificada: bool) -> None:
+    """Acumula los bytes de una imagen preparada para subir."""
+    with _lock_subida:
+        _estadisticas_subida['imagenes'] += 1
+        _estadisticas_subida['transcodificadas'] += int(transcodificada)
+        _estadisticas_subida['bytes_originales'] += bytes_originales
+        _estadisticas_subida['bytes_enviados'] += bytes_enviados
+    if bytes_originales > bytes_enviados:
+        logger.debug(f"Imagen preparada para subir: {bytes_originales - bytes_enviados} bytes ahorrados")
+
+def obtener_estadisticas_subida() -> Dict[str, int]:
+    """Obtiene las imágenes preparadas para subir, las transcodificadas y los bytes ahorrados."""
+    with _lock_subida:
+        estadisticas = dict(_estadisticas_subida)
+    estadisticas['bytes_ahorrados'] = estadisticas['bytes_originales'] - estadisticas['bytes_enviados']
+    return estadisticas
+
+def bytes_para_subida(ruta: str, presupuesto: Optional[MemoryBudget] = None) -> Optional[bytes]:
+    """
+    Obtiene los bytes de una imagen, sin metadatos y orientada, en un formato
+    que aceptan las APIs de visión (ver _preparar_subida).
+    """
+    preparada = _preparar_subida(ruta, b''.join, os.path.getsize(ruta), presupuesto)
+    return preparada[0] if preparada else None
+
+def codificar_para_subida(ruta: str, presupuesto: Optional[MemoryBudget] = None) -> Optional[Tuple[str, str]]:
+    """
+    Codifica una imagen en base64, sin metadatos y orientada, para enviarla como
+    URL data: a una API de visión (ver _preparar_subida).
+
+    Returns:
+        Tupla (base64, tipo MIME), o None si no se puede leer
+    """
+    tamano_base64 = -(-os.path.getsize(ruta) // 3) * 4
+    return _preparar_subida(
+        ruta,
+        lambda fragmentos: b''.join(_base64_por_bloques(fragmentos)).decode('ascii'),
+        2 * tamano_base64,
+        presupuesto
+    )
+
+def _base64_por_bloques(fragmentos: Iterable[Fragmento], tamano_bloque: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Codifica en base64 la concatenación de varios fragmentos de bytes por bloques.
+
+    Los bloques tienen un múltiplo de 3 bytes para que su codificación se pueda
+    concatenar; los bytes sobrantes de un fragmento pasan al siguiente.
+    """
+    tamano_bloque = max(3, (tamano_bloque or settings.BASE64_CHUNK_SIZE) // 3 * 3)
+    resto = b''
+    for fragmento in fragmentos:
+        if resto:
+            cabeza = resto + bytes(fragmento[:3 - len(resto)])
+            fragmento = fragmento[3 - len(resto):]
+            if len(cabeza) < 3:
+                resto = cabeza
+                continue
+            yield binascii.b2a_base64(cabeza, newline=False)
+        util = len(fragmento) // 3 * 3
+        for inicio in range(0, util, tamano_bloque):
+            yield binascii.b2a_base64(fragmento[inicio:min(inicio + tamano_bloque, util)], newline=False)
+        resto = bytes(fragmento[util:])
+    if resto:
+        yield binascii.b2a_base64(resto, newline=False)
+
+def iter_base64(ruta: str, tamano_bloque: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Codifica un archivo en base64 por bloques, sin leerlo entero.
+
+    Args:
+        ruta: Ruta del archivo
+        tamano_bloque: Bytes del archivo por bloque (se redondea a múltiplo de 3
+            para que los bloques se puedan concatenar); por defecto settings.BASE64_CHUNK_SIZE
+
+    Yields:
+        Fragmentos base64 en ASCII
+    """
+    with mapear_archivo(ruta) as datos:
+        yield from _base64_por_bloques([datos], tamano_bloque)
+
+def codificar_base64(ruta: str, presupuesto: Optional[MemoryBudget] = None) -> str:
+    """
+    Codifica un archivo en base64 como texto (p. ej. para una URL data:).
+
+    El archivo no se copia a memoria: solo se reservan los bloques codificados
+    y el texto final (unas 2,7 veces el tamaño del archivo, frente a 3,7 al
+    leerlo y codificarlo de una vez).
+    """
+    presupuesto = presupuesto or presupuesto_imagenes
+    tamano_base64 = -(-os.path.getsize(ruta) // 3) * 4
+    with presupuesto.reservar(2 * tamano_base64):
+        return b''.join(iter_base64(ruta)).decode('ascii')
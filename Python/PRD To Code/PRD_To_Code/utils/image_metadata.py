@@ -0,0 +1,186 @@
+"""
+Metadatos de imágenes JPEG, PNG y WebP.
+Lee la orientación EXIF y obtiene el flujo de bytes de la imagen sin metadatos
+(EXIF, XMP, ICC, miniaturas, notas del fabricante, comentarios) recorriendo
+los segmentos del archivo, sin decodificar ni recomprimir los píxeles.
+"""
+import struct
+from typing import List, Union
+
+# Trozo del flujo de bytes limpio: vista sobre el archivo original o bytes nuevos
+Fragmento = Union[bytes, memoryview]
+
+# Etiqueta EXIF de la orientación
+ETIQUETA_ORIENTACION = 0x0112
+
+# Marcadores JPEG que se conservan aunque sean de aplicación: APP14 (Adobe)
+# indica la transformación de color y cambia cómo se decodifica la imagen
+MARCADORES_JPEG_CONSERVADOS = (0xEE,)
+
+# Marcadores JPEG sin campo de longitud
+MARCADORES_JPEG_SIN_LONGITUD = (0x01, *range(0xD0, 0xD8))
+
+# Chunks PNG auxiliares que afectan a los píxeles (el resto son metadatos)
+CHUNKS_PNG_CONSERVADOS = (b'tRNS',)
+
+# Chunks WebP de metadatos y su bit en las opciones de VP8X
+CHUNKS_WEBP_METADATOS = {b'ICCP': 0x20, b'EXIF': 0x08, b'XMP ': 0x04}
+
+FIRMA_PNG = b'\x89PNG\r\n\x1a\n'
+
+def _orientacion_tiff(tiff: memoryview) -> int:
+    """Lee la orientación del IFD0 de un bloque EXIF en formato TIFF (1 si no tiene)."""
+    tiff = bytes(tiff[:65536])
+    if tiff.startswith(b'Exif\x00\x00'):
+        tiff = tiff[6:]
+    if tiff[:2] not in (b'II', b'MM') or len(tiff) < 8:
+        return 1
+    orden = '<' if tiff[:2] == b'II' else '>'
+    (desplazamiento,) = struct.unpack_from(orden + 'I', tiff, 4)
+    if desplazamiento + 2 > len(tiff):
+        return 1
+    (entradas,) = struct.unpack_from(orden + 'H', tiff, desplazamiento)
+    for i in range(entradas):
+        inicio = desplazamiento + 2 + 12 * i
+        if inicio + 12 > len(tiff):
+            break
+        etiqueta, tipo = struct.unpack_from(orden + 'HH', tiff, inicio)
+        if etiqueta == ETIQUETA_ORIENTACION and tipo == 3:
+            (orientacion,) = struct.unpack_from(orden + 'H', tiff, inicio + 8)
+            return orientacion if 1 <= orientacion <= 8 else 1
+    return 1
+
+def _segmentos_jpeg(datos: memoryview):
+    """Recorre los segmentos de un JPEG anteriores a los datos de imagen: (marcador, inicio, fin)."""
+    posicion = 2
+    while posicion + 4 <= len(datos):
+        if datos[posicion] != 0xFF:
+            raise ValueError("Segmento JPEG mal formado")
+        marcador = datos[posicion + 1]
+        if marcador == 0xFF:
+            posicion += 1
+            continue
+        if marcador == 0xDA:
+            # A partir del primer SOS van los datos de imagen
+            yield marcador, posicion, len(datos)
+            return
+        if marcador in MARCADORES_JPEG_SIN_LONGITUD:
+            yield marcador, posicion, posicion + 2
+            posicion += 2
+            continue
+        fin = posicion + 2 + int.from_bytes(datos[posicion + 2:posicion + 4], 'big')
+        yield marcador, posicion, fin
+        posicion = fin
+
+def _chunks_png(datos: memoryview):
+    """Recorre los chunks de un PNG: (tipo, inicio, fin)."""
+    posicion = len(FIRMA_PNG)
+    while posicion + 12 <= len(datos):
+        longitud = int.from_bytes(datos[posicion:posicion + 4], 'big')
+        tipo = bytes(datos[posicion + 4:posicion + 8])
+        fin = posicion + 12 + longitud
+        yield tipo, posicion, fin
+        posicion = fin
+
+def _chunks_webp(datos: memoryview):
+    """Recorre los chunks de un WebP: (tipo, inicio, fin), incluido el relleno a tamaño par."""
+    posicion = 12
+    while posicion + 8 <= len(datos):
+        tipo = bytes(datos[posicion:posicion + 4])
+        longitud = int.from_bytes(datos[posicion + 4:posicion + 8], 'little')
+        fin = min(len(datos), posicion + 8 + longitud + (longitud & 1))
+        yield tipo, posicion, fin
+        posicion = fin
+
+def orientacion_exif(datos: memoryview, formato: str) -> int:
+    """
+    Obtiene la orientación EXIF de una imagen.
+
+    Args:
+        datos: Bytes del archivo
+        formato: 'JPEG', 'PNG' o 'WEBP'
+
+    Returns:
+        Orientación EXIF (1-8; 1 si no tiene o no se reconoce el formato)
+    """
+    datos = memoryview(datos)
+    try:
+        if formato == 'JPEG':
+            for marcador, inicio, fin in _segmentos_jpeg(datos):
+                if marcador == 0xE1 and bytes(datos[inicio + 4:inicio + 10]) == b'Exif\x00\x00':
+                    return _orientacion_tiff(datos[inicio + 10:fin])
+        elif formato == 'PNG':
+            for tipo, inicio, fin in _chunks_png(datos):
+                if tipo == b'eXIf':
+                    return _orientacion_tiff(datos[inicio + 8:fin - 4])
+                if tipo == b'IDAT':
+                    break
+        elif formato == 'WEBP':
+            for tipo, inicio, fin in _chunks_webp(datos):
+                if tipo == b'EXIF':
+                    return _orientacion_tiff(datos[inicio + 8:fin])
+    except (ValueError, struct.error):
+        pass
+    return 1
+
+def fragmentos_sin_metadatos(datos: memoryview, formato: str) -> List[Fragmento]:
+    """
+    Obtiene el flujo de bytes de una imagen sin sus metadatos.
+
+    La mayoría de los fragmentos son vistas sobre los datos originales, así que
+    no se copia el archivo; quien los use debe hacerlo mientras datos siga
+    siendo válido (p. ej. dentro de mapear_archivo).
+
+    Args:
+        datos: Bytes del archivo
+        formato: 'JPEG', 'PNG' o 'WEBP'
+
+    Returns:
+        Fragmentos cuya concatenación es la imagen sin metadatos (los datos
+        originales enteros si el formato no se reconoce o está mal formado)
+    """
+    datos = memoryview(datos)
+    try:
+        if formato == 'JPEG':
+            partes = [(0, 2)]
+            for marcador, inicio, fin in _segmentos_jpeg(datos):
+                if (0xE0 <= marcador <= 0xEF and marcador not in MARCADORES_JPEG_CONSERVADOS) or marcador == 0xFE:
+                    continue
+                partes.append((inicio, fin))
+            return _fragmentos(datos, partes)
+
+        if formato == 'PNG':
+            partes = [(0, len(FIRMA_PNG))]
+            for tipo, inicio, fin in _chunks_png(datos):
+                if tipo[:1].isupper() or tipo in CHUNKS_PNG_CONSERVADOS:
+                    partes.append((inicio, fin))
+            return _fragmentos(datos, partes)
+
+        if formato == 'WEBP':
+            partes = []
+            for tipo, inicio, fin in _chunks_webp(datos):
+                if tipo in CHUNKS_WEBP_METADATOS:
+                    continue
+                if tipo == b'VP8X':
+                    # Quitar de las opciones los metadatos eliminados
+                    vp8x = bytearray(datos[inicio:fin])
+                    for bit in CHUNKS_WEBP_METADATOS.values():
+                        vp8x[8] &= ~bit
+                    partes.append(bytes(vp8x))
+                else:
+                    partes.append((inicio, fin))
+            tamano = 4 + sum(len(parte) if isinstance(parte, bytes) else parte[1] - parte[0] for parte in partes)
+            return _fragmentos(datos, [b'RIFF' + tamano.to_bytes(4, 'little') + b'WEBP', *partes])
+    except (ValueError, IndexError):
+        pass
+    return [datos]
+
+def _fragmentos(datos: memoryview, partes: list) -> List[Fragmento]:
+    """Convierte rangos (inicio, fin) y bytes nuevos en fragmentos, uniendo los rangos consecutivos."""
+    unidas = []
+    for parte in partes:
+        if isinstance(parte, tuple) and unidas and isinstance(unidas[-1], tuple) and unidas[-1][1] == parte[0]:
+            unidas[-1] = (unidas[-1][0], parte[1])
+        else:
+            unidas.append(parte)
+    return [datos[parte[0]:parte[1]] if isinstance(parte, tuple) else parte for parte in unidas]
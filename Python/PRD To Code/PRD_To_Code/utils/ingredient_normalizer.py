@@ -0,0 +1,192 @@
+"""
+Normalización y canonicalización de nombres de ingredientes.
+Pliega tildes (conservando la ñ), pasa los plurales a singular, elimina
+descriptores de variedad o estado y aplica un diccionario de sinónimos, de modo
+que "Tomates", "tomate cherry" y "jitomate" comparten la misma forma canónica.
+Los resultados se memorizan porque se llaman para cada ingrediente.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+from config.settings import settings
+
+# Tildes y diéresis que se pliegan (la ñ se conserva)
+_TABLA_ACENTOS = str.maketrans('áéíóúüàèìòùâêîôû', 'aeiouuaeiouaeiou')
+
+_NO_PALABRA = re.compile(r'[\W_]+')
+
+_VOCALES = set('aeiou')
+
+# Palabras que no cambian en plural o que terminan en -s en singular
+INVARIABLES = {
+    'anis', 'ananas', 'cuscus', 'gas', 'lunes', 'mas', 'menos', 'pais', 'tres', 'seis', 'dos',
+    'entrecot', 'atlas', 'crisis', 'gratis'
+}
+
+# Descriptores de variedad, color, tamaño o estado que no cambian el ingrediente.
+# Solo se eliminan cuando no son la primera palabra del nombre.
+DESCRIPTORES = {
+    'fresco', 'fresca', 'maduro', 'madura', 'verde', 'rojo', 'roja', 'amarillo', 'amarilla',
+    'morado', 'morada', 'blanco', 'blanca', 'negro', 'negra', 'grande', 'pequeño', 'pequeña',
+    'mediano', 'mediana', 'cherry', 'pera', 'picado', 'picada', 'troceado', 'troceada',
+    'rallado', 'rallada', 'cocido', 'cocida', 'crudo', 'cruda', 'entero', 'entera',
+    'frito', 'frita', 'organico', 'organica', 'ecologico', 'ecologica', 'natural',
+    'congelado', 'congelada', 'enlatado', 'enlatada', 'extra', 'virgen'
+}
+
+# Sinónimos regionales (formas ya normalizadas y en singular) -> nombre canónico
+SINONIMOS = {
+    'jitomate': 'tomate',
+    'patata': 'papa',
+    'palta': 'aguacate',
+    'choclo': 'maiz',
+    'elote': 'maiz',
+    'frutilla': 'fresa',
+    'durazno': 'melocoton',
+    'banana': 'platano',
+    'banano': 'platano',
+    'cambur': 'platano',
+    'arveja': 'guisante',
+    'chicharo': 'guisante',
+    'poroto': 'frijol',
+    'alubia': 'judia',
+    'habichuela': 'judia',
+    'gamba': 'camaron',
+    'cacahuate': 'cacahuete',
+    'mani': 'cacahuete',
+    'zucchini': 'calabacin',
+    'zapallito': 'calabacin',
+    'betabel': 'remolacha',
+    'betarraga': 'remolacha',
+    'ajie': 'aji',
+    'chile': 'aji',
+    'guindilla': 'aji',
+    'carne de vaca': 'carne de res',
+    'carne vacuna': 'carne de res',
+    'vacuno': 'carne de res',
+    'ternera': 'carne de res',
+    'puerco': 'cerdo',
+    'chancho': 'cerdo',
+    'nata': 'crema',
+    'manteca': 'mantequilla'
+}
+
+def plegar_acentos(texto: str) -> str:
+    """Pasa a minúsculas y quita tildes y diéresis, conservando la ñ."""
+    return texto.lower().translate(_TABLA_ACENTOS)
+
+def singularizar(palabra: str) -> str:
+    """
+    Pasa una palabra normalizada de plural a singular con las reglas del español.
+
+    tomates -> tomate, limones -> limon, nueces -> nuez, champiñones -> champiñon
+    """
+    if len(palabra) <= 3 or palabra in INVARIABLES or not palabra.endswith('s'):
+        return palabra
+    if palabra.endswith('ces') and palabra[-4] in _VOCALES:
+        return palabra[:-3] + 'z'
+    if palabra.endswith('es') and palabra[-3] in 'lnrdjy' and palabra[-4] in _VOCALES:
+        return palabra[:-2]
+    return palabra[:-1]
+
+class IngredientNormalizer:
+    """Formas normalizadas y canónicas de nombres de ingredientes."""
+
+    @staticmethod
+    @lru_cache(maxsize=settings.NORMALIZER_CACHE_SIZE)
+    def normalizar(texto: str) -> str:
+        """
+        Normaliza un texto: minúsculas, sin tildes, sin puntuación y con espacios simples.
+
+        Args:
+            texto: Texto original
+
+        Returns:
+            Texto normalizado
+        """
+        return ' '.join(_NO_PALABRA.sub(' ', plegar_acentos(texto)).split())
+
+    @staticmethod
+    @lru_cache(maxsize=settings.NORMALIZER_CACHE_SIZE)
+    def palabras(nombre: str) -> Tuple[str, ...]:
+        """
+        Obtiene las palabras de la forma canónica de un ingrediente.
+
+        Args:
+            nombre: Nombre del ingrediente
+
+        Returns:
+            Palabras en singular, sin descriptores y con sinónimos aplicados
+        """
+        palabras = [singularizar(palabra) for palabra in IngredientNormalizer.normalizar(nombre).split()]
+        palabras = palabras[:1] + [palabra for palabra in palabras[1:] if palabra not in DESCRIPTORES]
+
+        frase = ' '.join(palabras)
+        if frase in SINONIMOS:
+            return tuple(SINONIMOS[frase].split())
+        return tuple(
+            sinonimo
+            for palabra in palabras
+            for sinonimo in SINONIMOS.get(palabra, palabra).split()
+        )
+
+    @staticmethod
+    def canonico(nombre: str) -> str:
+        """
+        Obtiene el nombre canónico de un ingrediente ("Tomates cherry" -> "tomate").
+
+        Args:
+            nombre: Nombre del ingrediente
+
+        Returns:
+            Nombre canónico
+        """
+        return ' '.join(IngredientNormalizer.palabras(nombre))
+
+    @staticmethod
+    def canonicos(nombres: Iterable[str]) -> Tuple[str, ...]:
+        """Obtiene los nombres canónicos distintos y ordenados de varios ingredientes."""
+        return tuple(sorted({IngredientNormalizer.canonico(nombre) for nombre in nombres}))
+
+    @staticmethod
+    def contiene(nombre: str, termino: str) -> bool:
+        """
+        Indica si el término aparece como palabras completas en el nombre canónico.
+
+        "carne de res" contiene "res" y "carne"; "cilantro fresco" no contiene "res".
+        """
+        palabras = IngredientNormalizer.palabras(nombre)
+        buscadas = IngredientNormalizer.palabras(termino)
+        n = len(buscadas)
+        if not n:
+            return False
+        return any(palabras[i:i + n] == buscadas for i in range(len(palabras) - n + 1))
+
+    @staticmethod
+    @lru_cache(maxsize=settings.NORMALIZER_CACHE_SIZE)
+    def forma_busqueda(texto: str) -> str:
+        """Texto normalizado con cada palabra en singular (conserva los descriptores)."""
+        return ' '.join(singularizar(palabra) for palabra in IngredientNormalizer.normalizar(texto).split())
+
+    @staticmethod
+    def contiene_texto(nombre: str, termino: str) -> bool:
+        """
+        Indica si el término aparece como subcadena del nombre, tras normalizar ambos.
+
+        Es la comparación conservadora de los filtros obligatorios (dietas y
+        alérgenos): detecta "pan" en "empanada" a costa de algún falso positivo.
+        """
+        termino = IngredientNormalizer.forma_busqueda(termino)
+        if not termino:
+            return False
+        return termino in IngredientNormalizer.forma_busqueda(nombre) or termino in IngredientNormalizer.canonico(nombre)
+
+    @staticmethod
+    def cache_info() -> dict:
+        """Obtiene los aciertos de la memoización de cada forma normalizada."""
+        return {
+            'normalizar': IngredientNormalizer.normalizar.cache_info()._asdict(),
+            'palabras': IngredientNormalizer.palabras.cache_info()._asdict(),
+            'forma_busqueda': IngredientNormalizer.forma_busqueda.cache_info()._asdict()
+        }
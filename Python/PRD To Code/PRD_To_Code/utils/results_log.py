@@ -0,0 +1,299 @@
+"""
+Registro de resultados de sesiones en un log segmentado de solo escritura al final.
+Cada segmento guarda registros binarios (ver utils.serialization) y tiene un
+índice de posiciones por sesión, de modo que cualquier sesión se lee por mmap
+sin recorrer el log. Los segmentos rotan por tamaño y se pueden compactar.
+"""
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config.settings import settings
+from utils.serialization import ResultSerializer, CABECERA, MAGIC, VERSION, REGISTRO, TIPO_DOCUMENTO
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tipo de registro que marca una sesión como eliminada
+TIPO_BORRADO = 255
+
+EXTENSION_SEGMENTO = ".log"
+EXTENSION_INDICE = ".idx"
+
+class ResultsLog:
+    """Log segmentado de resultados con acceso aleatorio por id de sesión."""
+
+    def __init__(self, directorio: Optional[str] = None, tamano_segmento: Optional[int] = None):
+        """
+        Abre (o crea) el log de resultados.
+
+        Args:
+            directorio: Directorio del log (por defecto settings.RESULTS_LOG_DIR)
+            tamano_segmento: Tamaño en bytes a partir del cual se rota el segmento
+                (por defecto settings.RESULTS_LOG_SEGMENT_SIZE)
+        """
+        self.directorio = Path(directorio or settings.RESULTS_LOG_DIR)
+        self.tamano_segmento = tamano_segmento or settings.RESULTS_LOG_SEGMENT_SIZE
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+        # session_id -> (número de segmento, posición del registro)
+        self._indice: Dict[str, Tuple[int, int]] = {}
+        self._segmentos: List[int] = []
+        self._mapas: Dict[int, mmap.mmap] = {}
+        self._lock = threading.RLock()
+
+        numeros = []
+        for ruta in self.directorio.glob(f"*{EXTENSION_SEGMENTO}"):
+            if ruta.stem.isdecimal():
+                numeros.append(int(ruta.stem))
+            else:
+                logger.warning(f"Archivo ignorado en el log de resultados (no es un segmento): {ruta.name}")
+        for numero in sorted(numeros):
+            self._cargar_segmento(numero)
+
+    def __enter__(self) -> 'ResultsLog':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Número de sesiones vivas en el log."""
+        return len(self._indice)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._indice
+
+    def session_ids(self) -> List[str]:
+        """Obtiene los ids de las sesiones vivas en orden de escritura."""
+        with self._lock:
+            return [session_id for session_id, _ in sorted(self._indice.items(), key=lambda item: item[1])]
+
+    def append(self, session_id: str, resultado: Dict[str, Any]) -> None:
+        """
+        Añade el resultado de una sesión al final del log.
+
+        Si la sesión ya existía, la nueva versión sustituye a la anterior.
+
+        Args:
+            session_id: Id de la sesión
+            resultado: Resultado serializable de la sesión
+        """
+        registro = ResultSerializer.encode_record(
+            {'session_id': session_id, 'resultado': resultado}, TIPO_DOCUMENTO
+        )
+        with self._lock:
+            numero, posicion = self._escribir(session_id, registro, TIPO_DOCUMENTO)
+            self._indice[session_id] = (numero, posicion)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Lee el resultado de una sesión.
+
+        Args:
+            session_id: Id de la sesión
+
+        Returns:
+            Resultado de la sesión o None si no existe
+        """
+        with self._lock:
+            ubicacion = self._indice.get(session_id)
+            if ubicacion is None:
+                return None
+            numero, posicion = ubicacion
+            _, data, _ = ResultSerializer.decode_record(self._mapa(numero), posicion)
+        return data['resultado']
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Elimina una sesión escribiendo una marca de borrado.
+
+        Args:
+            session_id: Id de la sesión
+
+        Returns:
+            True si la sesión existía
+        """
+        with self._lock:
+            if session_id not in self._indice:
+                return False
+            registro = ResultSerializer.encode_record({'session_id': session_id}, TIPO_BORRADO)
+            self._escribir(session_id, registro, TIPO_BORRADO)
+            del self._indice[session_id]
+            return True
+
+    def iter_results(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Recorre las sesiones vivas en orden de escritura, leyéndolas de una en una."""
+        for session_id in self.session_ids():
+            resultado = self.get(session_id)
+            if resultado is not None:
+                yield session_id, resultado
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Reescribe los segmentos dejando solo la última versión de cada sesión viva.
+
+        Las versiones sustituidas y las sesiones borradas se descartan. Los
+        registros se copian sin decodificarlos.
+
+        Returns:
+            Segmentos y bytes antes y después de compactar
+        """
+        with self._lock:
+            antiguos = list(self._segmentos)
+            bytes_antes = sum(self._ruta(numero).stat().st_size for numero in antiguos)
+
+            vivos = sorted(self._indice.items(), key=lambda item: item[1])
+            nuevo_indice: Dict[str, Tuple[int, int]] = {}
+            siguiente = (antiguos[-1] + 1) if antiguos else 1
+            self._segmentos = []
+
+            for session_id, (numero, posicion) in vivos:
+                mapa = self._mapa(numero)
+                _, longitud = REGISTRO.unpack_from(mapa, posicion)
+                registro = bytes(mapa[posicion:posicion + REGISTRO.size + longitud])
+                if not self._segmentos or self._tamano(self._segmentos[-1]) >= self.tamano_segmento:
+                    self._crear_segmento(siguiente)
+                    siguiente += 1
+                nuevo_indice[session_id] = self._anexar(self._segmentos[-1], session_id, registro, TIPO_DOCUMENTO)
+
+            for numero in antiguos:
+                self._cerrar_mapa(numero)
+                self._ruta(numero).unlink()
+                self._ruta(numero, EXTENSION_INDICE).unlink(missing_ok=True)
+
+            self._indice = nuevo_indice
+            bytes_despues = sum(self._tamano(numero) for numero in self._segmentos)
+
+        logger.info(f"Log compactado: {bytes_antes} -> {bytes_despues} bytes")
+        return {
+            'segmentos_antes': len(antiguos),
+            'segmentos_despues': len(self._segmentos),
+            'bytes_antes': bytes_antes,
+            'bytes_despues': bytes_despues
+        }
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Obtiene el número de sesiones, segmentos y bytes del log."""
+        with self._lock:
+            return {
+                'sesiones': len(self._indice),
+                'segmentos': len(self._segmentos),
+                'bytes': sum(self._tamano(numero) for numero in self._segmentos)
+            }
+
+    def close(self) -> None:
+        """Libera los mapas de memoria abiertos."""
+        with self._lock:
+            for numero in list(self._mapas):
+                self._cerrar_mapa(numero)
+
+    def _escribir(self, session_id: str, registro: bytes, tipo: int) -> Tuple[int, int]:
+        """Escribe un registro en el segmento activo, rotándolo si está lleno."""
+        if not self._segmentos or self._tamano(self._segmentos[-1]) >= self.tamano_segmento:
+            self._crear_segmento((self._segmentos[-1] + 1) if self._segmentos else 1)
+        return self._anexar(self._segmentos[-1], session_id, registro, tipo)
+
+    def _anexar(self, numero: int, session_id: str, registro: bytes, tipo: int) -> Tuple[int, int]:
+        """Añade un registro y su entrada de índice al final de un segmento."""
+        with open(self._ruta(numero), 'ab') as f:
+            posicion = f.tell()
+            f.write(registro)
+        with open(self._ruta(numero, EXTENSION_INDICE), 'a', encoding='utf-8') as f:
+            f.write(f"{session_id}\t{posicion}\t{tipo}\n")
+
+        # El mapa del segmento activo ya no cubre el registro nuevo
+        self._cerrar_mapa(numero)
+        return numero, posicion
+
+    def _crear_segmento(self, numero: int) -> None:
+        """Crea un segmento vacío con la cabecera del formato binario."""
+        with open(self._ruta(numero), 'wb') as f:
+            f.write(CABECERA.pack(MAGIC, VERSION))
+        self._ruta(numero, EXTENSION_INDICE).touch()
+        self._segmentos.append(numero)
+
+    def _cargar_segmento(self, numero: int) -> None:
+        """Carga el índice de un segmento y recupera los registros que falten en él."""
+        ruta = self._ruta(numero)
+        ultima_posicion = None
+        ruta_indice = self._ruta(numero, EXTENSION_INDICE)
+
+        if ruta_indice.exists():
+            with open(ruta_indice, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    partes = linea.rstrip('\n').split('\t')
+                    if len(partes) != 3:
+                        continue
+                    session_id, posicion, tipo = partes[0], int(partes[1]), int(partes[2])
+                    self._aplicar_entrada(session_id, numero, posicion, tipo)
+                    ultima_posicion = posicion if ultima_posicion is None else max(ultima_posicion, posicion)
+
+        fin_indexado = CABECERA.size if ultima_posicion is None else self._fin_registro(ruta, ultima_posicion)
+
+        self._segmentos.append(numero)
+        if fin_indexado < ruta.stat().st_size:
+            self._recuperar_cola(numero, fin_indexado)
+
+    def _recuperar_cola(self, numero: int, posicion: int) -> None:
+        """Indexa los registros escritos tras la última entrada del índice (p. ej. tras un corte)."""
+        ruta = self._ruta(numero)
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+
+        with open(self._ruta(numero, EXTENSION_INDICE), 'a', encoding='utf-8') as indice:
+            while posicion < len(contenido):
+                try:
+                    tipo, data, siguiente = ResultSerializer.decode_record(contenido, posicion)
+                except Exception:
+                    logger.warning(f"Registro incompleto en {ruta} (posición {posicion}); se descarta la cola")
+                    with open(ruta, 'r+b') as f:
+                        f.truncate(posicion)
+                    break
+                self._aplicar_entrada(data['session_id'], numero, posicion, tipo)
+                indice.write(f"{data['session_id']}\t{posicion}\t{tipo}\n")
+                posicion = siguiente
+
+    def _aplicar_entrada(self, session_id: str, numero: int, posicion: int, tipo: int) -> None:
+        """Aplica una entrada de índice: la última escritura de cada sesión prevalece."""
+        if tipo == TIPO_BORRADO:
+            self._indice.pop(session_id, None)
+        else:
+            self._indice[session_id] = (numero, posicion)
+
+    def _mapa(self, numero: int) -> mmap.mmap:
+        """Obtiene (o abre) el mapa de memoria de solo lectura de un segmento."""
+        mapa = self._mapas.get(numero)
+        if mapa is None:
+            with open(self._ruta(numero), 'rb') as f:
+                mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapas[numero] = mapa
+        return mapa
+
+    def _cerrar_mapa(self, numero: int) -> None:
+        """Cierra el mapa de memoria de un segmento, si está abierto."""
+        mapa = self._mapas.pop(numero, None)
+        if mapa is not None:
+            mapa.close()
+
+    def _tamano(self, numero: int) -> int:
+        """Tamaño actual en bytes de un segmento."""
+        return os.path.getsize(self._ruta(numero))
+
+    def _ruta(self, numero: int, extension: str = EXTENSION_SEGMENTO) -> Path:
+        """Ruta del archivo de un segmento o de su índice."""
+        return self.directorio / f"{numero:06d}{extension}"
+
+    @staticmethod
+    def _fin_registro(ruta: Path, posicion: int) -> int:
+        """Posición en la que termina el registro que empieza en `posicion`."""
+        with open(ruta, 'rb') as f:
+            f.seek(posicion)
+            cabecera = f.read(REGISTRO.size)
+        if len(cabecera) < REGISTRO.size:
+            return posicion
+        _, longitud = REGISTRO.unpack(cabecera)
+        return posicion + REGISTRO.size + longitud
@@ -0,0 +1,297 @@
+"""
+Trazas con tiempos por etapa del proceso de generación de recetas.
+Cada generación abre una traza y las etapas (validación, calidad, detección,
+llamadas a las APIs, parseo, filtrado...) abren spans anidados medidos con un
+reloj monótono. El resumen se adjunta a los metadatos del resultado y la traza
+se puede exportar como log estructurado o en el formato JSON de OpenTelemetry
+(OTLP), que lee el receptor otlpjsonfile del OpenTelemetry Collector.
+
+Sin traza activa o con el trazado desactivado, abrir un span devuelve un
+objeto vacío compartido, así que instrumentar el código apenas cuesta nada.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import settings
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Estados de un span en OTLP
+ESTADO_OK = 1
+ESTADO_ERROR = 2
+
+# Tipo de span en OTLP: operación interna del proceso
+TIPO_INTERNO = 1
+
+# Formas de exportar las trazas terminadas
+EXPORTACIONES = ('ninguna', 'log', 'otlp')
+
+class Span:
+    """Etapa medida de una traza."""
+
+    __slots__ = ('nombre', 'traza_id', 'span_id', 'padre_id', 'inicio_ns', 'duracion_ns', 'atributos', 'error', '_inicio_monotono')
+
+    def __init__(self, nombre: str, traza_id: str, padre_id: Optional[str], atributos: Dict[str, Any]):
+        self.nombre = nombre
+        self.traza_id = traza_id
+        self.span_id = os.urandom(8).hex()
+        self.padre_id = padre_id
+        self.atributos = atributos
+        self.error: Optional[str] = None
+        self.duracion_ns = 0
+        self.inicio_ns = time.time_ns()
+        self._inicio_monotono = time.perf_counter_ns()
+
+    def establecer(self, **atributos) -> None:
+        """Añade atributos al span (p. ej. resultados conocidos al terminar la etapa)."""
+        self.atributos.update(atributos)
+
+    def to_dict(self, origen_ns: int) -> Dict[str, Any]:
+        """Convierte el span a diccionario con tiempos en ms relativos al inicio de la traza."""
+        datos = {
+            'nombre': self.nombre,
+            'span_id': self.span_id,
+            'padre_id': self.padre_id,
+            'inicio_ms': round((self.inicio_ns - origen_ns) / 1e6, 3),
+            'duracion_ms': round(self.duracion_ns / 1e6, 3)
+        }
+        if self.atributos:
+            datos['atributos'] = self.atributos
+        if self.error:
+            datos['error'] = self.error
+        return datos
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Convierte el span al formato JSON de OTLP."""
+        datos = {
+            'traceId': self.traza_id,
+            'spanId': self.span_id,
+            'name': self.nombre,
+            'kind': TIPO_INTERNO,
+            'startTimeUnixNano': str(self.inicio_ns),
+            'endTimeUnixNano': str(self.inicio_ns + self.duracion_ns),
+            'attributes': [_atributo_otlp(clave, valor) for clave, valor in self.atributos.items()],
+            'status': {'code': ESTADO_ERROR, 'message': self.error} if self.error else {'code': ESTADO_OK}
+        }
+        if self.padre_id:
+            datos['parentSpanId'] = self.padre_id
+        return datos
+
+class Traza:
+    """Spans de una generación de recetas."""
+
+    def __init__(self, nombre: str, atributos: Dict[str, Any]):
+        self.raiz = Span(nombre, os.urandom(16).hex(), None, atributos)
+        self.spans: List[Span] = [self.raiz]
+
+    @property
+    def traza_id(self) -> str:
+        return self.raiz.traza_id
+
+    def establecer(self, **atributos) -> None:
+        """Añade atributos al span raíz."""
+        self.raiz.establecer(**atributos)
+
+    def resumen(self) -> Dict[str, Any]:
+        """
+        Obtiene los tiempos de la traza para los metadatos del resultado.
+
+        Returns:
+            Diccionario con el id de traza, la duración total, el tiempo total
+            por etapa (sumando sus spans) y los spans terminados en orden de inicio
+        """
+        origen = self.raiz.inicio_ns
+        etapas: Dict[str, float] = {}
+        for span in self.spans[1:]:
+            etapas[span.nombre] = round(etapas.get(span.nombre, 0.0) + span.duracion_ns / 1e6, 3)
+        return {
+            'traza_id': self.traza_id,
+            'total_ms': round(self.raiz.duracion_ns / 1e6, 3),
+            'etapas': etapas,
+            'spans': [span.to_dict(origen) for span in sorted(self.spans, key=lambda span: span.inicio_ns)]
+        }
+
+    def to_otlp(self, servicio: str = 'culinary-vision') -> Dict[str, Any]:
+        """Convierte la traza a una petición de exportación OTLP/JSON (ExportTraceServiceRequest)."""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [_atributo_otlp('service.name', servicio)]},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [span.to_otlp() for span in self.spans]
+                }]
+            }]
+        }
+
+class _TrazaNula:
+    """Traza vacía que se usa con el trazado desactivado."""
+
+    traza_id = None
+
+    def establecer(self, **atributos) -> None:
+        pass
+
+    def resumen(self) -> Dict[str, Any]:
+        return {}
+
+class _SpanNulo:
+    """Span vacío compartido: no mide nada ni guarda atributos."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_SpanNulo':
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def establecer(self, **atributos) -> None:
+        pass
+
+class _ContextoNulo:
+    """Contexto que devuelve un objeto vacío (traza con el trazado desactivado)."""
+
+    __slots__ = ('_objeto',)
+
+    def __init__(self, objeto):
+        self._objeto = objeto
+
+    def __enter__(self):
+        return self._objeto
+
+    def __exit__(self, *args) -> None:
+        pass
+
+_SPAN_NULO = _SpanNulo()
+_TRAZA_NULA = _ContextoNulo(_TrazaNula())
+
+# Traza y span abiertos en el contexto actual
+_traza_actual: 'contextvars.ContextVar[Optional[Traza]]' = contextvars.ContextVar('traza_actual', default=None)
+_span_actual: 'contextvars.ContextVar[Optional[Span]]' = contextvars.ContextVar('span_actual', default=None)
+
+class _ContextoSpan:
+    """Abre un span hijo del span actual y lo cierra al salir del bloque."""
+
+    __slots__ = ('_traza', '_span', '_token')
+
+    def __init__(self, traza: Traza, nombre: str, atributos: Dict[str, Any]):
+        self._traza = traza
+        padre = _span_actual.get()
+        self._span = Span(nombre, traza.traza_id, padre.span_id if padre else traza.raiz.span_id, atributos)
+
+    def __enter__(self) -> Span:
+        self._token = _span_actual.set(self._span)
+        return self._span
+
+    def __exit__(self, tipo, valor, traceback) -> None:
+        self._span.duracion_ns = time.perf_counter_ns() - self._span._inicio_monotono
+        if valor is not None:
+            self._span.error = f"{tipo.__name__}: {valor}"
+        _span_actual.reset(self._token)
+        self._traza.spans.append(self._span)
+
+class _ContextoTraza:
+    """Abre una traza nueva y la exporta al salir del bloque."""
+
+    def __init__(self, tracer: 'Tracer', nombre: str, atributos: Dict[str, Any]):
+        self._tracer = tracer
+        self._traza = Traza(nombre, atributos)
+
+    def __enter__(self) -> Traza:
+        self._tokens = (_traza_actual.set(self._traza), _span_actual.set(self._traza.raiz))
+        return self._traza
+
+    def __exit__(self, tipo, valor, traceback) -> None:
+        raiz = self._traza.raiz
+        raiz.duracion_ns = time.perf_counter_ns() - raiz._inicio_monotono
+        if valor is not None:
+            raiz.error = f"{tipo.__name__}: {valor}"
+        _span_actual.reset(self._tokens[1])
+        _traza_actual.reset(self._tokens[0])
+        self._tracer._exportar(self._traza)
+
+class Tracer:
+    """Crea trazas y spans, y exporta las trazas terminadas."""
+
+    def __init__(self, habilitado: Optional[bool] = None, exportacion: Optional[str] = None, ruta_otlp: Optional[str] = None):
+        """
+        Inicializa el tracer.
+
+        Args:
+            habilitado: Si se miden las etapas (por defecto settings.ENABLE_TRACING)
+            exportacion: 'ninguna', 'log' u 'otlp' (por defecto settings.TRACE_EXPORT)
+            ruta_otlp: Archivo JSON Lines donde se añaden las trazas en formato
+                OTLP (por defecto settings.TRACE_OTLP_FILE)
+        """
+        self.habilitado = settings.ENABLE_TRACING if habilitado is None else habilitado
+        self.exportacion = exportacion or settings.TRACE_EXPORT
+        if self.exportacion not in EXPORTACIONES:
+            logger.warning(f"Exportación de trazas desconocida: {self.exportacion}; no se exportan")
+            self.exportacion = 'ninguna'
+        self.ruta_otlp = ruta_otlp or settings.TRACE_OTLP_FILE
+        self.exportadores: List[Callable[[Traza], None]] = []
+        self._lock = threading.Lock()
+
+    def traza(self, nombre: str, **atributos):
+        """
+        Abre una traza nueva (la que hubiera abierta se recupera al salir).
+
+        Uso:
+            with tracer.traza('generar_recetas', imagenes=3) as traza:
+                ...
+            resumen = traza.resumen()
+        """
+        if not self.habilitado:
+            return _TRAZA_NULA
+        return _ContextoTraza(self, nombre, atributos)
+
+    def span(self, nombre: str, **atributos):
+        """
+        Abre un span hijo del actual para medir una etapa.
+
+        Fuera de una traza o con el trazado desactivado devuelve un span vacío.
+
+        Uso:
+            with tracer.span('llamada_llm', plantilla='principal') as span:
+                ...
+                span.establecer(tokens=1200)
+        """
+        if not self.habilitado:
+            return _SPAN_NULO
+        traza = _traza_actual.get()
+        if traza is None:
+            return _SPAN_NULO
+        return _ContextoSpan(traza, nombre, atributos)
+
+    def _exportar(self, traza: Traza) -> None:
+        """Exporta una traza terminada según la configuración y a los exportadores registrados."""
+        try:
+            if self.exportacion == 'log':
+                logger.info(json.dumps({'traza': traza.resumen()}, ensure_ascii=False, default=str))
+            elif self.exportacion == 'otlp':
+                linea = json.dumps(traza.to_otlp(), ensure_ascii=False, default=str)
+                with self._lock, open(self.ruta_otlp, 'a', encoding='utf-8') as f:
+                    f.write(linea + '\n')
+            for exportador in self.exportadores:
+                exportador(traza)
+        except Exception as e:
+            logger.warning(f"No se pudo exportar la traza {traza.traza_id}: {e}")
+
+def _atributo_otlp(clave: str, valor: Any) -> Dict[str, Any]:
+    """Convierte un atributo al formato clave-valor tipado de OTLP."""
+    if isinstance(valor, bool):
+        return {'key': clave, 'value': {'boolValue': valor}}
+    if isinstance(valor, int):
+        return {'key': clave, 'value': {'intValue': str(valor)}}
+    if isinstance(valor, float):
+        return {'key': clave, 'value': {'doubleValue': valor}}
+    return {'key': clave, 'value': {'stringValue': str(valor)}}
+
+# Tracer compartido por los servicios
+tracer = Tracer()
@@ -38,13 +38,6 @@ class Validators:
                 result['errors'].append(f"Archivo no encontrado: {image_path}")
                 return result
             
-            # Verificar extensión
-            file_extension = Path(image_path).suffix.lower()
-            if file_extension not in settings.SUPPORTED_IMAGE_FORMATS:
-                result['valid'] = False
-                result['errors'].append(f"Formato no soportado: {file_extension}")
-                return result
-            
             # Verificar tamaño del archivo
             file_size = os.path.getsize(image_path)
             if file_size > settings.MAX_FILE_SIZE:
@@ -64,6 +57,20 @@ class Validators:
                 result['errors'].append("Sin permisos de lectura")
                 return result
             
+            # Verificar formato por el contenido, no por la extensión
+            from utils.image_io import EXTENSIONES_FORMATO, detectar_formato, formato_decodificable, formatos_soportados
+            formato = detectar_formato(image_path)
+            if formato not in formatos_soportados():
+                result['valid'] = False
+                result['errors'].append(f"Formato no soportado: {formato or Path(image_path).suffix.lower()}")
+                return result
+            if not formato_decodificable(formato):
+                result['valid'] = False
+                result['errors'].append(f"Para leer imágenes {formato} hay que instalar pillow-heif")
+                return result
+            if EXTENSIONES_FORMATO.get(Path(image_path).suffix.lower()) != formato:
+                result['warnings'].append(f"La extensión no coincide con el formato {formato}")
+            
             return result
             
         except Exception as e: